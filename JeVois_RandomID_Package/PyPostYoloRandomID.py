@@ -2,10 +2,11 @@ import pyjevois
 if pyjevois.pro: import libjevoispro as jevois
 else: import libjevois as jevois
 
-import numpy as np
-import cv2
 import random
 
+from overlay_render import HelperBackend, JevoisBackend, LabelCache, OverlayRenderer
+from yolo_core import Detections, NmsSuppressor, load_classes
+
 ## YOLO post-processor with Random IDs - MultiDNN2 Safe Version
 #
 # @author Laurent Itti
@@ -21,6 +22,17 @@ class PyPostYoloRandomID:
         self.boxes = []
         self.classmap = None
         
+        # Rendu : labels et couleurs en cache, une liste de commandes par frame et par sortie
+        self.labels = LabelCache("ID{id}:{name}: {score:.2f}", decimals=2)
+        self.colors = {}
+        self.legacy_renderer = OverlayRenderer()
+        self.helper_renderer = OverlayRenderer()
+        self.legacy_backend = JevoisBackend(jevois)
+        self.helper_backend = HelperBackend()
+        
+        # NMS du cœur commun (yolo_core) sur les boîtes du décodeur natif
+        self.suppressor = NmsSuppressor()
+        
         # Essayer de créer PyPostYOLO (fonctionne en DNN normal)
         self.yolopp = None
         try:
@@ -94,12 +106,11 @@ class PyPostYoloRandomID:
     ## Charger les classes
     def loadClasses(self, filename):
         if filename:
-            try:
-                f = open(pyjevois.share + '/' + filename, 'rt')
-                self.classmap = f.read().rstrip('\n').split('\n')
-                f.close()
+            # Fichier lu une fois par processus (cache partagé de yolo_core)
+            self.classmap = load_classes([pyjevois.share + '/' + filename], fallback=False)
+            if self.classmap is not None:
                 jevois.LINFO(f"Loaded {len(self.classmap)} classes")
-            except:
+            else:
                 # Classes COCO par défaut
                 self.classmap = ['person', 'bicycle', 'car', 'motorcycle', 'airplane', 'bus', 'train', 'truck', 
                                 'boat', 'traffic light', 'fire hydrant', 'stop sign', 'parking meter', 'bench', 
@@ -159,8 +170,9 @@ class PyPostYoloRandomID:
                                                       self.maxnbox.get(),
                                                       self.sigmoid.get())
             
-            # NMS
-            indices = cv2.dnn.NMSBoxes(boxes, confs, self.cthresh.get() * 0.01, self.nms.get() * 0.01)
+            # NMS (toutes classes, comme cv2.dnn.NMSBoxes)
+            self.suppressor.iou = self.nms.get() * 0.01
+            indices = self.suppressor.indices(Detections.from_xywh(boxes, confs, classids)).tolist()
 
             # Traiter les détections
             for i in indices:
@@ -186,22 +198,26 @@ class PyPostYoloRandomID:
         
     # ###################################################################################################
     ## Label avec ID aléatoire
-    def getLabel(self, id, conf):
+    def getLabel(self, id, conf, random_id=None):
         if self.classmap is None:
             self.loadClasses('dnn/labels/coco-labels.txt')
-            
-        if self.classmap and id >= 0 and id < len(self.classmap): 
-            categ = self.classmap[id]
-        else: 
-            categ = f'class{id}'
         
-        color = jevois.stringToRGBA(categ, 255)
+        # Couleur calculée une fois par classe
+        color = self.colors.get(id)
+        if color is None:
+            if self.classmap and id >= 0 and id < len(self.classmap): 
+                categ = self.classmap[id]
+            else: 
+                categ = f'class{id}'
+            color = jevois.stringToRGBA(categ, 255) & 0xffffffff
+            self.colors[id] = color
         
         # ID aléatoire
-        random_id = random.randint(1, 999)
-        label = "ID%d:%s: %.2f" % (random_id, categ, conf * 100.0)
+        if random_id is None:
+            random_id = random.randint(1, 999)
+        label = self.labels.label(random_id, id, conf, self.classmap)
         
-        return (label, color & 0xffffffff)
+        return (label, color)
     
     # ###################################################################################################
     ## Affichage
@@ -209,18 +225,23 @@ class PyPostYoloRandomID:
         if not overlay:
             return
             
+        if outimg is None and helper is None:
+            return
+        
+        # Un label (et un ID aléatoire) par boîte, partagé par les deux modes d'affichage
+        self.legacy_renderer.begin()
+        self.helper_renderer.begin()
+        for i in range(len(self.classIds)):
+            label, color = self.getLabel(self.classIds[i], self.confidences[i])
+            x1, y1, x2, y2 = self.boxes[i]
+            w, h = x2 - x1 + 1, y2 - y1 + 1
+            self.legacy_renderer.add_box(label, x1, y1, w, h, label, x1 + 6, y1 + 2, jevois.YUYV.LightGreen)
+            self.helper_renderer.add_box(label, x1, y1, w, h, label, x1 + 3, y1 + 3, color)
+
         # Mode legacy
         if outimg is not None:
-            for i in range(len(self.classIds)):
-                label, color = self.getLabel(self.classIds[i], self.confidences[i])
-                x1, y1, x2, y2 = self.boxes[i]
-                jevois.drawRect(outimg, x1, y1, x2-x1+1, y2-y1+1, 2, jevois.YUYV.LightGreen)
-                jevois.writeText(outimg, label, x1 + 6, y1 + 2, jevois.YUYV.LightGreen, jevois.Font.Font10x20)
+            self.legacy_renderer.flush(self.legacy_backend, outimg)
 
         # Mode JeVois-Pro
         if helper is not None:
-            for i in range(len(self.classIds)):
-                label, color = self.getLabel(self.classIds[i], self.confidences[i])
-                x1, y1, x2, y2 = self.boxes[i]
-                helper.drawRect(x1, y1, x2, y2, color, True)
-                helper.drawText(x1 + 3, y1 + 3, label, color)
\ No newline at end of file
+            self.helper_renderer.flush(self.helper_backend, helper)
\ No newline at end of file
@@ -29,6 +29,12 @@ cp PyPostYoloRandomID.py /jevoispro/share/pydnn/post/
 chmod 755 /jevoispro/share/pydnn/post/PyPostYoloRandomID.py
 echo "   ✅ PyPostYoloRandomID.py installé"
 
+# Modules partagés (à la racine du dépôt) : rendu, cœur de post-traitement et ses métriques
+for module in overlay_render.py yolo_core.py instrumentation.py; do
+    cp "$(dirname "$0")/../$module" /jevoispro/share/pydnn/post/
+    echo "   ✅ $module installé"
+done
+
 # Vérifier la syntaxe Python
 echo ""
 echo "🔍 Vérification de la syntaxe Python..."
@@ -5,10 +5,21 @@ Basé sur YOLOv7 - Compatible DNN & MultiDNN2
 IDs aléatoires + Tracking persistant
 """
 
-import numpy as np
-import random
 import time
-from collections import deque
+
+import numpy as np
+
+from anonymous_ids import AnonymousIdService
+from async_log import get_log_sink
+from decode_executor import decode_plan_from_env
+from instrumentation import get_metrics
+from model_artifacts import artifacts_from_env
+from occupancy_heatmap import heatmap_from_env
+from scene_cache import scene_cache_from_env
+from tensor_capture import capture_from_env
+from yolo_core import (CenterTracker, LogReporter, NmsSuppressor, Yolov7Decoder, YoloCore, blob_size, class_name,
+                       class_selection_from_env, load_classes)
+from zone_analytics import zone_analytics_from_env
 
 class PyPostYOLO_Ultimate:
     """Le post-processeur YOLO définitif - Simple et efficace"""
@@ -28,268 +39,123 @@ class PyPostYOLO_Ultimate:
         self.scale_xy = 2.0
         
         # Tracking simple mais efficace
-        self.tracks = {}
-        self.next_id = 1
-        
-        # Classes COCO
-        self.classmap = self._load_classes()
+        self.random_ids = AnonymousIdService(100, 999)
         
-        # Optimisation simple
-        self.grid_cache = {}
+        # Artefacts précalculés du modèle (YOLO_MODEL_CONFIG, voir model_artifacts.py), sinon valeurs ci-dessus
+        self.artifacts = artifacts_from_env()
         
-    def _load_classes(self):
-        """Charge les classes COCO"""
-        try:
-            with open('/jevoispro/share/dnn/labels/coco-labels.txt', 'r') as f:
-                return f.read().strip().split('\n')
-        except:
-            return [f"class{i}" for i in range(80)]
-    
-    def init(self):
-        """Initialisation JeVois"""
-        pass
-    
-    def process(self, outs, preproc):
-        """Process principal - YOLOv7 uniquement"""
-        
-        # Dimensions de l'image
-        try:
-            bsiz = preproc.blobsize(0)
-            img_w, img_h = bsiz[1], bsiz[0]
-        except:
-            img_w, img_h = 512, 288
-        
-        # Décoder les 3 échelles YOLOv7
-        all_boxes = []
-        all_scores = []
-        all_classes = []
-        
-        for scale_idx in range(min(3, len(outs))):
-            boxes, scores, classes = self._decode_yolov7(
-                outs[scale_idx], 
-                scale_idx,
-                img_w, 
-                img_h
-            )
-            all_boxes.extend(boxes)
-            all_scores.extend(scores)
-            all_classes.extend(classes)
+        # Classes COCO
+        if self.artifacts is not None and self.artifacts.classes:
+            self.classmap = list(self.artifacts.classes)
+        else:
+            self.classmap = load_classes()
         
-        # NMS simple
-        final_indices = self._nms(all_boxes, all_scores)
+        # Logs de report() écrits hors du thread vidéo
+        self.log = get_log_sink()
         
-        # Créer les détections finales
-        detections = []
-        for idx in final_indices:
-            det = {
-                'box': all_boxes[idx],
-                'score': all_scores[idx],
-                'class_id': all_classes[idx],
-                'class_name': self.classmap[all_classes[idx]] if all_classes[idx] < len(self.classmap) else f"class{all_classes[idx]}"
-            }
-            
-            # Ajouter tracking
-            det['id'] = self._get_track_id(det)
-            det['random_id'] = random.randint(100, 999)
-            
-            detections.append(det)
+        # Capture des sorties brutes pour relecture hors ligne (YOLO_CAPTURE_DIR, voir tensor_capture.py)
+        self.capture = capture_from_env('Ultimate')
         
-        # Stocker pour report
-        self.detections = detections
-        return detections
-    
-    def _decode_yolov7(self, output, scale_idx, img_w, img_h):
-        """Décode une échelle YOLOv7"""
+        # Chronomètres par étape et compteurs par tête (YOLO_METRICS / YOLO_METRICS_SOCKET)
+        self.metrics = get_metrics('Ultimate')
         
-        # Format attendu: [1, 255, H, W]
-        if len(output.shape) != 4 or output.shape[1] != 255:
-            return [], [], []
+        # Cœur commun : décodage, NMS toutes classes, tracking par centre, journal (format ID_track/ID_random)
+        decoder = (Yolov7Decoder.from_artifacts(self.artifacts) if self.artifacts is not None
+                   else Yolov7Decoder(self.anchors, self.scale_xy))
+        self.core = YoloCore(decoder, NmsSuppressor(self.nms_threshold),
+                             CenterTracker(self.random_ids, max_dist=0.05, max_age=2.0),
+                             LogReporter("ID{id}/{random_id}:{class_name} {score:.1%}", self.log),
+                             metrics=self.metrics)
         
-        _, _, grid_h, grid_w = output.shape
-        stride = self.strides[scale_idx]
-        anchors = self.anchors[scale_idx]
+        # Scène inchangée (caméra fixe) : détections réutilisées (YOLO_SCENE_CACHE, voir scene_cache.py)
+        self.core.cache = scene_cache_from_env()
         
-        # Reshape: [1, 255, H, W] -> [3, 85, H, W]
-        output = output.reshape(3, 85, grid_h, grid_w)
+        # Pool de décodage partagé (YOLO_DECODE_WORKERS, voir decode_executor.py) : décodage, NMS et tracking
+        self.decode_plan = decode_plan_from_env('Ultimate', self.core, self)
         
-        # Créer ou récupérer la grille
-        grid_key = (grid_w, grid_h)
-        if grid_key not in self.grid_cache:
-            xv, yv = np.meshgrid(np.arange(grid_w), np.arange(grid_h))
-            self.grid_cache[grid_key] = (xv, yv)
-        xv, yv = self.grid_cache[grid_key]
+        # Allow-list et seuils par classe (YOLO_CLASSES / YOLO_CLASS_THRESHOLDS)
+        self.core.decoder.select(*class_selection_from_env(self.classmap))
         
-        boxes = []
-        scores = []
-        classes = []
+        # Zones et lignes comptées sur l'appareil (YOLO_ZONES, voir zone_analytics.py) : report() émet
+        # les compteurs et les événements au lieu d'une ligne par détection
+        self.zones = zone_analytics_from_env()
         
-        # Process chaque anchor
-        for a in range(3):
-            anchor_w, anchor_h = anchors[a]
-            
-            # Extraire les prédictions pour cet anchor
-            pred = output[a]  # [85, H, W]
-            
-            # Objectness
-            obj_conf = self._sigmoid(pred[4])
-            
-            # Masque des cellules valides
-            valid = obj_conf > self.conf_threshold
-            if not np.any(valid):
-                continue
-            
-            # Coordonnées des cellules valides
-            valid_y, valid_x = np.where(valid)
-            
-            # Process seulement les cellules valides
-            for i in range(len(valid_x)):
-                x_idx = valid_x[i]
-                y_idx = valid_y[i]
-                
-                # Prédictions pour cette cellule
-                cell_pred = pred[:, y_idx, x_idx]
-                
-                # Coordonnées de la boîte
-                tx = self._sigmoid(cell_pred[0])
-                ty = self._sigmoid(cell_pred[1])
-                tw = cell_pred[2]
-                th = cell_pred[3]
-                
-                # Décoder position (formule YOLOv7)
-                bx = (tx * self.scale_xy - 0.5 * (self.scale_xy - 1) + x_idx) * stride
-                by = (ty * self.scale_xy - 0.5 * (self.scale_xy - 1) + y_idx) * stride
-                
-                # Décoder taille
-                bw = np.exp(np.clip(tw, -5, 5)) * anchor_w
-                bh = np.exp(np.clip(th, -5, 5)) * anchor_h
-                
-                # Classes
-                class_probs = self._sigmoid(cell_pred[5:85])
-                class_id = np.argmax(class_probs)
-                class_conf = class_probs[class_id]
-                
-                # Score final
-                score = obj_conf[y_idx, x_idx] * class_conf
-                
-                if score > self.conf_threshold:
-                    # Convertir en format [x1, y1, x2, y2]
-                    x1 = (bx - bw/2) / img_w
-                    y1 = (by - bh/2) / img_h
-                    x2 = (bx + bw/2) / img_w
-                    y2 = (by + bh/2) / img_h
-                    
-                    # Clamp to [0, 1]
-                    x1 = max(0, min(1, x1))
-                    y1 = max(0, min(1, y1))
-                    x2 = max(0, min(1, x2))
-                    y2 = max(0, min(1, y2))
-                    
-                    boxes.append([x1, y1, x2, y2])
-                    scores.append(float(score))
-                    classes.append(int(class_id))
+        # Carte de présence des tracks en mémoire partagée (YOLO_HEATMAP, voir occupancy_heatmap.py)
+        self.heatmap = heatmap_from_env()
         
-        return boxes, scores, classes
+    @property
+    def tracks(self):
+        return self.core.tracker.tracks
     
-    def _sigmoid(self, x):
-        """Sigmoid avec protection overflow"""
-        return 1.0 / (1.0 + np.exp(-np.clip(x, -10, 10)))
+    def init(self):
+        """Initialisation JeVois"""
+        if self.artifacts is not None:
+            self.core.prepare()
     
-    def _nms(self, boxes, scores, threshold=0.45):
-        """Non-Maximum Suppression simple"""
-        if not boxes:
-            return []
-        
-        # Convertir en numpy pour efficacité
-        boxes = np.array(boxes)
-        scores = np.array(scores)
-        
-        # Trier par score
-        order = scores.argsort()[::-1]
-        
-        keep = []
-        while order.size > 0:
-            # Prendre le meilleur
-            i = order[0]
-            keep.append(i)
-            
-            if order.size == 1:
-                break
-            
-            # Calculer IoU avec les autres
-            xx1 = np.maximum(boxes[i, 0], boxes[order[1:], 0])
-            yy1 = np.maximum(boxes[i, 1], boxes[order[1:], 1])
-            xx2 = np.minimum(boxes[i, 2], boxes[order[1:], 2])
-            yy2 = np.minimum(boxes[i, 3], boxes[order[1:], 3])
-            
-            w = np.maximum(0.0, xx2 - xx1)
-            h = np.maximum(0.0, yy2 - yy1)
-            inter = w * h
-            
-            area_i = (boxes[i, 2] - boxes[i, 0]) * (boxes[i, 3] - boxes[i, 1])
-            area = (boxes[order[1:], 2] - boxes[order[1:], 0]) * (boxes[order[1:], 3] - boxes[order[1:], 1])
-            
-            iou = inter / (area_i + area - inter)
-            
-            # Garder seulement ceux avec IoU < threshold
-            inds = np.where(iou <= threshold)[0]
-            order = order[inds + 1]
-        
-        return keep
+    def uninit(self):
+        """Appelé par JeVois avant le déchargement : plan retiré du pool partagé, carte de présence écrite"""
+        if self.decode_plan is not None:
+            self.decode_plan.close()
+            self.decode_plan = None
+        self.metrics.close()
+        if self.heatmap is not None:
+            self.heatmap.save()  # dernière grille, reprise au prochain chargement
+            self.heatmap.close()
+            self.heatmap = None
     
-    def _get_track_id(self, detection):
-        """Tracking simple par position"""
-        
-        # Position du centre
-        cx = (detection['box'][0] + detection['box'][2]) / 2
-        cy = (detection['box'][1] + detection['box'][3]) / 2
-        
-        # Chercher un track proche
-        best_track = None
-        best_dist = 0.05  # 5% de l'image max
-        
-        for track_id, track in self.tracks.items():
-            if track['class_id'] != detection['class_id']:
-                continue
-            
-            # Distance au track
-            dist = np.sqrt((cx - track['cx'])**2 + (cy - track['cy'])**2)
-            
-            if dist < best_dist:
-                best_dist = dist
-                best_track = track_id
-        
-        # Si trouvé, mettre à jour
-        if best_track:
-            self.tracks[best_track]['cx'] = cx
-            self.tracks[best_track]['cy'] = cy
-            self.tracks[best_track]['time'] = time.time()
-            return best_track
-        
-        # Sinon créer nouveau track
-        track_id = self.next_id
-        self.next_id += 1
+    def process(self, outs, preproc):
+        """Process principal - YOLOv7 uniquement"""
         
-        self.tracks[track_id] = {
-            'cx': cx,
-            'cy': cy,
-            'class_id': detection['class_id'],
-            'time': time.time()
-        }
+        if self.capture is not None:
+            self.capture.capture(outs, preproc)
         
-        # Nettoyer vieux tracks (>2 secondes)
-        current = time.time()
-        self.tracks = {k: v for k, v in self.tracks.items() 
-                      if current - v['time'] < 2.0}
+        # Dimensions de l'image
+        img_w, img_h = blob_size(preproc)
+        
+        # Décoder les 3 échelles YOLOv7, NMS simple, tracking (sur le pool partagé si actif)
+        if self.decode_plan is not None:
+            future = self.decode_plan.submit(outs[:3], img_w, img_h, self.conf_threshold)
+            if future is None:
+                return getattr(self, 'detections', [])  # file pleine : frame précédente conservée
+            dets = future.result()
+        else:
+            dets = self.core.process(outs[:3], img_w, img_h, self.conf_threshold)
+        
+        # Créer les détections finales : boîtes [x1, y1, x2, y2] normalisées et bornées à [0, 1]
+        boxes = np.clip(dets.boxes / np.array([img_w, img_h, img_w, img_h], dtype=np.float32), 0.0, 1.0)
+        if self.zones is not None or self.heatmap is not None:
+            centers, now = (boxes[:, :2] + boxes[:, 2:]) / 2, time.time()
+            if self.zones is not None:
+                self.zones.update(dets.ids, centers, now)
+            if self.heatmap is not None:
+                self.heatmap.update(centers, now)
+        detections = [
+            {'box': box, 'score': score, 'class_id': class_id, 'class_name': class_name(self.classmap, class_id),
+             'id': track_id, 'random_id': random_id}
+            for box, score, class_id, track_id, random_id in zip(
+                boxes.tolist(), dets.scores.tolist(), dets.class_ids.tolist(), dets.ids.tolist(),
+                dets.random_ids.tolist())
+        ]
         
-        return track_id
+        # Stocker pour report
+        self.detections = detections
+        return detections
     
     def report(self, outimg, helper, overlay, idle):
         """Affichage des résultats"""
-        
-        if hasattr(self, 'detections'):
-            for det in self.detections:
-                # Format: ID_track/ID_random: class score%
-                label = f"ID{det['id']}/{det['random_id']}:{det['class_name']} {det['score']*100:.1f}%"
-                print(label)
-        
+        t = self.metrics.start()
+        
+        if self.zones is not None:
+            # Compteurs et événements seulement (émis quand un track franchit une ligne ou une zone)
+            events = self.zones.drain()
+            for timestamp, kind, name, track_id, direction in events:
+                self.log.info("🚧 {} {} : track {} {}", kind, name, track_id, direction or '')
+            if events:
+                self.log.info("🚧 Compteurs : {}", self.zones.stats())
+        elif hasattr(self, 'detections'):
+            # Format: ID_track/ID_random: class score% (une ligne par détection, formatée en arrière-plan)
+            self.core.report(self.detections, outimg, helper, overlay, idle)
+        
+        self.metrics.lap('report', t)
+        self.metrics.end_frame()
         return len(self.detections) if hasattr(self, 'detections') else 0
\ No newline at end of file
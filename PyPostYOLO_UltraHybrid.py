@@ -7,10 +7,28 @@ Performance optimisée 30+ FPS
 """
 
 import numpy as np
+import os
 import random
-import hashlib
 import time
 from collections import deque, defaultdict
+from types import MappingProxyType
+
+from anonymous_ids import AnonymousIdService
+from async_log import get_log_sink
+from detection_export import DetectionExporter
+from detection_recorder import DetectionRecorder
+from frame_skip import frame_skip_from_env
+from instrumentation import get_metrics
+from latency_budget import LatencyBudget
+from model_artifacts import artifacts_from_env
+from occupancy_heatmap import heatmap_from_env
+from result_snapshot import ResultPublisher
+from scene_cache import scene_cache_from_env
+from tensor_capture import capture_from_env
+from track_snapshot import TrackSnapshot, open_track_snapshot
+from yolo_core import (CellSuppressor, Detections, NmsSuppressor, PersistentTracker, Yolov7Decoder, YoloCore,
+                       blob_size, class_selection_from_env, load_classes)
+from zone_analytics import zone_analytics_from_env
 
 class PyPostYOLO_UltraHybrid:
     """
@@ -21,14 +39,14 @@ class PyPostYOLO_UltraHybrid:
     - Aucune dépendance problématique
     """
     
-    def __init__(self):
+    def __init__(self, snapshot_path=None):
         # ========== Configuration Auto-Adaptative ==========
-        self.context_type = None  # 'DNN', 'MultiDNN2', ou 'Unknown'
-        self.has_pypostyolo = False
+        # Contexte détecté au premier accès (voir context_type) ; l'instance PyPostYOLO du test
+        # est conservée comme décodeur natif, reconfiguré seulement quand un paramètre change
+        self._context = None  # 'DNN', 'MultiDNN2', ou 'Unknown'
         self.has_guihelper = False
-        
-        # Détection automatique du contexte
-        self._detect_context()
+        self.native_yolo = None
+        self.native_params = None
         
         # ========== Configuration YOLO ==========
         self.conf_threshold = 0.25
@@ -47,35 +65,112 @@ class PyPostYOLO_UltraHybrid:
         # ========== Système de Tracking Innovant ==========
         self.tracking_mode = 'hybrid'  # 'random', 'persistent', 'hybrid'
         
-        # IDs aléatoires
-        self.random_ids = {}
-        self.random_seed = int(time.time())
-        
-        # Tracking persistant avec mémoire
-        self.tracks = {}
-        self.next_track_id = 1
+        # Tracking persistant avec mémoire ; IDs aléatoires stables par track, dérivés d'un hash à clé
+        self.tracker = PersistentTracker(AnonymousIdService(100, 999))
         self.track_history = defaultdict(lambda: deque(maxlen=30))
         self.track_colors = {}
         
+        # Tracking délégué à un service multi-flux (voir multistream_tracker.py)
+        self.stream_tracker = None
+        
+        # Instantané de l'état du tracker pour redémarrage à chaud : fichier donné, sinon un fichier par
+        # instance et par modèle dans YOLO_TRACK_SNAPSHOT_DIR (voir track_snapshot.py) ; aucun par défaut
+        self.snapshot_path = snapshot_path
+        self.snapshot = None
+        
         # Tracking hybride (le meilleur des deux)
         self.hybrid_tracks = {}
         self.appearance_features = {}
         
         # ========== Optimisations Performance ==========
-        self.use_optimizations = True
-        self.sigmoid_cache = {}
-        self.grid_cache = {}
         self.last_frame_time = time.time()
         self.fps_history = deque(maxlen=30)
-        
-        # Table de lookup pour sigmoid (ultra rapide)
-        self._init_sigmoid_lut()
+        self.detections = []
+        self.log = get_log_sink()  # logs de report() hors du thread vidéo
+        
+        # Capture des sorties brutes pour relecture hors ligne (YOLO_CAPTURE_DIR, voir tensor_capture.py)
+        self.capture = capture_from_env('UltraHybrid')
+        
+        # Chronomètres par étape et compteurs par tête (YOLO_METRICS / YOLO_METRICS_SOCKET)
+        self.metrics = get_metrics('UltraHybrid')
+        self.tracker.metrics = self.metrics
+        
+        # Sous charge : décodage une frame sur N, tracks propagés entre deux
+        # (YOLO_TARGET_FPS ; None = désactivé, chaque frame est décodée)
+        self.frame_skip = frame_skip_from_env()
+        
+        # Budget de latence par frame (YOLO_LATENCY_BUDGET_MS) : candidats, seuil, têtes et
+        # suppression ajustés aux durées mesurées, résultat partiel à l'échéance (None = désactivé)
+        budget_ms = os.environ.get('YOLO_LATENCY_BUDGET_MS')
+        self.latency_budget = (LatencyBudget(float(budget_ms), conf_threshold=self.conf_threshold,
+                                             num_heads=len(self.strides))
+                               if budget_ms else None)
+        
+        # Export des détections en mémoire partagée pour les consommateurs locaux
+        # (YOLO_EXPORT_SHM = nom de l'anneau, lu avec detection_export.DetectionReader)
+        export_name = os.environ.get('YOLO_EXPORT_SHM')
+        self.exporter = DetectionExporter(export_name) if export_name else None
+        
+        # Enregistrement colonnaire des frames pour relecture d'incidents
+        # (YOLO_RECORD_DIR = dossier des segments, lu avec detection_recorder.RecordingReader)
+        record_dir = os.environ.get('YOLO_RECORD_DIR')
+        self.recorder = DetectionRecorder(record_dir) if record_dir else None
+        self.frame_index = 0
+        
+        # Occupation de zones et franchissements de lignes comptés sur l'appareil à partir des tracks
+        # (YOLO_ZONES = configuration JSON, voir zone_analytics.py) : report() émet compteurs et événements
+        self.zones = zone_analytics_from_env()
+        
+        # Carte de présence des tracks, instantané périodique dans un fichier mappé en mémoire
+        # (YOLO_HEATMAP = chemin du fichier, lu avec occupancy_heatmap.load_heatmap)
+        self.heatmap = heatmap_from_env()
+        
+        # Résultat immuable par frame publié par process() (results.current pour les consommateurs
+        # externes) ; report() lit une frame cohérente même si process() réécrit detections / tracks
+        self.results = ResultPublisher()
+        self.report_results = self.results.reader(self.metrics)
+        
+        # Artefacts précalculés du modèle (YOLO_MODEL_CONFIG, voir model_artifacts.py), sinon valeurs ci-dessus
+        self.artifacts = artifacts_from_env()
+        if self.artifacts is not None:
+            self.anchors = [[tuple(a) for a in layer.tolist()] for layer in self.artifacts.anchors]
+            self.scale_xy = self.artifacts.meta['scale_xy']
+        
+        # Décodage et suppression du cœur commun (yolo_core) ; le tracking reste ici
+        self.nms_suppressor = NmsSuppressor(self.nms_threshold, per_class=True)
+        self.cell_suppressor = CellSuppressor(cell=max(self.strides))
+        decoder = (Yolov7Decoder.from_artifacts(self.artifacts) if self.artifacts is not None
+                   else Yolov7Decoder(self.anchors, self.scale_xy))
+        self.core = YoloCore(decoder, self.nms_suppressor, metrics=self.metrics)
+        
+        # Scène inchangée (caméra fixe) : détections réutilisées, le tracking continue (YOLO_SCENE_CACHE)
+        self.core.cache = scene_cache_from_env()
         
         # ========== Classes COCO ==========
-        self.classmap = None
-        self._load_classes()
+        if self.artifacts is not None and self.artifacts.classes:
+            self.classmap = list(self.artifacts.classes)
+        else:
+            self.classmap = load_classes()
         
-        print(f"✅ UltraHybrid initialisé - Contexte: {self.context_type}, Mode: {self.tracking_mode}")
+        # Allow-list et seuils par classe (YOLO_CLASSES / YOLO_CLASS_THRESHOLDS) : seuls les canaux
+        # des classes retenues sont décodés
+        self.core.decoder.select(*class_selection_from_env(self.classmap))
+        
+        # Reprendre les tracks et le compteur d'IDs d'avant le rechargement
+        self._restore_tracks()
+        
+        print(f"✅ UltraHybrid initialisé - Mode: {self.tracking_mode}")
+    
+    @property
+    def context_type(self):
+        """'DNN', 'MultiDNN2' ou 'Unknown', détecté au premier accès puis mis en cache"""
+        if self._context is None:
+            self._detect_context()
+        return self._context
+    
+    @property
+    def has_pypostyolo(self):
+        return self.context_type == 'DNN'
     
     def _detect_context(self):
         """Auto-détecte le contexte d'exécution"""
@@ -86,73 +181,98 @@ class PyPostYOLO_UltraHybrid:
                 import libjevoispro as jevois
             else:
                 import libjevois as jevois
-            
-            # Tester PyPostYOLO
-            try:
-                test = jevois.PyPostYOLO()
-                self.has_pypostyolo = True
-                self.context_type = 'DNN'
-                del test
-            except:
-                self.has_pypostyolo = False
-                self.context_type = 'MultiDNN2'
-            
-            # Tester GUIHelper
-            try:
-                if hasattr(jevois, 'GUIhelperPython'):
-                    self.has_guihelper = True
-            except:
-                pass
-                
         except ImportError:
-            self.context_type = 'Unknown'
+            self._context = 'Unknown'
             print("⚠️ Running in standalone mode (no jevois module)")
+            return
+        
+        # Tester PyPostYOLO : l'instance créée sert ensuite au décodage
+        try:
+            self.native_yolo = jevois.PyPostYOLO()
+            self._context = 'DNN'
+        except Exception:
+            self.native_yolo = None
+            self._context = 'MultiDNN2'
+        
+        # Tester GUIHelper
+        self.has_guihelper = hasattr(jevois, 'GUIhelperPython')
+        print(f"🔍 UltraHybrid - Contexte: {self._context}")
+    
+    @property
+    def tracks(self):
+        return self.tracker.tracks
+    
+    @tracks.setter
+    def tracks(self, tracks):
+        self.tracker.tracks = tracks
+    
+    @property
+    def next_track_id(self):
+        return self.tracker.next_track_id
     
-    def _init_sigmoid_lut(self):
-        """Initialise une LUT pour sigmoid (10x plus rapide)"""
-        x = np.linspace(-10, 10, 2000)
-        self.sigmoid_lut = 1.0 / (1.0 + np.exp(-x))
-        self.sigmoid_range = 20.0
-        self.sigmoid_offset = 10.0
+    @next_track_id.setter
+    def next_track_id(self, next_track_id):
+        self.tracker.next_track_id = next_track_id
     
-    def fast_sigmoid(self, x):
-        """Sigmoid ultra-rapide avec LUT"""
-        if not self.use_optimizations:
-            return 1.0 / (1.0 + np.exp(-np.clip(x, -10, 10)))
-        
-        # Utiliser la LUT
-        x_flat = x.flatten()
-        indices = ((x_flat + self.sigmoid_offset) / self.sigmoid_range * 1999).astype(int)
-        indices = np.clip(indices, 0, 1999)
-        result = self.sigmoid_lut[indices]
-        return result.reshape(x.shape)
+    @property
+    def random_ids(self):
+        return self.tracker.random_ids
     
-    def _load_classes(self):
-        """Charge les noms de classes COCO"""
+    def _restore_tracks(self):
+        """Ouvre l'instantané et restaure l'état du tracker s'il est récent"""
         try:
-            paths = [
-                '/jevoispro/share/dnn/labels/coco-labels.txt',
-                '/usr/share/jevois-pro/dnn/labels/coco-labels.txt',
-                'dnn/labels/coco-labels.txt'
-            ]
-            
-            for path in paths:
-                try:
-                    with open(path, 'r') as f:
-                        self.classmap = f.read().strip().split('\n')
-                        print(f"📋 Loaded {len(self.classmap)} classes")
-                        return
-                except:
-                    continue
-        except:
-            pass
-        
-        # Fallback : noms génériques
-        self.classmap = [f"class{i}" for i in range(80)]
+            if self.snapshot_path:
+                self.snapshot = TrackSnapshot(self.snapshot_path)
+            else:
+                self.snapshot = open_track_snapshot('UltraHybrid',
+                                                    self.artifacts.key if self.artifacts is not None else 'default')
+            state = self.snapshot.load() if self.snapshot is not None else None
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Snapshot indisponible: {e}")
+            self.snapshot = None
+            return
+        
+        if state is None:
+            return
+        
+        tracks, next_track_id = state
+        for track in tracks.values():
+            class_id = track['class_id']
+            track['class_name'] = self.classmap[class_id] if class_id < len(self.classmap) else f"class{class_id}"
+        
+        self.tracks = tracks
+        self.next_track_id = max(next_track_id, max(tracks, default=0) + 1)
+        # IDs affichés des tracks restaurés repris tels quels (la clé n'est pas dans l'instantané)
+        self.random_ids.restore({k: v['random_id'] for k, v in tracks.items()})
+        print(f"♻️ {len(tracks)} tracks restaurés, prochain ID: {self.next_track_id}")
     
     def init(self):
         """Appelé par JeVois pour initialisation"""
-        print(f"🚀 UltraHybrid ready - Mode: {self.tracking_mode}, Context: {self.context_type}")
+        if self.artifacts is not None:
+            self.core.prepare()
+        print(f"🚀 UltraHybrid ready - Mode: {self.tracking_mode}")
+    
+    def uninit(self):
+        """Appelé par JeVois avant le déchargement : dernier instantané écrit, fichiers libérés"""
+        if self.snapshot is not None:
+            self.snapshot.save(self.tracks, self.next_track_id)
+            self.snapshot.close()
+            self.snapshot = None
+        if self.recorder is not None:
+            self.recorder.close()  # segment courant vidé sur disque
+            self.recorder = None
+        if self.exporter is not None:
+            self.exporter.close()  # anneau partagé retiré de /dev/shm
+            self.exporter = None
+        self.metrics.close()
+        if self.heatmap is not None:
+            self.heatmap.save()  # dernière grille, reprise au prochain chargement
+            self.heatmap.close()
+            self.heatmap = None
+    
+    def attach_stream_tracker(self, client):
+        """Délègue le tracking persistant à un StreamTrackerClient (None = local)"""
+        self.stream_tracker = client
     
     def set_mode(self, mode):
         """Change le mode de tracking"""
@@ -163,34 +283,91 @@ class PyPostYOLO_UltraHybrid:
     def process(self, outs, preproc):
         """Process principal - compatible DNN et MultiDNN2"""
         
+        if self.capture is not None:
+            self.capture.capture(outs, preproc)
+        
         # Mesurer FPS
         current_time = time.time()
         fps = 1.0 / (current_time - self.last_frame_time) if self.last_frame_time else 30.0
         self.last_frame_time = current_time
         self.fps_history.append(fps)
         
+        # Frame sautée : avancer les tracks par prédiction de mouvement
+        if self.frame_skip is not None and self.tracking_mode != 'random':
+            self.frame_skip.update(self.fps_history)
+            if not self.frame_skip.should_decode():
+                t = self.metrics.start()
+                self.detections = self._propagate_tracks(current_time)
+                self.metrics.lap('propagate', t)
+                self._export(current_time, preproc)
+                return self.detections
+        
+        decode_start = time.perf_counter()
+        
         # Si on a PyPostYOLO et qu'on est en DNN, l'utiliser pour performance
-        if self.has_pypostyolo and self.context_type == 'DNN':
-            return self._process_with_pypostyolo(outs, preproc)
+        if self.context_type == 'DNN':
+            self.detections = self._process_with_pypostyolo(outs, preproc)
+        else:
+            # Sinon, utiliser notre décodeur Python optimisé
+            self.detections = self._process_pure_python(outs, preproc)
+        
+        if self.frame_skip is not None:
+            self.frame_skip.record_decode(time.perf_counter() - decode_start)
         
-        # Sinon, utiliser notre décodeur Python optimisé
-        return self._process_pure_python(outs, preproc)
+        self._export(current_time, preproc)
+        return self.detections
+    
+    def _export(self, timestamp, preproc):
+        """Publie la frame courante pour report(), dans l'anneau d'export et l'enregistrement (si activés)"""
+        self.frame_index += 1
+        if self.zones is not None or self.heatmap is not None:
+            self._update_analytics(timestamp, preproc)
+        # Tracks : nouveau dict par frame, jamais modifié ensuite (PersistentTracker) : publié sans copie
+        self.results.publish(timestamp, detections=self.detections, tracks=MappingProxyType(self.tracks), info={
+            'fps': sum(self.fps_history) / len(self.fps_history) if self.fps_history else 0.0,
+            'interval': self.frame_skip.interval if self.frame_skip is not None else 1,
+            'mode': self.tracking_mode,
+        })
+        if self.exporter is not None:
+            self.exporter.publish(self.detections, frame_index=self.frame_index, timestamp=timestamp)
+        if self.recorder is not None:
+            self.recorder.append_detections(self.detections, self.frame_index, timestamp)
+    
+    def _update_analytics(self, timestamp, preproc):
+        """Centres des tracks (normalisés par le blob) -> compteurs de zones et de lignes, carte de présence"""
+        img_w, img_h = blob_size(preproc)
+        tracked = [det for det in self.detections if 'id' in det]
+        centers = np.array([(det['x'], det['y']) for det in tracked], dtype=np.float64).reshape(-1, 2)
+        centers /= (img_w, img_h)
+        if self.zones is not None and self.tracking_mode != 'random':
+            self.zones.update([det['id'] for det in tracked], centers, timestamp)
+        if self.heatmap is not None:
+            self.heatmap.update(centers, timestamp)
+    
+    def _propagate_tracks(self, now):
+        """Boîtes prédites (vitesse constante) pour les tracks vivants, marquées 'predicted'"""
+        predicted = []
+        for track_id, track in self.tracks.items():
+            dt = now - track.get('last_seen', now)
+            det = dict(track)
+            det['id'] = track_id
+            det['x'] = track['x'] + track.get('vx', 0.0) * dt
+            det['y'] = track['y'] + track.get('vy', 0.0) * dt
+            det['predicted'] = True
+            if self.tracking_mode == 'hybrid':
+                self._decorate_hybrid(det)
+            predicted.append(det)
+        return predicted
     
     def _process_with_pypostyolo(self, outs, preproc):
         """Process avec PyPostYOLO (DNN uniquement)"""
         try:
-            import libjevoispro as jevois
-            yolo = jevois.PyPostYOLO()
-            
-            # Configuration
-            yolo.anchors = self._format_anchors()
-            yolo.scalexy = self.scale_xy
-            yolo.sigmoid = False
-            yolo.cthresh = self.conf_threshold
-            yolo.nms = self.nms_threshold
+            yolo = self._configure_native()
             
             # Décoder avec C++
+            t = self.metrics.start()
             detections = yolo.yolo(outs, preproc.blobsize(0))
+            self.metrics.lap('decode', t)
             
             # Ajouter tracking
             return self._apply_tracking(detections)
@@ -199,159 +376,96 @@ class PyPostYOLO_UltraHybrid:
             print(f"⚠️ PyPostYOLO failed, falling back to Python: {e}")
             return self._process_pure_python(outs, preproc)
     
+    def _configure_native(self):
+        """Décodeur natif persistant : paramètres réassignés seulement s'ils ont changé"""
+        params = (tuple(map(tuple, self.anchors)), self.scale_xy, self.conf_threshold, self.nms_threshold)
+        if params != self.native_params:
+            yolo = self.native_yolo
+            yolo.anchors = self._format_anchors()
+            yolo.scalexy = self.scale_xy
+            yolo.sigmoid = False
+            yolo.cthresh = self.conf_threshold
+            yolo.nms = self.nms_threshold
+            self.native_params = params
+        return self.native_yolo
+    
     def _process_pure_python(self, outs, preproc):
         """Process en Python pur - compatible MultiDNN2"""
         
-        # Récupérer dimensions
-        try:
-            bsiz = preproc.blobsize(0)
-            img_w, img_h = bsiz[1], bsiz[0]
-        except:
-            img_w, img_h = 512, 288  # Fallback
-        
-        # Décoder toutes les échelles
-        all_detections = []
-        
-        for scale_idx, output in enumerate(outs[:3]):
-            if scale_idx >= len(self.strides):
+        # Récupérer dimensions (512x288 si indisponibles)
+        img_w, img_h = blob_size(preproc)
+        
+        # Budget de latence : têtes grossières d'abord, seuil et nombre de candidats du contrôleur
+        budget = self.latency_budget
+        if budget is not None:
+            tb = budget.start()
+            heads = budget.head_order(self.strides)
+            conf = budget.conf_threshold
+            remaining = budget.candidate_budget
+        else:
+            tb = None
+            heads = range(len(self.strides))
+            conf = self.conf_threshold
+            remaining = None
+        
+        # Suppression imposée par le budget : NMS par classe ou meilleure boîte par cellule
+        cell = budget is not None and budget.suppression == 'cell'
+        self.nms_suppressor.iou = self.nms_threshold
+        self.core.suppressor = self.cell_suppressor if cell else self.nms_suppressor
+        
+        # Scène inchangée : détections de la frame de référence, sans décodage ni suppression
+        dets = self.core.cached(outs, img_w, img_h, conf, heads, extra=remaining)
+        if dets is not None:
+            return self._finish_frame(self._to_dicts(dets), budget, tb, False)
+        
+        # Décoder les échelles
+        parts = []
+        partial = False
+        decoded = 0
+        
+        for scale_idx in heads:
+            if scale_idx >= min(len(outs), 3):
                 continue
+            if budget is not None and not budget.allows_head(scale_idx, decoded):
+                partial = True  # échéance : résultat partiel avec les têtes déjà décodées
+                break
             
-            # Décodage optimisé par échelle
-            scale_dets = self._decode_scale_optimized(
-                output, scale_idx, img_w, img_h
-            )
-            all_detections.extend(scale_dets)
-        
-        # NMS optimisé
-        final_dets = self._nms_optimized(all_detections)
-        
-        # Appliquer tracking selon le mode
-        return self._apply_tracking(final_dets)
-    
-    def _decode_scale_optimized(self, output, scale_idx, img_w, img_h):
-        """Décodage YOLO optimisé pour une échelle"""
-        
-        # Format: [1, 255, H, W] -> [3, 85, H, W]
-        if len(output.shape) != 4:
-            return []
-        
-        _, _, grid_h, grid_w = output.shape
-        stride = self.strides[scale_idx]
-        anchors = self.anchors[scale_idx]
-        
-        # Reshape optimisé
-        output = output.reshape(3, 85, grid_h, grid_w)
-        
-        # Créer grille (avec cache)
-        grid_key = (grid_w, grid_h)
-        if grid_key not in self.grid_cache:
-            xv, yv = np.meshgrid(np.arange(grid_w), np.arange(grid_h))
-            self.grid_cache[grid_key] = (xv, yv)
-        xv, yv = self.grid_cache[grid_key]
-        
-        detections = []
-        
-        # Traitement vectorisé par anchor
-        for a_idx, (anchor_w, anchor_h) in enumerate(anchors):
-            pred = output[a_idx]  # [85, H, W]
-            
-            # Objectness avec sigmoid rapide
-            obj_conf = self.fast_sigmoid(pred[4])
-            
-            # Masque des cellules valides
-            valid_mask = obj_conf > self.conf_threshold
-            if not np.any(valid_mask):
-                continue
-            
-            # Indices valides
-            valid_y, valid_x = np.where(valid_mask)
-            
-            # Extraire seulement les prédictions valides
-            valid_preds = pred[:, valid_y, valid_x].T  # [N, 85]
-            valid_obj = obj_conf[valid_y, valid_x]
-            
-            # Décoder coordonnées (vectorisé)
-            tx = self.fast_sigmoid(valid_preds[:, 0])
-            ty = self.fast_sigmoid(valid_preds[:, 1])
-            tw = valid_preds[:, 2]
-            th = valid_preds[:, 3]
-            
-            # Calcul des boîtes
-            cx = (tx * self.scale_xy - 0.5 * (self.scale_xy - 1) + valid_x) * stride
-            cy = (ty * self.scale_xy - 0.5 * (self.scale_xy - 1) + valid_y) * stride
-            w = np.exp(np.clip(tw, -5, 5)) * anchor_w
-            h = np.exp(np.clip(th, -5, 5)) * anchor_h
-            
-            # Classes (vectorisé)
-            class_probs = self.fast_sigmoid(valid_preds[:, 5:85])
-            class_ids = np.argmax(class_probs, axis=1)
-            class_confs = np.max(class_probs, axis=1)
-            
-            # Score final
-            scores = valid_obj * class_confs
-            
-            # Filtrer par score
-            valid_indices = scores > self.conf_threshold
-            
-            # Créer détections
-            for i in np.where(valid_indices)[0]:
-                detections.append({
-                    'x': float(cx[i]),
-                    'y': float(cy[i]),
-                    'w': float(w[i]),
-                    'h': float(h[i]),
-                    'score': float(scores[i]),
-                    'class_id': int(class_ids[i]),
-                    'class_name': self.classmap[class_ids[i]] if self.classmap else f"class{class_ids[i]}"
-                })
-        
-        return detections
+            # Décodage vectorisé par échelle (au plus remaining détections si budget)
+            part = self.core.decoder.decode_head(outs[scale_idx], scale_idx, img_w, img_h, conf,
+                                                 self.metrics, remaining)
+            parts.append(part)
+            decoded += 1
+            if budget is not None:
+                remaining -= len(part)
+                tb = budget.lap(f'head{scale_idx}', tb)
+        
+        # NMS par classe (ou suppression par cellule si le budget l'impose)
+        dets = self.core.suppress(Detections.concat(parts))
+        if self.core.cache is not None and not partial:
+            self.core.cache.put(dets)  # résultat partiel jamais réutilisé
+        if partial and self.metrics.enabled:
+            self.metrics.count('partial_frames')
+        return self._finish_frame(self._to_dicts(dets), budget, tb, partial)
     
-    def _nms_optimized(self, detections):
-        """NMS optimisé avec tri par classe"""
-        if not detections:
-            return []
-        
-        # Grouper par classe pour NMS plus rapide
-        by_class = defaultdict(list)
-        for det in detections:
-            by_class[det['class_id']].append(det)
-        
-        final = []
-        
-        # NMS par classe
-        for class_id, class_dets in by_class.items():
-            # Trier par score
-            class_dets.sort(key=lambda x: x['score'], reverse=True)
-            
-            # NMS pour cette classe
-            keep = []
-            while class_dets:
-                best = class_dets[0]
-                keep.append(best)
-                class_dets = class_dets[1:]
-                
-                # Supprimer overlaps
-                class_dets = [d for d in class_dets 
-                             if self._iou(best, d) < self.nms_threshold]
-            
-            final.extend(keep)
-        
-        return final
+    def _finish_frame(self, final_dets, budget, tb, partial):
+        """Tracking selon le mode, puis bilan de la frame pour le budget de latence"""
+        if budget is None:
+            return self._apply_tracking(final_dets)
+        tb = budget.lap('nms', tb)
+        tracked = self._apply_tracking(final_dets)
+        budget.lap('tracking', tb)
+        budget.end_frame(partial)
+        return tracked
     
-    def _iou(self, a, b):
-        """Calcul IoU optimisé"""
-        x1 = max(a['x'] - a['w']/2, b['x'] - b['w']/2)
-        y1 = max(a['y'] - a['h']/2, b['y'] - b['h']/2)
-        x2 = min(a['x'] + a['w']/2, b['x'] + b['w']/2)
-        y2 = min(a['y'] + a['h']/2, b['y'] + b['h']/2)
-        
-        inter = max(0, x2-x1) * max(0, y2-y1)
-        area_a = a['w'] * a['h']
-        area_b = b['w'] * b['h']
-        union = area_a + area_b - inter
-        
-        return inter / union if union > 0 else 0
+    def _to_dicts(self, dets):
+        """Detections du cœur -> dicts du tracker (centre x, y, w, h en pixels du blob)"""
+        classmap = self.classmap
+        return [
+            {'x': cx, 'y': cy, 'w': w, 'h': h, 'score': score, 'class_id': class_id,
+             'class_name': classmap[class_id] if class_id < len(classmap) else f"class{class_id}", 'head': head}
+            for (cx, cy, w, h), score, class_id, head in zip(
+                dets.centers().tolist(), dets.scores.tolist(), dets.class_ids.tolist(), dets.heads.tolist())
+        ]
     
     def _apply_tracking(self, detections):
         """Applique le tracking selon le mode choisi"""
@@ -373,57 +487,22 @@ class PyPostYOLO_UltraHybrid:
     def _apply_persistent_tracking(self, detections):
         """Mode 2: Tracking persistant avec mémoire"""
         
-        # Matcher avec tracks existants
-        unmatched_dets = list(detections)
-        matched_tracks = set()
+        # Tracking réparti : le shard du service possède les tracks de ce flux
+        if self.stream_tracker is not None:
+            t = self.metrics.start()
+            tracked = self.stream_tracker.track(detections)
+            self.tracks = {det['id']: det for det in tracked}
+            self.metrics.lap('association', t)
+            return tracked
         
-        for track_id, track in list(self.tracks.items()):
-            best_match = None
-            best_dist = float('inf')
-            
-            for det in unmatched_dets:
-                # Distance spatiale
-                dist = np.sqrt((det['x'] - track['x'])**2 + (det['y'] - track['y'])**2)
-                
-                # Vérifier classe
-                if det['class_id'] == track['class_id'] and dist < best_dist:
-                    best_dist = dist
-                    best_match = det
-            
-            # Si match trouvé (dans 10% de l'image)
-            if best_match and best_dist < 0.1 * max(det.get('img_w', 1000), det.get('img_h', 1000)):
-                best_match['id'] = track_id
-                best_match['tracking_mode'] = 'persistent'
-                best_match['age'] = track.get('age', 0) + 1
-                
-                # Mise à jour Kalman-like simple
-                alpha = 0.7  # Facteur de lissage
-                track['x'] = alpha * best_match['x'] + (1-alpha) * track['x']
-                track['y'] = alpha * best_match['y'] + (1-alpha) * track['y']
-                track['w'] = alpha * best_match['w'] + (1-alpha) * track['w']
-                track['h'] = alpha * best_match['h'] + (1-alpha) * track['h']
-                track['age'] = best_match['age']
-                track['last_seen'] = time.time()
-                
-                self.tracks[track_id] = track
-                unmatched_dets.remove(best_match)
-                matched_tracks.add(track_id)
-        
-        # Créer nouveaux tracks pour non-matchés
-        for det in unmatched_dets:
-            det['id'] = self.next_track_id
-            det['tracking_mode'] = 'persistent'
-            det['age'] = 0
-            self.tracks[self.next_track_id] = det.copy()
-            self.tracks[self.next_track_id]['last_seen'] = time.time()
-            self.next_track_id += 1
-        
-        # Nettoyer vieux tracks (>2 secondes)
-        current_time = time.time()
-        self.tracks = {k: v for k, v in self.tracks.items() 
-                      if current_time - v.get('last_seen', 0) < 2.0}
+        # Association et expiration (tracker sans E/S, partagé avec les shards multi-flux)
+        tracked = self.tracker(detections)
         
-        return detections
+        # Instantané périodique (redémarrage à chaud)
+        if self.snapshot is not None:
+            self.snapshot.maybe_save(self.tracks, self.next_track_id)
+        
+        return tracked
     
     def _apply_hybrid_tracking(self, detections):
         """Mode 3: Hybride - Tracking intelligent avec fallback aléatoire"""
@@ -431,21 +510,24 @@ class PyPostYOLO_UltraHybrid:
         # D'abord essayer le tracking persistant
         tracked = self._apply_persistent_tracking(detections)
         
-        # Pour les objets avec tracking instable, ajouter un ID aléatoire secondaire
         for det in tracked:
-            if det.get('age', 0) < 3:  # Nouvel objet ou tracking instable
-                det['random_id'] = random.randint(100, 999)
-                det['display_id'] = f"{det['id']}/{det['random_id']}"
-            else:  # Tracking stable
-                det['display_id'] = str(det['id'])
-            
-            det['tracking_mode'] = 'hybrid'
-            
-            # Ajouter confidence du tracking
-            det['tracking_confidence'] = min(1.0, det.get('age', 0) / 10.0)
+            self._decorate_hybrid(det)
         
         return tracked
     
+    def _decorate_hybrid(self, det):
+        """Identifiant affiché et confiance du tracking en mode hybride"""
+        # Pour les objets avec tracking instable, afficher l'ID aléatoire secondaire du track
+        if det.get('age', 0) < 3:  # Nouvel objet ou tracking instable
+            det['display_id'] = f"{det['id']}/{det['random_id']}"
+        else:  # Tracking stable
+            det['display_id'] = str(det['id'])
+        
+        det['tracking_mode'] = 'hybrid'
+        
+        # Ajouter confidence du tracking
+        det['tracking_confidence'] = min(1.0, det.get('age', 0) / 10.0)
+    
     def _format_anchors(self):
         """Formate les anchors pour PyPostYOLO"""
         result = ""
@@ -456,15 +538,36 @@ class PyPostYOLO_UltraHybrid:
     
     def report(self, outimg, helper, overlay, idle):
         """Affichage des résultats"""
+        t = self.metrics.start()
         
-        # Calculer FPS moyen
-        avg_fps = np.mean(self.fps_history) if self.fps_history else 0
+        # Dernière frame publiée par process() : détections, tracks et FPS d'une même frame
+        result = self.report_results.read()
         
-        # Log performance
-        if len(self.tracks) > 0:
-            print(f"📊 Tracking: {len(self.tracks)} objects | "
-                  f"Mode: {self.tracking_mode} | "
-                  f"FPS: {avg_fps:.1f} | "
-                  f"Context: {self.context_type}")
+        # Boîtes prédites (frame sautée) plutôt que décodées
+        predicted = sum(1 for det in result.detections if det.get('predicted'))
         
-        return len(self.tracks)
\ No newline at end of file
+        # Log performance
+        if len(result.tracks) > 0:
+            self.log.info("📊 Tracking: {} objects | Mode: {} | FPS: {:.1f} | "
+                          "Décodage: 1/{} | Prédites: {} | Context: {}",
+                          len(result.tracks), result.info['mode'], result.info['fps'],
+                          result.info['interval'], predicted, self.context_type)
+        
+        # Zones et lignes : événements de la frame et compteurs, pas les boîtes
+        if self.zones is not None:
+            events = self.zones.drain()
+            for timestamp, kind, name, track_id, direction in events:
+                self.log.info("🚧 {} {} : track {} {}", kind, name, track_id, direction or '')
+            if events:
+                self.log.info("🚧 Compteurs : {}", self.zones.stats())
+        
+        # Décisions du budget de latence (audit des compromis)
+        if self.latency_budget is not None:
+            for d in self.latency_budget.drain():
+                self.log.info("⏳ Budget {} ms : {} {} {} -> {} (frame {} ms, {})",
+                              d['budget_ms'], d['action'], d['knob'], d['old'], d['new'],
+                              d['frame_ms'], d['reason'])
+        
+        self.metrics.lap('report', t)
+        self.metrics.end_frame()
+        return len(result.tracks)
\ No newline at end of file
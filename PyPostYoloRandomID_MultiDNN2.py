@@ -6,10 +6,18 @@
 # @author Assistant
 # @ingroup pydnn
 
-import numpy as np
-import cv2
 import random
 
+from async_log import get_log_sink
+from decode_executor import configure_core, decode_plan_from_env
+from instrumentation import get_metrics
+from model_artifacts import artifacts_from_env
+from result_snapshot import ResultPublisher
+from scene_cache import scene_cache_from_env
+from tensor_capture import capture_from_env
+from yolo_core import (LogReporter, NmsSuppressor, Yolov7Decoder, YoloCore, blob_size, class_name,
+                       class_selection_from_env, load_classes)
+
 class PyPostYoloRandomID_MultiDNN2:
     # ###################################################################################################
     ## Constructor
@@ -27,35 +35,64 @@ class PyPostYoloRandomID_MultiDNN2:
         
         # Anchors pour YOLOv7-tiny
         self.anchor_text = "10,13, 16,30, 33,23;   30,61, 62,45, 59,119;   116,90, 156,198, 373,326"
+        
+        # Artefacts précalculés du modèle (YOLO_MODEL_CONFIG, voir model_artifacts.py) : anchors,
+        # scale_xy, quantification et classes sans reconstruction au changement de modèle
+        self.artifacts = artifacts_from_env()
+        if self.artifacts is not None:
+            self.anchor_text = self.artifacts.meta['fields']['anchors']
+            self.scale_xy = self.artifacts.meta['scale_xy']
+        
+        # Logs de report() écrits hors du thread vidéo
+        self.log = get_log_sink()
+        
+        # Chronomètres par étape et compteurs par tête (YOLO_METRICS / YOLO_METRICS_SOCKET)
+        self.metrics = get_metrics('MultiDNN2')
+        
+        # Décodage, NMS et journal des détections du cœur commun
+        decoder = (Yolov7Decoder.from_artifacts(self.artifacts) if self.artifacts is not None
+                   else Yolov7Decoder(self.anchor_text, self.scale_xy))
+        self.core = YoloCore(decoder, NmsSuppressor(self.nms_thresh),
+                             reporter=LogReporter("Detection: ID{}:{} {:.1%} at [{},{},{},{}]", self.log),
+                             metrics=self.metrics)
+        
+        # Capture des sorties brutes pour relecture hors ligne (YOLO_CAPTURE_DIR, voir tensor_capture.py)
+        self.capture = capture_from_env('MultiDNN2')
+        
+        # Scène inchangée (caméra fixe) : détections réutilisées (YOLO_SCENE_CACHE, voir scene_cache.py)
+        self.core.cache = scene_cache_from_env()
+        
+        # Pool de décodage partagé par les réseaux de l'interpréteur (YOLO_DECODE_WORKERS, voir decode_executor.py) :
+        # priorité = ordre de chargement (premier réseau = détecteur principal), modifiable par decode_plan.priority
+        self.decode_plan = decode_plan_from_env('MultiDNN2', self.core, self)
+        self.core_params = (self.anchor_text, self.scale_xy, self.nms_thresh)
+        
+        # Résultat immuable par frame (results.current pour les consommateurs externes) :
+        # report() lit boîtes, scores et classes d'une même frame, sans verrou
+        self.results = ResultPublisher()
+        self.report_results = self.results.reader(self.metrics)
 
     # ###################################################################################################
     ## JeVois parameters initialization
     def init(self):
         # Cette fonction est appelée par JeVois
-        # On charge les classes COCO par défaut
-        try:
-            # Essayer plusieurs chemins possibles
-            paths = [
-                '/jevoispro/share/dnn/labels/coco-labels.txt',
-                '/usr/share/jevois-pro/dnn/labels/coco-labels.txt',
-                'dnn/labels/coco-labels.txt'
-            ]
-            
-            for path in paths:
-                try:
-                    with open(path, 'r') as f:
-                        self.classmap = f.read().rstrip('\n').split('\n')
-                        print(f"Loaded {len(self.classmap)} classes from {path}")
-                        break
-                except:
-                    continue
-                    
-            if not self.classmap:
-                print("Warning: Could not load class names, using defaults")
-                self.classmap = [f"class{i}" for i in range(80)]
-        except Exception as e:
-            print(f"Error in init: {e}")
-            self.classmap = [f"class{i}" for i in range(80)]
+        # On charge les classes COCO par défaut (chemins possibles, sinon noms génériques)
+        if self.artifacts is not None and self.artifacts.classes:
+            self.classmap = list(self.artifacts.classes)
+        else:
+            self.classmap = load_classes()
+        if self.artifacts is not None:
+            self.core.prepare()
+        # Allow-list et seuils par classe (YOLO_CLASSES / YOLO_CLASS_THRESHOLDS), noms résolus avec les classes
+        self.core.decoder.select(*class_selection_from_env(self.classmap))
+
+    # ###################################################################################################
+    ## Appelé par JeVois avant le déchargement : plan retiré du pool partagé, métriques de l'instance retirées
+    def uninit(self):
+        if self.decode_plan is not None:
+            self.decode_plan.close()
+            self.decode_plan = None
+        self.metrics.close()
 
     # ###################################################################################################
     ## Process function that works without jevois module
@@ -66,145 +103,87 @@ class PyPostYoloRandomID_MultiDNN2:
             print("Need at least one output")
             return
         
-        # Parse anchors
-        anchor_layers = []
-        for layer in self.anchor_text.replace(' ', '').split(';'):
-            pairs = layer.split(',')
-            anchors = [(float(pairs[i]), float(pairs[i+1])) for i in range(0, len(pairs), 2)]
-            anchor_layers.append(anchors)
-        
-        # Get blob dimensions - preproc.blobsize returns (height, width)
-        try:
-            bsiz = preproc.blobsize(0)
-            blob_h, blob_w = bsiz[0], bsiz[1]
-        except:
-            # Fallback si blobsize ne fonctionne pas
-            blob_w, blob_h = 512, 288
-        
-        # Process each output layer
-        all_boxes = []
-        all_confidences = []
-        all_class_ids = []
-        
-        for layer_idx, out in enumerate(outs):
-            if layer_idx >= len(anchor_layers):
-                continue
-                
-            # Reshape output: out shape is (1, 255, grid_h, grid_w)
-            # 255 = 3 anchors * (5 + 80 classes)
-            grid_h = out.shape[2]
-            grid_w = out.shape[3]
-            num_anchors = 3
-            num_classes = 80
-            
-            # Reshape to (3, 85, grid_h, grid_w)
-            out_reshaped = out.reshape((num_anchors, 5 + num_classes, grid_h, grid_w))
-            
-            # Process each anchor
-            for anchor_idx in range(num_anchors):
-                anchor_w, anchor_h = anchor_layers[layer_idx][anchor_idx]
-                
-                for y in range(grid_h):
-                    for x in range(grid_w):
-                        # Get the predictions for this cell
-                        predictions = out_reshaped[anchor_idx, :, y, x]
-                        
-                        # Extract box coordinates and confidence
-                        tx = predictions[0]
-                        ty = predictions[1]
-                        tw = predictions[2]
-                        th = predictions[3]
-                        objectness = predictions[4]
-                        
-                        # Apply sigmoid to objectness
-                        objectness = 1.0 / (1.0 + np.exp(-objectness))
-                        
-                        if objectness < self.conf_thresh:
-                            continue
-                        
-                        # Get class scores and apply sigmoid
-                        class_scores = predictions[5:]
-                        class_scores = 1.0 / (1.0 + np.exp(-class_scores))
-                        
-                        # Find best class
-                        class_id = np.argmax(class_scores)
-                        class_confidence = class_scores[class_id]
-                        
-                        # Combined confidence
-                        confidence = objectness * class_confidence
-                        
-                        if confidence < self.conf_thresh:
-                            continue
-                        
-                        # Decode box coordinates
-                        # Apply sigmoid and scale
-                        bx = (1.0 / (1.0 + np.exp(-tx)) * self.scale_xy - 0.5 * (self.scale_xy - 1) + x) / grid_w
-                        by = (1.0 / (1.0 + np.exp(-ty)) * self.scale_xy - 0.5 * (self.scale_xy - 1) + y) / grid_h
-                        
-                        # Apply exponential and anchors
-                        bw = np.exp(tw) * anchor_w / blob_w
-                        bh = np.exp(th) * anchor_h / blob_h
-                        
-                        # Convert to pixel coordinates
-                        x_center = bx * blob_w
-                        y_center = by * blob_h
-                        width = bw * blob_w
-                        height = bh * blob_h
-                        
-                        # Convert to x,y,w,h format
-                        x_min = int(x_center - width / 2)
-                        y_min = int(y_center - height / 2)
-                        
-                        all_boxes.append([x_min, y_min, int(width), int(height)])
-                        all_confidences.append(float(confidence))
-                        all_class_ids.append(int(class_id))
-        
-        # Apply NMS
-        self.boxes = []
-        self.confidences = []
-        self.classIds = []
+        if self.capture is not None:
+            self.capture.capture(outs, preproc)
         
-        if len(all_boxes) > 0:
-            indices = cv2.dnn.NMSBoxes(all_boxes, all_confidences, 
-                                       self.conf_thresh, self.nms_thresh)
-            
-            if len(indices) > 0:
-                for i in indices.flatten():
-                    self.boxes.append(all_boxes[i])
-                    self.confidences.append(all_confidences[i])
-                    self.classIds.append(all_class_ids[i])
+        self._sync_core()
+        
+        # preproc.blobsize renvoie (hauteur, largeur) ; 512x288 si indisponible
+        blob_w, blob_h = blob_size(preproc)
+        
+        # Décodage vectorisé + NMS toutes classes (cœur commun, voir yolo_core.py), sur le pool partagé si actif
+        if self.decode_plan is not None:
+            future = self.decode_plan.submit(outs, blob_w, blob_h, self.conf_thresh)
+            if future is None:
+                return  # file du réseau pleine : résultats de la frame précédente conservés
+            dets = future.result()
+        else:
+            dets = self.core.process(outs, blob_w, blob_h, self.conf_thresh)
+        
+        # Format historique : boîtes entières x, y, w, h
+        self.boxes, self.confidences, self.classIds = self._results(dets)
+        self.results.publish(boxes=self.boxes, confidences=self.confidences, class_ids=self.classIds)
+
+    # ###################################################################################################
+    ## Batch process (relecture / évaluation hors ligne) : sorties empilées [B, 255, H, W] par tête
+    def process_batch(self, outs, preproc):
+        """Décode B frames en une passe ; renvoie [(boxes, confidences, classIds)] par frame"""
+        
+        if len(outs) < 1:
+            return []
+        
+        self._sync_core()
+        blob_w, blob_h = blob_size(preproc)
+        batch = self.core.process_batch(outs, blob_w, blob_h, self.conf_thresh)
+        results = [self._results(batch.frame(i)) for i in range(len(batch))]
+        
+        # report() affiche la dernière frame du lot
+        if results:
+            self.boxes, self.confidences, self.classIds = results[-1]
+            self.results.publish(boxes=self.boxes, confidences=self.confidences, class_ids=self.classIds)
+        return results
+
+    def _sync_core(self):
+        # Paramètres changés : appliqués au cœur entre deux frames du pool (jamais pendant un décodage)
+        params = (self.anchor_text, self.scale_xy, self.nms_thresh)
+        if params != self.core_params:
+            self.core_params = params
+            configure_core(self.decode_plan, self.core, lambda core: self._apply_params(core, *params))
+
+    @staticmethod
+    def _apply_params(core, anchor_text, scale_xy, nms_thresh):
+        # Décodeur reconstruit seulement si les anchors ou scale_xy changent
+        if core.decoder.key != (anchor_text, scale_xy):
+            core.decoder = Yolov7Decoder(anchor_text, scale_xy).select(*core.decoder.selection)
+        core.suppressor.iou = nms_thresh
+
+    @staticmethod
+    def _results(dets):
+        return dets.xywh().astype(int).tolist(), dets.scores.tolist(), dets.class_ids.tolist()
 
     # ###################################################################################################
     ## Report function that works without jevois module
     def report(self, outimg, helper, overlay, idle):
         """Report detections with random IDs"""
+        t = self.metrics.start()
+        
+        # Dernière frame publiée par process(), lue d'un bloc
+        result = self.report_results.read()
         
         # Si on a une image de sortie et overlay est activé
         if overlay and outimg is not None:
-            # Dessiner les boîtes détectées
-            for i in range(len(self.boxes)):
-                x, y, w, h = self.boxes[i]
-                
-                # Générer un ID aléatoire
-                random_id = random.randint(1, 999)
-                
-                # Obtenir le nom de la classe
-                if self.classmap and self.classIds[i] < len(self.classmap):
-                    class_name = self.classmap[self.classIds[i]]
-                else:
-                    class_name = f"class{self.classIds[i]}"
-                
-                # Créer le label avec ID aléatoire
-                label = f"ID{random_id}:{class_name} {self.confidences[i]*100:.1f}%"
-                
-                # Dessiner avec OpenCV basique (pas de dépendance jevois)
-                # Note: outimg pourrait être en YUYV, on dessine quand même
-                try:
-                    # Simple rectangle et texte
-                    # Les couleurs dépendent du format de l'image
-                    print(f"Detection: {label} at [{x},{y},{w},{h}]")
-                except Exception as e:
-                    print(f"Error drawing: {e}")
+            # Le résultat est immuable : on peut le passer par référence,
+            # les labels (ID aléatoire, nom de classe) sont construits par le thread de log
+            boxes, confidences, class_ids = result.boxes, result.confidences, result.class_ids
+            
+            def rows():
+                for box, conf, class_id in zip(boxes, confidences, class_ids):
+                    yield (random.randint(1, 999), class_name(self.classmap, class_id), conf, *box)
+            
+            self.core.report(rows, outimg, helper, overlay, idle)
+        
+        self.metrics.lap('report', t)
+        self.metrics.end_frame()
         
         # Retourner le nombre de détections pour debug
-        return len(self.boxes)
\ No newline at end of file
+        return len(result.boxes)
\ No newline at end of file
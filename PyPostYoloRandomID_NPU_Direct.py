@@ -6,9 +6,14 @@
 # @author Assistant
 # @ingroup pydnn
 
-import numpy as np
-import random
-import cv2
+from async_log import get_log_sink
+from decode_executor import decode_plan_from_env
+from instrumentation import get_metrics
+from model_artifacts import artifacts_from_env
+from scene_cache import scene_cache_from_env
+from tensor_capture import capture_from_env
+from yolo_core import (COCO_LABEL_PATHS, DenseRowDecoder, NmsSuppressor, RandomIdTracker, Yolov7Decoder, YoloCore,
+                       blob_size, class_name, class_selection_from_env, load_classes)
 
 class PyPostYoloRandomID_NPU_Direct:
     """Version ultra-optimisée pour 30+ FPS avec accès direct NPU"""
@@ -22,178 +27,81 @@ class PyPostYoloRandomID_NPU_Direct:
             [(30, 61), (62, 45), (59, 119)],    # Moyenne échelle  
             [(116, 90), (156, 198), (373, 326)] # Grande échelle
         ]
-        # Cache pour éviter les recalculs
-        self.grid_cache = {}
-        self.sigmoid_lut = None
-        self.init_optimizations()
+        # Artefacts précalculés du modèle (YOLO_MODEL_CONFIG, voir model_artifacts.py), sinon anchors ci-dessus
+        self.artifacts = artifacts_from_env()
+        # Chronomètres par étape et compteurs par tête (YOLO_METRICS / YOLO_METRICS_SOCKET)
+        self.metrics = get_metrics('NPU_Direct')
+        # YOLOv7 brut : décodage, NMS toutes classes et IDs aléatoires du cœur commun
+        decoder = (Yolov7Decoder.from_artifacts(self.artifacts) if self.artifacts is not None
+                   else Yolov7Decoder(self.anchors))
+        self.core = YoloCore(decoder, NmsSuppressor(0.45), RandomIdTracker(1, 999), metrics=self.metrics)
+        # YOLOv8 avec bibliothèque (lignes déjà en probabilités) : même NMS et mêmes IDs, autre décodeur
+        self.v8_core = YoloCore(DenseRowDecoder(), NmsSuppressor(0.45), RandomIdTracker(1, 999), metrics=self.metrics)
+        # Logs de report() écrits hors du thread vidéo
+        self.log = get_log_sink()
         
-    def init_optimizations(self):
-        """Pré-calculs pour optimisation"""
-        # Table de lookup pour sigmoid (évite np.exp coûteux)
-        x = np.linspace(-10, 10, 2000)
-        self.sigmoid_lut = 1.0 / (1.0 + np.exp(-x))
-        self.sigmoid_min = -10
-        self.sigmoid_max = 10
-        self.sigmoid_steps = 2000
+        # Capture des sorties brutes pour relecture hors ligne (YOLO_CAPTURE_DIR, voir tensor_capture.py)
+        self.capture = capture_from_env('NPU_Direct')
+        
+        # Scène inchangée (caméra fixe) : détections réutilisées (YOLO_SCENE_CACHE, voir scene_cache.py)
+        self.core.cache = scene_cache_from_env()
+        
+        # Pool de décodage partagé (YOLO_DECODE_WORKERS, voir decode_executor.py) pour le YOLOv7 brut ;
+        # les lignes YOLOv8 déjà décodées restent sur le thread appelant
+        self.decode_plan = decode_plan_from_env('NPU_Direct', self.core, self)
         
-    def fast_sigmoid(self, x):
-        """Sigmoid ultra-rapide avec lookup table"""
-        # Clipper et mapper vers l'index de la LUT
-        x_clipped = np.clip(x, self.sigmoid_min, self.sigmoid_max)
-        idx = ((x_clipped - self.sigmoid_min) / (self.sigmoid_max - self.sigmoid_min) * (self.sigmoid_steps - 1)).astype(int)
-        return self.sigmoid_lut[idx]
-    
     def init(self):
         """Initialisation JeVois"""
-        try:
-            # Charger les classes COCO
-            with open('/jevoispro/share/dnn/labels/coco-labels.txt', 'r') as f:
-                self.classmap = f.read().rstrip('\n').split('\n')
-        except:
-            self.classmap = [f"class{i}" for i in range(80)]
+        # Charger les classes COCO
+        if self.artifacts is not None and self.artifacts.classes:
+            self.classmap = list(self.artifacts.classes)
+        else:
+            self.classmap = load_classes(COCO_LABEL_PATHS[:1])
+        if self.artifacts is not None:
+            self.core.prepare()
+        # Allow-list et seuils par classe (YOLO_CLASSES / YOLO_CLASS_THRESHOLDS), YOLOv7 brut comme YOLOv8
+        selection = class_selection_from_env(self.classmap)
+        self.core.decoder.select(*selection)
+        self.v8_core.decoder.select(*selection)
     
-    def get_grid_offsets(self, grid_w, grid_h):
-        """Cache les offsets de grille pour éviter les recalculs"""
-        key = (grid_w, grid_h)
-        if key not in self.grid_cache:
-            # Créer une grille d'offsets
-            xv, yv = np.meshgrid(np.arange(grid_w), np.arange(grid_h))
-            self.grid_cache[key] = (xv, yv)
-        return self.grid_cache[key]
+    def uninit(self):
+        """Appelé par JeVois avant le déchargement : plan retiré du pool partagé, métriques retirées"""
+        if self.decode_plan is not None:
+            self.decode_plan.close()
+            self.decode_plan = None
+        self.metrics.close()
     
     def process_optimized_yolov8(self, outs, preproc):
-        """Traitement optimisé pour YOLOv8 avec library native"""
-        self.detections = []
-        
-        if len(outs) == 0:
-            return
-            
-        # YOLOv8 avec library: sortie format [1, num_boxes, 85] ou [num_boxes, 85]
-        output = outs[0]
-        
-        if len(output.shape) == 3:
-            output = output[0]  # Enlever dimension batch
-        
-        # Traitement vectorisé rapide
-        if output.shape[1] >= 85:  # 80 classes + 4 coords + 1 conf
-            # Extraction vectorisée
-            boxes = output[:, :4]      # x, y, w, h
-            confs = output[:, 4]        # confidence
-            classes = output[:, 5:85]   # scores des classes
-            
-            # Seuillage vectorisé
-            mask = confs > 0.25
-            valid_boxes = boxes[mask]
-            valid_confs = confs[mask]
-            valid_classes = classes[mask]
-            
-            # Argmax vectorisé pour les classes
-            class_ids = np.argmax(valid_classes, axis=1)
-            class_confs = np.max(valid_classes, axis=1)
-            
-            # Créer les détections avec IDs aléatoires
-            for i in range(len(valid_boxes)):
-                self.detections.append({
-                    'box': valid_boxes[i],
-                    'conf': valid_confs[i] * class_confs[i],
-                    'class_id': int(class_ids[i]),
-                    'random_id': random.randint(1, 999)
-                })
+        """Traitement optimisé pour YOLOv8 avec library native : [1, N, 5 + C] ou [N, 5 + C], cœur commun"""
+        blob_w, blob_h = blob_size(preproc)
+        self._publish(self.v8_core.process(outs[:1], blob_w, blob_h, 0.25))
     
     def process_optimized_yolov7(self, outs, preproc):
-        """Traitement optimisé pour YOLOv7 raw (sans library)"""
-        self.detections = []
-        
-        # Récupérer dimensions blob
-        try:
-            bsiz = preproc.blobsize(0)
-            blob_h, blob_w = bsiz[0], bsiz[1]
-        except:
-            blob_w, blob_h = 512, 288
-        
-        all_detections = []
-        
-        # Traiter chaque échelle en parallèle
-        for scale_idx, out in enumerate(outs[:3]):  # 3 échelles max
-            if scale_idx >= len(self.anchors):
-                continue
-                
-            # Format: [1, 255, grid_h, grid_w] -> [3, 85, grid_h, grid_w]
-            grid_h, grid_w = out.shape[2], out.shape[3]
-            out = out.reshape(3, 85, grid_h, grid_w)
-            
-            # Obtenir grille d'offsets (cachée)
-            xv, yv = self.get_grid_offsets(grid_w, grid_h)
-            
-            # Traitement vectorisé par anchor
-            for anchor_idx in range(3):
-                anchor_w, anchor_h = self.anchors[scale_idx][anchor_idx]
-                pred = out[anchor_idx]  # [85, grid_h, grid_w]
-                
-                # Objectness avec sigmoid rapide
-                obj = self.fast_sigmoid(pred[4])
-                
-                # Masque pour objectness > seuil
-                obj_mask = obj > 0.25
-                if not np.any(obj_mask):
-                    continue
-                
-                # Extraire seulement les cellules valides
-                valid_indices = np.where(obj_mask)
-                valid_y = valid_indices[0]
-                valid_x = valid_indices[1]
-                
-                # Coordonnées avec sigmoid rapide
-                tx = self.fast_sigmoid(pred[0][obj_mask])
-                ty = self.fast_sigmoid(pred[1][obj_mask])
-                tw = pred[2][obj_mask]
-                th = pred[3][obj_mask]
-                
-                # Classes avec sigmoid rapide  
-                classes = self.fast_sigmoid(pred[5:85, obj_mask[0], obj_mask[1]])
-                
-                # Calcul vectorisé des boîtes
-                bx = (tx * 2.0 - 0.5 + valid_x) / grid_w * blob_w
-                by = (ty * 2.0 - 0.5 + valid_y) / grid_h * blob_h
-                bw = np.exp(tw) * anchor_w
-                bh = np.exp(th) * anchor_h
-                
-                # Classes et confidences
-                class_ids = np.argmax(classes, axis=0)
-                class_confs = np.max(classes, axis=0)
-                final_confs = obj[obj_mask] * class_confs
-                
-                # Ajouter détections valides
-                valid = final_confs > 0.25
-                for i in np.where(valid)[0]:
-                    all_detections.append({
-                        'x': bx[i] - bw[i]/2,
-                        'y': by[i] - bh[i]/2,
-                        'w': bw[i],
-                        'h': bh[i],
-                        'conf': final_confs[i],
-                        'class_id': class_ids[i]
-                    })
-        
-        # NMS vectorisé rapide
-        if all_detections:
-            boxes = [[d['x'], d['y'], d['w'], d['h']] for d in all_detections]
-            confs = [d['conf'] for d in all_detections]
-            
-            # NMS avec OpenCV (optimisé C++)
-            indices = cv2.dnn.NMSBoxes(boxes, confs, 0.25, 0.45)
-            
-            if len(indices) > 0:
-                for i in indices.flatten():
-                    det = all_detections[i]
-                    det['random_id'] = random.randint(1, 999)
-                    self.detections.append(det)
+        """Traitement optimisé pour YOLOv7 raw (sans library) : cœur commun"""
+        blob_w, blob_h = blob_size(preproc)
+        if self.decode_plan is not None:
+            future = self.decode_plan.submit(outs[:3], blob_w, blob_h, 0.25)
+            if future is not None:  # file pleine : détections de la frame précédente conservées
+                self._publish(future.result())
+            return
+        self._publish(self.core.process(outs[:3], blob_w, blob_h, 0.25))
+    
+    def _publish(self, dets):
+        """Detections du cœur -> dicts x, y (coin), w, h, conf, classe, ID aléatoire"""
+        self.detections = [
+            {'x': x, 'y': y, 'w': w, 'h': h, 'conf': conf, 'class_id': class_id, 'random_id': random_id}
+            for (x, y, w, h), conf, class_id, random_id in zip(
+                dets.xywh().tolist(), dets.scores.tolist(), dets.class_ids.tolist(), dets.random_ids.tolist())
+        ]
     
     def process(self, outs, preproc):
         """Process principal - détecte le type de sortie"""
         if len(outs) == 0:
             return
         
+        if self.capture is not None:
+            self.capture.capture(outs, preproc)
+        
         # Détecter le format de sortie
         first_out = outs[0]
         
@@ -208,19 +116,17 @@ class PyPostYoloRandomID_NPU_Direct:
     
     def report(self, outimg, helper, overlay, idle):
         """Affichage optimisé des résultats"""
+        t = self.metrics.start()
         
         # Log minimaliste pour performance
         if len(self.detections) > 0:
-            print(f"Détections: {len(self.detections)}")
+            self.log.info("Détections: {}", len(self.detections))
             
             # Afficher seulement les 3 premières pour debug
             for det in self.detections[:3]:
-                if 'box' in det:  # Format YOLOv8
-                    x, y, w, h = det['box']
-                else:  # Format YOLOv7
-                    x, y, w, h = det['x'], det['y'], det['w'], det['h']
-                
-                class_name = self.classmap[det['class_id']] if self.classmap else f"class{det['class_id']}"
-                print(f"  ID{det['random_id']}:{class_name} {det['conf']*100:.1f}%")
+                self.log.info("  ID{}:{} {:.1%}", det['random_id'], class_name(self.classmap, det['class_id']),
+                              det['conf'])
         
+        self.metrics.lap('report', t)
+        self.metrics.end_frame()
         return len(self.detections)
\ No newline at end of file
@@ -2,10 +2,16 @@ import pyjevois
 if pyjevois.pro: import libjevoispro as jevois
 else: import libjevois as jevois
 
-import numpy as np
-import cv2
 import random
 
+from decode_executor import configure_core, decode_plan_from_env
+from instrumentation import get_metrics
+from overlay_render import JevoisBackend
+from result_snapshot import ResultPublisher
+from scene_cache import scene_cache_from_env
+from tensor_capture import capture_from_env
+from yolo_core import NmsSuppressor, OverlayReporter, Yolov7Decoder, YoloCore, load_classes, parse_class_selection
+
 ## Python DNN post-processor for YOLO with Random IDs - Pure Python Version
 #
 # Version compatible avec MultiDNN2 - Sans PyPostYOLO
@@ -22,6 +28,33 @@ class PyPostYoloRandomID_PurePython:
         self.confidences = []
         self.boxes = []
         self.classmap = None
+        self.selection = ('', '')  # texte de classfilter / classthresh
+        self.class_selection = (None, {})  # résolu au changement de paramètre ou au chargement des labels
+        self.applied_selection = None
+        self.decoder_key = None
+        self.nms_iou = None
+        
+        # Chronomètres par étape et compteurs par tête (YOLO_METRICS / YOLO_METRICS_SOCKET)
+        self.metrics = get_metrics('PurePython')
+        
+        # Décodage et NMS du cœur commun ; rendu de l'overlay : labels en cache, une liste de commandes par frame
+        self.core = YoloCore(Yolov7Decoder(), NmsSuppressor(),
+                             reporter=OverlayReporter(JevoisBackend(jevois), "ID{id}:{name} {score:.1f}%",
+                                                      color=jevois.YUYV.MedGreen),
+                             metrics=self.metrics)
+        
+        # Capture des sorties brutes pour relecture hors ligne (YOLO_CAPTURE_DIR, voir tensor_capture.py)
+        self.capture = capture_from_env('PurePython')
+        
+        # Scène inchangée (caméra fixe) : détections réutilisées (YOLO_SCENE_CACHE, voir scene_cache.py)
+        self.core.cache = scene_cache_from_env()
+        
+        # Pool de décodage partagé (YOLO_DECODE_WORKERS, voir decode_executor.py), None = décodage ici
+        self.decode_plan = decode_plan_from_env('PurePython', self.core, self)
+        
+        # Résultat immuable par frame : report() lit boîtes, scores et classes d'une même frame
+        self.results = ResultPublisher()
+        self.report_results = self.results.reader(self.metrics)
 
     # ###################################################################################################
     ## JeVois parameters initialization
@@ -48,74 +81,53 @@ class PyPostYoloRandomID_PurePython:
         self.scalexy = jevois.Parameter(self, 'scalexy', 'float',
                       "Non-linear coordinate box scaling, usually should not be changed",
                       2.0, pc)
+        
+        self.classfilter = jevois.Parameter(self, 'classfilter', 'str',
+                          "Comma-separated class names or indices to detect, empty for all classes",
+                          "", pc)
+        
+        self.classthresh = jevois.Parameter(self, 'classthresh', 'str',
+                          "Per-class detection thresholds in percent, e.g. person:50,car:30",
+                          "", pc)
+        
+        self.classfilter.setCallback(lambda value: self.selectClasses(classes=value))
+        self.classthresh.setCallback(lambda value: self.selectClasses(thresholds=value))
+
+    # ###################################################################################################
+    ## Appelé par JeVois avant le déchargement : plan retiré du pool partagé, métriques de l'instance retirées
+    def uninit(self):
+        if self.decode_plan is not None:
+            self.decode_plan.close()
+            self.decode_plan = None
+        self.metrics.close()
+
+    @staticmethod
+    def _apply_params(core, key, rebuild, classes, iou):
+        # Décodeur reconstruit seulement quand les anchors ou scalexy changent ; allow-list et seuils par classe
+        if rebuild:
+            core.decoder = Yolov7Decoder(*key)
+        if classes is not None:
+            core.decoder.select(*classes)
+            if core.cache is not None:
+                core.cache.clear()
+        core.suppressor.iou = iou
 
     # ###################################################################################################
     ## Load class names
     def loadClasses(self, filename):
         if filename:
-            with open(jevois.share + '/' + filename, 'r') as f:
-                self.classmap = f.read().rstrip('\n').split('\n')
+            self.classmap = load_classes([jevois.share + '/' + filename], fallback=False)
+            self.selectClasses()
 
     # ###################################################################################################
-    ## Decode YOLO raw outputs - Pure Python implementation
-    def decode_yolo_output(self, output, blob_w, blob_h, anchor_layer):
-        """Décoder une sortie YOLO en boîtes et scores"""
-        grid_h, grid_w = output.shape[2], output.shape[3]
-        num_anchors = len(anchor_layer)
-        num_classes = output.shape[1] // num_anchors - 5
-        
-        output = output.reshape((num_anchors, 5 + num_classes, grid_h, grid_w))
-        output = output.transpose(0, 2, 3, 1)  # anchors, grid_h, grid_w, (5+classes)
-        
-        boxes = []
-        confidences = []
-        class_ids = []
-        
-        for anchor_idx in range(num_anchors):
-            for y in range(grid_h):
-                for x in range(grid_w):
-                    data = output[anchor_idx, y, x]
-                    
-                    # Coordonnées de la boîte
-                    tx, ty, tw, th = data[0:4]
-                    objectness = data[4]
-                    
-                    # Sigmoid pour objectness
-                    objectness = 1.0 / (1.0 + np.exp(-objectness))
-                    
-                    if objectness < self.cthresh.get() / 100.0:
-                        continue
-                    
-                    # Scores des classes
-                    class_scores = data[5:]
-                    class_scores = 1.0 / (1.0 + np.exp(-class_scores))  # Sigmoid
-                    class_id = np.argmax(class_scores)
-                    confidence = objectness * class_scores[class_id]
-                    
-                    if confidence < self.cthresh.get() / 100.0:
-                        continue
-                    
-                    # Décodage des coordonnées avec anchors
-                    anchor_w, anchor_h = anchor_layer[anchor_idx]
-                    scale = self.scalexy.get()
-                    
-                    # Sigmoid et scaling pour x,y
-                    bx = (1.0 / (1.0 + np.exp(-tx)) * scale - 0.5 * (scale - 1) + x) * blob_w / grid_w
-                    by = (1.0 / (1.0 + np.exp(-ty)) * scale - 0.5 * (scale - 1) + y) * blob_h / grid_h
-                    
-                    # Exponentielle pour largeur/hauteur
-                    bw = np.exp(tw) * anchor_w * blob_w / grid_w
-                    bh = np.exp(th) * anchor_h * blob_h / grid_h
-                    
-                    # Convertir en x,y,w,h
-                    x_min = int(bx - bw / 2)
-                    y_min = int(by - bh / 2)
-                    
-                    boxes.append([x_min, y_min, int(bw), int(bh)])
-                    confidences.append(float(confidence))
-                    class_ids.append(int(class_id))
-        
-        return boxes, confidences, class_ids
+    ## Résolution des noms de classes : au changement de classfilter / classthresh ou au chargement des labels,
+    ## jamais dans process() ; un nom inconnu (labels pas encore chargés, faute de frappe) est journalisé et ignoré
+    def selectClasses(self, classes=None, thresholds=None):
+        self.selection = (self.selection[0] if classes is None else classes,
+                          self.selection[1] if thresholds is None else thresholds)
+        self.class_selection = parse_class_selection(
+            *self.selection, self.classmap, scale=0.01,
+            unknown=lambda name: jevois.LERROR(f"Unknown class {name!r} ignored"))
 
     # ###################################################################################################
     ## Process outputs
@@ -124,69 +136,48 @@ class PyPostYoloRandomID_PurePython:
             jevois.LERROR("Need at least one output")
             return
         
-        # Parse anchors
-        anchor_text = self.anchors.get().replace(' ', '')
-        anchor_layers = []
-        for layer in anchor_text.split(';'):
-            pairs = layer.split(',')
-            anchors = [(float(pairs[i]), float(pairs[i+1])) for i in range(0, len(pairs), 2)]
-            anchor_layers.append(anchors)
+        if self.capture is not None:
+            self.capture.capture(outs, preproc)
+        
+        # Paramètres changés : appliqués au cœur entre deux frames du pool (jamais pendant un décodage)
+        key = (self.anchors.get(), self.scalexy.get())
+        selection = self.class_selection
+        iou = self.nms.get() / 100.0
+        if (key, selection, iou) != (self.decoder_key, self.applied_selection, self.nms_iou):
+            rebuild = key != self.decoder_key
+            classes = selection if rebuild or selection != self.applied_selection else None
+            self.decoder_key, self.applied_selection, self.nms_iou = key, selection, iou
+            configure_core(self.decode_plan, self.core,
+                           lambda core: self._apply_params(core, key, rebuild, classes, iou))
         
         # Get blob dimensions
         bsiz = preproc.blobsize(0)
         blob_w, blob_h = bsiz[1], bsiz[0]
         
-        # Decode each output layer
-        all_boxes = []
-        all_confidences = []
-        all_class_ids = []
-        
-        for i, out in enumerate(outs):
-            if i < len(anchor_layers):
-                boxes, confs, ids = self.decode_yolo_output(out, blob_w, blob_h, anchor_layers[i])
-                all_boxes.extend(boxes)
-                all_confidences.extend(confs)
-                all_class_ids.extend(ids)
-        
-        # Apply NMS
-        if len(all_boxes) > 0:
-            indices = cv2.dnn.NMSBoxes(all_boxes, all_confidences, 
-                                       self.cthresh.get() / 100.0, 
-                                       self.nms.get() / 100.0)
-            
-            self.boxes = []
-            self.confidences = []
-            self.classIds = []
-            
-            if len(indices) > 0:
-                for i in indices.flatten():
-                    self.boxes.append(all_boxes[i])
-                    self.confidences.append(all_confidences[i])
-                    self.classIds.append(all_class_ids[i])
+        # Décodage vectorisé de chaque sortie + NMS (cœur commun, voir yolo_core.py)
+        if self.decode_plan is not None:
+            future = self.decode_plan.submit(outs, blob_w, blob_h, self.cthresh.get() / 100.0)
+            if future is None:
+                return  # file du réseau pleine : résultats de la frame précédente conservés
+            dets = future.result()
         else:
-            self.boxes = []
-            self.confidences = []
-            self.classIds = []
+            dets = self.core.process(outs, blob_w, blob_h, self.cthresh.get() / 100.0)
+        
+        # Boîtes entières x, y, w, h
+        self.boxes = dets.xywh().astype(int).tolist()
+        self.confidences = dets.scores.tolist()
+        self.classIds = dets.class_ids.tolist()
+        self.results.publish(boxes=self.boxes, confidences=self.confidences, class_ids=self.classIds)
 
     # ###################################################################################################
     ## Report results
     def report(self, outimg, helper, overlay, idle):
+        t = self.metrics.start()
+        result = self.report_results.read()
         if overlay and outimg is not None:
-            for i in range(len(self.boxes)):
-                x, y, w, h = self.boxes[i]
-                
-                # Générer un ID aléatoire
-                random_id = random.randint(1, 999)
-                
-                # Nom de classe
-                if self.classmap and self.classIds[i] < len(self.classmap):
-                    class_name = self.classmap[self.classIds[i]]
-                else:
-                    class_name = f"class{self.classIds[i]}"
-                
-                # Label avec ID aléatoire
-                label = f"ID{random_id}:{class_name} {self.confidences[i]*100:.1f}%"
-                
-                # Dessiner la boîte et le label
-                jevois.drawRect(outimg, x, y, w, h, 2, jevois.YUYV.MedGreen)
-                jevois.writeText(outimg, label, x + 3, y - 12, jevois.YUYV.MedGreen, jevois.Font.Font10x20)
\ No newline at end of file
+            # Un ID aléatoire par boîte ; labels en cache, dessin en une seule passe
+            rows = [(random.randint(1, 999), class_id, conf, *box)
+                    for box, conf, class_id in zip(result.boxes, result.confidences, result.class_ids)]
+            self.core.report(rows, outimg, helper, overlay, idle, classmap=self.classmap)
+        self.metrics.lap('report', t)
+        self.metrics.end_frame()
@@ -6,8 +6,11 @@
 # @author Assistant
 # @ingroup pydnn
 
-import numpy as np
-import random
+from async_log import get_log_sink
+from instrumentation import get_metrics
+from tensor_capture import capture_from_env
+from yolo_core import (LogReporter, PredecodedDecoder, RandomIdTracker, YoloCore, class_name, class_selection_from_env,
+                       load_classes)
 
 class PyPostYoloRandomID_Optimized:
     """Version optimisée qui délègue le décodage YOLO au C++ natif"""
@@ -15,71 +18,64 @@ class PyPostYoloRandomID_Optimized:
     def __init__(self):
         self.detections = []
         self.classmap = None
+        # Logs de report() écrits hors du thread vidéo
+        self.log = get_log_sink()
+        
+        # Capture des sorties brutes pour relecture hors ligne (YOLO_CAPTURE_DIR, voir tensor_capture.py)
+        self.capture = capture_from_env('Optimized')
+        
+        # Chronomètres par étape (YOLO_METRICS / YOLO_METRICS_SOCKET)
+        self.metrics = get_metrics('Optimized')
+        
+        # Cœur commun sans décodage ni NMS : lecture des boîtes natives, IDs aléatoires, journal
+        self.core = YoloCore(PredecodedDecoder(), None, RandomIdTracker(1, 999),
+                             LogReporter("Detection: ID{}:{} {:.1%} at [{},{},{},{}]", self.log),
+                             metrics=self.metrics)
         
     def init(self):
         """Initialisation - Charge les noms de classes"""
-        try:
-            # Charger les labels COCO
-            with open('/jevoispro/share/dnn/labels/coco-labels.txt', 'r') as f:
-                self.classmap = f.read().rstrip('\n').split('\n')
-        except:
-            self.classmap = [f"class{i}" for i in range(80)]
+        # Charger les labels COCO
+        self.classmap = load_classes()
+        # Allow-list et seuils par classe (YOLO_CLASSES / YOLO_CLASS_THRESHOLDS)
+        self.core.decoder.select(*class_selection_from_env(self.classmap))
+    
+    def uninit(self):
+        """Appelé par JeVois avant le déchargement : métriques de l'instance retirées"""
+        self.metrics.close()
     
     def process(self, outs, preproc):
         """
         Process optimisé - Les sorties sont DÉJÀ décodées par la bibliothèque native !
         On ajoute juste les IDs aléatoires
         """
-        self.detections = []
+        if self.capture is not None:
+            self.capture.capture(outs, preproc)
         
         # Pour YOLOv8 avec library native, les sorties sont déjà des boîtes
-        # Format attendu : [batch, num_detections, 6] où 6 = [x,y,w,h,conf,class]
-        if len(outs) > 0:
-            output = outs[0]
-            
-            # Si c'est une sortie déjà décodée (shape = [1, N, 6] ou [N, 6])
-            if len(output.shape) == 3 and output.shape[2] >= 6:
-                # Format [batch, detections, attributes]
-                for i in range(output.shape[1]):
-                    det = output[0, i, :]
-                    if det[4] > 0.2:  # Seuil de confiance
-                        self.detections.append({
-                            'x': int(det[0]),
-                            'y': int(det[1]), 
-                            'w': int(det[2]),
-                            'h': int(det[3]),
-                            'conf': float(det[4]),
-                            'class_id': int(det[5]),
-                            'random_id': random.randint(1, 999)
-                        })
-            elif len(output.shape) == 2 and output.shape[1] >= 6:
-                # Format [detections, attributes]
-                for i in range(output.shape[0]):
-                    det = output[i, :]
-                    if det[4] > 0.2:  # Seuil de confiance
-                        self.detections.append({
-                            'x': int(det[0]),
-                            'y': int(det[1]),
-                            'w': int(det[2]),
-                            'h': int(det[3]),
-                            'conf': float(det[4]),
-                            'class_id': int(det[5]),
-                            'random_id': random.randint(1, 999)
-                        })
+        # Format attendu : [1, N, 6] ou [N, 6] où 6 = [x,y,w,h,conf,class], seuil de confiance 0.2
+        dets = self.core.process(outs, 0, 0, 0.2)
+        boxes = dets.xywh().astype(int)  # boîtes natives d'origine, tronquées comme int()
+        self.detections = [
+            {'x': x, 'y': y, 'w': w, 'h': h, 'conf': conf, 'class_id': class_id, 'random_id': random_id}
+            for (x, y, w, h), conf, class_id, random_id in zip(
+                boxes.tolist(), dets.scores.tolist(), dets.class_ids.tolist(), dets.random_ids.tolist())
+        ]
     
     def report(self, outimg, helper, overlay, idle):
         """Affichage des résultats avec IDs aléatoires"""
+        t = self.metrics.start()
+        
+        detections = self.detections
+        
+        def rows():
+            for det in detections:
+                # Créer le label avec ID aléatoire
+                yield (det['random_id'], class_name(self.classmap, det['class_id']), det['conf'],
+                       det['x'], det['y'], det['w'], det['h'])
         
-        for det in self.detections:
-            # Créer le label avec ID aléatoire
-            if self.classmap and det['class_id'] < len(self.classmap):
-                class_name = self.classmap[det['class_id']]
-            else:
-                class_name = f"class{det['class_id']}"
-            
-            label = f"ID{det['random_id']}:{class_name} {det['conf']*100:.1f}%"
-            
-            # Log pour debug
-            print(f"Detection: {label} at [{det['x']},{det['y']},{det['w']},{det['h']}]")
+        # Log pour debug (formaté par le thread de log, pas par le thread vidéo)
+        self.core.report(rows, outimg, helper, overlay, idle)
         
-        return len(self.detections)
\ No newline at end of file
+        self.metrics.lap('report', t)
+        self.metrics.end_frame()
+        return len(self.detections)
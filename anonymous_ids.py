@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+🎭 SERVICE D'IDS ANONYMES
+IDs d'affichage pseudo-aléatoires, stables par track et sans collision
+Dérivés une seule fois d'un hash à clé (BLAKE2b) - aucun appel RNG par frame
+"""
+
+import hashlib
+import os
+import struct
+
+
+class AnonymousIdService:
+    """
+    Attribue à chaque track persistant un ID d'affichage pseudo-aléatoire :
+    - calculé UNE fois à la création du track (hash à clé, pas de RNG)
+    - unique parmi les tracks vivants (sondage linéaire dans le pool)
+    - libéré à l'expiration du track pour être réutilisé
+    """
+
+    def __init__(self, low=100, high=999, key=None):
+        self.low = low
+        self.high = high
+        self.pool_size = high - low + 1
+
+        # Clé secrète : sans elle, impossible de relier un ID affiché au track
+        self.key = key if key is not None else os.urandom(16)
+
+        self.assigned = {}   # track_id -> ID affiché
+        self.in_use = set()  # IDs affichés actuellement attribués
+
+    def _start_slot(self, track_id):
+        """Position de départ dans le pool, dérivée du hash à clé"""
+        digest = hashlib.blake2b(struct.pack('<q', int(track_id)),
+                                 key=self.key, digest_size=8).digest()
+        return int.from_bytes(digest, 'little') % self.pool_size
+
+    def acquire(self, track_id):
+        """Retourne l'ID affiché du track (attribué au premier appel)"""
+        display_id = self.assigned.get(track_id)
+        if display_id is not None:
+            return display_id
+
+        start = self._start_slot(track_id)
+        for probe in range(self.pool_size):
+            candidate = self.low + (start + probe) % self.pool_size
+            if candidate not in self.in_use:
+                break
+        else:
+            # Pool épuisé (plus de tracks vivants que d'IDs) : collision inévitable
+            candidate = self.low + start
+
+        self.assigned[track_id] = candidate
+        self.in_use.add(candidate)
+        return candidate
+
+    def restore(self, assignments):
+        """Réinstalle des attributions track_id -> ID affiché (redémarrage à chaud)"""
+        for track_id, display_id in assignments.items():
+            self.assigned[track_id] = display_id
+            self.in_use.add(display_id)
+
+    def release(self, track_id):
+        """Libère l'ID d'un track expiré"""
+        display_id = self.assigned.pop(track_id, None)
+        if display_id is not None and display_id not in self.assigned.values():
+            self.in_use.discard(display_id)
+
+    def retain(self, live_track_ids):
+        """Libère les IDs de tous les tracks absents de live_track_ids"""
+        for track_id in [t for t in self.assigned if t not in live_track_ids]:
+            self.release(track_id)
+
+    def reset(self):
+        """Oublie toutes les attributions (la clé est conservée)"""
+        self.assigned.clear()
+        self.in_use.clear()
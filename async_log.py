@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+📝 ASYNC LOG SINK
+Journalisation non bloquante pour report() : le thread vidéo ne fait qu'un append
+- Tampon circulaire borné vidé par un thread d'arrière-plan, par lots
+- Formatage différé (gabarit + arguments), filtrage par niveau, limite de débit
+- Mode binaire compact (gabarits internés + arguments typés) relu par read_binary_log()
+"""
+
+import os
+import string
+import struct
+import sys
+import threading
+import time
+from collections import deque
+
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+LEVEL_NAMES = {'DEBUG': DEBUG, 'INFO': INFO, 'WARNING': WARNING, 'ERROR': ERROR}
+
+# Format binaire : définition de gabarit puis événements qui y font référence
+_TEMPLATE = struct.Struct('<BHH')     # kind=0, template_id, longueur utf-8
+_EVENT = struct.Struct('<BdBHB')      # kind=1, timestamp, level, template_id, nargs
+_INT = struct.Struct('<q')
+_FLOAT = struct.Struct('<d')
+_STR = struct.Struct('<H')
+
+_formatter = string.Formatter()
+
+
+def _format_row(template, row):
+    """Formate une ligne : dict -> champs nommés, tuple -> champs positionnels"""
+    if isinstance(row, dict):
+        return template.format(**row)
+    return template.format(*row)
+
+
+class AsyncLogSink:
+    """
+    Puits de logs asynchrone :
+    - log() / log_each() : O(1) sur le thread appelant, quel que soit le nombre de détections
+    - log_each() garde une référence sur les lignes (ou un callable qui les produit) ;
+      leur formatage a lieu dans le thread d'arrière-plan
+    """
+
+    def __init__(self, capacity=4096, level=INFO, batch_size=256, flush_interval=0.05,
+                 rate_limit=500.0, stream=None, binary_path=None):
+        self.capacity = capacity
+        self.level = level
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.rate_limit = rate_limit  # lignes/s, 0 = illimité
+        self.stream = stream if stream is not None else sys.stdout
+
+        # Mode binaire compact (sinon texte)
+        self.binary = open(binary_path, 'ab') if binary_path else None
+        self.templates = {}
+        self.template_fields = {}
+
+        self.buffer = deque()
+        self.dropped_full = 0
+        self.dropped_rate = 0
+        self.written = 0
+        self._reported_rate = 0
+
+        self.tokens = rate_limit
+        self.last_refill = time.monotonic()
+
+        self.wakeup = threading.Event()
+        self.running = True
+        self.thread = threading.Thread(target=self._drain_loop, name='async-log-sink', daemon=True)
+        self.thread.start()
+
+    # ========== Côté thread vidéo ==========
+
+    def log(self, level, template, *args):
+        """Enfile une ligne (formatée plus tard avec template.format(*args))"""
+        if level < self.level:
+            return
+        if len(self.buffer) >= self.capacity:
+            self.dropped_full += 1
+            return
+        self.buffer.append((time.time(), level, template, args, None))
+
+    def log_each(self, level, template, rows):
+        """Enfile une ligne par élément de rows (séquence ou callable) en une seule opération"""
+        if level < self.level:
+            return
+        if len(self.buffer) >= self.capacity:
+            self.dropped_full += 1
+            return
+        self.buffer.append((time.time(), level, template, None, rows))
+
+    def debug(self, template, *args):
+        self.log(DEBUG, template, *args)
+
+    def info(self, template, *args):
+        self.log(INFO, template, *args)
+
+    def warning(self, template, *args):
+        self.log(WARNING, template, *args)
+
+    def error(self, template, *args):
+        self.log(ERROR, template, *args)
+
+    # ========== Côté thread d'arrière-plan ==========
+
+    def _take_tokens(self, n):
+        """Limite de débit (seau à jetons), retourne le nombre de lignes autorisées"""
+        if not self.rate_limit:
+            return n
+        now = time.monotonic()
+        self.tokens = min(self.rate_limit, self.tokens + (now - self.last_refill) * self.rate_limit)
+        self.last_refill = now
+        allowed = min(n, int(self.tokens))
+        self.tokens -= allowed
+        self.dropped_rate += n - allowed
+        return allowed
+
+    def _expand(self, record):
+        """Record -> liste de (timestamp, level, template, args|row)"""
+        stamp, level, template, args, rows = record
+        if rows is None:
+            return [(stamp, level, template, args)]
+        if callable(rows):
+            rows = rows()
+        return [(stamp, level, template, row) for row in rows]
+
+    def _drain_loop(self):
+        while self.running:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            self._drain()
+        self._drain()
+
+    def _drain(self):
+        while self.buffer:
+            lines = []
+            for _ in range(min(self.batch_size, len(self.buffer))):
+                try:
+                    lines.extend(self._expand(self.buffer.popleft()))
+                except Exception as e:
+                    lines.append((time.time(), ERROR, "⚠️ Log illisible: {}", (e,)))
+
+            lines = lines[:self._take_tokens(len(lines))]
+            if self.dropped_rate != self._reported_rate:
+                lines.append((time.time(), WARNING, "⚠️ {} lignes de log supprimées (limite de débit)",
+                              (self.dropped_rate - self._reported_rate,)))
+                self._reported_rate = self.dropped_rate
+
+            if self.binary is not None:
+                self._write_binary(lines)
+            else:
+                self._write_text(lines)
+            self.written += len(lines)
+
+    def _write_text(self, lines):
+        out = []
+        for _, _, template, row in lines:
+            try:
+                out.append(_format_row(template, row))
+            except Exception as e:
+                out.append(f"⚠️ Log illisible ({template!r}): {e}")
+        if out:
+            self.stream.write('\n'.join(out) + '\n')
+            self.stream.flush()
+
+    def _template_id(self, template, chunks):
+        template_id = self.templates.get(template)
+        if template_id is None:
+            template_id = len(self.templates)
+            self.templates[template] = template_id
+            self.template_fields[template] = [name for _, name, _, _ in _formatter.parse(template)
+                                              if name is not None]
+            data = template.encode('utf-8')
+            chunks.append(_TEMPLATE.pack(0, template_id, len(data)) + data)
+        return template_id
+
+    def _write_binary(self, lines):
+        chunks = []
+        for stamp, level, template, row in lines:
+            template_id = self._template_id(template, chunks)
+            if isinstance(row, dict):
+                row = [row[name] for name in self.template_fields[template]]
+            args = []
+            for value in row:
+                if isinstance(value, (bool, int)) or hasattr(value, '__index__'):
+                    args.append(b'i' + _INT.pack(int(value)))
+                elif isinstance(value, float) or hasattr(value, '__float__'):
+                    args.append(b'f' + _FLOAT.pack(float(value)))
+                else:
+                    data = str(value).encode('utf-8')[:65535]
+                    args.append(b's' + _STR.pack(len(data)) + data)
+            chunks.append(_EVENT.pack(1, stamp, level, template_id, len(args)) + b''.join(args))
+        self.binary.write(b''.join(chunks))
+        self.binary.flush()
+
+    # ========== Contrôle ==========
+
+    def flush(self):
+        """Demande un vidage immédiat (non bloquant)"""
+        self.wakeup.set()
+
+    def stats(self):
+        return {
+            'queued': len(self.buffer),
+            'written': self.written,
+            'dropped_full': self.dropped_full,
+            'dropped_rate': self.dropped_rate,
+        }
+
+    def close(self):
+        self.running = False
+        self.wakeup.set()
+        self.thread.join(timeout=2.0)
+        if self.binary is not None:
+            self.binary.close()
+
+
+def read_binary_log(path):
+    """Relit un log binaire : génère (timestamp, level, ligne formatée)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    templates = {}
+    pos = 0
+    while pos < len(data):
+        kind = data[pos]
+        if kind == 0:
+            _, template_id, size = _TEMPLATE.unpack_from(data, pos)
+            pos += _TEMPLATE.size
+            template = data[pos:pos + size].decode('utf-8')
+            # Champs nommés -> positionnels, dans l'ordre d'écriture
+            templates[template_id] = ''.join(
+                literal.replace('{', '{{').replace('}', '}}') +
+                ('' if name is None else '{' + (f"!{conv}" if conv else '') + (f":{spec}" if spec else '') + '}')
+                for literal, name, spec, conv in _formatter.parse(template))
+            pos += size
+        else:
+            _, stamp, level, template_id, nargs = _EVENT.unpack_from(data, pos)
+            pos += _EVENT.size
+            args = []
+            for _ in range(nargs):
+                code = data[pos:pos + 1]
+                pos += 1
+                if code == b'i':
+                    args.append(_INT.unpack_from(data, pos)[0])
+                    pos += _INT.size
+                elif code == b'f':
+                    args.append(_FLOAT.unpack_from(data, pos)[0])
+                    pos += _FLOAT.size
+                else:
+                    size = _STR.unpack_from(data, pos)[0]
+                    pos += _STR.size
+                    args.append(data[pos:pos + size].decode('utf-8'))
+                    pos += size
+            yield stamp, level, templates[template_id].format(*args)
+
+
+_default_sink = None
+_default_lock = threading.Lock()
+
+
+def get_log_sink():
+    """
+    Puits partagé par tous les post-processeurs du processus
+    Configuration : YOLO_LOG_LEVEL (DEBUG/INFO/WARNING/ERROR), YOLO_LOG_BINARY (chemin)
+    """
+    global _default_sink
+    with _default_lock:
+        if _default_sink is None:
+            level = LEVEL_NAMES.get(os.environ.get('YOLO_LOG_LEVEL', 'INFO').upper(), INFO)
+            _default_sink = AsyncLogSink(level=level, binary_path=os.environ.get('YOLO_LOG_BINARY'))
+        return _default_sink
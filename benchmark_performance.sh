@@ -12,6 +12,13 @@ echo "📦 Installation de la version NPU Direct..."
     "/home/jevois/jevois_docs/PyPostYoloRandomID_NPU_Direct.py" \
     "/jevoispro/share/pydnn/post/PyPostYoloRandomID_NPU_Direct.py"
 
+# Modules partagés importés par le post-processeur
+for module in async_log.py decode_executor.py instrumentation.py model_artifacts.py scene_cache.py tensor_capture.py yolo_core.py; do
+    /home/jevois/jevois_docs/connect_jevois.sh copy \
+        "/home/jevois/jevois_docs/$module" \
+        "/jevoispro/share/pydnn/post/$module"
+done
+
 # Ajouter les configurations de benchmark
 cat > /tmp/benchmark_config.sh << 'EOF'
 #!/bin/bash
@@ -21,9 +28,9 @@ cat >> /jevoispro/share/dnn/npu.yml << 'INNER_EOF'
 
 # ==================== BENCHMARK PERFORMANCE ====================
 
-# Version ULTRA-OPTIMISÉE avec accès NPU direct (35+ FPS)
+# Version ULTRA-OPTIMISÉE avec accès NPU direct
 BENCHMARK-npu-direct:
-  comment: "NPU Direct - LUT Sigmoid + Cache + Vectorisation - 35+ FPS"
+  comment: "NPU Direct - LUT Sigmoid + Cache + Vectorisation"
   model: "npu/detection/yolov8n-512x288.nb"
   library: "npu/detection/libnn_yolov8n-512x288.so"
   postproc: Python
@@ -31,9 +38,9 @@ BENCHMARK-npu-direct:
   processing: Async
   classes: "dnn/labels/coco-labels.txt"
 
-# Version avec traitement par batch (30+ FPS)
+# Version avec traitement par batch
 BENCHMARK-batch-process:
-  comment: "Traitement par batch - 30+ FPS"
+  comment: "Traitement par batch"
   model: "npu/detection/yolov10n-512x288.nb"
   library: "npu/detection/libnn_yolov10n-512x288.so"
   postproc: Python
@@ -45,91 +52,36 @@ INNER_EOF
 
 echo "✅ Configurations benchmark ajoutées"
 
-# Créer un script de test FPS
-cat > /tmp/test_fps.py << 'PYTHON_EOF'
-#!/usr/bin/env python3
-import time
-import numpy as np
-
-def benchmark_sigmoid():
-    """Compare sigmoid standard vs LUT"""
-    x = np.random.randn(1000000)
-    
-    # Sigmoid standard
-    start = time.time()
-    y1 = 1.0 / (1.0 + np.exp(-x))
-    t1 = time.time() - start
-    
-    # Sigmoid avec clip (plus rapide)
-    start = time.time()
-    x_clip = np.clip(x, -10, 10)
-    y2 = 1.0 / (1.0 + np.exp(-x_clip))
-    t2 = time.time() - start
-    
-    print(f"Sigmoid standard: {t1*1000:.2f}ms")
-    print(f"Sigmoid clippé: {t2*1000:.2f}ms")
-    print(f"Speedup: {t1/t2:.2f}x")
-
-benchmark_sigmoid()
-PYTHON_EOF
-
-python3 /tmp/test_fps.py
 EOF
 
 # Exécuter sur JeVois
 /home/jevois/jevois_docs/connect_jevois.sh copy "/tmp/benchmark_config.sh" "/tmp/benchmark_config.sh"
 /home/jevois/jevois_docs/connect_jevois.sh cmd "chmod +x /tmp/benchmark_config.sh && /tmp/benchmark_config.sh"
 
+# Suite de benchmark : post-processeurs, stub JeVois et modules partagés
+/home/jevois/jevois_docs/connect_jevois.sh cmd "mkdir -p /tmp/yolo_bench"
+for file in benchmark_postprocessors.py jevois_stub.py npu_purepython_config.yml \
+            PyPostYoloRandomID_PurePython.py PyPostYoloRandomID_MultiDNN2.py PyPostYoloRandomID_NPU_Direct.py \
+            PyPostYOLO_UltraHybrid.py PyPostYOLO_Ultimate.py SOLUTION_OPTIMISEE_30FPS.py \
+            anonymous_ids.py async_log.py decode_executor.py detection_export.py detection_recorder.py frame_skip.py instrumentation.py \
+            latency_budget.py model_artifacts.py occupancy_heatmap.py overlay_render.py result_snapshot.py scene_cache.py tensor_capture.py track_snapshot.py yolo_core.py zone_analytics.py; do
+    /home/jevois/jevois_docs/connect_jevois.sh copy \
+        "/home/jevois/jevois_docs/$file" \
+        "/tmp/yolo_bench/$file"
+done
+
 echo ""
 echo "================================================"
-echo "📈 RÉSULTATS DU BENCHMARK"
+echo "📈 RÉSULTATS DU BENCHMARK (mesurés)"
 echo "================================================"
-echo ""
-echo "🏆 CLASSEMENT PAR PERFORMANCE:"
-echo ""
-echo "1. BENCHMARK-npu-direct     : 35+ FPS ⚡"
-echo "   - LUT pour sigmoid (10x plus rapide)"
-echo "   - Cache des grilles d'offsets"
-echo "   - Traitement vectorisé NumPy"
-echo "   - Accès direct tensors NPU"
-echo ""
-echo "2. ULTRA-yolov8n-cpp        : 35+ FPS ⚡"
-echo "   - Post-processeur C++ natif"
-echo "   - Pas d'overhead Python"
-echo ""
-echo "3. FAST-yolov8n-randomid    : 30+ FPS ✅"
-echo "   - Bibliothèque native .so"
-echo "   - IDs aléatoires en Python"
-echo ""
-echo "4. FAST-yolov10n-randomid   : 30+ FPS ✅"
-echo "   - YOLOv10 optimisé"
-echo "   - Moins d'anchors"
-echo ""
-echo "5. AAA-yolov7-randomid      : 20+ FPS 🔶"
-echo "   - Version originale DNN"
-echo "   - PyPostYOLO C++"
-echo ""
-echo "6. Python pur sans optim    : 1.1 FPS ❌"
-echo "   - Décodage manuel Python"
-echo "   - Pas de vectorisation"
+
+# Latences p50/p95/p99 par étape, FPS et candidats par densité ; JSON dans /tmp/yolo_bench/results.json
+/home/jevois/jevois_docs/connect_jevois.sh cmd \
+    "cd /tmp/yolo_bench && python3 benchmark_postprocessors.py --frames ${BENCH_FRAMES:-200} --output results.json && cat results.json"
+
+# Lot de frames (relecture, évaluation) : process_batch() contre autant d'appels à process(), par frame
+/home/jevois/jevois_docs/connect_jevois.sh cmd \
+    "cd /tmp/yolo_bench && python3 benchmark_postprocessors.py --batch ${BENCH_BATCH:-8} --frames ${BENCH_FRAMES:-200} --output batch.json && cat batch.json"
+
 echo ""
 echo "================================================"
-echo "⚡ OPTIMISATIONS APPLIQUÉES:"
-echo ""
-echo "✅ Lookup Table (LUT) pour sigmoid:"
-echo "   - Pré-calcul de 2000 valeurs"
-echo "   - 10x plus rapide que np.exp"
-echo ""
-echo "✅ Cache des grilles:"
-echo "   - Évite recalcul des offsets"
-echo "   - Réutilisation entre frames"
-echo ""
-echo "✅ Vectorisation NumPy:"
-echo "   - Traitement par batch"
-echo "   - Opérations matricielles"
-echo ""
-echo "✅ Processing Async:"
-echo "   - Pipeline NPU parallèle"
-echo "   - Pas d'attente CPU"
-echo ""
-echo "================================================"
\ No newline at end of file
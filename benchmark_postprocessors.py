@@ -0,0 +1,471 @@
+#!/usr/bin/env python3
+"""
+⏱️ BENCHMARK DES POST-PROCESSEURS
+Mesure réelle de chaque post-processeur avec des tenseurs aux formes de outtensors (YAML) :
+- latence par étape (process, report, décodage, NMS, tracking) en p50 / p95 / p99
+- FPS soutenu (process + report) et nombre de candidats / détections
+- plusieurs densités de détections (fraction des cellules d'anchor positives)
+Résultats en JSON (stdout ou --output), résumé lisible sur stderr
+
+Usage : python benchmark_postprocessors.py [--frames 200] [--densities 0,0.001,0.01,0.05] [--only UltraHybrid,Ultimate]
+        python benchmark_postprocessors.py --corpus /chemin/corpus   (tenseurs réels, voir tensor_capture.py)
+        python benchmark_postprocessors.py --profile-alloc   (allocations par étape, voir instrumentation.py)
+        python benchmark_postprocessors.py --native   (PyPostYOLO simulé : chemin DNN d'UltraHybrid, voir jevois_stub.py)
+        python benchmark_postprocessors.py --startup [--startup-runs 5]   (import et init() en processus neuf)
+        python benchmark_postprocessors.py --batch 8   (process_batch() sur 8 frames contre 8 appels à process())
+"""
+
+import argparse
+import contextlib
+import importlib
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+import numpy as np
+
+# Pas de logs de report() dans les mesures (sink asynchrone créé au premier import)
+os.environ.setdefault('YOLO_LOG_LEVEL', 'ERROR')
+
+import jevois_stub
+
+# nom -> (module, classe, kwargs du constructeur, méthodes chronométrées par étape, format des entrées)
+# Méthodes en chemin pointé : 'core.decode' = étape du cœur commun (yolo_core.YoloCore) de l'instance
+CORE_STAGES = {'decode': 'core.decode', 'nms': 'core.suppress'}
+POSTPROCESSORS = {
+    'PurePython': ('PyPostYoloRandomID_PurePython', 'PyPostYoloRandomID_PurePython', {}, CORE_STAGES, 'raw'),
+    'MultiDNN2': ('PyPostYoloRandomID_MultiDNN2', 'PyPostYoloRandomID_MultiDNN2', {}, CORE_STAGES, 'raw'),
+    'NPU_Direct': ('PyPostYoloRandomID_NPU_Direct', 'PyPostYoloRandomID_NPU_Direct', {}, CORE_STAGES, 'raw'),
+    'UltraHybrid': ('PyPostYOLO_UltraHybrid', 'PyPostYOLO_UltraHybrid', {'snapshot_path': None},
+                    {'decode': 'core.decoder.decode_head', 'nms': 'core.suppress', 'tracking': '_apply_tracking'},
+                    'raw'),
+    'Ultimate': ('PyPostYOLO_Ultimate', 'PyPostYOLO_Ultimate', {}, dict(CORE_STAGES, tracking='core.track'), 'raw'),
+    'Optimized': ('SOLUTION_OPTIMISEE_30FPS', 'PyPostYoloRandomID_Optimized', {}, {}, 'decoded'),
+}
+
+DEFAULT_INTENSORS = "NCHW:8U:1x3x288x512:AA:0.003921568393707275:0"
+DEFAULT_OUTTENSORS = ("NCHW:8U:1x255x36x64:AA:0.003916095942258835:0, NCHW:8U:1x255x18x32:AA:0.00392133416607976:0, "
+                      "NCHW:8U:1x255x9x16:AA:0.003921062219887972:0")
+
+
+def parse_tensor_shapes(spec):
+    """'NCHW:8U:1x255x36x64:AA:...' (séparés par des virgules) -> [(1, 255, 36, 64), ...]"""
+    shapes = []
+    for tensor in spec.split(','):
+        fields = tensor.strip().split(':')
+        if len(fields) >= 3:
+            shapes.append(tuple(int(d) for d in fields[2].split('x')))
+    return shapes
+
+
+def load_tensor_config(path):
+    """intensors / outtensors du premier modèle du YAML (sans dépendance à PyYAML)"""
+    config = {'intensors': DEFAULT_INTENSORS, 'outtensors': DEFAULT_OUTTENSORS}
+    if path and os.path.exists(path):
+        with open(path, 'r') as f:
+            text = f.read()
+        for key in config:
+            match = re.search(rf'^\s*{key}:\s*"([^"]+)"', text, re.MULTILINE)
+            if match:
+                config[key] = match.group(1)
+    return parse_tensor_shapes(config['intensors'])[0], parse_tensor_shapes(config['outtensors'])
+
+
+def make_raw_outputs(shapes, density, rng, num_anchors=3, num_classes=80):
+    """Sorties YOLOv7 brutes (logits) : une fraction density des cellules d'anchor est positive"""
+    outs = []
+    positives = []
+    for shape in shapes:
+        h, w = shape[2], shape[3]
+        t = rng.normal(0.0, 0.5, (num_anchors, 5 + num_classes, h, w)).astype(np.float32)
+        t[:, 4] = -6.0
+        t[:, 5:] -= 4.0
+
+        a, y, x = np.nonzero(rng.random((num_anchors, h, w)) < density)
+        classes = rng.integers(0, num_classes, len(a))
+        t[a, 4, y, x] = rng.uniform(0.5, 4.0, len(a))
+        t[a, 5 + classes, y, x] = rng.uniform(1.0, 5.0, len(a))
+
+        stride_x, stride_y = 1.0 / w, 1.0 / h
+        positives.extend(zip((x + 0.5) * stride_x, (y + 0.5) * stride_y, classes))
+        outs.append(t.reshape(shape))
+    return outs, positives
+
+
+def make_decoded_output(positives, blob_w, blob_h, rng):
+    """Sortie déjà décodée par la bibliothèque native : [1, N, 6] = x, y, w, h, conf, classe"""
+    out = np.zeros((1, len(positives), 6), dtype=np.float32)
+    for i, (cx, cy, class_id) in enumerate(positives):
+        out[0, i] = (cx * blob_w, cy * blob_h, rng.uniform(10, 120), rng.uniform(10, 120),
+                     rng.uniform(0.3, 1.0), class_id)
+    return [out]
+
+
+def _instrument(pp, stages, frame_times):
+    """Remplace les méthodes d'étape de l'instance par des versions chronométrées (cumulées par frame)"""
+    for stage, path in stages.items():
+        *owners, method = path.split('.')
+        owner = pp
+        for name in owners:
+            owner = getattr(owner, name, None)
+        fn = getattr(owner, method, None)
+        if fn is None:
+            continue
+
+        def timed(*args, _fn=fn, _stage=stage, **kwargs):
+            start = time.perf_counter()
+            try:
+                return _fn(*args, **kwargs)
+            finally:
+                frame_times[_stage] += time.perf_counter() - start
+
+        setattr(owner, method, timed)
+
+
+def _count_detections(pp):
+    detections = getattr(pp, 'detections', None)
+    if detections is None:
+        detections = getattr(pp, 'boxes', [])
+    return len(detections)
+
+
+def _percentiles(samples):
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99]) * 1000.0
+    return {'p50_ms': round(p50, 4), 'p95_ms': round(p95, 4), 'p99_ms': round(p99, 4),
+            'mean_ms': round(float(np.mean(samples)) * 1000.0, 4)}
+
+
+def run_one(name, inputs, frames, warmup):
+    """Instancie un post-processeur et mesure process() + report() sur inputs = [(outs, preproc), ...] en boucle"""
+    module_name, class_name, kwargs, stages, _ = POSTPROCESSORS[name]
+    module = importlib.import_module(module_name)
+    native = jevois_stub.NativePyPostYOLO
+    native.reset_counters()
+    start = time.perf_counter()
+    pp = getattr(module, class_name)(**kwargs)
+    pp.init()
+    startup = time.perf_counter() - start
+
+    frame_times = defaultdict(float)
+    _instrument(pp, stages, frame_times)
+    metrics = getattr(pp, 'metrics', None)
+    samples = defaultdict(list)
+    outimg = object()
+    detections = []
+
+    for i in range(warmup + frames):
+        outs, preproc = inputs[i % len(inputs)]
+        if i == warmup and metrics is not None:
+            metrics.reset()
+        frame_times.clear()
+        start = time.perf_counter()
+        pp.process(outs, preproc)
+        mid = time.perf_counter()
+        pp.report(outimg, None, True, False)
+        end = time.perf_counter()
+
+        if i < warmup:
+            continue
+        samples['process'].append(mid - start)
+        samples['report'].append(end - mid)
+        samples['frame'].append(end - start)
+        for stage in stages:
+            samples[stage].append(frame_times.get(stage, 0.0))
+        detections.append(_count_detections(pp))
+
+    result = {
+        'startup_ms': round(startup * 1000.0, 3),
+        'fps': round(len(samples['frame']) / sum(samples['frame']), 2),
+        'detections': round(float(np.mean(detections)), 2),
+        'stages': {stage: _percentiles(values) for stage, values in samples.items()},
+    }
+    # Mode --native : constructions et paramètres assignés du décodeur natif simulé
+    if native.instances:
+        result['native'] = {'instances': native.instances, 'assignments': native.assignments}
+    # Mode --profile-alloc : allocations par étape relevées par l'instrumentation du post-processeur
+    if metrics is not None and 'profile' in metrics.stats():
+        result['profile'] = metrics.stats()['profile']
+    return result
+
+
+def run_suite(names, densities, frames=200, warmup=20, config=None, seed=0):
+    in_shape, out_shapes = load_tensor_config(config)
+    blob_h, blob_w = in_shape[2], in_shape[3]
+    preproc = jevois_stub.PreProcessor(blob_h, blob_w)
+
+    results = []
+    for density in densities:
+        rng = np.random.default_rng(seed)
+        raw, positives = make_raw_outputs(out_shapes, density, rng)
+        decoded = make_decoded_output(positives, blob_w, blob_h, rng)
+
+        for name in names:
+            entry = {'postprocessor': name, 'density': density, 'candidates': len(positives)}
+            outs = decoded if POSTPROCESSORS[name][4] == 'decoded' else raw
+            try:
+                entry.update(run_one(name, [(outs, preproc)], frames, warmup))
+            except Exception as e:
+                entry['error'] = f"{type(e).__name__}: {e}"
+            results.append(entry)
+
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'jevois_stub': 'libjevoispro' in sys.modules and sys.modules['libjevoispro'].__dict__.get(
+                'PyPostYOLO') in (jevois_stub.PyPostYOLO, jevois_stub.NativePyPostYOLO),
+            'native_stub': 'libjevoispro' in sys.modules and sys.modules['libjevoispro'].__dict__.get(
+                'PyPostYOLO') is jevois_stub.NativePyPostYOLO,
+        },
+        'blob': [blob_w, blob_h],
+        'outtensors': [list(s) for s in out_shapes],
+        'frames': frames,
+        'warmup': warmup,
+        'results': results,
+    }
+
+
+def run_batch(densities, batch=8, frames=200, warmup=20, config=None, seed=0):
+    """
+    MultiDNN2 : process_batch() sur batch frames empilées contre batch appels à process(), par densité
+    Temps par frame (lot / batch) ; frames différentes dans le lot, mêmes frames pour les deux chemins
+    """
+    from PyPostYoloRandomID_MultiDNN2 import PyPostYoloRandomID_MultiDNN2
+
+    in_shape, out_shapes = load_tensor_config(config)
+    preproc = jevois_stub.PreProcessor(in_shape[2], in_shape[3])
+    rounds, warmup = max(1, frames // batch), max(1, warmup // batch)
+
+    results = []
+    for density in densities:
+        rng = np.random.default_rng(seed)
+        generated = [make_raw_outputs(out_shapes, density, rng) for _ in range(batch)]
+        loop_outs = [outs for outs, _ in generated]
+        stacked = [np.concatenate(t) for t in zip(*loop_outs)]
+        pp = PyPostYoloRandomID_MultiDNN2()
+        pp.init()
+
+        samples = defaultdict(list)
+        for i in range(warmup + rounds):
+            start = time.perf_counter()
+            for outs in loop_outs:
+                pp.process(outs, preproc)
+            mid = time.perf_counter()
+            pp.process_batch(stacked, preproc)
+            end = time.perf_counter()
+            if i >= warmup:
+                samples['loop'].append((mid - start) / batch)
+                samples['batch'].append((end - mid) / batch)
+        pp.uninit()
+
+        results.append({
+            'density': density,
+            'candidates': round(sum(len(p) for _, p in generated) / batch, 2),
+            'stages': {path: _percentiles(values) for path, values in samples.items()},
+            'speedup': round(float(np.mean(samples['loop']) / np.mean(samples['batch'])), 2),
+        })
+
+    return {
+        'environment': {'python': platform.python_version(), 'numpy': np.__version__,
+                        'machine': platform.machine()},
+        'outtensors': [list(s) for s in out_shapes],
+        'batch': batch,
+        'rounds': rounds,
+        'warmup': warmup,
+        'results': results,
+    }
+
+
+# Exécuté dans un interpréteur neuf : numpy (partagé par tous les modules) mesuré à part, puis import
+# du module, premier init() (caches vides) et second init() (caches du processus chauds)
+_STARTUP_PROBE = """
+import contextlib, importlib, json, sys, time
+import jevois_stub
+jevois_stub.install(native=sys.argv[4] == '1')
+module_name, class_name, kwargs = sys.argv[1], sys.argv[2], json.loads(sys.argv[3])
+with contextlib.redirect_stdout(sys.stderr):
+    t0 = time.perf_counter()
+    import numpy
+    t1 = time.perf_counter()
+    module = importlib.import_module(module_name)
+    t2 = time.perf_counter()
+    getattr(module, class_name)(**kwargs).init()
+    t3 = time.perf_counter()
+    getattr(module, class_name)(**kwargs).init()
+    t4 = time.perf_counter()
+print(json.dumps({'numpy_ms': 1000 * (t1 - t0), 'import_ms': 1000 * (t2 - t1),
+                  'init_ms': 1000 * (t3 - t2), 'reinit_ms': 1000 * (t4 - t3)}))
+"""
+
+
+def run_startup(names, runs=5, native=False):
+    """Temps de démarrage par post-processeur : médianes sur runs processus neufs"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    for name in names:
+        module_name, class_name, kwargs, _, _ = POSTPROCESSORS[name]
+        entry = {'postprocessor': name, 'runs': runs}
+        samples = defaultdict(list)
+        for _ in range(runs):
+            proc = subprocess.run([sys.executable, '-c', _STARTUP_PROBE, module_name, class_name,
+                                   json.dumps(kwargs), '1' if native else '0'],
+                                  cwd=here, capture_output=True, text=True)
+            if proc.returncode != 0:
+                entry['error'] = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'échec'
+                break
+            for key, value in json.loads(proc.stdout.strip().splitlines()[-1]).items():
+                samples[key].append(value)
+        entry.update({key: round(float(np.median(values)), 3) for key, values in samples.items()})
+        results.append(entry)
+
+    return {
+        'environment': {'python': platform.python_version(), 'numpy': np.__version__,
+                        'machine': platform.machine(), 'native_stub': native},
+        'startup': results,
+    }
+
+
+def run_corpus(names, path, frames=200, warmup=20):
+    """Même mesure sur un corpus capturé sur la caméra (frames rejouées en boucle)"""
+    from tensor_capture import TensorCorpus
+
+    corpus = TensorCorpus(path)
+    preprocs = {}
+    inputs = []
+    candidates = 0
+    for outs, blob in corpus.load():
+        if blob not in preprocs:
+            preprocs[blob] = jevois_stub.PreProcessor(*(blob if blob[0] else (288, 512)))
+        preproc = preprocs[blob]
+        inputs.append((outs, preproc))
+        # Candidats = cellules d'anchor dont l'objectness dépasse 25 % (sorties YOLOv7 brutes)
+        for out in outs:
+            if out.ndim == 4 and out.shape[1] == 255:
+                candidates += int((out.reshape(3, 85, *out.shape[2:])[:, 4] > -1.0986).sum())
+
+    results = []
+    for name in names:
+        if POSTPROCESSORS[name][4] == 'decoded':
+            continue
+        entry = {'postprocessor': name, 'density': 'corpus',
+                 'candidates': round(candidates / max(len(inputs), 1), 2)}
+        try:
+            entry.update(run_one(name, inputs, frames, warmup))
+        except Exception as e:
+            entry['error'] = f"{type(e).__name__}: {e}"
+        results.append(entry)
+
+    return {
+        'corpus': path,
+        'corpus_frames': len(inputs),
+        'outtensors': [list(t.shape[1:]) for t in corpus.tensors],
+        'frames': frames,
+        'warmup': warmup,
+        'results': results,
+    }
+
+
+def print_summary(report, stream=sys.stderr):
+    """Classement lisible (par densité, FPS décroissant ; démarrage croissant)"""
+    if 'startup' in report:
+        print(f"\n🚀 Démarrage (médiane de {report['startup'][0]['runs'] if report['startup'] else 0} processus, "
+              f"numpy exclu)", file=stream)
+        for r in sorted(report['startup'], key=lambda r: r.get('import_ms', 0.0) + r.get('init_ms', 0.0)):
+            if 'error' in r:
+                print(f"   {r['postprocessor']:12s} ❌ {r['error']}", file=stream)
+                continue
+            print(f"   {r['postprocessor']:12s} import {r['import_ms']:7.2f} ms | init() {r['init_ms']:7.2f} ms "
+                  f"| second init() {r['reinit_ms']:7.2f} ms | numpy {r['numpy_ms']:.1f} ms", file=stream)
+        return
+
+    if 'batch' in report:
+        print(f"\n📦 Lot de {report['batch']} frames (MultiDNN2, temps par frame)", file=stream)
+        for r in report['results']:
+            loop, batch = r['stages']['loop'], r['stages']['batch']
+            print(f"   densité {r['density']:<6} process() p50 {loop['p50_ms']:.2f} ms | process_batch() p50 "
+                  f"{batch['p50_ms']:.2f} ms | x{r['speedup']:.2f} ({r['candidates']:.0f} candidats)", file=stream)
+        return
+
+    by_density = defaultdict(list)
+    for r in report['results']:
+        by_density[r['density']].append(r)
+
+    for density, entries in by_density.items():
+        print(f"\n📊 Densité {density} ({entries[0]['candidates']} candidats)", file=stream)
+        for r in sorted(entries, key=lambda r: -r.get('fps', 0.0)):
+            if 'error' in r:
+                print(f"   {r['postprocessor']:12s} ❌ {r['error']}", file=stream)
+                continue
+            p = r['stages']['frame']
+            print(f"   {r['postprocessor']:12s} {r['fps']:9.1f} FPS | frame p50 {p['p50_ms']:.2f} ms "
+                  f"p95 {p['p95_ms']:.2f} ms p99 {p['p99_ms']:.2f} ms | {r['detections']:.0f} détections "
+                  f"| démarrage {r['startup_ms']:.1f} ms", file=stream)
+            if 'native' in r:
+                print("   " + " " * 12 + f" PyPostYOLO natif : {r['native']['instances']} construction(s), "
+                      f"{r['native']['assignments']} paramètres assignés", file=stream)
+            if 'profile' in r:
+                alloc = r['profile'].get('alloc_bytes', {})
+                objects = r['profile'].get('objects', {})
+                print("   " + " " * 12 + " allocations/frame : " + ", ".join(
+                    f"{stage} {alloc[stage]['mean'] / 1024:.1f} KiB {objects.get(stage, {}).get('mean', 0):.0f} obj"
+                    for stage in alloc), file=stream)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark des post-processeurs YOLO")
+    parser.add_argument('--config', default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                         'npu_purepython_config.yml'))
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--densities', default='0,0.001,0.01,0.05')
+    parser.add_argument('--only', default=','.join(POSTPROCESSORS))
+    parser.add_argument('--corpus', help="Corpus de tenseurs capturés (remplace les densités synthétiques)")
+    parser.add_argument('--profile-alloc', action='store_true',
+                        help="Profilage des allocations par étape (YOLO_PROFILE_ALLOC, latences faussées)")
+    parser.add_argument('--native', action='store_true',
+                        help="PyPostYOLO simulé (contexte DNN) au lieu d'un PyPostYOLO absent")
+    parser.add_argument('--native-construct-ms', type=float, default=0.0,
+                        help="Coût de construction simulé du PyPostYOLO natif (ms)")
+    parser.add_argument('--startup', action='store_true',
+                        help="Temps d'import et d'init() par post-processeur (processus neufs)")
+    parser.add_argument('--startup-runs', type=int, default=5)
+    parser.add_argument('--batch', type=int, default=0,
+                        help="Taille de lot : process_batch() contre autant d'appels à process() (MultiDNN2)")
+    parser.add_argument('--output', help="Fichier JSON (défaut : stdout)")
+    args = parser.parse_args(argv)
+
+    jevois_stub.install(native=args.native)
+    jevois_stub.NativePyPostYOLO.construct_seconds = args.native_construct_ms / 1000.0
+    if args.profile_alloc:
+        os.environ['YOLO_PROFILE_ALLOC'] = '1'
+    names = [n for n in args.only.split(',') if n]
+    densities = [float(d) for d in args.densities.split(',')]
+
+    # Les post-processeurs affichent sur stdout : réservé au JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        if args.startup:
+            report = run_startup(names, args.startup_runs, args.native)
+        elif args.batch:
+            report = run_batch(densities, args.batch, args.frames, args.warmup, args.config)
+        elif args.corpus:
+            report = run_corpus(names, args.corpus, args.frames, args.warmup)
+        else:
+            report = run_suite(names, densities, args.frames, args.warmup, args.config)
+    print_summary(report)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
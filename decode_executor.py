@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+🧵 DECODE EXECUTOR
+Pool de décodage partagé par tous les post-processeurs d'un interpréteur (réseaux MultiDNN2 côte à côte)
+- Un plan par réseau : cœur de décodage (YoloCore : anchors, sélection de classes, NMS) + priorité
+- Ordonnancement par priorité (0 = détecteur principal) puis par ordre d'arrivée ; au plus max_pending
+  frames en attente par réseau
+- Préemption coopérative entre deux têtes (YoloCore.process_steps) : une frame du principal attend au plus
+  le décodage d'une tête du réseau secondaire, qui reprend ensuite où il s'était arrêté
+- Un thread suffit en général : les décodages ne se disputent plus le GIL entre threads du pipeline
+- Par réseau : profondeur de file, frames soumises / décodées / refusées / préemptées,
+  attente et décodage (p50, p95)
+- Un plan par instance de post-processeur (clé unique, même après rechargement du module), retiré
+  par uninit() : pas de plan orphelin ni de cœur remplacé par celui d'un autre réseau
+- Paramètres du cœur (anchors, sélection de classes, seuil NMS) changés par plan.configure() : appliqués
+  par le pool entre deux frames du réseau, jamais pendant une frame en cours ou préemptée
+- Réseaux servis : post-processeurs décodant par YoloCore.process (MultiDNN2, PurePython, NPU_Direct YOLOv7,
+  Ultimate) ; UltraHybrid (budget de latence, têtes et tracking propres) décode sur son thread
+
+Activation : YOLO_DECODE_WORKERS=1 (nombre de threads ; 0 ou absent = décodage sur le thread du pipeline)
+Benchmark : python decode_executor.py [threads]
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+
+from instrumentation import Histogram
+
+
+class DecodePlan:
+    """Réseau enregistré : cœur de décodage, priorité et statistiques"""
+
+    def __init__(self, executor, name, core, priority, max_pending):
+        self.executor = executor
+        self.name = name
+        self.core = core
+        self.priority = priority
+        self.max_pending = max_pending
+        self.lock = threading.Lock()
+        self.active = 0  # frames commencées (en cours ou préemptées), sous lock
+        self.updates = []  # changements du cœur en attente de la fin de ces frames, sous lock
+        self.pending = 0
+        self.max_depth = 0
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.preempted = 0
+        self.failed = 0
+        self.wait = Histogram()
+        self.decode = Histogram()
+
+    def submit(self, outs, blob_w, blob_h, conf, heads=None):
+        """Voir DecodeExecutor.submit"""
+        return self.executor.submit(self, outs, blob_w, blob_h, conf, heads)
+
+    def configure(self, update):
+        """update(core) tout de suite si aucune frame du réseau n'est commencée, sinon après la dernière"""
+        with self.lock:
+            if self.active:
+                self.updates.append(update)
+            else:
+                update(self.core)
+
+    def _finish(self):
+        """Frame terminée (sous lock) : changements en attente appliqués si plus aucune n'est commencée"""
+        self.active -= 1
+        if not self.active:
+            updates, self.updates = self.updates, []
+            for update in updates:
+                update(self.core)
+
+    def close(self):
+        """Retire le plan du pool (les frames déjà en file sont terminées)"""
+        self.executor.unregister(self)
+
+    def stats(self):
+        return {
+            'priority': self.priority,
+            'queue_depth': self.pending,
+            'max_depth': self.max_depth,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'preempted': self.preempted,
+            'failed': self.failed,
+            'wait_ms': {'p50': 1000 * self.wait.quantile(0.5), 'p95': 1000 * self.wait.quantile(0.95)},
+            'decode_ms': {'p50': 1000 * self.decode.quantile(0.5), 'p95': 1000 * self.decode.quantile(0.95),
+                          'mean': 1000 * self.decode.sum / self.decode.count if self.decode.count else 0.0},
+        }
+
+
+class DecodeJob:
+    """Frame soumise : arguments, étapes en cours (générateur, None avant le premier passage), durées"""
+
+    __slots__ = ('plan', 'args', 'future', 'submitted', 'steps', 'decode')
+
+    def __init__(self, plan, args, future):
+        self.plan = plan
+        self.args = args
+        self.future = future
+        self.submitted = time.perf_counter()
+        self.steps = None
+        self.decode = 0.0
+
+
+class DecodeExecutor:
+    """
+    plan = executor.register('yolov7-tiny', core)  # priorité = ordre d'enregistrement par défaut
+    future = executor.submit(plan, outs, blob_w, blob_h, conf)  # None si la file du réseau est pleine
+    dets = future.result()
+    """
+
+    def __init__(self, workers=1):
+        # concurrent.futures importe logging : seulement si le pool est activé
+        from concurrent.futures import Future
+        self.future = Future
+        self.cond = threading.Condition()
+        self.queue = []  # tas de (priorité, ordre d'arrivée, DecodeJob)
+        self.order = itertools.count()
+        self.ranks = itertools.count()  # priorité par défaut : ordre d'enregistrement, jamais réutilisé
+        self.plans = {}
+        self.closed = False
+        self.threads = [threading.Thread(target=self._run, name=f'yolo-decode-{i}', daemon=True)
+                        for i in range(max(1, workers))]
+        for thread in self.threads:
+            thread.start()
+
+    def register(self, name, core, priority=None, max_pending=2):
+        """Plan du réseau name (remplace le cœur si déjà enregistré)"""
+        with self.cond:
+            plan = self.plans.get(name)
+            if plan is None:
+                plan = self.plans[name] = DecodePlan(self, name, core,
+                                                     next(self.ranks) if priority is None else priority, max_pending)
+            else:
+                plan.core = core
+                if priority is not None:
+                    plan.priority = priority
+            return plan
+
+    def unregister(self, plan):
+        """Retire le plan (s'il est toujours celui de son nom) ; submit() le refuse ensuite"""
+        with self.cond:
+            if self.plans.get(plan.name) is plan:
+                del self.plans[plan.name]
+
+    def submit(self, plan, outs, blob_w, blob_h, conf, heads=None):
+        """Future des Detections de la frame, ou None si max_pending frames du réseau attendent déjà"""
+        future = self.future()
+        with self.cond:
+            if self.plans.get(plan.name) is not plan:
+                return None  # plan retiré
+            plan.submitted += 1
+            if plan.pending >= plan.max_pending:
+                plan.rejected += 1
+                return None
+            plan.pending += 1
+            plan.max_depth = max(plan.max_depth, plan.pending)
+            heapq.heappush(self.queue, (plan.priority, next(self.order),
+                                        DecodeJob(plan, (outs, blob_w, blob_h, conf, heads), future)))
+            self.cond.notify()
+        return future
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.queue and not self.closed:
+                    self.cond.wait()
+                if self.closed and not self.queue:
+                    return
+                priority, order, job = heapq.heappop(self.queue)
+
+            plan = job.plan
+            preempted = False
+            result = None
+            with plan.lock:
+                start = time.perf_counter()
+                try:
+                    if job.steps is None:
+                        plan.active += 1
+                        job.steps = plan.core.process_steps(*job.args)
+                    while True:
+                        next(job.steps)
+                        # Frame plus prioritaire en file : reprise plus tard, à la même place
+                        with self.cond:
+                            preempted = bool(self.queue) and self.queue[0][0] < priority
+                        if preempted:
+                            break
+                except StopIteration as stop:
+                    result = stop.value
+                except Exception as e:
+                    result = e
+                if not preempted:
+                    plan._finish()
+                job.decode += time.perf_counter() - start
+
+            with self.cond:
+                if preempted:
+                    plan.preempted += 1
+                    heapq.heappush(self.queue, (priority, order, job))
+                    continue
+                plan.pending -= 1
+                plan.wait.observe(time.perf_counter() - job.submitted - job.decode)
+                plan.decode.observe(job.decode)
+                if isinstance(result, Exception):
+                    plan.failed += 1
+                else:
+                    plan.completed += 1
+            if isinstance(result, Exception):
+                job.future.set_exception(result)
+            else:
+                job.future.set_result(result)
+
+    def stats(self):
+        with self.cond:
+            return {name: plan.stats() for name, plan in self.plans.items()}
+
+    def close(self):
+        """Termine les jobs en file puis arrête les threads"""
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        for thread in self.threads:
+            thread.join()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Pool partagé par le processus (YOLO_DECODE_WORKERS), ou None si désactivé"""
+    global _executor
+    workers = int(os.environ.get('YOLO_DECODE_WORKERS', '0') or 0)
+    if workers <= 0:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = DecodeExecutor(workers)
+        return _executor
+
+
+def decode_plan_from_env(name, core, owner):
+    """
+    Plan de l'instance owner sur le pool partagé (clé name-id(owner) : unique par instance vivante),
+    ou None si le pool est désactivé ; plan.close() dans uninit()
+    """
+    executor = get_executor()
+    if executor is None:
+        return None
+    return executor.register(f'{name}-{id(owner):x}', core)
+
+
+def configure_core(plan, core, update):
+    """update(core) par le plan si le pool est actif (entre deux frames), sinon tout de suite"""
+    if plan is None:
+        update(core)
+    else:
+        plan.configure(update)
+
+
+# ========== Benchmark ==========
+
+def _bench(seconds=2.0, workers=1):
+    """Détecteur principal (scène calme) + réseau secondaire lent (scène dense), un thread pipeline chacun"""
+    import numpy as np
+
+    os.environ.setdefault('YOLO_LOG_LEVEL', 'ERROR')
+    import jevois_stub
+    jevois_stub.install()
+    import decode_executor  # pool vu par les post-processeurs (pas celui de __main__)
+    from benchmark_postprocessors import make_raw_outputs
+    from PyPostYoloRandomID_MultiDNN2 import PyPostYoloRandomID_MultiDNN2
+
+    rng = np.random.default_rng(0)
+    shapes = [(1, 255, 36, 64), (1, 255, 18, 32), (1, 255, 9, 16)]
+    scenes = {'principal': make_raw_outputs(shapes, 0.002, rng)[0], 'secondaire': make_raw_outputs(shapes, 0.05, rng)[0]}
+    preproc = jevois_stub.PreProcessor(288, 512)
+
+    for mode in ('pipeline', f'pool {workers} threads'):
+        os.environ['YOLO_DECODE_WORKERS'] = '0' if mode == 'pipeline' else str(workers)
+        pps = {name: PyPostYoloRandomID_MultiDNN2() for name in scenes}
+        latencies = {name: [] for name in scenes}
+        deadline = time.perf_counter() + seconds
+
+        def pipeline(name):
+            pp = pps[name]
+            pp.init()
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                pp.process(scenes[name], preproc)
+                latencies[name].append(time.perf_counter() - start)
+
+        threads = [threading.Thread(target=pipeline, args=(name,)) for name in scenes]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        print(f"⚙️  {mode}")
+        for name, samples in latencies.items():
+            ms = 1000 * np.asarray(samples)
+            print(f"   {name:10s} {len(ms) / seconds:8.1f} FPS | p50 {np.percentile(ms, 50):.2f} ms | "
+                  f"p95 {np.percentile(ms, 95):.2f} ms")
+        executor = decode_executor.get_executor()
+        if executor is not None:
+            for name, s in executor.stats().items():
+                print(f"   {name}: priorité {s['priority']}, file max {s['max_depth']}, "
+                      f"préemptions {s['preempted']}, attente p95 {s['wait_ms']['p95']:.2f} ms, "
+                      f"décodage p50 {s['decode_ms']['p50']:.2f} ms")
+
+
+if __name__ == "__main__":
+    import sys
+    _bench(workers=int(sys.argv[1]) if len(sys.argv) > 1 else 1)
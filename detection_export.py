@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+📡 DETECTION EXPORT
+Export des détections/tracks de chaque frame dans un anneau en mémoire partagée
+- Enregistrements à disposition fixe (RECORD_DTYPE), lisibles directement avec NumPy
+- En-tête global + en-tête par slot avec numéro de séquence (seqlock : impair = écriture en cours)
+- Lecteurs locaux sans parsing ni copie ; les frames écrasées sont détectées et comptées
+
+Benchmark : python detection_export.py [lecteurs] [frames]
+"""
+
+import mmap
+import os
+import struct
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+
+MAGIC = b'YDET'
+VERSION = 1
+
+# magic, version, slots, max_records, record_size, slot_size, last committed seq
+HEADER = struct.Struct('<4sIIIIIQ')
+HEADER_SIZE = 64
+
+# seq (seqlock), frame_index, timestamp, count
+SLOT_HEADER = struct.Struct('<QQdI')
+SLOT_HEADER_SIZE = 32
+
+# x, y = centre de la boîte (pixels du blob)
+RECORD_DTYPE = np.dtype([
+    ('x', '<f4'),
+    ('y', '<f4'),
+    ('w', '<f4'),
+    ('h', '<f4'),
+    ('score', '<f4'),
+    ('class_id', '<i4'),
+    ('track_id', '<i4'),
+    ('random_id', '<i4'),
+])
+
+Frame = namedtuple('Frame', 'seq frame_index timestamp records')
+
+
+def _attach_readonly(name):
+    """
+    Mappe l'anneau en lecture seule (Linux : /dev/shm) ; pas de SharedMemory côté lecteur,
+    son resource_tracker supprimerait l'anneau à la sortie du lecteur
+    """
+    fd = os.open('/dev/shm/' + name.lstrip('/'), os.O_RDONLY)
+    try:
+        return mmap.mmap(fd, 0, prot=mmap.PROT_READ)
+    finally:
+        os.close(fd)
+
+
+def _layout(slots, max_records):
+    slot_size = SLOT_HEADER_SIZE + max_records * RECORD_DTYPE.itemsize
+    return slot_size, HEADER_SIZE + slots * slot_size
+
+
+class DetectionExporter:
+    """Écrivain unique de l'anneau (un par post-processeur)"""
+
+    def __init__(self, name='yolo_detections', slots=64, max_records=256):
+        self.slots = slots
+        self.max_records = max_records
+        self.slot_size, size = _layout(slots, max_records)
+
+        # Importé ici : multiprocessing coûte ~10 ms au chargement des post-processeurs sans export
+        from multiprocessing import shared_memory
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Anneau d'une exécution précédente : on le remplace
+            old = shared_memory.SharedMemory(name=name)
+            old.close()
+            old.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        self.buf = self.shm.buf
+        self.records = [np.ndarray((max_records,), dtype=RECORD_DTYPE, buffer=self.buf,
+                                   offset=HEADER_SIZE + i * self.slot_size + SLOT_HEADER_SIZE)
+                        for i in range(slots)]
+        self.seq = 0
+        HEADER.pack_into(self.buf, 0, MAGIC, VERSION, slots, max_records,
+                         RECORD_DTYPE.itemsize, self.slot_size, 0)
+
+    def publish_arrays(self, boxes, scores, class_ids, track_ids=None, random_ids=None,
+                       frame_index=None, timestamp=None):
+        """Publie une frame à partir de tableaux (boxes: N x 4 en x, y centre, w, h)"""
+        self.seq += 1
+        slot = self.seq % self.slots
+        offset = HEADER_SIZE + slot * self.slot_size
+        n = min(len(scores), self.max_records)
+        stamp = time.time() if timestamp is None else timestamp
+        index = self.seq if frame_index is None else frame_index
+
+        # Écriture en cours : seq impair
+        SLOT_HEADER.pack_into(self.buf, offset, 2 * self.seq - 1, index, stamp, 0)
+
+        rec = self.records[slot]
+        if n:
+            boxes = np.asarray(boxes, dtype=np.float32)[:n]
+            rec['x'][:n] = boxes[:, 0]
+            rec['y'][:n] = boxes[:, 1]
+            rec['w'][:n] = boxes[:, 2]
+            rec['h'][:n] = boxes[:, 3]
+            rec['score'][:n] = np.asarray(scores)[:n]
+            rec['class_id'][:n] = np.asarray(class_ids)[:n]
+            rec['track_id'][:n] = np.asarray(track_ids)[:n] if track_ids is not None else -1
+            rec['random_id'][:n] = np.asarray(random_ids)[:n] if random_ids is not None else -1
+
+        SLOT_HEADER.pack_into(self.buf, offset, 2 * self.seq, index, stamp, n)
+        struct.pack_into('<Q', self.buf, HEADER.size - 8, self.seq)
+        return self.seq
+
+    def publish(self, detections, frame_index=None, timestamp=None):
+        """Publie une frame de détections au format dict (x, y centre, w, h, score, class_id, id, random_id)"""
+        n = min(len(detections), self.max_records)
+        dets = detections[:n]
+        boxes = np.array([(d['x'], d['y'], d['w'], d['h']) for d in dets], dtype=np.float32).reshape(-1, 4)
+        return self.publish_arrays(boxes,
+                                   [d['score'] for d in dets],
+                                   [d['class_id'] for d in dets],
+                                   [d.get('id', -1) for d in dets],
+                                   [d.get('random_id', -1) for d in dets],
+                                   frame_index, timestamp)
+
+    def close(self, unlink=True):
+        del self.records, self.buf
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+class DetectionReader:
+    """
+    Lecteur de l'anneau : records renvoyés comme vues NumPy en lecture seule (zéro copie)
+    Une vue reste valide tant que still_valid(frame) est vrai (l'écrivain n'a pas fait le tour)
+    """
+
+    def __init__(self, name='yolo_detections'):
+        self.buf = _attach_readonly(name)
+        magic, version, slots, max_records, record_size, slot_size, _ = HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC or version != VERSION or record_size != RECORD_DTYPE.itemsize:
+            raise ValueError(f"Anneau de détections incompatible: {name}")
+        self.slots = slots
+        self.slot_size = slot_size
+        self.records = [np.ndarray((max_records,), dtype=RECORD_DTYPE, buffer=self.buf,
+                                   offset=HEADER_SIZE + i * slot_size + SLOT_HEADER_SIZE)
+                        for i in range(slots)]
+        self.next_seq = self.latest_seq() + 1
+        self.missed = 0
+
+    def latest_seq(self):
+        """Numéro de la dernière frame publiée"""
+        return struct.unpack_from('<Q', self.buf, HEADER.size - 8)[0]
+
+    def read(self, seq):
+        """Frame seq si elle est encore dans l'anneau, sinon None"""
+        offset = HEADER_SIZE + (seq % self.slots) * self.slot_size
+        slot_seq, index, stamp, count = SLOT_HEADER.unpack_from(self.buf, offset)
+        if slot_seq != 2 * seq:
+            return None
+        return Frame(seq, index, stamp, self.records[seq % self.slots][:count])
+
+    def still_valid(self, frame):
+        """True si la vue de frame n'a pas été réécrite depuis read()"""
+        offset = HEADER_SIZE + (frame.seq % self.slots) * self.slot_size
+        return struct.unpack_from('<Q', self.buf, offset)[0] == 2 * frame.seq
+
+    def poll(self):
+        """Frames publiées depuis le dernier appel (les frames écrasées sont comptées dans missed)"""
+        latest = self.latest_seq()
+        if latest - self.next_seq >= self.slots:
+            self.missed += latest - self.next_seq - self.slots + 1
+            self.next_seq = latest - self.slots + 1
+
+        frames = []
+        while self.next_seq <= latest:
+            frame = self.read(self.next_seq)
+            if frame is None:
+                self.missed += 1
+            else:
+                frames.append(frame)
+            self.next_seq += 1
+        return frames
+
+    def close(self):
+        del self.records
+        self.buf.close()
+
+
+def _bench_reader(name, stop, results):
+    """Processus lecteur du benchmark : somme des scores de chaque frame reçue"""
+    reader = DetectionReader(name)
+    frames = records = 0
+    checksum = 0.0
+    while not stop.is_set():
+        for frame in reader.poll():
+            checksum += float(frame.records['score'].sum())
+            if reader.still_valid(frame):
+                frames += 1
+                records += len(frame.records)
+            else:
+                reader.missed += 1
+    for frame in reader.poll():
+        frames += 1
+        records += len(frame.records)
+    results.put((frames, records, reader.missed))
+    reader.close()
+
+
+def benchmark(num_readers=4, num_frames=20000, dets_per_frame=30):
+    """Débit d'écriture et de lecture avec plusieurs lecteurs concurrents"""
+    import multiprocessing as mp
+
+    name = 'yolo_detections_bench'
+    exporter = DetectionExporter(name, slots=256)
+    stop = mp.Event()
+    results = mp.Queue()
+    readers = [mp.Process(target=_bench_reader, args=(name, stop, results)) for _ in range(num_readers)]
+    for p in readers:
+        p.start()
+    time.sleep(0.5)
+
+    rng = np.random.default_rng(0)
+    boxes = rng.uniform(0, 512, (dets_per_frame, 4)).astype(np.float32)
+    scores = rng.uniform(0.2, 1.0, dets_per_frame).astype(np.float32)
+    classes = rng.integers(0, 80, dets_per_frame)
+    tracks = np.arange(dets_per_frame)
+
+    start = time.perf_counter()
+    for _ in range(num_frames):
+        exporter.publish_arrays(boxes, scores, classes, tracks, tracks)
+    elapsed = time.perf_counter() - start
+
+    time.sleep(0.2)
+    stop.set()
+    stats = [results.get() for _ in readers]
+    for p in readers:
+        p.join()
+    exporter.close()
+
+    return {
+        'frames': num_frames,
+        'write_us_per_frame': 1e6 * elapsed / num_frames,
+        'write_fps': num_frames / elapsed,
+        'readers': [{'frames': f, 'records': r, 'missed': m} for f, r, m in stats],
+    }
+
+
+if __name__ == "__main__":
+    readers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    frames = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    result = benchmark(readers, frames)
+    print(f"📡 Écriture: {result['write_us_per_frame']:.1f} µs/frame ({result['write_fps']:.0f} frames/s)")
+    for i, r in enumerate(result['readers']):
+        print(f"   Lecteur {i}: {r['frames']} frames, {r['records']} records, {r['missed']} manquées")
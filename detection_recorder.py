@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+🎞️ DETECTION RECORDER
+Enregistrement en append-only des résultats du post-processeur pour relecture d'incidents
+- Colonnes (frame, timestamp, box, score, classe, track) dans des fichiers mappés en mémoire, préalloués
+- Index par frame (frame_index, timestamp, offset, nombre de lignes)
+- Index temporel par seaux : chaque seau pointe vers sa première frame (seaux vides compris), accès direct
+  au seau puis recherche binaire parmi les frames de ce seau seulement
+- Rotation des segments (lignes, frames ou durée couverte par les seaux)
+
+Benchmark : python detection_recorder.py [frames] [détections] (coût par frame de append / append_detections)
+"""
+
+import itertools
+import operator
+import os
+import time
+
+import numpy as np
+
+FRAME_DTYPE = np.dtype([
+    ('frame_index', '<i8'),
+    ('timestamp', '<f8'),
+    ('offset', '<i8'),
+    ('count', '<i4'),
+    ('pad', '<i4'),
+])
+
+# t0, bucket_seconds, n_frames, n_rows (les deux compteurs sont écrits en dernier = commit)
+META_DTYPE = np.dtype([
+    ('t0', '<f8'),
+    ('bucket_seconds', '<f8'),
+    ('n_frames', '<i8'),
+    ('n_rows', '<i8'),
+])
+
+# colonne -> (dtype, forme d'une ligne)
+COLUMNS = {
+    'frame': ('<i8', ()),
+    'timestamp': ('<f8', ()),
+    'box': ('<f4', (4,)),
+    'score': ('<f4', ()),
+    'class_id': ('<i4', ()),
+    'track_id': ('<i4', ()),
+}
+
+
+# Champs d'une détection dict lus par append_detections (box, score, classe)
+_DET_FIELDS = operator.itemgetter('x', 'y', 'w', 'h', 'score', 'class_id')
+
+
+def _open_memmap(path, dtype, shape, mode):
+    return np.lib.format.open_memmap(path, mode=mode, dtype=dtype, shape=shape) if mode == 'w+' \
+        else np.load(path, mmap_mode=mode)
+
+
+class _Segment:
+    """Un segment = un dossier de fichiers .npy mappés (colonnes, index de frames, seaux)"""
+
+    def __init__(self, path, rows, frames, buckets, bucket_seconds=1.0, t0=0.0, mode='w+'):
+        self.path = path
+        if mode == 'w+':
+            os.makedirs(path, exist_ok=True)
+
+        def column(name, dtype, shape):
+            return _open_memmap(os.path.join(path, name + '.npy'), dtype, shape, mode)
+
+        self.meta = column('meta', META_DTYPE, (1,))
+        self.frames = column('frames', FRAME_DTYPE, (frames,))
+        self.buckets = column('buckets', '<i8', (buckets,))
+        self.columns = {name: column(name, dtype, (rows,) + shape) for name, (dtype, shape) in COLUMNS.items()}
+
+        if mode == 'w+':
+            self.meta[0] = (t0, bucket_seconds, 0, 0)
+            self.buckets[:] = -1
+
+        # Écriture par des vues ndarray simples : l'indexation d'un np.memmap coûte plusieurs µs par accès
+        self.frame_rows = self.frames.view(np.ndarray)
+        self.bucket_rows = self.buckets.view(np.ndarray)
+        self.column_rows = {name: col.view(np.ndarray) for name, col in self.columns.items()}
+        self.counters = self.meta.view(np.ndarray).view('<i8')  # [2] = n_frames, [3] = n_rows
+
+        self.t0 = float(self.meta[0]['t0'])
+        self.bucket_seconds = float(self.meta[0]['bucket_seconds'])
+        self.n_frames = int(self.meta[0]['n_frames'])
+        self.n_rows = int(self.meta[0]['n_rows'])
+        self.last_bucket = -1  # dernier seau renseigné (écriture)
+
+    def bucket_of(self, timestamp):
+        return int((timestamp - self.t0) / self.bucket_seconds)
+
+    def flush(self):
+        for arr in (self.meta, self.frames, self.buckets, *self.columns.values()):
+            arr.flush()
+
+
+class DetectionRecorder:
+    """
+    Enregistreur append-only :
+    - append() copie une frame dans les colonnes préallouées (quelques tranches NumPy, pas d'I/O explicite)
+    - le compteur du segment est mis à jour en dernier : une frame interrompue n'est jamais visible
+    """
+
+    def __init__(self, root, rows_per_segment=1 << 20, frames_per_segment=1 << 16,
+                 bucket_seconds=1.0, max_buckets=4096):
+        self.root = root
+        self.rows_per_segment = rows_per_segment
+        self.frames_per_segment = frames_per_segment
+        self.bucket_seconds = bucket_seconds
+        self.max_buckets = max_buckets
+        os.makedirs(root, exist_ok=True)
+
+        existing = sorted(d for d in os.listdir(root) if d.startswith('seg_'))
+        self.segment_number = int(existing[-1][4:]) if existing else 0
+        self.segment = None
+
+    def _rotate(self, timestamp):
+        if self.segment is not None:
+            self.segment.flush()
+        self.segment_number += 1
+        path = os.path.join(self.root, f"seg_{self.segment_number:06d}")
+        self.segment = _Segment(path, self.rows_per_segment, self.frames_per_segment,
+                                self.max_buckets, self.bucket_seconds, t0=timestamp)
+
+    def append(self, frame_index, timestamp, boxes, scores, class_ids, track_ids=None):
+        """Ajoute une frame (boxes: N x 4)"""
+        n = len(scores)
+        seg = self.segment
+        if (seg is None or seg.n_frames >= self.frames_per_segment
+                or seg.n_rows + n > self.rows_per_segment
+                or seg.bucket_of(timestamp) >= self.max_buckets):
+            self._rotate(timestamp)
+            seg = self.segment
+
+        start, end = seg.n_rows, seg.n_rows + n
+        if n:
+            cols = seg.column_rows
+            cols['frame'][start:end] = frame_index
+            cols['timestamp'][start:end] = timestamp
+            cols['box'][start:end] = boxes
+            cols['score'][start:end] = scores
+            cols['class_id'][start:end] = class_ids
+            cols['track_id'][start:end] = -1 if track_ids is None else track_ids
+
+        seg.frame_rows[seg.n_frames] = (frame_index, timestamp, start, n, 0)
+
+        # Première frame de chaque seau temporel ; les seaux sautés pointent vers cette frame aussi,
+        # la lecture n'a donc jamais à chercher le seau rempli suivant
+        bucket = max(0, seg.bucket_of(timestamp))
+        if bucket > seg.last_bucket:
+            seg.bucket_rows[seg.last_bucket + 1:bucket + 1] = seg.n_frames
+            seg.last_bucket = bucket
+
+        seg.n_frames += 1
+        seg.n_rows = end
+        seg.counters[2] = seg.n_frames
+        seg.counters[3] = seg.n_rows
+
+    def append_detections(self, detections, frame_index, timestamp=None):
+        """Ajoute une frame de détections au format dict (x, y centre, w, h, score, class_id, id)"""
+        stamp = time.time() if timestamp is None else timestamp
+        n = len(detections)
+        # Une seule conversion dict -> tableau [N, 6], les colonnes en sont des tranches
+        rows = np.fromiter(itertools.chain.from_iterable(map(_DET_FIELDS, detections)),
+                           dtype=np.float64, count=6 * n).reshape(n, 6)
+        self.append(frame_index, stamp, rows[:, :4], rows[:, 4], rows[:, 5],
+                    [d.get('id', -1) for d in detections])
+
+    def close(self):
+        if self.segment is not None:
+            self.segment.flush()
+            self.segment = None
+
+
+class RecordingReader:
+    """Lecture d'un enregistrement : colonnes renvoyées comme vues sur les fichiers mappés"""
+
+    def __init__(self, root):
+        self.root = root
+        self.segments = []
+        for name in sorted(d for d in os.listdir(root) if d.startswith('seg_')):
+            # Formes lues dans les en-têtes .npy ; seules les frames déjà validées sont visibles
+            seg = _Segment(os.path.join(root, name), 0, 0, 0, mode='r')
+            if seg.n_frames:
+                seg.t_last = float(seg.frames[seg.n_frames - 1]['timestamp'])
+                self.segments.append(seg)
+
+    def _first_frame_at(self, seg, timestamp):
+        """
+        Première frame du segment avec un timestamp >= timestamp : seau lu directement,
+        puis recherche binaire dans ses frames (bornées par le début du seau suivant)
+        """
+        bucket = seg.bucket_of(timestamp)
+        if bucket < 0:
+            return 0
+        buckets = seg.buckets
+        if bucket >= len(buckets) or buckets[bucket] < 0:
+            return seg.n_frames  # après la dernière frame écrite
+        first = min(int(buckets[bucket]), seg.n_frames)
+        end = int(buckets[bucket + 1]) if bucket + 1 < len(buckets) else -1
+        end = seg.n_frames if end < 0 else min(end, seg.n_frames)
+        return first + int(np.searchsorted(seg.frames['timestamp'][first:end], timestamp))
+
+    def time_range(self, t_start, t_end):
+        """Liste de (segment, frame_début, frame_fin) couvrant [t_start, t_end)"""
+        spans = []
+        for seg in self.segments:
+            if seg.t_last < t_start or seg.t0 >= t_end:
+                continue
+            first = self._first_frame_at(seg, t_start)
+            last = self._first_frame_at(seg, t_end)
+            if last > first:
+                spans.append((seg, first, last))
+        return spans
+
+    def query(self, t_start, t_end):
+        """
+        Colonnes des lignes enregistrées dans [t_start, t_end) + index des frames
+        (vues zéro copie si la plage tient dans un segment, sinon concaténation)
+        """
+        parts = []
+        for seg, first, last in self.time_range(t_start, t_end):
+            frames = seg.frames[first:last]
+            row_start = int(frames[0]['offset'])
+            row_end = int(frames[-1]['offset'] + frames[-1]['count'])
+            part = {name: col[row_start:row_end] for name, col in seg.columns.items()}
+            part['frames'] = frames
+            parts.append(part)
+
+        if not parts:
+            result = {name: np.empty((0,) + shape, dtype=dtype) for name, (dtype, shape) in COLUMNS.items()}
+            result['frames'] = np.empty(0, dtype=FRAME_DTYPE)
+            return result
+        if len(parts) == 1:
+            return parts[0]
+        return {name: np.concatenate([p[name] for p in parts]) for name in parts[0]}
+
+
+# ========== Benchmark ==========
+
+def benchmark(num_frames=20000, num_dets=30, root=None):
+    """
+    Coût par frame (µs, médiane et p99) de append() sur des tableaux et de append_detections()
+    sur des dicts, pour num_dets détections par frame
+    """
+    import tempfile
+    rng = np.random.default_rng(0)
+    boxes = np.column_stack([rng.uniform(0, 500, (num_dets, 2)), np.full((num_dets, 2), 30.0)]).astype(np.float32)
+    scores = np.full(num_dets, 0.8, dtype=np.float32)
+    class_ids = np.zeros(num_dets, dtype=np.int32)
+    track_ids = np.arange(num_dets, dtype=np.int32)
+    detections = [{'x': float(b[0]), 'y': float(b[1]), 'w': float(b[2]), 'h': float(b[3]), 'score': 0.8,
+                   'class_id': 0, 'id': i} for i, b in enumerate(boxes)]
+    calls = {
+        'append': lambda rec, i, stamp: rec.append(i, stamp, boxes, scores, class_ids, track_ids),
+        'append_detections': lambda rec, i, stamp: rec.append_detections(detections, i, stamp),
+    }
+    results = {'frames': num_frames, 'dets': num_dets}
+    for name, call in calls.items():
+        with tempfile.TemporaryDirectory(dir=root) as tmp:
+            recorder = DetectionRecorder(tmp)
+            laps = np.empty(num_frames)
+            t0 = time.time()
+            for i in range(num_frames):
+                start = time.perf_counter()
+                call(recorder, i, t0 + i / 30.0)
+                laps[i] = time.perf_counter() - start
+            recorder.close()
+        laps *= 1e6
+        results[name] = (float(np.percentile(laps, 50)), float(np.percentile(laps, 99)))
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+    args = [int(a) for a in sys.argv[1:3]]
+    r = benchmark(*args)
+    print(f"🎞️ {r['frames']} frames x {r['dets']} détections")
+    for name in ('append', 'append_detections'):
+        p50, p99 = r[name]
+        print(f"   {name:18s}: p50 {p50:5.1f} µs | p99 {p99:5.1f} µs")
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+⏭️ FRAME SKIP SCHEDULER
+Décodage complet + NMS une frame sur N, propagation des tracks par mouvement entre les deux
+N est choisi à partir du coût mesuré du décodage et du FPS réel (fps_history)
+
+Activation : YOLO_TARGET_FPS=30 (FPS visé ; 0 ou absent = décodage à chaque frame),
+YOLO_FRAME_SKIP_MAX (N maximal, 4 par défaut)
+"""
+
+import math
+import os
+from collections import deque
+
+
+class FrameSkipScheduler:
+    """
+    Choisit l'intervalle de décodage N :
+    - CPU saturé (FPS moyen < 90% de la cible) : N augmente jusqu'à couvrir le coût du décodage
+    - marge retrouvée : N redescend vers 1 (décodage à chaque frame)
+    """
+
+    def __init__(self, target_fps=30.0, max_interval=4, headroom=0.8):
+        self.target_fps = target_fps
+        self.max_interval = max_interval
+        self.headroom = headroom  # fraction du budget frame allouée au décodage
+        self.interval = 1
+        self.countdown = 0
+        self.decode_times = deque(maxlen=15)
+        self.decoded = 0
+        self.skipped = 0
+
+    def record_decode(self, seconds):
+        """Enregistre la durée d'un décodage complet"""
+        self.decode_times.append(seconds)
+
+    def update(self, fps_history):
+        """Recalcule N à partir du coût de décodage et du FPS mesuré"""
+        if not self.decode_times or not fps_history:
+            return self.interval
+
+        decode = sum(self.decode_times) / len(self.decode_times)
+        needed = math.ceil(decode * self.target_fps / self.headroom)
+        needed = max(1, min(self.max_interval, needed))
+
+        # Moyenne harmonique : FPS sur la période moyenne, insensible aux frames sautées très courtes
+        avg_fps = len(fps_history) / sum(1.0 / max(f, 1e-6) for f in fps_history)
+        if avg_fps < 0.9 * self.target_fps:
+            self.interval = max(self.interval, needed)
+        elif needed < self.interval:
+            self.interval = needed
+        return self.interval
+
+    def should_decode(self):
+        """True si cette frame doit être décodée, False si elle est propagée"""
+        if self.countdown <= 0:
+            self.countdown = self.interval - 1
+            self.decoded += 1
+            return True
+        self.countdown -= 1
+        self.skipped += 1
+        return False
+
+
+def frame_skip_from_env():
+    """FrameSkipScheduler configuré par YOLO_TARGET_FPS / YOLO_FRAME_SKIP_MAX, ou None"""
+    target_fps = float(os.environ.get('YOLO_TARGET_FPS', '0') or 0)
+    if target_fps <= 0:
+        return None
+    return FrameSkipScheduler(target_fps=target_fps,
+                              max_interval=int(os.environ.get('YOLO_FRAME_SKIP_MAX', '4') or 4))
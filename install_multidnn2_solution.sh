@@ -19,6 +19,13 @@ echo "📦 Copie du post-processeur Python pur..."
     "/home/jevois/jevois_docs/PyPostYoloRandomID_PurePython.py" \
     "/jevoispro/share/pydnn/post/PyPostYoloRandomID_PurePython.py"
 
+# Modules partagés importés par le post-processeur
+for module in async_log.py decode_executor.py instrumentation.py model_artifacts.py overlay_render.py result_snapshot.py scene_cache.py tensor_capture.py yolo_core.py; do
+    /home/jevois/jevois_docs/connect_jevois.sh copy \
+        "/home/jevois/jevois_docs/$module" \
+        "/jevoispro/share/pydnn/post/$module"
+done
+
 echo ""
 echo "✅ Vérification de la copie..."
 /home/jevois/jevois_docs/connect_jevois.sh cmd \
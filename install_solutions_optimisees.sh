@@ -12,6 +12,13 @@ echo "📦 Installation du post-processeur optimisé..."
     "/home/jevois/jevois_docs/SOLUTION_OPTIMISEE_30FPS.py" \
     "/jevoispro/share/pydnn/post/PyPostYoloRandomID_Optimized.py"
 
+# Modules partagés importés par le post-processeur
+for module in async_log.py instrumentation.py tensor_capture.py yolo_core.py; do
+    /home/jevois/jevois_docs/connect_jevois.sh copy \
+        "/home/jevois/jevois_docs/$module" \
+        "/jevoispro/share/pydnn/post/$module"
+done
+
 # 2. Créer les configurations pour utiliser les bibliothèques natives
 echo ""
 echo "⚙️ Configuration des modèles avec bibliothèques natives..."
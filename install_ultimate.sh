@@ -40,6 +40,13 @@ echo "📦 Installation du post-processeur Ultimate..."
     "/home/jevois/jevois_docs/PyPostYOLO_Ultimate.py" \
     "/jevoispro/share/pydnn/post/PyPostYOLO_Ultimate.py"
 
+# Modules partagés importés par le post-processeur
+for module in anonymous_ids.py async_log.py decode_executor.py instrumentation.py model_artifacts.py occupancy_heatmap.py scene_cache.py tensor_capture.py yolo_core.py zone_analytics.py; do
+    /home/jevois/jevois_docs/connect_jevois.sh copy \
+        "/home/jevois/jevois_docs/$module" \
+        "/jevoispro/share/pydnn/post/$module"
+done
+
 # 3. Ajouter LE SEUL modèle qui fonctionne
 echo ""
 echo "⚙️ Configuration du modèle Ultimate..."
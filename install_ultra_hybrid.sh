@@ -14,6 +14,13 @@ echo "📦 Installation du post-processeur Ultra Hybrid..."
     "/home/jevois/jevois_docs/PyPostYOLO_UltraHybrid.py" \
     "/jevoispro/share/pydnn/post/PyPostYOLO_UltraHybrid.py"
 
+# Modules partagés importés par le post-processeur
+for module in anonymous_ids.py async_log.py detection_export.py detection_recorder.py frame_skip.py instrumentation.py latency_budget.py model_artifacts.py occupancy_heatmap.py result_snapshot.py scene_cache.py tensor_capture.py track_snapshot.py yolo_core.py zone_analytics.py; do
+    /home/jevois/jevois_docs/connect_jevois.sh copy \
+        "/home/jevois/jevois_docs/$module" \
+        "/jevoispro/share/pydnn/post/$module"
+done
+
 # 2. Supprimer les configurations problématiques
 echo ""
 echo "🧹 Nettoyage des configurations avec erreurs..."
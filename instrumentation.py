@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+📈 INSTRUMENTATION
+Chronomètres par étape, compteurs et histogrammes à seaux fixes pour les post-processeurs
+- Étapes : dequant, threshold, decode, nms, association, expiry, report (durée cumulée par frame)
+- Compteurs étiquetés (candidats et survivants par tête de détection, ...)
+- stats() pour Python, exposition au format texte Prometheus sur une socket Unix locale
+- Désactivé (défaut) : get_metrics() renvoie NULL_METRICS dont les méthodes ne font rien
+- Une instance par post-processeur chargé (étiquette instance : plus petit numéro libre pour ce nom,
+  libéré par close() dans uninit()) ; cumuls protégés par un verrou (thread vidéo et pool de décodage)
+- Mode profilage des allocations (AllocationMetrics) : octets, objets Python, tableaux NumPy
+  et pauses du GC par étape et par frame (tracemalloc + gc.callbacks), à l'échelle du processus
+
+Activation : YOLO_METRICS=1, ou YOLO_METRICS_SOCKET=/tmp/yolo_metrics.sock (active et sert l'export)
+Profilage : YOLO_PROFILE_ALLOC=1 (active aussi les métriques ; coûteux, hors production)
+Lecture : curl --unix-socket /tmp/yolo_metrics.sock http://localhost/metrics
+"""
+
+import bisect
+import gc
+import os
+import stat
+import threading
+import time
+import tracemalloc
+
+# Bornes des seaux en secondes (convention Prometheus), +Inf implicite
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+
+# Familles du mode profilage -> bornes des seaux
+PROFILE_BUCKETS = {
+    'alloc_bytes': (1 << 10, 4 << 10, 16 << 10, 64 << 10, 256 << 10, 1 << 20, 4 << 20, 16 << 20),
+    'objects': (1, 4, 16, 64, 256, 1024, 4096, 16384),
+    'numpy_arrays': (1, 2, 4, 8, 16, 32, 64, 128),
+    'gc_collections': (1, 2, 4, 8),
+    'gc_seconds': STAGE_BUCKETS,
+}
+
+PROFILE_HELP = {
+    'alloc_bytes': "Pic d'octets alloués au-dessus du début de l'étape (tracemalloc), cumulé par frame",
+    'objects': "Objets Python suivis par le GC créés (net) pendant l'étape, par frame",
+    'numpy_arrays': "Tampons NumPy créés pendant l'étape et encore vivants à sa fin (frames échantillonnées)",
+    'gc_collections': "Collectes du GC survenues pendant l'étape, par frame",
+    'gc_seconds': "Durée des pauses du GC pendant l'étape, par frame",
+}
+
+
+class Histogram:
+    """Histogramme à seaux fixes : observe() = une recherche dichotomique + un incrément"""
+
+    def __init__(self, bounds=STAGE_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """[(borne, nombre d'observations <= borne), ...] terminé par +Inf"""
+        total = 0
+        result = []
+        for bound, n in zip(self.bounds + (float('inf'),), self.counts):
+            total += n
+            result.append((bound, total))
+        return result
+
+    def quantile(self, q):
+        """Estimation d'un quantile (borne supérieure du seau qui le contient)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        for bound, total in self.cumulative():
+            if total >= rank:
+                return bound
+        return float('inf')
+
+
+class Metrics:
+    """
+    Métriques d'un post-processeur :
+    t = m.start() ... t = m.lap('decode', t) ... m.end_frame()
+    Les laps d'une même étape s'additionnent sur la frame ; end_frame() les verse dans les histogrammes
+    """
+
+    enabled = True
+
+    def __init__(self, name, bounds=STAGE_BUCKETS, instance=None):
+        self.name = name
+        self.instance = instance  # numéro de l'instance (get_metrics), None hors registre
+        self.bounds = bounds
+        self.histograms = {}
+        self.profile = {}  # (famille, étape) -> Histogram, rempli par AllocationMetrics
+        self.counters = {}
+        self.frame = {}
+        self.frames = 0
+        # Laps du thread vidéo et des threads du pool de décodage (YoloCore partagé), lecture par l'export
+        self.lock = threading.Lock()
+
+    def start(self):
+        return time.perf_counter()
+
+    def lap(self, stage, t):
+        now = time.perf_counter()
+        with self.lock:
+            self.frame[stage] = self.frame.get(stage, 0.0) + (now - t)
+        return now
+
+    def _observe(self, stage, seconds):
+        hist = self.histograms.get(stage)
+        if hist is None:
+            hist = self.histograms[stage] = Histogram(self.bounds)
+        hist.observe(seconds)
+
+    def observe(self, stage, seconds):
+        """Observation directe (hors cumul par frame)"""
+        with self.lock:
+            self._observe(stage, seconds)
+
+    def end_frame(self):
+        with self.lock:
+            for stage, seconds in self.frame.items():
+                self._observe(stage, seconds)
+            self.frame.clear()
+            self.frames += 1
+
+    def count(self, name, value=1, head=None):
+        key = (name, head)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def _observe_profile(self, family, stage, value):
+        hist = self.profile.get((family, stage))
+        if hist is None:
+            hist = self.profile[(family, stage)] = Histogram(PROFILE_BUCKETS[family])
+        hist.observe(value)
+
+    def observe_profile(self, family, stage, value):
+        with self.lock:
+            self._observe_profile(family, stage, value)
+
+    def reset(self):
+        """Remet les histogrammes et compteurs à zéro (entre deux séries de mesures)"""
+        with self.lock:
+            self.histograms.clear()
+            self.profile.clear()
+            self.counters.clear()
+            self.frame.clear()
+            self.frames = 0
+
+    def close(self):
+        """Retire l'instance du registre (numéro réutilisable par la prochaine instance du même nom)"""
+        with _registry_lock:
+            if _registry.get((self.name, self.instance)) is self:
+                del _registry[(self.name, self.instance)]
+
+    def stats(self):
+        """Vue Python : latences (ms) par étape et compteurs"""
+        with self.lock:
+            return self._stats()
+
+    def _stats(self):
+        stages = {}
+        for stage, hist in self.histograms.items():
+            stages[stage] = {
+                'count': hist.count,
+                'mean_ms': 1000.0 * hist.sum / hist.count if hist.count else 0.0,
+                'p50_ms': 1000.0 * hist.quantile(0.50),
+                'p95_ms': 1000.0 * hist.quantile(0.95),
+                'p99_ms': 1000.0 * hist.quantile(0.99),
+                'buckets': {('+Inf' if b == float('inf') else b): n for b, n in hist.cumulative()},
+            }
+        counters = {}
+        for (name, head), value in self.counters.items():
+            counters[name if head is None else f"{name}[{head}]"] = value
+        result = {'frames': self.frames, 'stages': stages, 'counters': counters}
+
+        if self.profile:
+            profile = {}
+            for (family, stage), hist in self.profile.items():
+                profile.setdefault(family, {})[stage] = {
+                    'count': hist.count,
+                    'mean': hist.sum / hist.count if hist.count else 0.0,
+                    'p50': hist.quantile(0.50),
+                    'p95': hist.quantile(0.95),
+                    'p99': hist.quantile(0.99),
+                    'max_bucket': max((b for b, n in zip(hist.bounds + (float('inf'),), hist.counts) if n),
+                                      default=0),
+                }
+            result['profile'] = profile
+        return result
+
+    def families(self):
+        """Lignes d'exposition Prometheus regroupées par famille : {(nom, type): [lignes]}"""
+        with self.lock:
+            return self._families()
+
+    def _families(self):
+        # Étiquettes de l'instance : pp="MultiDNN2",instance="1" (instance absente hors registre)
+        pp = f'pp="{self.name}"' + ('' if self.instance is None else f',instance="{self.instance}"')
+        families = {}
+
+        def histogram(family, stage, hist):
+            lines = families.setdefault((f'yolo_{family}', 'histogram'), [])
+            labels = f'{pp},stage="{stage}"'
+            for bound, total in hist.cumulative():
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'yolo_{family}_bucket{{{labels},le="{le}"}} {total}')
+            lines.append(f'yolo_{family}_sum{{{labels}}} {hist.sum!r}')
+            lines.append(f'yolo_{family}_count{{{labels}}} {hist.count}')
+
+        for stage, hist in sorted(self.histograms.items()):
+            histogram('stage_seconds', stage, hist)
+        for (family, stage), hist in sorted(self.profile.items()):
+            histogram(family, stage, hist)
+        for (name, head), value in sorted(self.counters.items(), key=lambda kv: (kv[0][0], kv[0][1] or 0)):
+            labels = pp + ('' if head is None else f',head="{head}"')
+            families.setdefault((f'yolo_{name}_total', 'counter'), []).append(f'yolo_{name}_total{{{labels}}} {value}')
+        families.setdefault(('yolo_frames_total', 'counter'), []).append(f'yolo_frames_total{{{pp}}} {self.frames}')
+        return families
+
+    def prometheus(self):
+        """Exposition au format texte Prometheus (ce post-processeur seul)"""
+        return _render_families([self.families()])
+
+
+class AllocationMetrics(Metrics):
+    """
+    Métriques + profilage des allocations, étape par étape (mêmes appels start/lap/end_frame) :
+    - alloc_bytes : pic tracemalloc au-dessus du début de l'étape (temporaires NumPy compris)
+    - objects : objets suivis par le GC créés (net), via gc.get_count()
+    - gc_collections / gc_seconds : collectes survenues pendant l'étape (gc.callbacks)
+    - numpy_arrays : tampons NumPy encore vivants à la fin de l'étape, une frame sur sample_every
+      (instantanés tracemalloc, trop coûteux pour chaque frame)
+    Le temps passé dans le profileur est exclu des durées d'étape
+    Attribution à l'échelle du processus : tracemalloc et le GC ne distinguent pas les threads ; avec le pool
+    de décodage actif ou plusieurs réseaux profilés, une étape compte aussi ce que les autres threads allouent
+    pendant qu'elle s'exécute (profiler un réseau seul, YOLO_DECODE_WORKERS=0, pour une attribution exacte)
+    """
+
+    def __init__(self, name, bounds=STAGE_BUCKETS, sample_every=47, instance=None):
+        super().__init__(name, bounds, instance)
+        self.sample_every = sample_every  # premier : ne s'aligne pas sur le saut de frames (1 sur 2)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.frame_profile = {}
+        self.sampling = False
+        self.gc_started = None
+        self.gc_pending = [0, 0.0]
+        gc.callbacks.append(self._on_gc)
+        self._mark()
+
+    def _on_gc(self, phase, info):
+        if phase == 'start':
+            self.gc_started = time.perf_counter()
+        elif self.gc_started is not None:
+            self.gc_pending[0] += 1
+            self.gc_pending[1] += time.perf_counter() - self.gc_started
+            self.gc_started = None
+
+    @staticmethod
+    def _numpy_buffers():
+        snapshot = tracemalloc.take_snapshot()
+        return len(snapshot.filter_traces([tracemalloc.DomainFilter(True, tracemalloc_domain())]).traces)
+
+    def _mark(self):
+        self.base_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        self.base_objects = gc.get_count()[0]
+        self.gc_pending = [0, 0.0]
+        if self.sampling:
+            self.base_numpy = self._numpy_buffers()
+
+    def _add(self, family, stage, value):
+        key = (family, stage)
+        self.frame_profile[key] = self.frame_profile.get(key, 0) + value
+
+    def start(self):
+        with self.lock:
+            self._mark()
+        return time.perf_counter()
+
+    def lap(self, stage, t):
+        now = time.perf_counter()
+        with self.lock:
+            self.frame[stage] = self.frame.get(stage, 0.0) + (now - t)
+
+            _, peak = tracemalloc.get_traced_memory()
+            collections, gc_seconds = self.gc_pending
+            self._add('alloc_bytes', stage, max(0, peak - self.base_bytes))
+            # Le compteur de génération 0 repart de zéro après une collecte : delta seulement sans collecte
+            if not collections:
+                self._add('objects', stage, max(0, gc.get_count()[0] - self.base_objects))
+            self._add('gc_collections', stage, collections)
+            self._add('gc_seconds', stage, gc_seconds)
+            if self.sampling:
+                self._add('numpy_arrays', stage, max(0, self._numpy_buffers() - self.base_numpy))
+
+            self._mark()
+        return time.perf_counter()
+
+    def end_frame(self):
+        with self.lock:
+            for (family, stage), value in self.frame_profile.items():
+                self._observe_profile(family, stage, value)
+            self.frame_profile.clear()
+        super().end_frame()
+        self.sampling = self.frames % self.sample_every == 0
+
+    def reset(self):
+        super().reset()
+        with self.lock:
+            self.frame_profile.clear()
+
+    def close(self):
+        super().close()
+        if self._on_gc in gc.callbacks:
+            gc.callbacks.remove(self._on_gc)
+
+
+def tracemalloc_domain():
+    """Domaine tracemalloc des tampons de données NumPy"""
+    import numpy as np
+    return np.lib.tracemalloc_domain
+
+
+class _NullMetrics:
+    """Métriques désactivées : mêmes méthodes, aucun travail"""
+
+    enabled = False
+    name = None
+
+    def start(self):
+        return 0.0
+
+    def lap(self, stage, t):
+        return 0.0
+
+    def observe(self, stage, seconds):
+        pass
+
+    def end_frame(self):
+        pass
+
+    def count(self, name, value=1, head=None):
+        pass
+
+    def observe_profile(self, family, stage, value):
+        pass
+
+    def reset(self):
+        pass
+
+    def close(self):
+        pass
+
+    def stats(self):
+        return {'frames': 0, 'stages': {}, 'counters': {}}
+
+    def families(self):
+        return {}
+
+    def prometheus(self):
+        return ''
+
+
+NULL_METRICS = _NullMetrics()
+
+_registry = {}  # (nom, instance) -> Metrics
+_registry_lock = threading.Lock()
+_server = None
+
+
+_HELP = dict({'yolo_stage_seconds': "Durée cumulée par frame de chaque étape du post-processeur"},
+             **{f'yolo_{family}': text for family, text in PROFILE_HELP.items()})
+
+
+def _render_families(all_families):
+    """Fusionne les familles de plusieurs post-processeurs (HELP / TYPE une fois par famille)"""
+    merged = {}
+    for families in all_families:
+        for key, lines in families.items():
+            merged.setdefault(key, []).extend(lines)
+    body = []
+    for (name, kind), lines in merged.items():
+        if name in _HELP:
+            body.append(f'# HELP {name} {_HELP[name]}')
+        body.append(f'# TYPE {name} {kind}')
+        body.extend(lines)
+    return '\n'.join(body) + '\n' if body else ''
+
+
+def prometheus_text():
+    """Toutes les métriques du processus, au format Prometheus"""
+    with _registry_lock:
+        metrics = list(_registry.values())
+    return _render_families(m.families() for m in metrics)
+
+
+def serve(path):
+    """Démarre (une fois) l'export Prometheus sur la socket Unix path, dans un thread démon"""
+    global _server
+    if _server is not None:
+        return _server
+
+    # Importé ici : socketserver (~5 ms) ne sert qu'avec YOLO_METRICS_SOCKET
+    import socketserver
+
+    class MetricsHandler(socketserver.StreamRequestHandler):
+        """Répond à toute requête HTTP par l'exposition Prometheus"""
+
+        def handle(self):
+            self.rfile.readline()
+            payload = prometheus_text().encode('utf-8')
+            self.wfile.write(b'HTTP/1.0 200 OK\r\n'
+                             b'Content-Type: text/plain; version=0.0.4\r\n'
+                             b'Content-Length: ' + str(len(payload)).encode() + b'\r\n\r\n' + payload)
+
+    class MetricsServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+    # Seule une socket restée d'un export précédent est remplacée, jamais un autre fichier
+    try:
+        if stat.S_ISSOCK(os.lstat(path).st_mode):
+            os.unlink(path)
+    except FileNotFoundError:
+        pass
+    _server = MetricsServer(path, MetricsHandler)
+    threading.Thread(target=_server.serve_forever, name='metrics-exporter', daemon=True).start()
+    return _server
+
+
+def get_metrics(name):
+    """
+    Métriques d'une instance du post-processeur name (plus petit numéro d'instance libre pour ce nom,
+    libéré par close()), ou NULL_METRICS si désactivé
+    Configuration : YOLO_METRICS=1, YOLO_METRICS_SOCKET (chemin de la socket d'export),
+    YOLO_PROFILE_ALLOC=1 (profilage des allocations)
+    """
+    socket_path = os.environ.get('YOLO_METRICS_SOCKET')
+    profile = os.environ.get('YOLO_PROFILE_ALLOC', '0') not in ('', '0')
+    if not socket_path and not profile and os.environ.get('YOLO_METRICS', '0') in ('', '0'):
+        return NULL_METRICS
+
+    with _registry_lock:
+        instance = next(n for n in range(len(_registry) + 1) if (name, n) not in _registry)
+        metrics = AllocationMetrics(name, instance=instance) if profile else Metrics(name, instance=instance)
+        _registry[(name, instance)] = metrics
+    if socket_path:
+        serve(socket_path)
+    return metrics
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+🧪 JEVOIS STUB
+Modules pyjevois / libjevoispro de substitution pour exécuter les post-processeurs hors device
+(benchmarks, tests) : paramètres, dessin et logs sans effet, PreProcessor avec blobsize()
+install(native=True) : PyPostYOLO simulé (contexte DNN) qui compte constructions et reconfigurations
+"""
+
+import importlib.util
+import sys
+import tempfile
+import time
+import types
+
+
+class ParameterCategory:
+    def __init__(self, name, description=""):
+        self.name = name
+        self.description = description
+
+
+class Parameter:
+    """Paramètre JeVois : get/set + callback appelé à chaque set()"""
+
+    def __init__(self, component, name, typename, description, default, category=None):
+        self.name = name
+        self.value = default
+        self.callback = None
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+        if self.callback is not None:
+            self.callback(value)
+
+    def setCallback(self, callback):
+        self.callback = callback
+
+
+class YUYV:
+    Black = 0x8000
+    DarkGrey = 0x8050
+    MedGrey = 0x8080
+    LightGrey = 0x80a0
+    White = 0x80ff
+    DarkGreen = 0x0000
+    MedGreen = 0x0040
+    LightGreen = 0x00ff
+    DarkTeal = 0x7070
+    MedTeal = 0x7090
+    LightTeal = 0x70b0
+
+
+class Font:
+    Font5x7 = 0
+    Font6x10 = 1
+    Font10x20 = 2
+
+
+class PyPostYOLO:
+    """Décodeur natif absent hors device (comme en contexte MultiDNN2)"""
+
+    def __init__(self):
+        raise RuntimeError("PyPostYOLO indisponible (stub)")
+
+
+class NativePyPostYOLO:
+    """
+    PyPostYOLO simulé (contexte DNN hors device) : yolo() décode avec yolo_core (NMS par classe)
+    Compteurs de classe pour comparer temps de démarrage et temps par frame :
+    instances (constructions), assignments (paramètres assignés) ; construct_seconds simule
+    le coût de construction sur le device
+    """
+
+    instances = 0
+    assignments = 0
+    construct_seconds = 0.0
+
+    def __init__(self):
+        NativePyPostYOLO.instances += 1
+        if self.construct_seconds:
+            time.sleep(self.construct_seconds)
+        object.__setattr__(self, '_core', None)
+        object.__setattr__(self, 'anchors', "10,13, 16,30, 33,23;   30,61, 62,45, 59,119;   "
+                                            "116,90, 156,198, 373,326")
+        object.__setattr__(self, 'scalexy', 2.0)
+        object.__setattr__(self, 'sigmoid', False)
+        object.__setattr__(self, 'cthresh', 0.25)
+        object.__setattr__(self, 'nms', 0.45)
+
+    def __setattr__(self, name, value):
+        NativePyPostYOLO.assignments += 1
+        object.__setattr__(self, name, value)
+
+    @classmethod
+    def reset_counters(cls):
+        cls.instances = 0
+        cls.assignments = 0
+
+    def yolo(self, outs, blobsize):
+        """Détections (centre x, y, w, h en pixels du blob, score, classe)"""
+        from yolo_core import NmsSuppressor, Yolov7Decoder, YoloCore
+
+        core = self._core
+        if core is None or core.decoder.key != (self.anchors, self.scalexy):
+            core = YoloCore(Yolov7Decoder(self.anchors, self.scalexy), NmsSuppressor(self.nms, per_class=True))
+            object.__setattr__(self, '_core', core)
+        core.suppressor.iou = self.nms
+
+        blob_h, blob_w = blobsize
+        dets = core.suppress(core.decode(outs, blob_w, blob_h, self.cthresh))
+        if not len(dets):
+            return []
+        return [{'x': cx, 'y': cy, 'w': w, 'h': h, 'score': score, 'class_id': class_id,
+                 'class_name': f"class{class_id}"}
+                for (cx, cy, w, h), score, class_id in zip(
+                    dets.centers().tolist(), dets.scores.tolist(), dets.class_ids.tolist())]
+
+
+class PreProcessor:
+    """preproc de substitution : blobsize(i) renvoie (hauteur, largeur) comme attendu par les modules"""
+
+    def __init__(self, blob_h=288, blob_w=512):
+        self.size = (blob_h, blob_w)
+
+    def blobsize(self, num):
+        return self.size
+
+
+def _noop(*args, **kwargs):
+    return None
+
+
+def install(force=False, pro=True, native=False):
+    """
+    Enregistre pyjevois et libjevoispro (ou libjevois) dans sys.modules
+    Sans force, ne fait rien si le vrai module pyjevois est disponible ; renvoie True si le stub est actif
+    native : PyPostYOLO simulé (NativePyPostYOLO) au lieu d'un PyPostYOLO absent
+    """
+    if not force and ('pyjevois' in sys.modules or importlib.util.find_spec('pyjevois') is not None):
+        return False
+
+    pyjevois = types.ModuleType('pyjevois')
+    pyjevois.pro = pro
+
+    lib = types.ModuleType('libjevoispro' if pro else 'libjevois')
+    lib.share = tempfile.gettempdir()
+    lib.ParameterCategory = ParameterCategory
+    lib.Parameter = Parameter
+    lib.YUYV = YUYV
+    lib.Font = Font
+    lib.PyPostYOLO = NativePyPostYOLO if native else PyPostYOLO
+    for name in ('LDEBUG', 'LINFO', 'LERROR', 'LFATAL', 'drawRect', 'writeText', 'drawLine', 'drawCircle'):
+        setattr(lib, name, _noop)
+
+    sys.modules['pyjevois'] = pyjevois
+    sys.modules[lib.__name__] = lib
+    return True
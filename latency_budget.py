@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+⏳ LATENCY BUDGET
+Contrôleur de budget de latence par frame : ajuste le post-traitement à partir des durées mesurées
+- Boutons : budget de candidats, seuil de confiance effectif (borné), têtes décodées, mode de suppression
+- Têtes décodées de la plus grossière à la plus fine ; arrêt à l'échéance = résultat partiel
+- Chaque décision est journalisée (bouton, ancienne / nouvelle valeur, coûts mesurés) pour audit
+
+Activation dans UltraHybrid : YOLO_LATENCY_BUDGET_MS=25
+"""
+
+import time
+from collections import deque
+
+# Ordre de restauration quand la marge revient : la qualité d'abord
+RESTORE_ORDER = ('heads', 'confidence', 'suppression', 'candidates')
+
+
+class LatencyBudget:
+    """
+    Boucle par frame :
+    t = b.start() ... b.allows_head(h) ... t = b.lap(f'head{h}', t) ... t = b.lap('nms', t) ... b.end_frame()
+    - dépassement (moyenne glissante > budget) : un bouton dégradé, choisi selon l'étape dominante
+      (NMS / tracking -> candidats puis suppression ; décodage -> confiance puis têtes)
+    - marge (moyenne < recover * budget pendant patience frames) : un bouton restauré
+    """
+
+    def __init__(self, budget_ms=25.0, conf_threshold=0.25, max_conf=0.5, conf_step=0.05,
+                 max_candidates=2048, min_candidates=64, num_heads=3, min_heads=1,
+                 recover=0.7, patience=15, cooldown=3, alpha=0.2, log_size=256):
+        self.budget = budget_ms / 1000.0
+        self.base_conf = conf_threshold
+        self.max_conf = max_conf
+        self.conf_step = conf_step
+        self.max_candidates = max_candidates
+        self.min_candidates = min_candidates
+        self.total_heads = num_heads
+        self.min_heads = min_heads
+        self.recover = recover
+        self.patience = patience
+        self.cooldown = cooldown
+        self.alpha = alpha  # lissage exponentiel des coûts
+
+        # Boutons (valeurs courantes)
+        self.conf_threshold = conf_threshold
+        self.candidate_budget = max_candidates
+        self.num_heads = num_heads
+        self.suppression = 'nms'  # 'nms' (IoU exact) ou 'cell' (meilleure boîte par cellule, linéaire)
+
+        self.order = list(range(num_heads))  # têtes, de la plus grossière à la plus fine
+        self.costs = {}       # étape -> coût moyen (s)
+        self.frame_cost = None
+        self.frame = {}
+        self.frame_start = 0.0
+        self.frames = 0
+        self.partial = 0
+        self.calm = 0
+        self.wait = patience  # patience courante, doublée quand une restauration est aussitôt annulée
+        self.since_change = 0
+
+        self.decisions = deque(maxlen=log_size)
+        self.undrained = 0
+
+    # ========== Mesure ==========
+
+    def start(self):
+        self.frame.clear()
+        self.frame_start = time.perf_counter()
+        return self.frame_start
+
+    def lap(self, stage, t):
+        now = time.perf_counter()
+        self.frame[stage] = self.frame.get(stage, 0.0) + (now - t)
+        return now
+
+    def head_order(self, strides):
+        """Indices des têtes décodées cette frame : stride décroissant (grossière d'abord), num_heads au plus"""
+        self.order = sorted(range(len(strides)), key=lambda i: -strides[i])
+        return self.order[:self.num_heads]
+
+    def allows_head(self, head, decoded):
+        """
+        False si décoder cette tête dépasserait l'échéance (coût estimé de la tête + NMS et tracking)
+        La première tête est toujours décodée
+        """
+        if decoded == 0:
+            return True
+        elapsed = time.perf_counter() - self.frame_start
+        remaining = (self.costs.get(f'head{head}', 0.0) + self.costs.get('nms', 0.0)
+                     + self.costs.get('tracking', 0.0))
+        return elapsed + remaining <= self.budget
+
+    def end_frame(self, partial=False):
+        """Met à jour les coûts moyens et ajuste au plus un bouton ; renvoie la décision ou None"""
+        cost = time.perf_counter() - self.frame_start
+        self.frames += 1
+        self.partial += bool(partial)
+        for stage, seconds in self.frame.items():
+            prev = self.costs.get(stage)
+            self.costs[stage] = seconds if prev is None else prev + self.alpha * (seconds - prev)
+        self.frame_cost = cost if self.frame_cost is None else self.frame_cost + self.alpha * (cost - self.frame_cost)
+
+        self.since_change += 1
+        if self.since_change < self.cooldown:
+            return None
+
+        if self.frame_cost > self.budget:
+            self.calm = 0
+            return self._degrade()
+        if self.frame_cost < self.recover * self.budget:
+            self.calm += 1
+            if self.calm >= self.wait:
+                self.calm = 0
+                return self._restore()
+        else:
+            self.calm = 0
+        return None
+
+    # ========== Boutons ==========
+
+    def _dominant(self):
+        decode = sum(self.costs.get(f'head{h}', 0.0) for h in self.order[:self.num_heads])
+        post = self.costs.get('nms', 0.0) + self.costs.get('tracking', 0.0)
+        return ('post', post, decode) if post >= decode else ('decode', decode, post)
+
+    def _degrade(self):
+        stage, dominant, other = self._dominant()
+        if stage == 'post':
+            order = ('candidates', 'suppression', 'confidence', 'heads')
+        else:
+            order = ('confidence', 'heads', 'candidates', 'suppression')
+        reason = f"{stage} {1000 * dominant:.2f} ms (autre {1000 * other:.2f} ms)"
+        for knob in order:
+            decision = self._step(knob, degrade=True, reason=reason)
+            if decision is not None:
+                return decision
+        return None
+
+    def _restore(self):
+        for knob in RESTORE_ORDER:
+            # Tête suivante seulement si son dernier coût connu tient dans la marge (pas d'oscillation)
+            if knob == 'heads' and self.num_heads < len(self.order):
+                head_cost = self.costs.get(f'head{self.order[self.num_heads]}', 0.0)
+                if self.frame_cost + head_cost > self.recover * self.budget:
+                    continue
+            decision = self._step(knob, degrade=False, reason='marge')
+            if decision is not None:
+                return decision
+        return None
+
+    def _step(self, knob, degrade, reason):
+        old = self.value(knob)
+        if knob == 'candidates':
+            new = (max(self.min_candidates, old // 2) if degrade
+                   else min(self.max_candidates, old * 2))
+        elif knob == 'confidence':
+            new = (min(self.max_conf, round(old + self.conf_step, 4)) if degrade
+                   else max(self.base_conf, round(old - self.conf_step, 4)))
+        elif knob == 'heads':
+            new = max(self.min_heads, old - 1) if degrade else min(self.total_heads, old + 1)
+        else:
+            new = 'cell' if degrade else 'nms'
+        if new == old:
+            return None
+
+        setattr(self, {'candidates': 'candidate_budget', 'confidence': 'conf_threshold',
+                       'heads': 'num_heads', 'suppression': 'suppression'}[knob], new)
+        last = self.decisions[-1] if self.decisions else None
+        if degrade and last is not None and last['action'] == 'restore' and last['knob'] == knob:
+            self.wait = min(self.wait * 2, self.patience * 8)  # oscillation : restaurer moins vite
+        elif not degrade and self.wait > self.patience and self.calm == 0 and self.since_change > 4 * self.wait:
+            self.wait = self.patience
+        self.since_change = 0
+        decision = {
+            'frame': self.frames,
+            'knob': knob,
+            'old': old,
+            'new': new,
+            'action': 'degrade' if degrade else 'restore',
+            'frame_ms': round(1000 * self.frame_cost, 3),
+            'budget_ms': round(1000 * self.budget, 3),
+            'reason': reason,
+        }
+        self.decisions.append(decision)
+        self.undrained = min(self.undrained + 1, self.decisions.maxlen)
+        return decision
+
+    def value(self, knob):
+        return {'candidates': self.candidate_budget, 'confidence': self.conf_threshold,
+                'heads': self.num_heads, 'suppression': self.suppression}[knob]
+
+    # ========== Journal ==========
+
+    def drain(self):
+        """Décisions prises depuis le dernier appel (pour les journaliser hors du chemin critique)"""
+        if not self.undrained:
+            return []
+        new = list(self.decisions)[-self.undrained:]
+        self.undrained = 0
+        return new
+
+    def stats(self):
+        return {
+            'frames': self.frames,
+            'partial_frames': self.partial,
+            'frame_ms': round(1000 * (self.frame_cost or 0.0), 3),
+            'budget_ms': round(1000 * self.budget, 3),
+            'costs_ms': {k: round(1000 * v, 3) for k, v in self.costs.items()},
+            'knobs': {k: self.value(k) for k in RESTORE_ORDER},
+            'decisions': list(self.decisions),
+        }
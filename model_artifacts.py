@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+📦 MODEL ARTIFACTS
+Artefacts précalculés par entrée de modèle du YAML (ex. npu_purepython_config.yml), pour un
+démarrage à chaud sans reconstruction après un changement de modèle
+- Clé : hash des champs model, intensors, outtensors, anchors, scalexy, classes
+- Contenu : anchors par tête, formes et pas (stride) des sorties, quantification (scale, zero point)
+  des sorties, format des sorties (yolov7 brut / déjà décodé), noms de classes
+- Fichier : en-tête + index JSON + tableaux alignés ; relu par mmap (vues NumPy sans copie)
+- Mode post-processeur : YOLO_MODEL_CONFIG (YAML) + YOLO_MODEL_ENTRY (défaut : première entrée),
+  cache dans YOLO_ARTIFACTS_DIR (défaut /tmp/yolo_artifacts)
+
+Benchmark : python model_artifacts.py [config.yml] [entrée]
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+from yolo_core import load_classes, parse_anchors
+
+MAGIC = b'YART'
+VERSION = 1
+
+# magic, version, longueur de l'index JSON
+HEADER = struct.Struct('<4sII')
+ALIGN = 64
+
+MODEL_FIELDS = ('model', 'intensors', 'outtensors', 'anchors', 'scalexy', 'classes')
+
+LABEL_ROOTS = ('/jevoispro/share', '/usr/share/jevois-pro', '')
+
+
+# ========== YAML des modèles ==========
+
+def read_model_entries(path):
+    """
+    Entrées de premier niveau du YAML des modèles -> {nom: {champ: valeur texte}}
+    (sous-ensemble plat du format JeVois, sans dépendance à PyYAML)
+    """
+    entries = {}
+    current = None
+    with open(path, 'r') as f:
+        for line in f:
+            if not line.strip() or line.lstrip().startswith('#'):
+                continue
+            key, sep, value = line.strip().partition(':')
+            if not sep:
+                continue
+            if not line[0].isspace():
+                current = entries.setdefault(key, {})
+            elif current is not None:
+                current[key.strip()] = value.strip().strip('"').strip("'")
+    return entries
+
+
+def parse_tensor_spec(spec):
+    """'NCHW:8U:1x255x36x64:AA:0.0039:0, ...' -> [{'type', 'shape', 'scale', 'zero'}, ...]"""
+    tensors = []
+    for tensor in spec.split(','):
+        fields = tensor.strip().split(':')
+        if len(fields) < 3:
+            continue
+        quantized = len(fields) >= 6 and fields[3] != 'NONE'
+        tensors.append({
+            'type': fields[1],
+            'shape': tuple(int(d) for d in fields[2].split('x')),
+            'scale': float(fields[4]) if quantized else 1.0,
+            'zero': float(fields[5]) if quantized else 0.0,
+        })
+    return tensors
+
+
+def model_key(entry):
+    """Hash des champs du YAML qui déterminent les artefacts"""
+    fields = {name: str(entry.get(name, '')) for name in MODEL_FIELDS}
+    return hashlib.sha1(json.dumps(fields, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def _label_path(classes):
+    for root in LABEL_ROOTS:
+        path = os.path.join(root, classes) if root else classes
+        if os.path.exists(path):
+            return path
+    return None
+
+
+# ========== Artefacts ==========
+
+class ModelArtifacts:
+    """Tableaux (vues en lecture seule si chargés depuis le cache) et métadonnées d'une entrée"""
+
+    def __init__(self, key, arrays, meta):
+        self.key = key
+        self.arrays = arrays
+        self.meta = meta
+
+    @property
+    def anchors(self):
+        return [self.arrays[f'anchors{h}'] for h in range(self.meta['heads'])]
+
+    @property
+    def quant(self):
+        """[(scale, zero point)] par sortie, ou None si les sorties ne sont pas quantifiées"""
+        if not self.meta['quantized']:
+            return None
+        return [(float(s), float(z)) for s, z in self.arrays['quant']]
+
+    @property
+    def classes(self):
+        return self.meta['classes']
+
+    @property
+    def blob_size(self):
+        return tuple(self.meta['blob'])  # (largeur, hauteur)
+
+    @classmethod
+    def build(cls, entry):
+        """Précalcul depuis les champs texte d'une entrée du YAML"""
+        outs = parse_tensor_spec(entry.get('outtensors', ''))
+        ins = parse_tensor_spec(entry.get('intensors', ''))
+        blob_h, blob_w = (ins[0]['shape'][2], ins[0]['shape'][3]) if ins and len(ins[0]['shape']) == 4 else (288, 512)
+        layers = parse_anchors(entry.get('anchors', ''))
+
+        arrays = {}
+        for h, layer in enumerate(layers):
+            arrays[f'anchors{h}'] = np.asarray(layer, dtype=np.float32).reshape(-1, 2)
+        arrays['shapes'] = np.array([t['shape'] + (0,) * (4 - len(t['shape'])) for t in outs],
+                                    dtype=np.int64).reshape(-1, 4)
+        arrays['quant'] = np.array([(t['scale'], t['zero']) for t in outs], dtype=np.float64).reshape(-1, 2)
+        arrays['strides'] = np.array([(blob_w / s[3], blob_h / s[2]) if s[2] and s[3] else (0.0, 0.0)
+                                      for s in arrays['shapes']], dtype=np.float32).reshape(-1, 2)
+
+        # Format : A * (5 + C) canaux par tête avec des anchors = yolov7 brut ; sinon déjà décodé
+        num_anchors = len(layers[0]) if layers else 0
+        raw = bool(outs) and num_anchors > 0 and all(
+            len(t['shape']) == 4 and t['shape'][1] % num_anchors == 0 and t['shape'][1] // num_anchors > 5
+            for t in outs)
+
+        classes = entry.get('classes', '')
+        label_path = _label_path(classes) if classes else None
+        meta = {
+            'fields': {name: str(entry.get(name, '')) for name in MODEL_FIELDS},
+            'heads': len(layers),
+            'blob': [blob_w, blob_h],
+            'scale_xy': float(entry.get('scalexy', 2.0) or 2.0),
+            'format': 'yolov7' if raw else 'decoded',
+            'num_classes': outs[0]['shape'][1] // num_anchors - 5 if raw else None,
+            'quantized': any(t['type'] in ('8U', '8S', '16U', '16S') for t in outs),
+            'classes': load_classes([label_path], fallback=False) if label_path else None,
+            'label_path': label_path,
+            'label_mtime': os.stat(label_path).st_mtime_ns if label_path else None,
+        }
+        return cls(model_key(entry), arrays, meta)
+
+    def stale(self):
+        """Fichier de classes modifié depuis le précalcul"""
+        path = self.meta.get('label_path')
+        if not path:
+            return False
+        try:
+            return os.stat(path).st_mtime_ns != self.meta['label_mtime']
+        except OSError:
+            return True
+
+    # ========== Fichier ==========
+
+    def save(self, path):
+        """Écriture atomique (fichier temporaire puis rename)"""
+        index = {'key': self.key, 'meta': self.meta, 'arrays': {}}
+        offset = 0
+        for name, array in self.arrays.items():
+            array = np.ascontiguousarray(array)
+            index['arrays'][name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+            offset += -(-array.nbytes // ALIGN) * ALIGN
+        text = json.dumps(index).encode('utf-8')
+        data_start = -(-(HEADER.size + len(text)) // ALIGN) * ALIGN
+
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(text)) + text)
+            for name, array in self.arrays.items():
+                f.seek(data_start + index['arrays'][name]['offset'])
+                f.write(np.ascontiguousarray(array).tobytes())
+            f.truncate(data_start + offset)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """Vues NumPy sur le fichier mappé ; None si absent ou invalide"""
+        try:
+            with open(path, 'rb') as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        if len(mm) < HEADER.size:
+            return None
+        magic, version, length = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != VERSION:
+            return None
+        index = json.loads(mm[HEADER.size:HEADER.size + length])
+        data_start = -(-(HEADER.size + length) // ALIGN) * ALIGN
+        arrays = {}
+        for name, spec in index['arrays'].items():
+            dtype = np.dtype(spec['dtype'])
+            count = int(np.prod(spec['shape'], dtype=np.int64))
+            arrays[name] = np.frombuffer(mm, dtype=dtype, count=count,
+                                         offset=data_start + spec['offset']).reshape(spec['shape'])
+        return cls(index['key'], arrays, index['meta'])
+
+
+class ArtifactCache:
+    """Dossier d'artefacts : un fichier <clé>.yart par entrée de modèle"""
+
+    def __init__(self, directory='/tmp/yolo_artifacts'):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, key):
+        return os.path.join(self.directory, f'{key}.yart')
+
+    def get(self, entry):
+        """Artefacts de l'entrée : relus du cache, ou précalculés et enregistrés"""
+        key = model_key(entry)
+        artifacts = ModelArtifacts.load(self.path(key))
+        if artifacts is not None and artifacts.key == key and not artifacts.stale():
+            self.hits += 1
+            return artifacts
+
+        self.misses += 1
+        artifacts = ModelArtifacts.build(entry)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            artifacts.save(self.path(key))
+        except OSError:
+            pass  # cache en lecture seule : artefacts recalculés à chaque démarrage
+        return artifacts
+
+
+def artifacts_from_env():
+    """Artefacts du modèle configuré par YOLO_MODEL_CONFIG / YOLO_MODEL_ENTRY, ou None"""
+    config = os.environ.get('YOLO_MODEL_CONFIG')
+    if not config:
+        return None
+    try:
+        entries = read_model_entries(config)
+    except OSError:
+        return None
+    name = os.environ.get('YOLO_MODEL_ENTRY') or next(iter(entries), None)
+    if name not in entries:
+        return None
+    return ArtifactCache(os.environ.get('YOLO_ARTIFACTS_DIR', '/tmp/yolo_artifacts')).get(entries[name])
+
+
+# ========== Benchmark ==========
+
+def _bench(config, name=None, runs=200):
+    import tempfile
+
+    entries = read_model_entries(config)
+    name = name or next(iter(entries))
+    entry = entries[name]
+    with tempfile.TemporaryDirectory() as directory:
+        cache = ArtifactCache(directory)
+        start = time.perf_counter()
+        cache.get(entry)
+        cold = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(runs):
+            artifacts = cache.get(entry)
+        warm = (time.perf_counter() - start) / runs
+
+    print(f"Entrée {name} (clé {artifacts.key}) : format {artifacts.meta['format']}, "
+          f"{artifacts.meta['heads']} têtes, quantifié {artifacts.meta['quantized']}")
+    print(f"   démarrage à froid (précalcul + écriture) : {cold * 1e3:.3f} ms")
+    print(f"   démarrage à chaud (mmap)                  : {warm * 1e6:.1f} µs")
+
+
+if __name__ == "__main__":
+    here = os.path.dirname(os.path.abspath(__file__))
+    _bench(sys.argv[1] if len(sys.argv) > 1 else os.path.join(here, 'npu_purepython_config.yml'),
+           sys.argv[2] if len(sys.argv) > 2 else None)
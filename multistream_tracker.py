@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+🛰️ MULTI-STREAM TRACKER
+Service de tracking partagé entre plusieurs flux JeVois, réparti sur un pool de processus
+- Un shard (processus) possède les trackers d'un sous-ensemble de flux
+- Détections échangées par mémoire partagée, seuls des messages courts passent par les pipes
+- L'API du post-processeur reste par flux (StreamTrackerClient)
+- Un PersistentTracker (yolo_core) par flux, sans E/S : pas d'export, d'instantané ni de fichier partagé
+  entre flux
+- Au-delà de max_dets détections par frame : détections en trop non suivies, comptées (overflow)
+
+Benchmark : python multistream_tracker.py [flux] [frames] (débit selon le nombre de shards)
+"""
+
+import multiprocessing as mp
+import threading
+import time
+import zlib
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+# Colonnes d'entrée : x, y, w, h, score, class_id (float32)
+DET_FIELDS = 6
+# Colonnes de sortie : id, random_id, age (int32)
+TRACK_FIELDS = 3
+
+
+def _stream_views(buf, max_dets):
+    """Vues NumPy (entrée, sortie) sur le bloc de mémoire partagée d'un flux"""
+    in_bytes = max_dets * DET_FIELDS * 4
+    dets = np.ndarray((max_dets, DET_FIELDS), dtype=np.float32, buffer=buf)
+    tracks = np.ndarray((max_dets, TRACK_FIELDS), dtype=np.int32, buffer=buf, offset=in_bytes)
+    return dets, tracks
+
+
+def _shard_worker(conn):
+    """Boucle d'un shard : un tracker persistant par flux, piloté par messages courts"""
+    from anonymous_ids import AnonymousIdService
+    from yolo_core import PersistentTracker
+
+    streams = {}  # stream_id -> (shm, dets, tracks, tracker)
+
+    while True:
+        try:
+            msg = conn.recv()
+        except EOFError:
+            break
+
+        cmd = msg[0]
+        try:
+            if cmd == 'track':
+                _, stream_id, n = msg
+                _, dets, tracks, tracker = streams[stream_id]
+                detections = [{
+                    'x': float(d[0]), 'y': float(d[1]), 'w': float(d[2]), 'h': float(d[3]),
+                    'score': float(d[4]), 'class_id': int(d[5])
+                } for d in dets[:n]]
+                tracker(detections)
+                for i, det in enumerate(detections):
+                    tracks[i] = (det['id'], det['random_id'], det['age'])
+                conn.send(('ok', len(tracker.tracks)))
+
+            elif cmd == 'register':
+                _, stream_id, shm_name, max_dets = msg
+                shm = shared_memory.SharedMemory(name=shm_name)
+                dets, tracks = _stream_views(shm.buf, max_dets)
+                tracker = PersistentTracker(AnonymousIdService(100, 999))
+                streams[stream_id] = (shm, dets, tracks, tracker)
+                conn.send(('ok', None))
+
+            elif cmd == 'unregister':
+                _, stream_id = msg
+                shm, dets, tracks, _ = streams.pop(stream_id)
+                del dets, tracks
+                shm.close()
+                conn.send(('ok', None))
+
+            elif cmd == 'stop':
+                conn.send(('ok', None))
+                break
+
+            else:
+                conn.send(('error', f"Commande inconnue: {cmd}"))
+
+        except Exception as e:
+            conn.send(('error', f"{type(e).__name__}: {e}"))
+
+    for shm, dets, tracks, _ in streams.values():
+        del dets, tracks
+        shm.close()
+
+
+class _Shard:
+    """Côté parent d'un shard : processus, pipe et verrou d'aller-retour"""
+
+    def __init__(self, ctx, index):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_shard_worker, args=(child_conn,),
+                                   name=f"tracker-shard-{index}", daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.busy_time = 0.0
+        self.streams = 0
+
+    def send(self, msg):
+        self.conn.send(msg)
+
+    def recv(self):
+        status, value = self.conn.recv()
+        if status != 'ok':
+            raise RuntimeError(f"Shard tracker: {value}")
+        return value
+
+    def call(self, msg):
+        with self.lock:
+            start = time.perf_counter()
+            self.send(msg)
+            value = self.recv()
+            self.calls += 1
+            self.busy_time += time.perf_counter() - start
+            return value
+
+
+class StreamTrackerClient:
+    """Tracker d'un flux : même contrat que le tracking persistant local d'UltraHybrid"""
+
+    def __init__(self, service, stream_id, shard, shm, max_dets):
+        self.service = service
+        self.stream_id = stream_id
+        self.shard = shard
+        self.shm = shm
+        self.max_dets = max_dets
+        self.dets, self.out = _stream_views(shm.buf, max_dets)
+        self.live_tracks = 0
+        self.overflow = 0  # détections au-delà de max_dets, non suivies
+
+    def _write(self, detections):
+        """Copie les détections dans la mémoire partagée, retourne leur nombre (au plus max_dets)"""
+        n = min(len(detections), self.max_dets)
+        self.overflow += len(detections) - n
+        for i in range(n):
+            det = detections[i]
+            self.dets[i] = (det['x'], det['y'], det['w'], det['h'], det['score'], det['class_id'])
+        return n
+
+    def _read(self, detections, n):
+        """Recopie les IDs calculés par le shard (au-delà de max_dets : détections retirées, voir overflow)"""
+        for i in range(n):
+            track_id, random_id, age = self.out[i]
+            det = detections[i]
+            det['id'] = int(track_id)
+            det['random_id'] = int(random_id)
+            det['age'] = int(age)
+            det['tracking_mode'] = 'persistent'
+        return detections[:n]
+
+    def track(self, detections):
+        """Associe les détections d'une frame aux tracks du flux (appel synchrone)"""
+        n = self._write(detections)
+        self.live_tracks = self.shard.call(('track', self.stream_id, n))
+        return self._read(detections, n)
+
+    def close(self):
+        self.service.unregister(self.stream_id)
+
+
+class MultiStreamTracker:
+    """
+    Service de tracking multi-flux :
+    - flux répartis par hash stable (crc32) sur num_shards processus
+    - track_batch() soumet une frame par flux à tous les shards avant de collecter,
+      les shards travaillent donc en parallèle
+    """
+
+    def __init__(self, num_shards=None, max_dets=256, start_method=None):
+        ctx = mp.get_context(start_method)
+        # Un seul resource_tracker partagé par les shards : sinon chacun signale
+        # comme fuites les blocs de mémoire partagée qu'il a seulement attachés
+        resource_tracker.ensure_running()
+        self.num_shards = num_shards or mp.cpu_count()
+        self.max_dets = max_dets
+        self.shards = [_Shard(ctx, i) for i in range(self.num_shards)]
+        self.clients = {}
+        self.lock = threading.Lock()
+
+    def _shard_for(self, stream_id):
+        return self.shards[zlib.crc32(str(stream_id).encode()) % self.num_shards]
+
+    def register(self, stream_id):
+        """Crée (ou retourne) le client de tracking du flux stream_id"""
+        with self.lock:
+            client = self.clients.get(stream_id)
+            if client is not None:
+                return client
+
+            size = self.max_dets * (DET_FIELDS + TRACK_FIELDS) * 4
+            shm = shared_memory.SharedMemory(create=True, size=size)
+            shard = self._shard_for(stream_id)
+            shard.call(('register', stream_id, shm.name, self.max_dets))
+            shard.streams += 1
+
+            client = StreamTrackerClient(self, stream_id, shard, shm, self.max_dets)
+            self.clients[stream_id] = client
+            return client
+
+    def unregister(self, stream_id):
+        with self.lock:
+            client = self.clients.pop(stream_id, None)
+            if client is None:
+                return
+            client.shard.streams -= 1
+            try:
+                client.shard.call(('unregister', stream_id))
+            finally:
+                # Mémoire partagée libérée même si le shard a déjà perdu le flux
+                del client.dets, client.out
+                client.shm.close()
+                client.shm.unlink()
+
+    def track_batch(self, batches):
+        """
+        Tracking d'une frame pour plusieurs flux : {stream_id: detections} -> même dict,
+        détections annotées (id, random_id, age)
+        """
+        by_shard = {}
+        for stream_id, detections in batches.items():
+            client = self.register(stream_id)
+            by_shard.setdefault(id(client.shard), (client.shard, []))[1].append((client, detections))
+
+        # Verrouiller les shards dans un ordre fixe pour éviter tout interblocage
+        jobs = sorted(by_shard.values(), key=lambda job: self.shards.index(job[0]))
+        for shard, _ in jobs:
+            shard.lock.acquire()
+        try:
+            start = time.perf_counter()
+            pending = []
+            for shard, items in jobs:
+                for client, detections in items:
+                    n = client._write(detections)
+                    shard.send(('track', client.stream_id, n))
+                    pending.append((shard, client, detections, n))
+
+            # Toutes les réponses sont lues avant de signaler une erreur : sinon les réponses restées
+            # dans les pipes seraient lues par les appels suivants (décalées d'une frame)
+            error = None
+            for shard, client, detections, n in pending:
+                try:
+                    client.live_tracks = shard.recv()
+                except RuntimeError as e:
+                    error = error or e
+                    continue
+                batches[client.stream_id] = client._read(detections, n)
+                shard.calls += 1
+            if error is not None:
+                raise error
+
+            elapsed = time.perf_counter() - start
+            for shard, _ in jobs:
+                shard.busy_time += elapsed
+        finally:
+            for shard, _ in jobs:
+                shard.lock.release()
+
+        return batches
+
+    def stats(self):
+        """Charge par shard : flux, appels, latence moyenne (ms), détections non suivies (au-delà de max_dets)"""
+        with self.lock:
+            clients = list(self.clients.values())
+        return [{
+            'shard': i,
+            'streams': shard.streams,
+            'calls': shard.calls,
+            'avg_ms': 1000.0 * shard.busy_time / shard.calls if shard.calls else 0.0,
+            'overflow': sum(client.overflow for client in clients if client.shard is shard),
+        } for i, shard in enumerate(self.shards)]
+
+    def close(self):
+        for stream_id in list(self.clients):
+            try:
+                self.unregister(stream_id)
+            except (EOFError, OSError, RuntimeError):
+                pass
+        for shard in self.shards:
+            try:
+                shard.call(('stop',))
+            except (EOFError, OSError, RuntimeError):
+                pass
+            shard.process.join(timeout=2.0)
+            shard.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ========== Benchmark ==========
+
+def _moving_detections(rng, num_streams, num_dets):
+    """Générateur de frames : num_dets objets par flux, déplacement lent (tracks stables)"""
+    pos = rng.uniform(0, 400, (num_streams, num_dets, 2))
+    vel = rng.uniform(-2, 2, (num_streams, num_dets, 2))
+    while True:
+        pos += vel
+        yield {stream: [{'x': float(x), 'y': float(y), 'w': 20.0, 'h': 40.0, 'score': 0.8, 'class_id': 0}
+                        for x, y in pos[stream]]
+               for stream in range(num_streams)}
+
+
+def benchmark(num_streams=8, num_frames=300, num_dets=30, shard_counts=None):
+    """Débit (frames de flux / s) de track_batch selon le nombre de shards"""
+    import os
+    os.environ.setdefault('YOLO_LOG_LEVEL', 'ERROR')
+    results = []
+    for num_shards in shard_counts or sorted({1, 2, 4, mp.cpu_count()}):
+        frames = _moving_detections(np.random.default_rng(0), num_streams, num_dets)
+        with MultiStreamTracker(num_shards=num_shards) as service:
+            service.track_batch(next(frames))  # enregistrement des flux hors mesure
+            start = time.perf_counter()
+            for _ in range(num_frames):
+                service.track_batch(next(frames))
+            elapsed = time.perf_counter() - start
+        results.append({'shards': num_shards, 'stream_fps': num_streams * num_frames / elapsed,
+                        'batch_ms': 1000 * elapsed / num_frames})
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+    args = [int(a) for a in sys.argv[1:3]]
+    print(f"🛰️ {mp.cpu_count()} cœurs")
+    for r in benchmark(*args):
+        print(f"   {r['shards']:2d} shards : {r['stream_fps']:8.0f} frames de flux/s | batch {r['batch_ms']:.2f} ms")
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+🔥 OCCUPANCY HEATMAP
+Carte de présence des tracks accumulée sur l'appareil, au lieu d'une reconstruction hors ligne des boîtes
+- Grille float32 fixe (18 x 32 par défaut : résolution stride 16 d'un blob 288 x 512), centres normalisés [0, 1]
+- Une frame = décroissance exponentielle de la grille + un seul ajout vectorisé (bincount) des centres,
+  pondéré par la durée de la frame : chaque cellule vaut des secondes de présence, demi-vie half_life
+- Instantané périodique dans un fichier mappé en mémoire (même protocole que track_snapshot :
+  seq impair pendant l'écriture), lu par les consommateurs avec load_heatmap() ; repris au redémarrage
+- Fichier privé (0600, pas de lien symbolique suivi) et verrouillé, ouvert comme celui de track_snapshot
+
+Activation : YOLO_HEATMAP=/chemin/heatmap.bin (+ YOLO_HEATMAP_GRID=18x32, YOLO_HEATMAP_HALF_LIFE en s,
+YOLO_HEATMAP_INTERVAL en s)
+"""
+
+import fcntl
+import mmap
+import os
+import stat
+import struct
+import time
+
+import numpy as np
+
+MAGIC = b'YHMP'
+VERSION = 1
+
+# magic, version, seq, timestamp, rows, cols, half_life, frames
+HEADER = struct.Struct('<4sIQdIIdQ')
+HEADER_SIZE = 64  # aligné pour la vue NumPy qui suit
+
+
+class OccupancyHeatmap:
+    """
+    heatmap.update(centers, timestamp)   # centers [N, 2] normalisés, une fois par frame
+    heatmap.grid -> float32 [rows, cols] (secondes de présence, avec décroissance)
+    """
+
+    def __init__(self, path=None, rows=18, cols=32, half_life=300.0, interval=1.0, max_dt=1.0):
+        self.path = path
+        self.rows = rows
+        self.cols = cols
+        self.half_life = half_life
+        self.interval = interval
+        self.max_dt = max_dt  # frame isolée après une pause : pas une présence de plusieurs minutes
+        self.grid = np.zeros((rows, cols), dtype=np.float32)
+        self.flat = self.grid.reshape(-1)
+        self.scale = np.array([cols, rows], dtype=np.float64)
+        self.limit = np.array([cols - 1, rows - 1])
+        self.last = None
+        self.frames = 0
+        self.last_save = 0.0
+        self.seq = 0
+        self.mm = None
+
+        if path is not None:
+            size = HEADER_SIZE + rows * cols * 4
+            fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW | os.O_CLOEXEC, 0o600)
+            try:
+                st = os.fstat(fd)
+                if not stat.S_ISREG(st.st_mode) or st.st_uid != os.getuid():
+                    raise OSError(f"{path} : fichier de carte refusé (pas un fichier ordinaire à nous)")
+                if st.st_mode & 0o077:
+                    os.fchmod(fd, 0o600)
+                # Un seul écrivain par fichier (verrou libéré à close() ou à la sortie)
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                if st.st_size != size:
+                    os.ftruncate(fd, size)
+                self.mm = mmap.mmap(fd, size)
+            except BaseException:
+                os.close(fd)
+                raise
+            self.fd = fd
+            self.view = np.ndarray((rows, cols), dtype=np.float32, buffer=self.mm, offset=HEADER_SIZE)
+            self._restore()
+
+    def _restore(self):
+        """Reprend la grille de l'instantané (même taille), décrue du temps écoulé depuis"""
+        magic, version, seq, stamp, rows, cols, half_life, frames = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            return
+        self.seq = seq + (seq & 1)
+        if seq & 1 or (rows, cols) != (self.rows, self.cols):
+            return
+        elapsed = max(0.0, time.time() - stamp)
+        self.grid[:] = self.view * np.float32(0.5 ** (elapsed / self.half_life))
+        self.frames = frames
+
+    def update(self, centers, timestamp=None):
+        """Décroissance + centres de la frame ; instantané si l'intervalle est écoulé"""
+        now = time.time() if timestamp is None else timestamp
+        dt = min(max(now - self.last, 0.0), self.max_dt) if self.last is not None else 0.0
+        self.last = now
+        self.frames += 1
+        if dt:
+            self.grid *= np.float32(0.5 ** (dt / self.half_life))
+            xy = np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+            if len(xy):
+                cells = np.clip((xy * self.scale).astype(np.intp), 0, self.limit)
+                counts = np.bincount(cells[:, 1] * self.cols + cells[:, 0], minlength=self.flat.size)
+                self.flat += (counts * dt).astype(np.float32)
+        if self.mm is not None and now - self.last_save >= self.interval:
+            self.save(now)
+
+    def save(self, now=None):
+        """Écrit la grille dans le fichier mappé (quelques µs)"""
+        if self.mm is None:
+            return  # carte en mémoire seulement
+        now = time.time() if now is None else now
+        self.seq += 1
+        HEADER.pack_into(self.mm, 0, MAGIC, VERSION, self.seq, now, self.rows, self.cols, self.half_life,
+                         self.frames)
+        self.view[:] = self.grid
+        self.seq += 1
+        HEADER.pack_into(self.mm, 0, MAGIC, VERSION, self.seq, now, self.rows, self.cols, self.half_life,
+                         self.frames)
+        self.last_save = now
+
+    def reset(self):
+        self.grid[:] = 0.0
+        self.frames = 0
+
+    def close(self):
+        if self.mm is not None:
+            del self.view
+            self.mm.close()
+            self.mm = None
+            os.close(self.fd)
+
+
+def load_heatmap(path, retries=3):
+    """(grille float32 [rows, cols], timestamp) du dernier instantané complet, ou None"""
+    try:
+        with open(path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        for _ in range(retries):
+            magic, version, seq, stamp, rows, cols, _, _ = HEADER.unpack_from(mm, 0)
+            if magic != MAGIC or version != VERSION or len(mm) < HEADER_SIZE + rows * cols * 4:
+                return None
+            grid = np.frombuffer(mm, dtype=np.float32, count=rows * cols, offset=HEADER_SIZE).reshape(rows, cols).copy()
+            if not seq & 1 and HEADER.unpack_from(mm, 0)[2] == seq:
+                return grid, stamp
+        return None  # écriture en cours à chaque essai
+    finally:
+        mm.close()
+
+
+def heatmap_from_env():
+    """OccupancyHeatmap configurée par YOLO_HEATMAP / _GRID / _HALF_LIFE / _INTERVAL, ou None"""
+    path = os.environ.get('YOLO_HEATMAP')
+    if not path:
+        return None
+    rows, cols = (int(n) for n in os.environ.get('YOLO_HEATMAP_GRID', '18x32').lower().split('x'))
+    return OccupancyHeatmap(path, rows, cols,
+                            half_life=float(os.environ.get('YOLO_HEATMAP_HALF_LIFE', '300') or 300),
+                            interval=float(os.environ.get('YOLO_HEATMAP_INTERVAL', '1.0') or 1.0))
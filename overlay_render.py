@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+🎨 OVERLAY RENDER
+Couche de rendu pour report() :
+- Labels mis en cache par (classe, score arrondi) ; l'ID (track ou aléatoire par frame) est inséré hors
+  du cache par simple concaténation : pas de f-string par frame, et le cache sert même si l'ID change
+- Une liste de commandes de dessin par frame, vidée en une seule passe vers un backend
+  (JeVois legacy, GUI helper, ou enregistreur hors device)
+- Backends du device immédiats : l'image de sortie legacy et la frame du GUI helper sont neuves à chaque frame,
+  tout est redessiné. Le mode retained (boîtes inchangées non renvoyées) ne sert qu'aux backends qui gardent
+  le dessin précédent (RecordingBackend ici) et suppose des objets identifiés d'une frame à l'autre :
+  clé = (ID de track, label) ; avec des IDs aléatoires par frame, aucune boîte n'est inchangée
+"""
+
+import time
+
+
+class LabelCache:
+    """
+    Cache de labels ; template reçoit id, name et score (en %, arrondi à decimals)
+    Le template est coupé autour de {id} : seuls les morceaux sans ID sont formatés et mis en cache
+    """
+
+    def __init__(self, template="ID{id}:{name} {score:.1f}%", decimals=1, maxsize=4096):
+        self.template = template
+        self.parts = template.split('{id}')
+        self.decimals = decimals
+        self.scale = 100.0 * 10 ** decimals
+        self.maxsize = maxsize
+        self.labels = {}
+        self.hits = 0
+        self.misses = 0
+
+    def label(self, track_key, class_id, score, classmap=None):
+        key = (class_id, int(score * self.scale + 0.5))
+        parts = self.labels.get(key)
+        if parts is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            if classmap and 0 <= class_id < len(classmap):
+                name = classmap[class_id]
+            else:
+                name = f"class{class_id}"
+            parts = tuple(part.format(name=name, score=key[1] / 10 ** self.decimals) for part in self.parts)
+
+            # Cache plein : on repart de zéro (moins coûteux qu'un LRU sur le chemin chaud)
+            if len(self.labels) >= self.maxsize:
+                self.labels.clear()
+            self.labels[key] = parts
+
+        if len(parts) == 1:
+            return parts[0]
+        return str(track_key).join(parts)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class OverlayRenderer:
+    """
+    Construit la liste de commandes d'une frame, une commande par boîte :
+    (x, y, w, h, label, text_x, text_y, color) -> rectangle + texte côté backend
+    - backend immédiat (JevoisBackend, HelperBackend) : toute la liste est dessinée en une passe
+    - backend 'retained' (l'image garde le dessin précédent) : seules les boîtes
+      modifiées, apparues ou disparues depuis la frame précédente sont envoyées ; une boîte est
+      retrouvée par sa clé (ID de track + label), jamais par son rang dans la frame
+    """
+
+    def __init__(self):
+        self.previous = {}  # clé -> commande de la frame précédente
+        self.current = {}
+        self.commands = []
+        self.skipped = 0
+
+    def begin(self):
+        """Démarre une nouvelle frame"""
+        self.previous, self.current = self.current, {}
+        self.commands = []
+
+    def add_box(self, key, x, y, w, h, label, text_x, text_y, color):
+        """Ajoute une boîte + son label (key identifie l'objet d'une frame à l'autre, ex. (ID de track, label))"""
+        cmd = (x, y, w, h, label, text_x, text_y, color)
+        if key in self.current:
+            key = (key, len(self.commands))  # même clé deux fois dans la frame : aucune boîte perdue
+        self.current[key] = cmd
+        self.commands.append(cmd)
+
+    def flush(self, backend, target):
+        """Envoie la frame au backend en une seule passe"""
+        if getattr(backend, 'retained', False):
+            previous = self.previous
+            changed = [cmd for key, cmd in self.current.items() if previous.get(key) != cmd]
+            removed = [cmd for key, cmd in previous.items() if self.current.get(key) != cmd]
+            self.skipped += len(self.current) - len(changed)
+            backend.update(target, changed, removed)
+        else:
+            backend.draw(target, self.commands)
+
+
+class JevoisBackend:
+    """
+    Dessin dans l'image de sortie legacy (YUYV) via jevois.drawRect / jevois.writeText
+    Immédiat : l'image de sortie est une nouvelle image caméra à chaque frame
+    """
+
+    def __init__(self, jevois, thickness=2, font=None):
+        self.jevois = jevois
+        self.thickness = thickness
+        self.font = font if font is not None else jevois.Font.Font10x20
+
+    def draw(self, outimg, commands):
+        draw_rect, write_text = self.jevois.drawRect, self.jevois.writeText
+        thick, font = self.thickness, self.font
+        for x, y, w, h, label, tx, ty, color in commands:
+            draw_rect(outimg, x, y, w, h, thick, color)
+            write_text(outimg, label, tx, ty, color, font)
+
+
+class HelperBackend:
+    """
+    Dessin JeVois-Pro via le GUI helper (coordonnées en coins x1,y1,x2,y2)
+    Immédiat : le GUI helper (ImGui) ne garde rien d'une frame à l'autre
+    """
+
+    def __init__(self, filled=True):
+        self.filled = filled
+
+    def draw(self, helper, commands):
+        filled = self.filled
+        for x, y, w, h, label, tx, ty, color in commands:
+            helper.drawRect(x, y, x + w - 1, y + h - 1, color, filled)
+            helper.drawText(tx, ty, label, color)
+
+
+class RecordingBackend:
+    """Backend de substitution hors device : compte les primitives dessinées (retained : mode différentiel)"""
+
+    def __init__(self, retained=False):
+        self.retained = retained
+        self.primitives = 0
+        self.last = []
+
+    def draw(self, target, commands):
+        self.primitives += 2 * len(commands)
+        self.last = commands
+
+    def update(self, target, changed, removed):
+        self.primitives += 2 * (len(changed) + len(removed))
+        self.last = changed
+
+
+def benchmark(num_boxes=20, frames=2000, moving=0.2, retained=False):
+    """Compare le rendu naïf (f-string + lookup par boîte) au rendu mis en cache"""
+    classmap = [f"class{i}" for i in range(80)]
+    boxes = [(i, 10 * i, 5 * i, 40, 60, i % 80, 0.5 + (i % 40) / 100.0) for i in range(num_boxes)]
+    num_moving = int(num_boxes * moving)
+
+    naive_primitives = 0
+    start = time.perf_counter()
+    for frame in range(frames):
+        commands = []
+        for key, x, y, w, h, class_id, score in boxes:
+            if key < num_moving:
+                x += frame % 3
+            name = classmap[class_id] if class_id < len(classmap) else f"class{class_id}"
+            label = f"ID{key}:{name} {score*100:.1f}%"
+            commands.append(('rect', x, y, w, h, 0))
+            commands.append(('text', x + 3, y - 12, label, 0))
+        naive_primitives += len(commands)
+    naive = (time.perf_counter() - start) / frames
+
+    labels = LabelCache()
+    renderer = OverlayRenderer()
+    backend = RecordingBackend(retained=retained)
+    start = time.perf_counter()
+    for frame in range(frames):
+        renderer.begin()
+        for key, x, y, w, h, class_id, score in boxes:
+            if key < num_moving:
+                x += frame % 3
+            label = labels.label(key, class_id, score, classmap)
+            renderer.add_box((key, label), x, y, w, h, label, x + 3, y - 12, 0)
+        renderer.flush(backend, None)
+    cached = (time.perf_counter() - start) / frames
+
+    return {
+        'boxes': num_boxes,
+        'naive_us': naive * 1e6,
+        'cached_us': cached * 1e6,
+        'label_misses': labels.misses,
+        'naive_primitives': naive_primitives // frames,
+        'cached_primitives': backend.primitives // frames,
+    }
+
+
+if __name__ == "__main__":
+    for retained in (False, True):
+        print(f"Backend {'retained' if retained else 'immédiat'}:")
+        for n in (5, 20, 100):
+            r = benchmark(num_boxes=n, retained=retained)
+            print(f"  {n:4d} boîtes | naïf: {r['naive_us']:7.1f} µs | cache: {r['cached_us']:7.1f} µs | "
+                  f"primitives/frame {r['naive_primitives']} -> {r['cached_primitives']} | "
+                  f"labels formatés {r['label_misses']}")
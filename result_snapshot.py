@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+🔁 RESULT SNAPSHOT
+Résultat immuable par frame, publié par échange de référence entre process() et report()
+- process() construit un FrameResult complet puis le publie : une seule affectation d'attribut,
+  atomique sous le GIL ; l'ancien résultat reste valide tant qu'un lecteur le référence
+- report() et les consommateurs externes lisent une frame cohérente, sans verrou ni copie
+- Le producteur ne modifie plus les dicts qu'il a publiés (détections, tracks) : UltraHybrid construit
+  des dicts neufs par frame et un nouveau dict de tracks par frame (PersistentTracker, copie sur écriture),
+  publié sans copie en MappingProxyType
+- Numéro de séquence par frame publiée ; chaque lecteur compte les frames sautées (dropped)
+  et relues (duplicated), aussi exportés en compteurs si les métriques sont actives
+"""
+
+import time
+from types import MappingProxyType
+
+from instrumentation import NULL_METRICS
+
+_EMPTY = MappingProxyType({})
+
+
+def _frozen(mapping):
+    return mapping if isinstance(mapping, MappingProxyType) else MappingProxyType(dict(mapping))
+
+
+class FrameResult:
+    """
+    Résultat d'une frame, en lecture seule : les champs sont figés à la construction
+    (tuples, tracks et infos en MappingProxyType) ; le producteur ne modifie plus ce qu'il a publié
+    tracks déjà en MappingProxyType : repris sans copie (dict que le producteur ne modifie plus)
+    """
+
+    __slots__ = ('seq', 'timestamp', 'detections', 'boxes', 'confidences', 'class_ids', 'tracks', 'info')
+
+    def __init__(self, seq, timestamp, detections=(), boxes=(), confidences=(), class_ids=(), tracks=None,
+                 info=None):
+        init = object.__setattr__
+        init(self, 'seq', seq)
+        init(self, 'timestamp', timestamp)
+        init(self, 'detections', tuple(detections))
+        init(self, 'boxes', tuple(boxes))
+        init(self, 'confidences', tuple(confidences))
+        init(self, 'class_ids', tuple(class_ids))
+        init(self, 'tracks', _EMPTY if not tracks else _frozen(tracks))
+        init(self, 'info', _EMPTY if not info else MappingProxyType(dict(info)))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"FrameResult est immuable ({name})")
+
+    def __len__(self):
+        return len(self.detections) or len(self.boxes)
+
+
+class ResultPublisher:
+    """Côté process() : un seul producteur ; current = dernier résultat publié (seq 0 = aucun)"""
+
+    def __init__(self):
+        self.seq = 0
+        self.current = FrameResult(0, 0.0)
+
+    def publish(self, timestamp=None, **fields):
+        result = FrameResult(self.seq + 1, time.time() if timestamp is None else timestamp, **fields)
+        self.seq = result.seq
+        self.current = result  # échange de référence : les lecteurs voient l'ancien ou le nouveau, entier
+        return result
+
+    def reader(self, metrics=NULL_METRICS):
+        return ResultReader(self, metrics)
+
+
+class ResultReader:
+    """Côté consommateur (un lecteur par consommateur) : dernier résultat + frames sautées / relues"""
+
+    def __init__(self, publisher, metrics=NULL_METRICS):
+        self.publisher = publisher
+        self.metrics = metrics
+        self.seq = publisher.current.seq  # les frames publiées avant l'abonnement ne sont pas comptées
+        self.reads = 0
+        self.dropped = 0
+        self.duplicated = 0
+
+    def read(self):
+        result = self.publisher.current
+        self.reads += 1
+        if result.seq and result.seq == self.seq:
+            self.duplicated += 1
+            if self.metrics.enabled:
+                self.metrics.count('duplicated_frames')
+        elif result.seq > self.seq + 1:
+            self.dropped += result.seq - self.seq - 1
+            if self.metrics.enabled:
+                self.metrics.count('dropped_frames', result.seq - self.seq - 1)
+        self.seq = result.seq
+        return result
+
+    def stats(self):
+        return {
+            'published': self.publisher.seq,
+            'reads': self.reads,
+            'dropped': self.dropped,
+            'duplicated': self.duplicated,
+        }
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+📼 TENSOR CAPTURE
+Capture des sorties brutes du réseau sur la caméra, relecture hors ligne à vitesse maximale
+- Corpus = dossier de fichiers .npy mappés : un tableau préalloué par tenseur de sortie,
+  un index de frames (frame vue, timestamp, taille du blob) et un compteur écrit en dernier
+- Sélection des frames : une sur N (every), jusqu'à max_frames
+- Mode capture des post-processeurs : YOLO_CAPTURE_DIR (+ YOLO_CAPTURE_EVERY, YOLO_CAPTURE_MAX, YOLO_CAPTURE_DTYPE)
+
+Relecture : python tensor_capture.py <corpus> [PostProcesseur ...] [--batch N]
+(--batch : lots de N frames empilées, process_batch des post-processeurs qui l'ont)
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+FRAME_DTYPE = np.dtype([
+    ('frame_index', '<i8'),
+    ('timestamp', '<f8'),
+    ('blob_h', '<i4'),
+    ('blob_w', '<i4'),
+])
+
+META_DTYPE = np.dtype([
+    ('n_frames', '<i8'),
+    ('n_tensors', '<i4'),
+    ('pad', '<i4'),
+])
+
+
+class TensorCapture:
+    """
+    Écrivain du corpus : les tableaux sont créés à la première frame (formes et types des outs),
+    chaque capture est une copie dans les memmaps ; les frames de forme différente sont ignorées
+    """
+
+    def __init__(self, path, every=1, max_frames=1000, dtype=None):
+        self.path = path
+        self.every = max(1, every)
+        self.max_frames = max_frames
+        self.dtype = dtype  # None = type reçu ; 'float16' divise la taille par deux
+        self.seen = 0
+        self.captured = 0
+        self.skipped = 0
+        self.tensors = None
+
+    def _create(self, outs):
+        os.makedirs(self.path, exist_ok=True)
+        self.meta = np.lib.format.open_memmap(os.path.join(self.path, 'meta.npy'), mode='w+',
+                                              dtype=META_DTYPE, shape=(1,))
+        self.frames = np.lib.format.open_memmap(os.path.join(self.path, 'frames.npy'), mode='w+',
+                                                dtype=FRAME_DTYPE, shape=(self.max_frames,))
+        self.tensors = [np.lib.format.open_memmap(os.path.join(self.path, f'tensor_{i}.npy'), mode='w+',
+                                                  dtype=self.dtype or out.dtype,
+                                                  shape=(self.max_frames,) + out.shape)
+                        for i, out in enumerate(outs)]
+        self.meta[0] = (0, len(outs), 0)
+
+    @property
+    def full(self):
+        return self.captured >= self.max_frames
+
+    def capture(self, outs, preproc=None, timestamp=None):
+        """Appelé à chaque process() ; renvoie True si la frame a été écrite dans le corpus"""
+        self.seen += 1
+        if self.full or (self.seen - 1) % self.every:
+            return False
+
+        if self.tensors is None:
+            self._create(outs)
+        if len(outs) != len(self.tensors) or any(o.shape != t.shape[1:] for o, t in zip(outs, self.tensors)):
+            self.skipped += 1
+            return False
+
+        try:
+            blob_h, blob_w = preproc.blobsize(0)[:2]
+        except Exception:
+            blob_h, blob_w = 0, 0
+
+        i = self.captured
+        for out, tensor in zip(outs, self.tensors):
+            tensor[i] = out
+        self.frames[i] = (self.seen, time.time() if timestamp is None else timestamp, blob_h, blob_w)
+
+        self.captured += 1
+        self.meta[0]['n_frames'] = self.captured
+        if self.full:
+            self.close()
+        return True
+
+    def close(self):
+        if self.tensors is not None:
+            for arr in (self.meta, self.frames, *self.tensors):
+                arr.flush()
+
+
+def capture_from_env(name):
+    """TensorCapture configurée par l'environnement, ou None si YOLO_CAPTURE_DIR n'est pas défini"""
+    base = os.environ.get('YOLO_CAPTURE_DIR')
+    if not base:
+        return None
+    path = os.path.join(base, f"{name}_{time.strftime('%Y%m%d_%H%M%S')}")
+    return TensorCapture(path,
+                         every=int(os.environ.get('YOLO_CAPTURE_EVERY', '1')),
+                         max_frames=int(os.environ.get('YOLO_CAPTURE_MAX', '1000')),
+                         dtype=os.environ.get('YOLO_CAPTURE_DTYPE'))
+
+
+class TensorCorpus:
+    """Lecture d'un corpus : corpus[i] -> (outs, (blob_h, blob_w), timestamp), tenseurs mappés sans copie"""
+
+    def __init__(self, path):
+        self.path = path
+        meta = np.load(os.path.join(path, 'meta.npy'))
+        self.n_frames = int(meta[0]['n_frames'])
+        self.frames = np.load(os.path.join(path, 'frames.npy'), mmap_mode='r')
+        self.tensors = [np.load(os.path.join(path, f'tensor_{i}.npy'), mmap_mode='r')
+                        for i in range(int(meta[0]['n_tensors']))]
+
+    def __len__(self):
+        return self.n_frames
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.n_frames:
+            raise IndexError(i)
+        frame = self.frames[i]
+        return ([t[i] for t in self.tensors], (int(frame['blob_h']), int(frame['blob_w'])),
+                float(frame['timestamp']))
+
+    def load(self):
+        """Toutes les frames en mémoire (float32), pour exclure les lectures disque des mesures"""
+        return [([np.asarray(t[i], dtype=np.float32) for t in self.tensors],
+                 (int(self.frames[i]['blob_h']), int(self.frames[i]['blob_w'])))
+                for i in range(self.n_frames)]
+
+
+def _chunks(frames, batch):
+    """Frames consécutives de même blob, par lots de batch au plus : (sorties empilées par tenseur, blob, n)"""
+    start = 0
+    while start < len(frames):
+        blob = frames[start][1]
+        end = start + 1
+        while end < len(frames) and end - start < batch and frames[end][1] == blob:
+            end += 1
+        chunk = [outs for outs, _ in frames[start:end]]
+        yield [np.concatenate(t) for t in zip(*chunk)], blob, end - start
+        start = end
+
+
+def replay(corpus, pp, repeat=1, batch=1):
+    """
+    Rejoue le corpus dans un post-processeur (process + report) aussi vite que possible
+    batch > 1 : process_batch par lots (report une fois par lot), latence = durée du lot / frames
+    """
+    import jevois_stub
+
+    frames = corpus.load() if isinstance(corpus, TensorCorpus) else corpus
+    preprocs = {}
+    latencies = []
+    outimg = object()
+    batched = batch > 1 and hasattr(pp, 'process_batch')
+
+    def preproc_for(blob):
+        preproc = preprocs.get(blob)
+        if preproc is None:
+            preproc = preprocs[blob] = jevois_stub.PreProcessor(*(blob if blob[0] else (288, 512)))
+        return preproc
+
+    for _ in range(repeat):
+        if batched:
+            for outs, blob, n in _chunks(frames, batch):
+                preproc = preproc_for(blob)
+                start = time.perf_counter()
+                pp.process_batch(outs, preproc)
+                pp.report(outimg, None, True, False)
+                latencies.extend([(time.perf_counter() - start) / n] * n)
+            continue
+        for outs, blob in frames:
+            preproc = preproc_for(blob)
+            start = time.perf_counter()
+            pp.process(outs, preproc)
+            pp.report(outimg, None, True, False)
+            latencies.append(time.perf_counter() - start)
+
+    total = sum(latencies)
+    return {
+        'frames': len(latencies),
+        'fps': len(latencies) / total if total else 0.0,
+        'mean_ms': 1000.0 * total / len(latencies) if latencies else 0.0,
+        'max_ms': 1000.0 * max(latencies, default=0.0),
+    }
+
+
+if __name__ == "__main__":
+    import importlib
+
+    os.environ.setdefault('YOLO_LOG_LEVEL', 'ERROR')
+    import jevois_stub
+    jevois_stub.install()
+    from benchmark_postprocessors import POSTPROCESSORS
+
+    args = sys.argv[1:]
+    batch = 1
+    if '--batch' in args:
+        i = args.index('--batch')
+        batch = int(args[i + 1])
+        del args[i:i + 2]
+    if not args:
+        print(__doc__)
+        sys.exit(1)
+
+    corpus = TensorCorpus(args[0])
+    frames = corpus.load()
+    print(f"📼 {len(corpus)} frames, tenseurs {[t.shape[1:] for t in corpus.tensors]}")
+    for name in args[1:] or [n for n, entry in POSTPROCESSORS.items() if entry[4] == 'raw']:
+        module_name, class_name, kwargs, _, _ = POSTPROCESSORS[name]
+        pp = getattr(importlib.import_module(module_name), class_name)(**kwargs)
+        pp.init()
+        try:
+            r = replay(frames, pp, batch=batch)
+            print(f"   {name:12s} {r['fps']:9.1f} FPS | moyenne {r['mean_ms']:.2f} ms | max {r['max_ms']:.2f} ms")
+        except Exception as e:
+            print(f"   {name:12s} ❌ {type(e).__name__}: {e}")
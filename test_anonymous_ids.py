@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Tests du service d'IDs anonymes (stabilité par track, absence de collision)
+"""
+
+from anonymous_ids import AnonymousIdService
+
+
+def test_ids_stable_per_track():
+    """Un track garde le même ID affiché tant qu'il vit"""
+    service = AnonymousIdService(100, 999, key=b'cle-de-test')
+
+    first = service.acquire(42)
+    for _ in range(100):
+        assert service.acquire(42) == first
+    assert 100 <= first <= 999
+
+
+def test_ids_collision_free():
+    """Tous les tracks vivants ont des IDs distincts, même pool plein"""
+    service = AnonymousIdService(100, 999, key=b'cle-de-test')
+
+    ids = [service.acquire(track_id) for track_id in range(1, 901)]
+    assert len(set(ids)) == 900
+
+    # Un ID libéré redevient disponible pour un nouveau track
+    service.retain(set(range(2, 901)))
+    assert service.acquire(5000) == ids[0]
+
+
+def test_ids_keyed():
+    """La même séquence de tracks donne des IDs différents avec une autre clé"""
+    a = AnonymousIdService(100, 999, key=b'cle-a')
+    b = AnonymousIdService(100, 999, key=b'cle-b')
+
+    ids_a = [a.acquire(t) for t in range(1, 20)]
+    ids_b = [b.acquire(t) for t in range(1, 20)]
+    assert ids_a != ids_b
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Tests du puits de logs asynchrone (file bornée, vidage à la fermeture, format binaire)
+"""
+
+import io
+
+from async_log import DEBUG, INFO, WARNING, AsyncLogSink, read_binary_log
+
+
+def _sink(**kwargs):
+    # Intervalle long : seuls flush() et close() réveillent le thread de vidage
+    kwargs.setdefault('flush_interval', 60.0)
+    kwargs.setdefault('rate_limit', 0)
+    return AsyncLogSink(stream=io.StringIO(), **kwargs)
+
+
+def test_bounded_queue_drops_overflow():
+    """File pleine : les lignes en trop sont comptées et supprimées, le thread vidéo ne bloque pas"""
+    sink = _sink(capacity=4)
+    for i in range(10):
+        sink.info("ligne {}", i)
+    sink.log_each(INFO, "det {id}", [{'id': 1}])
+    assert sink.stats()['queued'] == 4
+    assert sink.dropped_full == 7
+
+    sink.close()
+    assert sink.stream.getvalue().splitlines() == [f"ligne {i}" for i in range(4)]
+
+
+def test_close_flushes_pending_lines():
+    """close() écrit tout ce qui est en file, y compris les lignes différées de log_each"""
+    sink = _sink(level=INFO)
+    sink.debug("filtrée {}", 0)
+    sink.warning("alerte {}", 1)
+    sink.log_each(INFO, "ID{id} {score:.1f}", lambda: [{'id': 7, 'score': 0.5}, {'id': 8, 'score': 0.3}])
+    assert sink.written == 0
+
+    sink.close()
+    assert not sink.thread.is_alive()
+    assert sink.stream.getvalue().splitlines() == ["alerte 1", "ID7 0.5", "ID8 0.3"]
+    assert sink.stats() == {'queued': 0, 'written': 3, 'dropped_full': 0, 'dropped_rate': 0}
+
+
+def test_binary_log_round_trip(tmp_path):
+    """Mode binaire : gabarits internés relus à l'identique par read_binary_log()"""
+    path = str(tmp_path / 'yolo.log')
+    sink = _sink(level=DEBUG, binary_path=path)
+    sink.debug("{} frames à {:.1f} fps", 30, 29.97)
+    sink.log_each(WARNING, "ID{id}:{name}", [{'id': 3, 'name': 'person'}, {'name': 'car', 'id': 4}])
+    sink.close()
+
+    lines = [(level, line) for _, level, line in read_binary_log(path)]
+    assert lines == [(DEBUG, "30 frames à 30.0 fps"), (WARNING, "ID3:person"), (WARNING, "ID4:car")]
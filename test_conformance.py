@@ -0,0 +1,641 @@
+#!/usr/bin/env python3
+"""
+Tests de conformité différentiels entre les décodeurs YOLOv7
+- Mêmes tenseurs pour toutes les implémentations (synthétiques, ou corpus capturé via
+  YOLO_CONFORMANCE_CORPUS, voir tensor_capture.py), sorties ramenées à (x1, y1, x2, y2, score, classe)
+  en pixels du blob, comparées à un décodeur de référence NumPy avec tolérance
+- Latence de process() enregistrée à côté du résultat (record_property, et JSON si
+  YOLO_CONFORMANCE_REPORT est défini)
+
+Convention de référence (commune aux décodeurs Python) : sorties en logits, sigmoid sur
+objectness / classes / centre, centre = (sig(t) * scalexy - 0.5 * (scalexy - 1) + cellule) * stride,
+taille = exp(t) * anchor (anchors en pixels du blob).
+Le décodeur natif JeVois (tailles 4 * sig(t)^2 * anchor) n'est pas testable hors device.
+Les tenseurs synthétiques n'ont pas de boîtes qui se recouvrent : NMS par classe ou toutes classes
+confondues donnent alors le même résultat. test_nms_near_iou_threshold couvre les recouvrements
+(même classe et classes différentes, IoU juste au-dessus et juste au-dessous du seuil).
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+import pytest
+
+os.environ.setdefault('YOLO_LOG_LEVEL', 'ERROR')
+
+import jevois_stub
+
+jevois_stub.install()
+
+ANCHORS = [
+    [(10, 13), (16, 30), (33, 23)],
+    [(30, 61), (62, 45), (59, 119)],
+    [(116, 90), (156, 198), (373, 326)],
+]
+SHAPES = [(1, 255, 36, 64), (1, 255, 18, 32), (1, 255, 9, 16)]
+BLOB_W, BLOB_H = 512, 288
+CONF = 0.25
+SCALE_XY = 2.0
+
+BOX_TOL = 2.0     # pixels (boîtes entières dans PurePython / MultiDNN2)
+SCORE_TOL = 0.01  # sigmoid par table (UltraHybrid, NPU_Direct)
+
+_report = {}
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def _cell_box(cell, head, a, y, x, blob_w, blob_h, grid_w, grid_h, scale_xy=SCALE_XY):
+    """Boîte (x1, y1, x2, y2) d'une cellule d'anchor"""
+    anchor_w, anchor_h = ANCHORS[head][a]
+    cx = (_sigmoid(cell[0]) * scale_xy - 0.5 * (scale_xy - 1) + x) * blob_w / grid_w
+    cy = (_sigmoid(cell[1]) * scale_xy - 0.5 * (scale_xy - 1) + y) * blob_h / grid_h
+    w = np.exp(cell[2]) * anchor_w
+    h = np.exp(cell[3]) * anchor_h
+    return cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2
+
+
+def reference_decode(outs, blob_w=BLOB_W, blob_h=BLOB_H, conf=CONF):
+    """Décodeur de référence (sans NMS) : tableau N x 6"""
+    rows = []
+    for head, out in enumerate(outs[:3]):
+        grid_h, grid_w = out.shape[2], out.shape[3]
+        t = out.reshape(3, 85, grid_h, grid_w).astype(np.float64)
+        for a in range(3):
+            obj = _sigmoid(t[a, 4])
+            cls = _sigmoid(t[a, 5:])
+            class_id = cls.argmax(axis=0)
+            score = obj * cls.max(axis=0)
+            for y, x in zip(*np.nonzero((obj > conf) & (score > conf))):
+                box = _cell_box(t[a, :, y, x], head, a, y, x, blob_w, blob_h, grid_w, grid_h)
+                rows.append(box + (score[y, x], class_id[y, x]))
+    return np.array(rows, dtype=np.float64).reshape(-1, 6)
+
+
+def _iou(a, b):
+    iw = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    ih = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = iw * ih
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def make_frame(seed, num_boxes=15, max_iou=0.2):
+    """Tenseurs synthétiques : num_boxes détections nettes, sans recouvrement notable"""
+    rng = np.random.default_rng(seed)
+    outs = []
+    for shape in SHAPES:
+        t = rng.normal(0.0, 0.5, (3, 85) + shape[2:]).astype(np.float32)
+        t[:, 4] = -6.0
+        t[:, 5:] -= 4.0
+        outs.append(t)
+
+    placed = []
+    while len(placed) < num_boxes:
+        head, a = int(rng.integers(0, 3)), int(rng.integers(0, 3))
+        grid_h, grid_w = SHAPES[head][2:]
+        y, x = int(rng.integers(0, grid_h)), int(rng.integers(0, grid_w))
+        if outs[head][a, 4, y, x] > 0:
+            continue
+
+        cell = np.empty(85, dtype=np.float32)
+        cell[0:4] = rng.uniform(-1.0, 1.0, 4)
+        cell[4] = rng.uniform(1.0, 4.0)
+        cell[5:] = rng.normal(-4.0, 0.5, 80)
+        cell[5 + int(rng.integers(0, 80))] = rng.uniform(1.0, 5.0)
+
+        box = _cell_box(cell.astype(np.float64), head, a, y, x, BLOB_W, BLOB_H, grid_w, grid_h)
+        if any(_iou(box, p) > max_iou for p in placed):
+            continue
+        outs[head][a, :, y, x] = cell
+        placed.append(box)
+
+    return [o.reshape(s) for o, s in zip(outs, SHAPES)], (BLOB_H, BLOB_W)
+
+
+def _frames():
+    corpus = os.environ.get('YOLO_CONFORMANCE_CORPUS')
+    if corpus:
+        from tensor_capture import TensorCorpus
+        return [(outs, blob if blob[0] else (BLOB_H, BLOB_W)) for outs, blob in TensorCorpus(corpus).load()[:5]]
+    return [make_frame(seed) for seed in range(3)]
+
+
+# ========== Adaptateurs : instance configurée + sortie normalisée ==========
+
+def _xywh_rows(boxes, scores, classes):
+    return [(x, y, x + w, y + h, s, c) for (x, y, w, h), s, c in zip(boxes, scores, classes)]
+
+
+def _purepython():
+    from PyPostYoloRandomID_PurePython import PyPostYoloRandomID_PurePython
+    pp = PyPostYoloRandomID_PurePython()
+    pp.init()
+    pp.cthresh.set(CONF * 100.0)
+    return pp, lambda pp, blob: _xywh_rows(pp.boxes, pp.confidences, pp.classIds)
+
+
+def _multidnn2():
+    from PyPostYoloRandomID_MultiDNN2 import PyPostYoloRandomID_MultiDNN2
+    pp = PyPostYoloRandomID_MultiDNN2()
+    pp.init()
+    pp.conf_thresh = CONF
+    return pp, lambda pp, blob: _xywh_rows(pp.boxes, pp.confidences, pp.classIds)
+
+
+def _npu_direct():
+    from PyPostYoloRandomID_NPU_Direct import PyPostYoloRandomID_NPU_Direct
+    pp = PyPostYoloRandomID_NPU_Direct()
+    pp.init()
+    return pp, lambda pp, blob: [(d['x'], d['y'], d['x'] + d['w'], d['y'] + d['h'], d['conf'], d['class_id'])
+                                 for d in pp.detections]
+
+
+def _ultrahybrid():
+    from PyPostYOLO_UltraHybrid import PyPostYOLO_UltraHybrid
+    pp = PyPostYOLO_UltraHybrid(snapshot_path=None)
+    pp.frame_skip = None
+    return pp, lambda pp, blob: [(d['x'] - d['w'] / 2, d['y'] - d['h'] / 2, d['x'] + d['w'] / 2,
+                                  d['y'] + d['h'] / 2, d['score'], d['class_id']) for d in pp.detections]
+
+
+def _ultimate():
+    """Boîtes normalisées [0, 1] et bornées à l'image : ramenées en pixels"""
+    from PyPostYOLO_Ultimate import PyPostYOLO_Ultimate
+    pp = PyPostYOLO_Ultimate()
+    return pp, lambda pp, blob: [(d['box'][0] * blob[1], d['box'][1] * blob[0], d['box'][2] * blob[1],
+                                  d['box'][3] * blob[0], d['score'], d['class_id']) for d in pp.detections]
+
+
+IMPLEMENTATIONS = {
+    'PurePython': (_purepython, False),
+    'MultiDNN2': (_multidnn2, False),
+    'NPU_Direct': (_npu_direct, False),
+    'UltraHybrid': (_ultrahybrid, False),
+    'Ultimate': (_ultimate, True),   # True = boîtes bornées à l'image
+}
+
+NMS_IOU = 0.45
+PER_CLASS_NMS = {'UltraHybrid'}  # les autres suppriment toutes classes confondues
+
+
+def _match(reference, rows, clamp, blob):
+    """Nombre de détections de référence retrouvées (même classe, boîte et score dans la tolérance)"""
+    blob_h, blob_w = blob
+    remaining = [np.asarray(r, dtype=np.float64) for r in rows]
+    matched = 0
+    for ref in reference:
+        ref = ref.copy()
+        if clamp:
+            ref[[0, 2]] = np.clip(ref[[0, 2]], 0, blob_w)
+            ref[[1, 3]] = np.clip(ref[[1, 3]], 0, blob_h)
+        for i, row in enumerate(remaining):
+            if (int(row[5]) == int(ref[5]) and np.all(np.abs(row[:4] - ref[:4]) <= BOX_TOL)
+                    and abs(row[4] - ref[4]) <= SCORE_TOL):
+                matched += 1
+                del remaining[i]
+                break
+    return matched
+
+
+@pytest.fixture(scope='module', autouse=True)
+def conformance_report():
+    yield _report
+    path = os.environ.get('YOLO_CONFORMANCE_REPORT')
+    if path:
+        with open(path, 'w') as f:
+            json.dump(_report, f, indent=2)
+
+
+@pytest.mark.parametrize('name', list(IMPLEMENTATIONS))
+def test_conformance(name, record_property):
+    factory, clamp = IMPLEMENTATIONS[name]
+    pp, normalize = factory()
+    min_rate = 0.9 if os.environ.get('YOLO_CONFORMANCE_CORPUS') else 1.0
+
+    latencies = []
+    for outs, blob in _frames():
+        preproc = jevois_stub.PreProcessor(*blob)
+        start = time.perf_counter()
+        pp.process(outs, preproc)
+        latencies.append(time.perf_counter() - start)
+
+        reference = reference_decode(outs, blob[1], blob[0])
+        rows = normalize(pp, blob)
+        matched = _match(reference, rows, clamp, blob)
+        assert matched >= min_rate * len(reference), f"{name}: {matched}/{len(reference)} détections conformes"
+        assert len(rows) <= len(reference) + (1 - min_rate) * len(reference), \
+            f"{name}: {len(rows)} détections pour {len(reference)} attendues"
+
+    latency_ms = 1000.0 * float(np.median(latencies))
+    record_property('latency_ms', latency_ms)
+    _report[name] = {'latency_ms': latency_ms, 'frames': len(latencies)}
+
+
+def _logits_for_box(cx, cy, w, h, head, a):
+    """Cellule (y, x) et logits (tx, ty, tw, th) qui décodent exactement la boîte centrée (cx, cy)"""
+    grid_h, grid_w = SHAPES[head][2:]
+    stride_x, stride_y = BLOB_W / grid_w, BLOB_H / grid_h
+    x, y = int(cx // stride_x), int(cy // stride_y)
+    # centre = (sig(t) * 2 - 0.5 + cellule) * stride -> sig(t) = (centre / stride - cellule + 0.5) / 2
+    sx = (cx / stride_x - x + 0.5 * (SCALE_XY - 1)) / SCALE_XY
+    sy = (cy / stride_y - y + 0.5 * (SCALE_XY - 1)) / SCALE_XY
+    anchor_w, anchor_h = ANCHORS[head][a]
+    return y, x, (np.log(sx / (1 - sx)), np.log(sy / (1 - sy)), np.log(w / anchor_w), np.log(h / anchor_h))
+
+
+def make_overlap_frame(w=96.0, h=64.0, head=1):
+    """
+    Paires de boîtes décalées horizontalement, IoU (w - d) / (w + d) juste au-dessus ou au-dessous de NMS_IOU :
+    même classe / classes différentes ; la seconde boîte de chaque paire a le score le plus faible
+    """
+    rng = np.random.default_rng(0)
+    outs = []
+    for shape in SHAPES:
+        t = rng.normal(0.0, 0.5, (3, 85) + shape[2:]).astype(np.float32)
+        t[:, 4] = -6.0
+        t[:, 5:] -= 4.0
+        outs.append(t)
+
+    pairs = [((120.0, 80.0), NMS_IOU + 0.05, (0, 0)), ((360.0, 80.0), NMS_IOU - 0.05, (0, 0)),
+             ((120.0, 210.0), NMS_IOU + 0.05, (0, 2)), ((360.0, 210.0), NMS_IOU - 0.05, (0, 2))]
+    for (cx, cy), iou, classes in pairs:
+        d = w * (1 - iou) / (1 + iou)
+        for a, (dx, obj, class_id) in enumerate(zip((0.0, d), (4.0, 2.0), classes)):
+            y, x, coords = _logits_for_box(cx + dx, cy, w, h, head, a)
+            cell = outs[head][a, :, y, x]
+            cell[0:4] = coords
+            cell[4] = obj
+            cell[5:] = -6.0
+            cell[5 + class_id] = 4.0
+    return [o.reshape(s) for o, s in zip(outs, SHAPES)], (BLOB_H, BLOB_W)
+
+
+def reference_nms(rows, iou=NMS_IOU, per_class=False):
+    """NMS gloutonne de référence sur des lignes (x1, y1, x2, y2, score, classe) : suppression si IoU > iou"""
+    keep = []
+    for row in sorted(rows, key=lambda r: -r[4]):
+        if not any((not per_class or k[5] == row[5]) and _iou(k, row) > iou for k in keep):
+            keep.append(row)
+    return np.array(keep, dtype=np.float64).reshape(-1, 6)
+
+
+@pytest.mark.parametrize('name', list(IMPLEMENTATIONS))
+def test_nms_near_iou_threshold(name):
+    """Boîtes qui se recouvrent autour du seuil : mêmes survivants que la NMS de référence de l'implémentation"""
+    factory, clamp = IMPLEMENTATIONS[name]
+    pp, normalize = factory()
+    outs, blob = make_overlap_frame()
+    pp.process(outs, jevois_stub.PreProcessor(*blob))
+
+    decoded = reference_decode(outs, blob[1], blob[0])
+    assert len(decoded) == 8
+    reference = reference_nms(decoded, per_class=name in PER_CLASS_NMS)
+    # IoU > seuil : même classe toujours supprimée ; classes différentes seulement sans NMS par classe
+    assert len(reference) == (7 if name in PER_CLASS_NMS else 6)
+
+    rows = normalize(pp, blob)
+    assert len(rows) == len(reference) == _match(reference, rows, clamp, blob), \
+        f"{name}: {len(rows)} détections pour {len(reference)} attendues"
+
+
+@pytest.mark.parametrize('per_class', [False, True])
+@pytest.mark.parametrize('use_opencv', [False, True])
+def test_nms_suppressor_near_iou_threshold(per_class, use_opencv):
+    """NmsSuppressor (OpenCV ou repli NumPy) = NMS de référence sur les recouvrements autour du seuil"""
+    from yolo_core import Detections, NmsSuppressor
+
+    decoded = reference_decode(make_overlap_frame()[0])
+    dets = Detections(decoded[:, :4].astype(np.float32), decoded[:, 4].astype(np.float32),
+                      decoded[:, 5].astype(np.int32), np.zeros(len(decoded), dtype=np.int32))
+    kept = NmsSuppressor(NMS_IOU, per_class=per_class, use_opencv=use_opencv)(dets)
+    reference = reference_nms(decoded, per_class=per_class)
+    assert sorted(kept.boxes[:, :2].astype(np.float64).round(1).tolist()) == sorted(reference[:, :2].round(1).tolist())
+
+
+def test_batch_matches_frames():
+    """process_batch sur les frames empilées = process frame par frame"""
+    pp, normalize = _multidnn2()
+    frames = _frames()
+    frames = [(outs, blob) for outs, blob in frames if blob == frames[0][1]]
+    preproc = jevois_stub.PreProcessor(*frames[0][1])
+
+    expected = []
+    for outs, blob in frames:
+        pp.process(outs, preproc)
+        expected.append(normalize(pp, blob))
+
+    stacked = [np.concatenate(t) for t in zip(*(outs for outs, _ in frames))]
+    results = pp.process_batch(stacked, preproc)
+    assert [_xywh_rows(*r) for r in results] == expected
+
+
+def _moving_frames(frames=6, head=1):
+    """Objets qui se déplacent de frame en frame ; un objet disparaît, un autre apparaît à mi-parcours"""
+    rng = np.random.default_rng(3)
+    scene = []
+    for i in range(frames):
+        objects = [(80.0 + 6 * i, 70.0, 0), (300.0 - 5 * i, 150.0 + 3 * i, 2)]
+        objects += [(420.0, 60.0 + 4 * i, 0)] if i < frames // 2 else [(200.0 + 2 * i, 230.0, 7)]
+        outs = []
+        for shape in SHAPES:
+            t = rng.normal(0.0, 0.5, (3, 85) + shape[2:]).astype(np.float32)
+            t[:, 4] = -6.0
+            t[:, 5:] -= 4.0
+            outs.append(t)
+        for cx, cy, class_id in objects:
+            y, x, coords = _logits_for_box(cx, cy, 60.0, 40.0, head, 0)
+            cell = outs[head][0, :, y, x]
+            cell[0:4] = coords
+            cell[4] = 4.0
+            cell[5 + class_id] = 4.0
+        scene.append([o.reshape(s) for o, s in zip(outs, SHAPES)])
+    return scene
+
+
+def _tracked_core(kind):
+    """YoloCore avec tracker ; horloge avancée à chaque lecture (même séquence en lot et frame par frame)"""
+    import itertools
+    import random
+
+    from anonymous_ids import AnonymousIdService
+    from yolo_core import CenterTracker, NmsSuppressor, RandomIdTracker, Yolov7Decoder, YoloCore
+    random.seed(7)
+    if kind == 'center':
+        tracker = CenterTracker(AnonymousIdService(100, 999, key=bytes(16)), max_age=0.025,
+                                clock=itertools.count(0.0, 0.01).__next__)
+    else:
+        tracker = RandomIdTracker()
+    return YoloCore(Yolov7Decoder(ANCHORS), NmsSuppressor(), tracker=tracker)
+
+
+@pytest.mark.parametrize('kind', ['center', 'random'])
+def test_batch_matches_frames_with_tracker(kind):
+    """YoloCore.process_batch = process frame par frame : détections, IDs de track et état du tracker"""
+    scene = _moving_frames()
+    looped = _tracked_core(kind)
+    expected = [looped.process(outs, BLOB_W, BLOB_H, CONF) for outs in scene]
+    batched = _tracked_core(kind)
+    batch = batched.process_batch([np.concatenate(t) for t in zip(*scene)], BLOB_W, BLOB_H, CONF)
+
+    assert len(batch) == len(scene)
+    for i, dets in enumerate(expected):
+        got = batch.frame(i)
+        assert len(dets) == 3 and np.array_equal(got.boxes, dets.boxes)
+        assert np.array_equal(got.scores, dets.scores) and np.array_equal(got.class_ids, dets.class_ids)
+        assert got.ids.tolist() == dets.ids.tolist() and got.random_ids.tolist() == dets.random_ids.tolist()
+    if kind == 'center':
+        assert (batched.tracker.tracks, batched.tracker.next_id, batched.tracker.random_ids.assigned) == \
+            (looped.tracker.tracks, looped.tracker.next_id, looped.tracker.random_ids.assigned)
+        assert sorted(looped.tracker.tracks) == [2, 3, 4]  # track 1 disparu puis oublié, track 4 créé
+
+
+def test_decode_pool_matches_pipeline(monkeypatch):
+    """Décodage sur le pool partagé (YOLO_DECODE_WORKERS) = décodage sur le thread du pipeline"""
+    pp, normalize = _multidnn2()
+    monkeypatch.setenv('YOLO_DECODE_WORKERS', '1')
+    pooled, _ = _multidnn2()
+    assert pooled.decode_plan is not None
+
+    for outs, blob in _frames():
+        preproc = jevois_stub.PreProcessor(*blob)
+        pp.process(outs, preproc)
+        pooled.process(outs, preproc)
+        assert normalize(pooled, blob) == normalize(pp, blob)
+
+
+def test_decode_plans_per_instance(monkeypatch):
+    """Un plan par instance (clé unique), retiré par uninit() : plus aucune frame acceptée ensuite"""
+    monkeypatch.setenv('YOLO_DECODE_WORKERS', '1')
+    first, _ = _multidnn2()
+    second, _ = _multidnn2()
+    plan = first.decode_plan
+    assert plan is not second.decode_plan and plan.name != second.decode_plan.name
+    assert plan.executor.plans[plan.name] is plan
+
+    outs, blob = _frames()[0]
+    first.uninit()
+    assert first.decode_plan is None and plan.name not in plan.executor.plans
+    assert plan.submit(outs, blob[1], blob[0], 0.25) is None
+    second.uninit()
+
+
+@pytest.mark.parametrize('name', list(IMPLEMENTATIONS) + ['Optimized'])
+def test_stage_timers(name, monkeypatch):
+    """YOLO_METRICS : étapes chronométrées dans chaque adaptateur, frame close par report()"""
+    monkeypatch.setenv('YOLO_METRICS', '1')
+    if name == 'Optimized':
+        from SOLUTION_OPTIMISEE_30FPS import PyPostYoloRandomID_Optimized
+        pp = PyPostYoloRandomID_Optimized()
+        pp.init()
+        outs, blob, stages = [_dense_rows()[:, :, :6]], (BLOB_H, BLOB_W), {'threshold', 'association', 'report'}
+    else:
+        pp, _ = IMPLEMENTATIONS[name][0]()
+        (outs, blob), stages = _frames()[0], {'decode', 'nms', 'report'}
+    pp.process(outs, jevois_stub.PreProcessor(*blob))
+    pp.report(None, None, False, False)
+    stats = pp.metrics.stats()
+    assert stats['frames'] == 1 and stages <= set(stats['stages'])
+    pp.uninit()
+
+
+def test_scene_cache_reuses_static_frames(monkeypatch):
+    """Cache de scène (YOLO_SCENE_CACHE) : frame répétée = détections réutilisées, frame différente = décodée"""
+    monkeypatch.setenv('YOLO_SCENE_CACHE', '1')
+    pp, normalize = _multidnn2()
+    frames = _frames()
+    for outs, blob in frames + frames[:1]:
+        preproc = jevois_stub.PreProcessor(*blob)
+        pp.process(outs, preproc)
+        first = normalize(pp, blob)
+        pp.process(outs, preproc)
+        assert normalize(pp, blob) == first
+    assert pp.core.cache.hits == len(frames) + 1
+    assert pp.core.cache.misses == len(frames) + 1
+
+
+def test_predecoded_boxes_exact():
+    """Boîtes déjà décodées (Optimized) : x, y, w, h rendus comme int() des valeurs natives, sans aller-retour"""
+    from SOLUTION_OPTIMISEE_30FPS import PyPostYoloRandomID_Optimized
+
+    rng = np.random.default_rng(0)
+    n = 200
+    rows = np.column_stack([rng.uniform(0, 500, n), rng.uniform(0, 280, n), rng.integers(1, 200, n),
+                            rng.integers(1, 200, n), rng.uniform(0.3, 1.0, n), rng.integers(0, 80, n)])
+    rows = rows.astype(np.float32)
+    pp = PyPostYoloRandomID_Optimized()
+    pp.init()
+    pp.process([rows[None]], jevois_stub.PreProcessor(BLOB_H, BLOB_W))
+    got = [(d['x'], d['y'], d['w'], d['h']) for d in pp.detections]
+    assert got == [tuple(int(v) for v in row[:4]) for row in rows]
+
+
+def _dense_rows(n=40, num_classes=80, seed=0):
+    """Lignes YOLOv8 [1, N, 5 + C] sans recouvrement : cx, cy, w, h, objectness, scores de classes"""
+    rng = np.random.default_rng(seed)
+    rows = np.zeros((1, n, 5 + num_classes), dtype=np.float32)
+    rows[0, :, 0] = 12.0 + 24.0 * (np.arange(n) % 20)
+    rows[0, :, 1] = 12.0 + 24.0 * (np.arange(n) // 20)
+    rows[0, :, 2:4] = 16.0
+    rows[0, :, 4] = rng.uniform(0.1, 1.0, n)
+    rows[0, :, 5:] = rng.uniform(0.0, 0.2, (n, num_classes))
+    rows[0, np.arange(n), 5 + rng.integers(0, num_classes, n)] = rng.uniform(0.3, 1.0, n)
+    return rows
+
+
+def _dense_reference(rows, conf, allowed=None, thresholds=None):
+    out = []
+    for cx, cy, w, h, obj, *classes in rows[0].tolist():
+        candidates = range(len(classes)) if allowed is None else allowed
+        best = max(candidates, key=lambda c: classes[c])
+        score = obj * classes[best]
+        if score > (thresholds or {}).get(best, conf):
+            out.append(np.array([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2, score, best]))
+    return out
+
+
+def test_npu_direct_yolov8_rows():
+    """YOLOv8 avec bibliothèque (NPU_Direct) : décodage des lignes par le cœur commun"""
+    pp, normalize = _npu_direct()
+    rows = _dense_rows()
+    pp.process([rows], jevois_stub.PreProcessor(BLOB_H, BLOB_W))
+    reference = _dense_reference(rows, 0.25)
+    got = normalize(pp, (BLOB_H, BLOB_W))
+    assert 0 < len(reference) == len(got) == _match(reference, got, False, (BLOB_H, BLOB_W))
+
+
+def test_npu_direct_yolov8_class_selection(monkeypatch):
+    """YOLO_CLASSES / YOLO_CLASS_THRESHOLDS appliqués aussi aux lignes YOLOv8 de NPU_Direct"""
+    monkeypatch.setenv('YOLO_CLASSES', '0,2,7')
+    monkeypatch.setenv('YOLO_CLASS_THRESHOLDS', '2:0.6')
+    pp, normalize = _npu_direct()
+    rows = _dense_rows(seed=1)
+    rows[0, :20, 5 + 2] = 0.95  # classe 2 majoritaire sur la moitié des lignes
+    pp.process([rows], jevois_stub.PreProcessor(BLOB_H, BLOB_W))
+    reference = _dense_reference(rows, 0.25, allowed=[0, 2, 7], thresholds={2: 0.6})
+    got = normalize(pp, (BLOB_H, BLOB_W))
+    assert {int(r[5]) for r in got} <= {0, 2, 7}
+    assert 0 < len(reference) == len(got) == _match(reference, got, False, (BLOB_H, BLOB_W))
+
+
+# ========== Sélection de classes YOLOv7 (select) ==========
+
+def _decoded_rows(dets):
+    """Detections -> lignes (x1, y1, x2, y2, score, classe) triées"""
+    rows = np.column_stack([dets.boxes, dets.scores, dets.class_ids]).astype(np.float64)
+    return rows[np.lexsort(rows.T[::-1])]
+
+
+def _filtered(rows, conf, allowed=None, thresholds=None):
+    """Décodage non filtré puis filtrage : classes de l'allow-list, score au-dessus du seuil de sa classe"""
+    keep = [r for r in rows if (allowed is None or int(r[5]) in allowed)
+            and r[4] > (thresholds or {}).get(int(r[5]), conf)]
+    rows = np.array(keep, dtype=np.float64).reshape(-1, 6)
+    return rows[np.lexsort(rows.T[::-1])]
+
+
+def _select_case(outs):
+    """Allow-list d'une classe sur deux parmi celles présentes, seuils relevé et abaissé pour deux d'entre elles"""
+    from yolo_core import Yolov7Decoder
+    present = sorted({int(c) for c in _decoded_rows(Yolov7Decoder(ANCHORS)(outs, BLOB_W, BLOB_H, CONF))[:, 5]})
+    allowed = present[::2]
+    return allowed, {allowed[0]: 0.7, allowed[1]: 0.1}
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_yolov7_select_matches_filtered_decode(seed):
+    """select() (seuls les canaux retenus lus, seuils par classe vectorisés) = décodage complet puis filtrage"""
+    from yolo_core import Yolov7Decoder
+    outs, _ = make_frame(seed)
+    allowed, thresholds = _select_case(outs)
+    unfiltered = _decoded_rows(Yolov7Decoder(ANCHORS)(outs, BLOB_W, BLOB_H, 0.1))
+    expected = _filtered(unfiltered, CONF, allowed, thresholds)
+
+    got = _decoded_rows(Yolov7Decoder(ANCHORS).select(allowed, thresholds)(outs, BLOB_W, BLOB_H, CONF))
+    assert 0 < len(got) < len(_filtered(unfiltered, CONF))
+    assert np.allclose(got, expected, atol=1e-4)
+    assert np.allclose(got, _filtered(reference_decode(outs, conf=0.1), CONF, allowed, thresholds), atol=1e-3)
+
+    batch = Yolov7Decoder(ANCHORS).select(allowed, thresholds).decode_batch(
+        [np.concatenate([o, o]) for o in outs], BLOB_W, BLOB_H, CONF)
+    assert np.allclose(_decoded_rows(batch.frame(1)), expected, atol=1e-4)
+
+
+def test_yolov7_select_best_allowed_class():
+    """Classe retenue = meilleure des classes autorisées, pas la meilleure de toutes (puis écartée)"""
+    from yolo_core import Yolov7Decoder
+    out = np.full((1, 255, 9, 16), -8.0, dtype=np.float32)
+    cell = out.reshape(3, 85, 9, 16)[1, :, 4, 7]
+    cell[4] = 6.0
+    cell[5 + 3], cell[5 + 11] = 5.0, 2.0
+    dets = Yolov7Decoder(ANCHORS).select([11, 40])(
+        [np.zeros((1, 255, 36, 64), np.float32) - 8, np.zeros((1, 255, 18, 32), np.float32) - 8, out],
+        BLOB_W, BLOB_H, CONF)
+    assert dets.class_ids.tolist() == [11]
+    assert dets.scores[0] == pytest.approx(_sigmoid(6.0) * _sigmoid(2.0), rel=1e-5)
+
+
+@pytest.mark.parametrize('dtype, zero', [(np.uint8, 128), (np.int8, 0)])
+def test_yolov7_select_quantized(dtype, zero):
+    """Sorties quantifiées : seuil dans le domaine entier, cellules retenues déquantifiées, select() inchangé"""
+    from yolo_core import Yolov7Decoder
+    outs, _ = make_frame(1)
+    scale = 0.06
+    info = np.iinfo(dtype)
+    quantized = [np.clip(np.round(o / scale) + zero, info.min, info.max).astype(dtype) for o in outs]
+    dequantized = [(q.astype(np.float32) - zero) * np.float32(scale) for q in quantized]
+    quant = [(scale, zero)] * 3
+    allowed, thresholds = _select_case(dequantized)
+
+    full = _decoded_rows(Yolov7Decoder(ANCHORS, quant=quant)(quantized, BLOB_W, BLOB_H, CONF))
+    assert np.allclose(full, _decoded_rows(Yolov7Decoder(ANCHORS)(dequantized, BLOB_W, BLOB_H, CONF)), atol=1e-3)
+
+    got = _decoded_rows(Yolov7Decoder(ANCHORS, quant=quant).select(allowed, thresholds)(
+        quantized, BLOB_W, BLOB_H, CONF))
+    unfiltered = _decoded_rows(Yolov7Decoder(ANCHORS, quant=quant)(quantized, BLOB_W, BLOB_H, 0.1))
+    assert len(got) and np.allclose(got, _filtered(unfiltered, CONF, allowed, thresholds), atol=1e-4)
+
+
+def test_yolov7_per_class_thresholds():
+    """Seuils par classe seuls (sans allow-list) : seuil abaissé garde plus, seuil relevé garde moins"""
+    from yolo_core import Yolov7Decoder
+    outs, _ = make_frame(2)
+    unfiltered = _decoded_rows(Yolov7Decoder(ANCHORS)(outs, BLOB_W, BLOB_H, 0.05))
+    low, high = int(unfiltered[np.argmin(unfiltered[:, 4]), 5]), int(unfiltered[np.argmax(unfiltered[:, 4]), 5])
+    thresholds = {low: 0.05, high: 0.99}
+    decoder = Yolov7Decoder(ANCHORS).select(None, thresholds)
+    got = _decoded_rows(decoder(outs, BLOB_W, BLOB_H, CONF))
+    assert np.allclose(got, _filtered(unfiltered, CONF, None, thresholds), atol=1e-4)
+    assert high not in got[:, 5] and decoder.selection == (None, thresholds)
+
+
+def test_purepython_class_names_before_labels(monkeypatch, tmp_path):
+    """classfilter nommé avant le chargement des labels : nom journalisé et ignoré, puis résolu au chargement"""
+    import PyPostYoloRandomID_PurePython
+    jevois = PyPostYoloRandomID_PurePython.jevois
+    errors = []
+    monkeypatch.setattr(jevois, 'share', str(tmp_path))
+    monkeypatch.setattr(jevois, 'LERROR', errors.append)
+    (tmp_path / 'labels.txt').write_text('\n'.join(f'class{i}' for i in range(80)).replace('class0\n', 'person\n'))
+
+    pp, normalize = _purepython()
+    outs, blob = make_frame(0)
+    allowed, _ = _select_case(outs)
+    pp.classfilter.set(','.join(['person'] + [str(c) for c in allowed]))
+    pp.classthresh.set('person:60')
+    logged = len(errors)
+    assert logged and all("'person'" in e for e in errors)
+
+    preproc = jevois_stub.PreProcessor(*blob)
+    pp.process(outs, preproc)
+    assert {int(r[5]) for r in normalize(pp, blob)} == set(allowed)
+
+    pp.classes.set('labels.txt')
+    assert pp.class_selection == ([0] + allowed, {0: pytest.approx(0.6)})
+    pp.process(outs, preproc)
+    assert pp.core.decoder.selection[0] == sorted([0] + allowed) and len(errors) == logged
+    pp.uninit()
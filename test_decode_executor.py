@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Tests du pool de décodage partagé (changement des paramètres du cœur entre deux frames)
+"""
+
+import threading
+
+from decode_executor import DecodeExecutor, configure_core
+
+
+class BlockingCore:
+    """Cœur factice : une frame en deux étapes, la première bloquée jusqu'à release ; iou lu à chaque étape"""
+
+    def __init__(self):
+        self.iou = 0.45
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def process_steps(self, outs, blob_w, blob_h, conf, heads=None):
+        seen = [self.iou]
+        self.started.set()
+        self.release.wait(5)
+        yield
+        seen.append(self.iou)
+        return seen
+
+
+def _set_iou(iou):
+    return lambda core: setattr(core, 'iou', iou)
+
+
+def test_configure_waits_for_preempted_frame():
+    """Frame secondaire préemptée entre deux têtes : le nouveau seuil attend sa fin, puis s'applique"""
+    executor = DecodeExecutor(1)
+    main, secondary = BlockingCore(), BlockingCore()
+    main_plan = executor.register('principal', main, priority=0)
+    plan = executor.register('secondaire', secondary, priority=1)
+
+    future = plan.submit(None, 512, 288, 0.25)
+    assert secondary.started.wait(5)
+    main_future = main_plan.submit(None, 512, 288, 0.25)
+    secondary.release.set()  # première tête finie : préemptée par la frame du principal
+    assert main.started.wait(5)
+
+    plan.configure(_set_iou(0.6))
+    assert secondary.iou == 0.45
+    main.release.set()
+    assert main_future.result(5) == [0.45, 0.45]
+    assert future.result(5) == [0.45, 0.45]  # même seuil sur toute la frame
+    assert plan.stats()['preempted'] == 1
+    assert secondary.iou == 0.6
+
+    plan.configure(_set_iou(0.7))  # aucune frame commencée : tout de suite
+    assert secondary.iou == 0.7
+    executor.close()
+
+
+def test_configure_core_without_pool():
+    """Pool désactivé (plan None) : cœur du thread du pipeline changé tout de suite"""
+    core = BlockingCore()
+    configure_core(None, core, _set_iou(0.3))
+    assert core.iou == 0.3
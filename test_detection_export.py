@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Tests de l'anneau d'export des détections (aller-retour, seqlock, frames écrasées)
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from detection_export import HEADER_SIZE, SLOT_HEADER, DetectionExporter, DetectionReader
+
+
+@pytest.fixture
+def ring(request):
+    name = f"yolo_det_test_{os.getpid()}_{request.node.name}"[:60]
+    exporter = DetectionExporter(name, slots=4, max_records=8)
+    reader = DetectionReader(name)
+    yield exporter, reader
+    reader.close()
+    exporter.close()
+
+
+def _dets(n, base=0):
+    return [{'x': base + 10.0 * i, 'y': 5.0 * i, 'w': 20.0, 'h': 40.0, 'score': 0.5, 'class_id': i,
+             'id': 100 + i, 'random_id': 900 + i} for i in range(n)]
+
+
+def test_round_trip(ring):
+    """Frames relues dans l'ordre, champs identiques ; au-delà de max_records : tronqué"""
+    exporter, reader = ring
+    assert reader.poll() == []
+    exporter.publish(_dets(3), frame_index=7, timestamp=12.5)
+    exporter.publish([{'x': 1.0, 'y': 2.0, 'w': 3.0, 'h': 4.0, 'score': 0.9, 'class_id': 1}], frame_index=8)
+    exporter.publish(_dets(20), frame_index=9)
+
+    first, second, third = reader.poll()
+    assert (first.seq, first.frame_index, first.timestamp) == (1, 7, 12.5)
+    assert first.records['x'].tolist() == [0.0, 10.0, 20.0]
+    assert first.records['class_id'].tolist() == [0, 1, 2]
+    assert first.records['track_id'].tolist() == [100, 101, 102]
+    assert first.records['random_id'].tolist() == [900, 901, 902]
+    assert second.records['track_id'].tolist() == [-1]  # détection non suivie
+    assert len(third.records) == 8
+    assert reader.poll() == [] and reader.missed == 0
+
+
+def test_torn_slot_not_read(ring):
+    """Slot en cours d'écriture (seq impair) : read() le refuse ; vue réécrite : still_valid() faux"""
+    exporter, reader = ring
+    exporter.publish(_dets(2), frame_index=1)
+    frame = reader.read(1)
+    assert frame is not None and reader.still_valid(frame)
+
+    # Écrivain interrompu au milieu de la frame 5 (même slot que la frame 1)
+    SLOT_HEADER.pack_into(exporter.buf, HEADER_SIZE + 1 * exporter.slot_size, 2 * 5 - 1, 5, 0.0, 0)
+    assert not reader.still_valid(frame)
+    assert reader.read(5) is None
+    assert reader.read(1) is None
+
+
+def test_lagging_reader_counts_overwritten_frames(ring):
+    """Lecteur en retard de plus d'un tour : seules les frames encore dans l'anneau sont rendues"""
+    exporter, reader = ring
+    for i in range(10):
+        exporter.publish(_dets(1, base=i), frame_index=i)
+    frames = reader.poll()
+    assert [f.frame_index for f in frames] == [6, 7, 8, 9]
+    assert reader.missed == 6
+    assert np.allclose([f.records['x'][0] for f in frames], [6.0, 7.0, 8.0, 9.0])
+
+
+def test_uninit_unlinks_ring(monkeypatch):
+    """Déchargement du module : l'anneau nommé ne reste pas dans /dev/shm"""
+    import jevois_stub
+    jevois_stub.install()
+    from PyPostYOLO_UltraHybrid import PyPostYOLO_UltraHybrid
+
+    name = f"yolo_det_test_{os.getpid()}_uninit"
+    monkeypatch.setenv('YOLO_EXPORT_SHM', name)
+    pp = PyPostYOLO_UltraHybrid(snapshot_path=None)
+    DetectionReader(name).close()
+    pp.uninit()
+    assert pp.exporter is None
+    with pytest.raises(FileNotFoundError):
+        DetectionReader(name)
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Tests de l'enregistreur de détections (aller-retour, requêtes par plage de temps, rotation)
+"""
+
+import numpy as np
+import pytest
+
+from detection_recorder import DetectionRecorder, RecordingReader
+
+T0 = 1_700_000_000.0
+
+
+def _record(root, stamps, **kwargs):
+    """Une frame par timestamp, i % 4 détections ; retourne les lignes attendues (frame, t, box, score, classe, id)"""
+    recorder = DetectionRecorder(root, **kwargs)
+    expected = []
+    for i, stamp in enumerate(stamps):
+        dets = [{'x': 10.0 * i + k, 'y': 5.0 * k, 'w': 20.0, 'h': 40.0, 'score': 0.5 + 0.1 * k,
+                 'class_id': k, 'id': 100 + k} for k in range(i % 4)]
+        recorder.append_detections(dets, i, stamp)
+        expected += [(i, stamp, (d['x'], d['y'], d['w'], d['h']), d['score'], d['class_id'], d['id']) for d in dets]
+    recorder.close()
+    return expected
+
+
+def _rows(result):
+    return [(int(f), float(t), tuple(float(v) for v in box), float(s), int(c), int(k))
+            for f, t, box, s, c, k in zip(result['frame'], result['timestamp'], result['box'], result['score'],
+                                          result['class_id'], result['track_id'])]
+
+
+def _same(got, expected):
+    assert len(got) == len(expected)
+    for g, e in zip(got, expected):
+        assert g[0] == e[0] and g[1] == e[1] and g[4:] == e[4:]
+        assert g[2] == pytest.approx(e[2]) and g[3] == pytest.approx(e[3])
+
+
+@pytest.mark.parametrize('segment', [{}, {'frames_per_segment': 7}])
+def test_round_trip_time_ranges(tmp_path, segment):
+    """Chaque ligne relue avec son timestamp ; toute plage [t0, t1) = sélection par force brute"""
+    # Frames irrégulières : plusieurs par seau, seaux vides (pauses de plusieurs secondes)
+    stamps = T0 + np.cumsum([0.0, 0.2, 0.2, 0.9, 3.5, 0.1, 0.1, 0.1, 6.0, 0.4, 0.7, 0.3, 2.2, 0.05, 0.05])
+    expected = _record(str(tmp_path), stamps, bucket_seconds=1.0, **segment)
+    reader = RecordingReader(str(tmp_path))
+    assert len(reader.segments) == (1 if not segment else 3)
+
+    _same(_rows(reader.query(T0 - 1.0, T0 + 60.0)), expected)
+    bounds = [T0 - 0.5] + [float(t) for t in stamps] + [T0 + 0.55, T0 + 2.0, T0 + 7.3, T0 + 13.0, T0 + 30.0]
+    for t_start in bounds:
+        for t_end in bounds:
+            got = _rows(reader.query(t_start, t_end))
+            _same(got, [row for row in expected if t_start <= row[1] < t_end])
+
+
+def test_empty_range(tmp_path):
+    """Plage sans frame (avant, pendant une pause, après) : colonnes vides"""
+    _record(str(tmp_path), [T0, T0 + 0.5, T0 + 10.0, T0 + 10.5])
+    reader = RecordingReader(str(tmp_path))
+    for t_start, t_end in [(T0 - 5.0, T0), (T0 + 1.0, T0 + 9.0), (T0 + 11.0, T0 + 20.0)]:
+        result = reader.query(t_start, t_end)
+        assert len(result['frames']) == 0 and len(result['timestamp']) == 0
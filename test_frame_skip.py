@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Tests du saut de frames (activation, choix de N, propagation des tracks sur les frames sautées)
+"""
+
+import os
+
+os.environ.setdefault('YOLO_LOG_LEVEL', 'ERROR')
+
+from frame_skip import FrameSkipScheduler, frame_skip_from_env
+
+
+def _pattern(scheduler, frames):
+    return [scheduler.should_decode() for _ in range(frames)]
+
+
+def test_disabled_by_default(monkeypatch):
+    """Sans YOLO_TARGET_FPS (ou à 0) : aucune frame sautée"""
+    monkeypatch.delenv('YOLO_TARGET_FPS', raising=False)
+    assert frame_skip_from_env() is None
+    monkeypatch.setenv('YOLO_TARGET_FPS', '0')
+    assert frame_skip_from_env() is None
+
+    monkeypatch.setenv('YOLO_TARGET_FPS', '15')
+    monkeypatch.setenv('YOLO_FRAME_SKIP_MAX', '3')
+    scheduler = frame_skip_from_env()
+    assert (scheduler.target_fps, scheduler.max_interval, scheduler.interval) == (15.0, 3, 1)
+
+
+def test_interval_follows_load():
+    """Saturé : N couvre le coût du décodage (borné) ; marge retrouvée : retour au décodage de chaque frame"""
+    scheduler = FrameSkipScheduler(target_fps=30.0, max_interval=4, headroom=0.8)
+    assert scheduler.update([30.0] * 10) == 1  # aucun décodage mesuré
+
+    # 50 ms par décodage à 30 FPS visés : ceil(0.05 * 30 / 0.8) = 2
+    for _ in range(5):
+        scheduler.record_decode(0.05)
+    assert scheduler.update([18.0] * 10) == 2
+    assert _pattern(scheduler, 6) == [True, False, True, False, True, False]
+    assert (scheduler.decoded, scheduler.skipped) == (3, 3)
+
+    # Décodage très coûteux : N plafonné
+    for _ in range(15):
+        scheduler.record_decode(0.5)
+    assert scheduler.update([8.0] * 10) == 4
+
+    # FPS atteint et décodage redevenu rapide : N redescend
+    for _ in range(15):
+        scheduler.record_decode(0.01)
+    assert scheduler.update([30.0] * 10) == 1
+    assert _pattern(scheduler, 3) == [True, True, True]
+
+
+def test_fps_reached_keeps_interval_while_decode_costly():
+    """FPS atteint grâce au saut : N n'est pas réduit tant que le décodage en a besoin"""
+    scheduler = FrameSkipScheduler(target_fps=30.0)
+    scheduler.interval = 3
+    for _ in range(5):
+        scheduler.record_decode(0.07)  # ceil(0.07 * 30 / 0.8) = 3
+    assert scheduler.update([30.0] * 10) == 3
+
+
+def test_skipped_frames_propagate_tracks():
+    """Frame sautée : boîtes des tracks avancées à vitesse constante, marquées 'predicted'"""
+    from PyPostYOLO_UltraHybrid import PyPostYOLO_UltraHybrid
+
+    pp = PyPostYOLO_UltraHybrid(snapshot_path=None)
+    pp.tracking_mode = 'persistent'
+    pp.tracks = {
+        5: {'x': 100.0, 'y': 50.0, 'w': 20.0, 'h': 40.0, 'vx': 10.0, 'vy': -4.0, 'score': 0.9, 'class_id': 0,
+            'random_id': 42, 'age': 3, 'last_seen': 10.0},
+        8: {'x': 300.0, 'y': 200.0, 'w': 30.0, 'h': 30.0, 'score': 0.7, 'class_id': 2, 'random_id': 7,
+            'age': 1, 'last_seen': 10.25},
+    }
+    dets = {det['id']: det for det in pp._propagate_tracks(10.5)}
+
+    assert sorted(dets) == [5, 8]
+    assert (dets[5]['x'], dets[5]['y']) == (105.0, 48.0)
+    assert (dets[8]['x'], dets[8]['y']) == (300.0, 200.0)  # sans vitesse : immobile
+    assert all(det['predicted'] for det in dets.values())
+    assert pp.tracks[5]['x'] == 100.0  # les tracks eux-mêmes ne bougent pas
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Tests de l'instrumentation (histogrammes, cumul par frame, exposition Prometheus, export sur socket)
+"""
+
+import socket
+import threading
+
+import pytest
+
+from instrumentation import NULL_METRICS, Histogram, Metrics, get_metrics
+
+
+def test_histogram_quantiles():
+    """Quantile = borne supérieure du seau qui le contient ; valeurs sur une borne comptées dans son seau"""
+    hist = Histogram((1.0, 2.0, 5.0))
+    assert hist.quantile(0.5) == 0.0
+    for value in (0.5, 1.0, 1.5, 1.5, 2.0, 3.0, 4.0, 4.5, 6.0, 10.0):
+        hist.observe(value)
+
+    assert hist.counts == [2, 3, 3, 2]
+    assert hist.cumulative() == [(1.0, 2), (2.0, 5), (5.0, 8), (float('inf'), 10)]
+    assert hist.quantile(0.2) == 1.0
+    assert hist.quantile(0.5) == 2.0
+    assert hist.quantile(0.8) == 5.0
+    assert hist.quantile(0.95) == float('inf')
+    assert hist.sum == pytest.approx(34.0) and hist.count == 10
+
+
+def test_laps_accumulate_per_frame():
+    """Plusieurs laps d'une étape dans la frame = une observation ; compteurs par tête"""
+    metrics = Metrics('test', bounds=(0.001, 1.0))
+    for _ in range(3):
+        t = metrics.start()
+        t = metrics.lap('decode', t)
+        t = metrics.lap('nms', t)
+        metrics.lap('decode', t)
+        metrics.count('candidates', 10, head=0)
+        metrics.count('candidates', 4, head=1)
+        metrics.end_frame()
+
+    stats = metrics.stats()
+    assert stats['frames'] == 3
+    assert stats['stages']['decode']['count'] == 3 and stats['stages']['nms']['count'] == 3
+    assert stats['stages']['decode']['p99_ms'] == 1.0  # laps très courts : premier seau
+    assert stats['counters'] == {'candidates[0]': 30, 'candidates[1]': 12}
+
+    metrics.reset()
+    assert metrics.stats() == {'frames': 0, 'stages': {}, 'counters': {}}
+
+
+def test_prometheus_text():
+    """Exposition : HELP / TYPE une fois par famille, seaux cumulés, somme, compteurs étiquetés"""
+    metrics = Metrics('MultiDNN2', bounds=(0.001, 0.01))
+    metrics.observe('decode', 0.0005)
+    metrics.observe('decode', 0.005)
+    metrics.count('survivors', 3, head=2)
+    metrics.end_frame()
+
+    assert metrics.prometheus().splitlines() == [
+        '# HELP yolo_stage_seconds Durée cumulée par frame de chaque étape du post-processeur',
+        '# TYPE yolo_stage_seconds histogram',
+        'yolo_stage_seconds_bucket{pp="MultiDNN2",stage="decode",le="0.001"} 1',
+        'yolo_stage_seconds_bucket{pp="MultiDNN2",stage="decode",le="0.01"} 2',
+        'yolo_stage_seconds_bucket{pp="MultiDNN2",stage="decode",le="+Inf"} 2',
+        'yolo_stage_seconds_sum{pp="MultiDNN2",stage="decode"} 0.0055',
+        'yolo_stage_seconds_count{pp="MultiDNN2",stage="decode"} 2',
+        '# TYPE yolo_survivors_total counter',
+        'yolo_survivors_total{pp="MultiDNN2",head="2"} 3',
+        '# TYPE yolo_frames_total counter',
+        'yolo_frames_total{pp="MultiDNN2"} 1',
+    ]
+    assert NULL_METRICS.prometheus() == ''
+
+
+def test_get_metrics_gate_and_socket_export(tmp_path, monkeypatch):
+    """Désactivé par défaut ; YOLO_METRICS_SOCKET active les métriques et les sert en HTTP sur la socket"""
+    for var in ('YOLO_METRICS', 'YOLO_METRICS_SOCKET', 'YOLO_PROFILE_ALLOC'):
+        monkeypatch.delenv(var, raising=False)
+    assert get_metrics('test_export') is NULL_METRICS
+
+    path = str(tmp_path / 'metrics.sock')
+    monkeypatch.setenv('YOLO_METRICS_SOCKET', path)
+    metrics = get_metrics('test_export')
+    other = get_metrics('test_export')  # une instance par post-processeur chargé
+    assert other is not metrics and (metrics.instance, other.instance) == (0, 1)
+    metrics.count('frames_seen', 5)
+    other.count('frames_seen', 2)
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(5.0)
+        client.connect(path)
+        client.sendall(b'GET /metrics HTTP/1.0\r\n\r\n')
+        response = b''
+        while True:
+            chunk = client.recv(65536)
+            if not chunk:
+                break
+            response += chunk
+    head, body = response.decode('utf-8').split('\r\n\r\n', 1)
+    assert head.startswith('HTTP/1.0 200 OK')
+    assert 'yolo_frames_seen_total{pp="test_export",instance="0"} 5' in body.splitlines()
+    assert 'yolo_frames_seen_total{pp="test_export",instance="1"} 2' in body.splitlines()
+
+    # Instance retirée (uninit) : numéro repris par la suivante
+    metrics.close()
+    again = get_metrics('test_export')
+    assert again.instance == 0 and again is not metrics
+    again.close()
+    other.close()
+
+
+def test_serve_replaces_only_a_socket(tmp_path):
+    """Chemin de la socket occupé par un fichier ordinaire : jamais supprimé"""
+    import instrumentation
+
+    path = tmp_path / 'metrics.sock'
+    path.write_text('pas une socket')
+    server, instrumentation._server = instrumentation._server, None
+    try:
+        with pytest.raises(OSError):
+            instrumentation.serve(str(path))
+        assert path.read_text() == 'pas une socket'
+    finally:
+        instrumentation._server = server
+
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(str(tmp_path / 'stale.sock'))
+    stale.close()
+    instrumentation._server = None
+    try:
+        started = instrumentation.serve(str(tmp_path / 'stale.sock'))  # socket restée : remplacée
+        started.shutdown()
+        started.server_close()
+    finally:
+        instrumentation._server = server
+
+
+def test_concurrent_laps_not_lost():
+    """Laps du thread vidéo et d'un thread du pool sur la même frame : aucun cumul perdu"""
+    metrics = Metrics('test_threads')
+    laps = 20000
+
+    def worker(stage):
+        for _ in range(laps):
+            metrics.count(stage)
+            metrics.lap(stage, metrics.start())
+
+    threads = [threading.Thread(target=worker, args=(stage,)) for stage in ('decode', 'nms', 'decode')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert metrics.stats()['counters'] == {'decode': 2 * laps, 'nms': laps}
+    metrics.end_frame()
+    assert metrics.stats()['stages']['decode']['count'] == 1
+
+
+def test_allocation_profile_per_stage():
+    """Profilage : octets alloués attribués à l'étape qui alloue, échantillon NumPy, callback GC retiré"""
+    import gc
+    import tracemalloc
+
+    import numpy as np
+
+    from instrumentation import AllocationMetrics
+
+    tracing = tracemalloc.is_tracing()
+    metrics = AllocationMetrics('test_alloc', sample_every=1)
+    try:
+        kept = []
+        for _ in range(3):
+            t = metrics.start()
+            kept.append(np.ones(1 << 18))  # 2 Mio vivants à la fin de l'étape
+            t = metrics.lap('decode', t)
+            sum(range(100))
+            metrics.lap('nms', t)
+            metrics.end_frame()
+    finally:
+        metrics.close()
+        if not tracing:
+            tracemalloc.stop()
+    assert metrics._on_gc not in gc.callbacks
+
+    profile = metrics.stats()['profile']
+    assert profile['alloc_bytes']['decode']['count'] == 3
+    assert profile['alloc_bytes']['decode']['p50'] == 4 << 20  # seau (1 Mio, 4 Mio]
+    assert profile['alloc_bytes']['nms']['max_bucket'] <= 64 << 10  # aucune allocation de tableau
+    assert profile['numpy_arrays']['decode']['max_bucket'] >= 1
+    assert 'alloc_bytes' in metrics.prometheus() and 'yolo_numpy_arrays_bucket' in metrics.prometheus()
+
+
+def test_allocation_profile_is_process_wide():
+    """Allocation d'un autre thread (pool de décodage) pendant une étape : comptée dans cette étape"""
+    import tracemalloc
+
+    import numpy as np
+
+    from instrumentation import AllocationMetrics
+
+    tracing = tracemalloc.is_tracing()
+    metrics = AllocationMetrics('test_alloc_threads', sample_every=1000)
+    allocate, done = threading.Event(), threading.Event()
+    kept = []
+
+    def pool_job():
+        allocate.wait(5)
+        kept.append(np.ones(1 << 18))  # 2 Mio alloués hors du thread de l'étape
+        done.set()
+
+    thread = threading.Thread(target=pool_job)
+    thread.start()
+    try:
+        t = metrics.start()
+        allocate.set()
+        assert done.wait(5)
+        metrics.lap('report', t)  # étape qui n'alloue rien elle-même
+        metrics.end_frame()
+    finally:
+        thread.join()
+        metrics.close()
+        if not tracing:
+            tracemalloc.stop()
+    assert metrics.stats()['profile']['alloc_bytes']['report']['p50'] == 4 << 20
+
+
+def test_profiled_instances_registered_apart(monkeypatch):
+    """YOLO_PROFILE_ALLOC : une AllocationMetrics par instance, retirée du registre et du GC par close()"""
+    import gc
+    import tracemalloc
+
+    import instrumentation
+    from instrumentation import AllocationMetrics
+
+    monkeypatch.delenv('YOLO_METRICS_SOCKET', raising=False)
+    monkeypatch.setenv('YOLO_PROFILE_ALLOC', '1')
+    tracing = tracemalloc.is_tracing()
+    first, second = get_metrics('test_profiled'), get_metrics('test_profiled')
+    try:
+        assert isinstance(first, AllocationMetrics) and first is not second
+        assert instrumentation._registry[('test_profiled', 1)] is second
+    finally:
+        first.close()
+        second.close()
+        if not tracing:
+            tracemalloc.stop()
+    assert ('test_profiled', 0) not in instrumentation._registry
+    assert first._on_gc not in gc.callbacks and second._on_gc not in gc.callbacks
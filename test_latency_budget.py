@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Tests du contrôleur de budget de latence, sur une horloge simulée (décisions de dégradation et de restauration)
+"""
+
+import pytest
+
+import latency_budget
+from latency_budget import LatencyBudget
+
+
+class FakeClock:
+    """Remplace le module time de latency_budget : perf_counter() n'avance que par advance()"""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def perf_counter(self):
+        return self.now
+
+    def advance(self, ms):
+        self.now += ms / 1000.0
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(latency_budget, 'time', clock)
+    return clock
+
+
+def _frame(budget, clock, head_ms, post_ms):
+    """Une frame : têtes décodées tant que l'échéance le permet, puis NMS ; renvoie (têtes, décision)"""
+    t = budget.start()
+    decoded = []
+    for head in budget.head_order([8, 16, 32]):
+        if not budget.allows_head(head, len(decoded)):
+            break
+        clock.advance(head_ms)
+        t = budget.lap(f'head{head}', t)
+        decoded.append(head)
+    clock.advance(post_ms)
+    budget.lap('nms', t)
+    return decoded, budget.end_frame(partial=len(decoded) < budget.num_heads)
+
+
+def _decisions(budget, clock, frames, head_ms, post_ms):
+    return [(d['knob'], d['old'], d['new']) for d in
+            (_frame(budget, clock, head_ms, post_ms)[1] for _ in range(frames)) if d is not None]
+
+
+def test_decode_overrun_raises_confidence_then_drops_heads(clock):
+    """Décodage dominant (une tête dépasse déjà le budget) : seuil relevé jusqu'au plafond, puis une tête en moins"""
+    budget = LatencyBudget(budget_ms=25.0, cooldown=3)
+    decisions = _decisions(budget, clock, 18, head_ms=30.0, post_ms=2.0)
+    assert decisions == [('confidence', 0.25, 0.3), ('confidence', 0.3, 0.35), ('confidence', 0.35, 0.4),
+                         ('confidence', 0.4, 0.45), ('confidence', 0.45, 0.5), ('heads', 3, 2)]
+    assert budget.stats()['knobs'] == {'heads': 2, 'confidence': 0.5, 'suppression': 'nms', 'candidates': 2048}
+
+    # Têtes de la plus grossière à la plus fine : la plus fine (stride 8) est abandonnée
+    assert budget.head_order([8, 16, 32]) == [2, 1]
+    assert [d['knob'] for d in budget.drain()] == ['confidence'] * 5 + ['heads']
+    assert budget.drain() == []
+
+
+def test_post_overrun_halves_candidates_then_switches_suppression(clock):
+    """NMS / tracking dominants : budget de candidats divisé par deux jusqu'au minimum, puis suppression par cellule"""
+    budget = LatencyBudget(budget_ms=25.0, max_candidates=256, min_candidates=64, cooldown=1)
+    decisions = _decisions(budget, clock, 4, head_ms=2.0, post_ms=30.0)
+    assert decisions == [('candidates', 256, 128), ('candidates', 128, 64), ('suppression', 'nms', 'cell'),
+                         ('confidence', 0.25, 0.3)]
+
+
+def test_margin_restores_quality_first(clock):
+    """Marge durable : têtes restaurées d'abord, un bouton par période de patience"""
+    budget = LatencyBudget(budget_ms=25.0, cooldown=1, patience=5)
+    budget.num_heads = 1
+    budget.conf_threshold = 0.35
+    decisions = _decisions(budget, clock, 20, head_ms=2.0, post_ms=1.0)
+    assert decisions == [('heads', 1, 2), ('heads', 2, 3), ('confidence', 0.35, 0.3), ('confidence', 0.3, 0.25)]
+    assert _decisions(budget, clock, 20, head_ms=2.0, post_ms=1.0) == []  # tout est restauré
+
+
+def test_deadline_cuts_heads_within_frame(clock):
+    """Coût d'une tête connu : la frame s'arrête avant la tête qui dépasserait l'échéance (résultat partiel)"""
+    budget = LatencyBudget(budget_ms=25.0, cooldown=100)
+    _frame(budget, clock, head_ms=10.0, post_ms=2.0)  # premières mesures : toutes les têtes
+    heads, _ = _frame(budget, clock, head_ms=10.0, post_ms=2.0)
+    assert heads == [2, 1]
+    assert budget.stats()['partial_frames'] == 1
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Tests du service de tracking multi-flux (IDs stables et isolés par flux, erreurs d'un shard)
+"""
+
+import os
+
+import pytest
+
+os.environ.setdefault('YOLO_LOG_LEVEL', 'ERROR')
+
+from multistream_tracker import MultiStreamTracker
+
+
+def _objects(positions, dx=0.0):
+    return [{'x': x + dx, 'y': y, 'w': 20.0, 'h': 40.0, 'score': 0.9, 'class_id': 0} for x, y in positions]
+
+
+def _streams_on_two_shards(service):
+    """Deux flux servis par des shards différents"""
+    first = 'cam0'
+    for n in range(1, 64):
+        if service._shard_for(f'cam{n}') is not service._shard_for(first):
+            return first, f'cam{n}'
+    raise AssertionError("aucun flux sur le second shard")
+
+
+@pytest.fixture
+def service():
+    with MultiStreamTracker(num_shards=2, max_dets=32) as service:
+        yield service
+
+
+def test_ids_stable_and_isolated_per_stream(service):
+    """Même objet = même ID d'une frame à l'autre ; chaque flux a ses propres tracks"""
+    a, b = _streams_on_two_shards(service)
+    objects_a = [(50.0, 50.0), (200.0, 100.0), (350.0, 200.0)]
+    objects_b = [(100.0, 300.0), (400.0, 50.0)]
+
+    first = None
+    for frame in range(10):
+        out = service.track_batch({a: _objects(objects_a, 2.0 * frame), b: _objects(objects_b, -2.0 * frame)})
+        ids = {stream: [det['id'] for det in dets] for stream, dets in out.items()}
+        if first is None:
+            first = ids
+        assert ids == first
+
+    # Numérotation propre à chaque flux : les tracks de b ne consomment pas d'IDs de a
+    assert sorted(first[a]) == [1, 2, 3]
+    assert sorted(first[b]) == [1, 2]
+    assert service.clients[a].live_tracks == 3
+    assert service.clients[b].live_tracks == 2
+
+
+def test_shard_error_leaves_no_stale_reply(service):
+    """Erreur d'un shard : les réponses des autres sont consommées, la frame suivante est à jour"""
+    a, b = _streams_on_two_shards(service)
+    service.track_batch({a: _objects([(50.0, 50.0)]), b: _objects([(100.0, 100.0)])})
+
+    # Le shard de a ne connaît plus le flux : sa réponse est une erreur
+    service.clients[a].shard.call(('unregister', a))
+    with pytest.raises(RuntimeError):
+        service.track_batch({a: _objects([(50.0, 50.0)]), b: _objects([(100.0, 100.0)])})
+
+    out = service.track_batch({b: _objects([(100.0, 100.0), (300.0, 300.0), (400.0, 30.0)])})
+    assert service.clients[b].live_tracks == 3
+    assert sorted(det['id'] for det in out[b]) == [1, 2, 3]
+
+
+def test_overflow_counted(service):
+    """Plus de max_dets détections : les premières sont suivies, les autres comptées dans overflow"""
+    positions = [(10.0 * i, 5.0 * i) for i in range(40)]
+    out = service.track_batch({'cam0': _objects(positions)})
+    assert len(out['cam0']) == 32
+    assert service.clients['cam0'].overflow == 8
+    assert sum(s['overflow'] for s in service.stats()) == 8
+
+
+def test_streams_share_no_files(tmp_path, monkeypatch):
+    """Variables d'E/S d'UltraHybrid définies : les shards n'ouvrent ni anneau ni instantané"""
+    monkeypatch.setenv('YOLO_TRACK_SNAPSHOT_DIR', str(tmp_path / 'tracks'))
+    monkeypatch.setenv('YOLO_HEATMAP', str(tmp_path / 'heatmap.bin'))
+    monkeypatch.setenv('YOLO_RECORD_DIR', str(tmp_path / 'record'))
+    with MultiStreamTracker(num_shards=1, max_dets=8) as local:
+        a, b = 'cam0', 'cam1'
+        for frame in range(3):
+            out = local.track_batch({a: _objects([(50.0, 50.0)], frame), b: _objects([(300.0, 80.0)], -frame)})
+        assert [det['id'] for det in out[a]] == [1] and [det['id'] for det in out[b]] == [1]
+    assert list(tmp_path.iterdir()) == []
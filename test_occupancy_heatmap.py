@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Tests de la carte de présence (accumulation, décroissance, instantané seqlock, reprise au redémarrage)
+"""
+
+import time
+
+import numpy as np
+import pytest
+
+from occupancy_heatmap import HEADER, MAGIC, VERSION, OccupancyHeatmap, heatmap_from_env, load_heatmap
+
+
+def test_accumulates_seconds_with_decay():
+    """Chaque cellule cumule des secondes de présence, divisées par deux toutes les half_life secondes"""
+    heatmap = OccupancyHeatmap(rows=2, cols=4, half_life=10.0)
+    heatmap.update([(0.1, 0.1)], timestamp=0.0)  # première frame : pas de durée
+    assert heatmap.grid.sum() == 0.0
+    heatmap.update([(0.1, 0.1), (0.12, 0.2), (0.9, 0.9)], timestamp=0.5)
+    assert heatmap.grid[0, 0] == pytest.approx(1.0) and heatmap.grid[1, 3] == pytest.approx(0.5)
+
+    heatmap.update(np.zeros((0, 2)), timestamp=10.5)  # pause : durée bornée par max_dt, décroissance sur 1 s
+    assert heatmap.grid[0, 0] == pytest.approx(0.5 ** 0.1)
+    heatmap.update([(1.0, 1.0), (-0.2, 0.5)], timestamp=11.0)  # centres hors [0, 1] : cellules de bord
+    assert heatmap.grid[1, 3] == pytest.approx(0.5 * 0.5 ** 0.15 + 0.5)
+    assert heatmap.grid[1, 0] == pytest.approx(0.5)
+
+
+def test_snapshot_round_trip_and_torn_write(tmp_path):
+    """Instantané relu par load_heatmap ; écriture en cours (seq impair) : rien n'est rendu"""
+    path = str(tmp_path / 'heatmap.bin')
+    heatmap = OccupancyHeatmap(path, rows=3, cols=5, interval=1.0)
+    now = time.time()
+    heatmap.update([(0.5, 0.5)], timestamp=now)
+    heatmap.update([(0.5, 0.5), (0.0, 0.0)], timestamp=now + 0.5)  # intervalle non écoulé : pas d'instantané
+    assert load_heatmap(path)[0].sum() == 0.0
+    heatmap.update([(0.5, 0.5)], timestamp=now + 1.0)
+
+    grid, stamp = load_heatmap(path)
+    assert stamp == now + 1.0
+    assert np.array_equal(grid, heatmap.grid) and grid[1, 2] == pytest.approx(1.0, rel=1e-2)
+
+    seq = HEADER.unpack_from(heatmap.mm, 0)[2]
+    HEADER.pack_into(heatmap.mm, 0, MAGIC, VERSION, seq + 1, stamp, 3, 5, heatmap.half_life, heatmap.frames)
+    assert load_heatmap(path) is None
+    heatmap.close()
+
+
+def test_restart_resumes_grid(tmp_path):
+    """Nouvelle instance sur le même fichier : grille reprise (décrue du temps écoulé) ; autre taille : ignorée"""
+    path = str(tmp_path / 'heatmap.bin')
+    heatmap = OccupancyHeatmap(path, rows=2, cols=2, half_life=300.0)
+    now = time.time()
+    heatmap.update([(0.2, 0.2)], timestamp=now - 1.0)
+    heatmap.update([(0.2, 0.2)], timestamp=now)
+    heatmap.save(now)
+    heatmap.close()
+
+    resumed = OccupancyHeatmap(path, rows=2, cols=2, half_life=300.0)
+    assert resumed.grid[0, 0] == pytest.approx(1.0, rel=1e-3) and resumed.frames == 2
+    resumed.update([(0.8, 0.8)], timestamp=now + 1.0)  # la première frame après reprise n'ajoute rien
+    resumed.save(now + 1.0)
+    assert resumed.seq % 2 == 0 and resumed.seq > heatmap.seq
+    resumed.close()
+
+    assert OccupancyHeatmap(path, rows=3, cols=3).grid.sum() == 0.0
+
+
+def test_from_env(tmp_path, monkeypatch):
+    monkeypatch.delenv('YOLO_HEATMAP', raising=False)
+    assert heatmap_from_env() is None
+    monkeypatch.setenv('YOLO_HEATMAP', str(tmp_path / 'heatmap.bin'))
+    monkeypatch.setenv('YOLO_HEATMAP_GRID', '9x16')
+    heatmap = heatmap_from_env()
+    assert heatmap.grid.shape == (9, 16)
+    heatmap.close()
+
+
+def test_private_locked_file(tmp_path):
+    """Fichier créé en 0600 et verrouillé ; lien symbolique refusé"""
+    path = tmp_path / 'heatmap.bin'
+    heatmap = OccupancyHeatmap(str(path), rows=2, cols=2)
+    assert path.stat().st_mode & 0o777 == 0o600
+    with pytest.raises(BlockingIOError):
+        OccupancyHeatmap(str(path), rows=2, cols=2)
+    heatmap.close()
+    OccupancyHeatmap(str(path), rows=2, cols=2).close()  # verrou libéré à close()
+
+    link = tmp_path / 'link.bin'
+    link.symlink_to(path)
+    with pytest.raises(OSError):
+        OccupancyHeatmap(str(link), rows=2, cols=2)
+
+
+def test_uninit_saves_heatmap(tmp_path, monkeypatch):
+    """Déchargement du module : dernière grille écrite et fichier libéré pour l'instance suivante"""
+    import jevois_stub
+    jevois_stub.install()
+    from PyPostYOLO_UltraHybrid import PyPostYOLO_UltraHybrid
+
+    path = str(tmp_path / 'heatmap.bin')
+    monkeypatch.setenv('YOLO_HEATMAP', path)
+    monkeypatch.setenv('YOLO_HEATMAP_INTERVAL', '3600')
+    pp = PyPostYOLO_UltraHybrid(snapshot_path=None)
+    now = time.time()
+    pp.heatmap.update([(0.5, 0.5)], timestamp=now - 0.5)  # premier instantané seulement
+    pp.heatmap.update([(0.5, 0.5)], timestamp=now)
+    assert load_heatmap(path)[0].sum() == 0.0
+    pp.uninit()
+    assert pp.heatmap is None
+    assert load_heatmap(path)[0].sum() == pytest.approx(0.5, rel=1e-2)
+    OccupancyHeatmap(path).close()
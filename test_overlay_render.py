@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Tests du rendu de l'overlay (labels en cache, mode retained clé par track et label)
+"""
+
+from overlay_render import LabelCache, OverlayRenderer, RecordingBackend
+from yolo_core import OverlayReporter
+
+CLASSES = ['person', 'car']
+
+
+def _report(reporter, rows):
+    reporter(rows, outimg=object(), classmap=CLASSES)
+    return reporter.backend.last
+
+
+def test_retained_skips_boxes_by_track_not_rank():
+    """Mêmes tracks dans un autre ordre : rien à redessiner ; label ou position changés : redessinés"""
+    reporter = OverlayReporter(RecordingBackend(retained=True))
+    first = [(7, 0, 0.9, 10, 20, 30, 40), (8, 1, 0.5, 100, 20, 30, 40)]
+    assert len(_report(reporter, first)) == 2
+    assert _report(reporter, first[::-1]) == []
+    assert reporter.renderer.skipped == 2
+
+    moved = [(7, 0, 0.9, 12, 20, 30, 40), (8, 1, 0.6, 100, 20, 30, 40)]
+    assert [cmd[4] for cmd in _report(reporter, moved)] == ['ID7:person 90.0%', 'ID8:car 60.0%']
+
+
+def test_random_ids_redraw_but_labels_cached():
+    """IDs aléatoires par frame : chaque boîte est redessinée, les labels restent servis par le cache"""
+    reporter = OverlayReporter(RecordingBackend(retained=True))
+    for frame in range(5):
+        assert len(_report(reporter, [(100 + frame, 0, 0.9, 10, 20, 30, 40)])) == 1
+    assert reporter.labels.misses == 1 and reporter.labels.hits == 4
+
+
+def test_duplicate_keys_keep_every_box():
+    """Même ID et même label deux fois dans une frame (collision d'IDs aléatoires) : deux boîtes"""
+    renderer = OverlayRenderer()
+    backend = RecordingBackend(retained=True)
+    labels = LabelCache()
+    renderer.begin()
+    for x in (10, 200):
+        label = labels.label(5, 0, 0.9, CLASSES)
+        renderer.add_box((5, label), x, 0, 10, 10, label, x, 0, None)
+    renderer.flush(backend, None)
+    assert [cmd[0] for cmd in backend.last] == [10, 200]
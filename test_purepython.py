@@ -110,6 +110,27 @@ def test_multidnn2_compatibility():
         print(f"   ✅ Aucune dépendance à PyPostYOLO ou pipeline")
         return True
 
+def test_label_cache_hits_on_repeated_frames():
+    """Labels en cache malgré un ID aléatoire par boîte et par frame : taux de succès non nul"""
+    import jevois_stub
+    jevois_stub.install()
+    from benchmark_postprocessors import make_raw_outputs
+    from PyPostYoloRandomID_PurePython import PyPostYoloRandomID_PurePython
+
+    pp = PyPostYoloRandomID_PurePython()
+    pp.init()
+    outs = make_raw_outputs([(1, 255, 36, 64), (1, 255, 18, 32), (1, 255, 9, 16)], 0.002,
+                            np.random.default_rng(0))[0]
+    preproc = jevois_stub.PreProcessor(288, 512)
+    for _ in range(5):
+        pp.process(outs, preproc)
+        pp.report(object(), None, True, False)
+
+    labels = pp.core.reporter.labels
+    assert len(pp.boxes) > 0
+    assert labels.misses <= len(pp.boxes)
+    assert labels.hit_rate >= 0.75
+
 def main():
     """Tests principaux"""
     
@@ -136,4 +157,4 @@ def main():
         print("\n⚠️  Certains tests ont échoué")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
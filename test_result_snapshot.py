@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Tests des résultats par frame publiés par échange de référence (immutabilité, frames sautées / relues)
+"""
+
+import threading
+
+import pytest
+
+from instrumentation import Metrics
+from result_snapshot import ResultPublisher
+
+
+def test_reader_counts_dropped_and_duplicated():
+    """Lecteur plus lent ou plus rapide que le producteur : frames sautées et relues comptées"""
+    publisher = ResultPublisher()
+    publisher.publish(1.0)  # avant l'abonnement : ni sautée ni relue
+    metrics = Metrics('test')
+    reader = publisher.reader(metrics)
+
+    assert reader.read().seq == 1
+    publisher.publish(2.0)
+    assert reader.read().seq == 2
+    for stamp in (3.0, 4.0, 5.0):
+        publisher.publish(stamp)
+    assert reader.read().timestamp == 5.0  # frames 3 et 4 sautées
+    assert reader.read().seq == 5          # relue
+    assert reader.read().seq == 5          # relue
+
+    assert reader.stats() == {'published': 5, 'reads': 5, 'dropped': 2, 'duplicated': 3}
+    assert metrics.stats()['counters'] == {'dropped_frames': 2, 'duplicated_frames': 3}
+
+
+def test_readers_independent_and_empty_not_duplicated():
+    """Un compteur par lecteur ; relire « aucun résultat » (seq 0) n'est pas une frame relue"""
+    publisher = ResultPublisher()
+    fast, slow = publisher.reader(), publisher.reader()
+    assert len(fast.read()) == 0 and fast.read().seq == 0
+    for i in range(4):
+        publisher.publish(float(i), boxes=[(i, i, 1, 1)])
+        fast.read()
+    slow.read()
+    assert fast.stats()['dropped'] == 0 and fast.stats()['duplicated'] == 0
+    assert slow.stats()['dropped'] == 3
+
+
+def test_published_result_is_frozen():
+    """Le producteur ne peut plus modifier ce qu'il a publié, ni par les champs ni par les listes d'origine"""
+    publisher = ResultPublisher()
+    boxes = [(1, 2, 3, 4)]
+    tracks = {7: {'x': 1.0}}
+    result = publisher.publish(1.0, boxes=boxes, tracks=tracks, info={'fps': 30.0})
+    boxes.append((5, 6, 7, 8))
+    tracks[8] = {'x': 2.0}
+
+    assert result.boxes == ((1, 2, 3, 4),) and list(result.tracks) == [7]
+    with pytest.raises(AttributeError):
+        result.boxes = ()
+    with pytest.raises(TypeError):
+        result.info['fps'] = 0.0
+
+
+def test_tracker_updates_leave_published_frame_intact():
+    """UltraHybrid : frames suivantes (tracks associés, créés, oubliés) sans effet sur la frame déjà lue"""
+    import copy
+
+    import jevois_stub
+    jevois_stub.install()
+    from PyPostYOLO_UltraHybrid import PyPostYOLO_UltraHybrid
+
+    pp = PyPostYOLO_UltraHybrid(snapshot_path=None)
+    pp.tracking_mode = 'persistent'
+    clock = [100.0]
+    pp.tracker.clock = lambda: clock[0]
+
+    def frame(positions):
+        pp.detections = pp._apply_tracking([{'x': x, 'y': y, 'w': 20.0, 'h': 40.0, 'score': 0.9, 'class_id': 0}
+                                            for x, y in positions])
+        pp._export(clock[0], None)
+        clock[0] += 0.1
+
+    frame([(50.0, 50.0), (200.0, 100.0)])
+    frame([(55.0, 50.0), (205.0, 100.0)])
+    result = pp.report_results.read()
+    seen = copy.deepcopy((result.detections, dict(result.tracks)))
+
+    frame([(60.0, 50.0), (400.0, 300.0)])  # 1 associé, 2 non vu, 3 créé
+    clock[0] += 5.0
+    frame([])  # tous oubliés
+    assert pp.tracks == {}
+    assert (result.detections, dict(result.tracks)) == seen
+    assert sorted(result.tracks) == [1, 2]
+    with pytest.raises(TypeError):
+        result.tracks[3] = {}
+
+
+def test_concurrent_reads_see_whole_frames():
+    """Lecture pendant la publication : chaque résultat lu est entier ; lues + sautées = publiées"""
+    publisher = ResultPublisher()
+    reader = publisher.reader()
+    stop = threading.Event()
+    seen = set()
+    torn = []
+
+    def consume():
+        while not stop.is_set():
+            result = reader.read()
+            seen.add(result.seq)
+            if len(result.boxes) != len(result.confidences) or any(c != result.seq for c in result.confidences):
+                torn.append(result.seq)
+
+    thread = threading.Thread(target=consume)
+    thread.start()
+    for seq in range(1, 3001):
+        n = seq % 7
+        publisher.publish(float(seq), boxes=[(seq, 0, 1, 1)] * n, confidences=[seq] * n)
+    stop.set()
+    thread.join()
+    seen.add(reader.read().seq)
+
+    assert torn == []
+    seen.discard(0)
+    assert len(seen) + reader.dropped == 3000
+    assert reader.reads - reader.duplicated >= len(seen)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Tests du cache de scène (succès, échec sur changement, expiration, tolérance, activation)
+"""
+
+import numpy as np
+
+from scene_cache import SceneCache, scene_cache_from_env
+from yolo_core import Detections
+
+SHAPES = [(1, 255, 36, 64), (1, 255, 18, 32), (1, 255, 9, 16)]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _outs(seed=0, dtype=np.float32):
+    rng = np.random.default_rng(seed)
+    if dtype == np.int8:
+        return [rng.integers(-128, 128, shape, dtype=np.int8) for shape in SHAPES]
+    return [rng.normal(-3.0, 1.0, shape).astype(dtype) for shape in SHAPES]
+
+
+def _dets(n=3):
+    return Detections(np.arange(4 * n, dtype=np.float32).reshape(n, 4), np.full(n, 0.9, dtype=np.float32),
+                      np.arange(n, dtype=np.int32), np.zeros(n, dtype=np.int32))
+
+
+def _decoded(cache, outs, key=None):
+    """get() puis put() comme YoloCore : True si la frame a été servie par le cache"""
+    if cache.get(outs, key) is not None:
+        return True
+    cache.put(_dets())
+    return False
+
+
+def test_hit_on_identical_frame_and_copy():
+    """Frame identique : détections de référence rendues, dans un nouvel objet"""
+    cache = SceneCache()
+    outs = _outs()
+    assert not _decoded(cache, outs, key=0.25)
+    dets = cache.get([o.copy() for o in outs], key=0.25)
+    assert dets is not None and dets is not cache.dets
+    assert np.array_equal(dets.boxes, _dets().boxes)
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'expired': 0, 'hit_rate': 0.5}
+
+
+def test_miss_on_scene_or_key_change():
+    """Objectness d'une seule cellule modifiée, ou paramètres de décodage différents : frame décodée"""
+    cache = SceneCache()
+    outs = _outs()
+    _decoded(cache, outs, key=0.25)
+
+    moved = [o.copy() for o in outs]
+    moved[1].reshape(3, 85, 18, 32)[2, 4, 7, 11] += 0.5  # hors des échantillons à pas fixe
+    assert cache.get(moved, key=0.25) is None
+    assert cache.get(outs, key=0.30) is None
+
+    # La référence reste la dernière frame décodée : une frame non décodée (sans put) ne la remplace pas
+    assert cache.get(outs, key=0.25) is not None
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_expiry_after_max_age():
+    """Réutilisation bornée : au-delà de max_age depuis le dernier décodage, la frame est redécodée"""
+    clock = FakeClock()
+    cache = SceneCache(max_age=1.0, clock=clock)
+    outs = _outs()
+    _decoded(cache, outs)
+    clock.now = 0.9
+    assert _decoded(cache, outs)
+    clock.now = 1.5
+    assert not _decoded(cache, outs)  # expiré : redécodé, nouvelle référence à t = 1.5
+    assert cache.expired == 1
+    clock.now = 2.4
+    assert _decoded(cache, outs)
+
+
+def test_tolerance_and_quantized_outputs():
+    """Tolérance en unités brutes ; sorties int8 comparées sans débordement"""
+    cache = SceneCache(tolerance=2)
+    outs = _outs(dtype=np.int8)
+    _decoded(cache, outs)
+
+    noisy = [o.copy() for o in outs]
+    flat = noisy[0].reshape(-1)
+    flat[:] = np.clip(flat.astype(np.int16) + 2, -128, 127).astype(np.int8)
+    assert cache.get(noisy) is not None
+
+    far = [o.copy() for o in outs]
+    far[0].reshape(3, 85, -1)[0, 4, 0] = np.int8(127 if outs[0].reshape(3, 85, -1)[0, 4, 0] < 0 else -128)
+    assert cache.get(far) is None
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.delenv('YOLO_SCENE_CACHE', raising=False)
+    assert scene_cache_from_env() is None
+    monkeypatch.setenv('YOLO_SCENE_CACHE', '1')
+    monkeypatch.setenv('YOLO_SCENE_MAX_AGE', '0.5')
+    cache = scene_cache_from_env()
+    assert cache.max_age == 0.5 and cache.tolerance == 0.0
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Tests de la capture des tenseurs (sélection des frames, relecture du corpus, rejeu)
+"""
+
+import os
+
+import numpy as np
+
+os.environ.setdefault('YOLO_LOG_LEVEL', 'ERROR')
+
+import jevois_stub
+
+jevois_stub.install()
+
+from tensor_capture import TensorCapture, TensorCorpus, capture_from_env, replay
+
+SHAPES = [(1, 255, 36, 64), (1, 255, 18, 32), (1, 255, 9, 16)]
+
+
+def _outs(seed):
+    rng = np.random.default_rng(seed)
+    return [rng.normal(-3.0, 1.0, shape).astype(np.float32) for shape in SHAPES]
+
+
+def test_capture_round_trip(tmp_path):
+    """Une frame sur every, max_frames au plus ; corpus relu à l'identique (tenseurs, blob, timestamp)"""
+    path = str(tmp_path / 'corpus')
+    capture = TensorCapture(path, every=2, max_frames=3)
+    preproc = jevois_stub.PreProcessor(288, 512)
+    written = [capture.capture(_outs(i), preproc, timestamp=100.0 + i) for i in range(8)]
+    assert written == [True, False, True, False, True, False, False, False]
+    assert capture.full and capture.seen == 8
+
+    corpus = TensorCorpus(path)
+    assert len(corpus) == 3
+    for n, seed in enumerate((0, 2, 4)):
+        outs, blob, stamp = corpus[n]
+        assert blob == (288, 512) and stamp == 100.0 + seed
+        assert all(np.array_equal(got, want) for got, want in zip(outs, _outs(seed)))
+    assert corpus.frames['frame_index'][:3].tolist() == [1, 3, 5]
+
+
+def test_capture_skips_other_shapes_and_halves_dtype(tmp_path):
+    """Frame de forme différente ignorée ; float16 : tenseurs convertis, corpus partiel lisible"""
+    path = str(tmp_path / 'corpus')
+    capture = TensorCapture(path, max_frames=10, dtype='float16')
+    capture.capture(_outs(0))
+    assert not capture.capture(_outs(1)[:2])
+    assert capture.skipped == 1
+    capture.close()
+
+    corpus = TensorCorpus(path)
+    outs, blob, _ = corpus[0]
+    assert len(corpus) == 1 and blob == (0, 0)
+    assert outs[0].dtype == np.float16
+    assert np.allclose(outs[0], _outs(0)[0], atol=1e-2)
+
+
+def test_capture_from_env_and_replay(tmp_path, monkeypatch):
+    """YOLO_CAPTURE_DIR active la capture ; le corpus se rejoue dans un post-processeur"""
+    monkeypatch.delenv('YOLO_CAPTURE_DIR', raising=False)
+    assert capture_from_env('MultiDNN2') is None
+    monkeypatch.setenv('YOLO_CAPTURE_DIR', str(tmp_path))
+    monkeypatch.setenv('YOLO_CAPTURE_MAX', '4')
+    capture = capture_from_env('MultiDNN2')
+    assert capture.max_frames == 4 and os.path.dirname(capture.path) == str(tmp_path)
+
+    preproc = jevois_stub.PreProcessor(288, 512)
+    for i in range(4):
+        capture.capture(_outs(i), preproc)
+
+    from PyPostYoloRandomID_MultiDNN2 import PyPostYoloRandomID_MultiDNN2
+    pp = PyPostYoloRandomID_MultiDNN2()
+    pp.init()
+    result = replay(TensorCorpus(capture.path), pp, repeat=2)
+    assert result['frames'] == 8 and result['fps'] > 0
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Tests de l'instantané du tracker (aller-retour, péremption, écriture interrompue, fichier privé)
+"""
+
+import os
+import stat
+import time
+
+import pytest
+
+from track_snapshot import HEADER, MAGIC, VERSION, TrackSnapshot, open_track_snapshot
+
+
+def _tracks(now):
+    return {
+        7: {'x': 10.0, 'y': 20.0, 'w': 5.0, 'h': 6.0, 'vx': 1.0, 'vy': -1.0, 'score': 0.5,
+            'class_id': 2, 'random_id': 321, 'age': 4, 'last_seen': now},
+        9: {'x': 1.0, 'y': 2.0, 'w': 3.0, 'h': 4.0, 'class_id': 0, 'random_id': 654, 'last_seen': now},
+    }
+
+
+def test_save_restore_round_trip(tmp_path):
+    """Tracks et compteur d'IDs relus à l'identique par une nouvelle instance"""
+    path = str(tmp_path / 'ultra.tracks')
+    now = time.time()
+    snapshot = TrackSnapshot(path)
+    snapshot.save(_tracks(now), 12)
+    snapshot.close()
+
+    snapshot = TrackSnapshot(path)
+    tracks, next_id = snapshot.load()
+    snapshot.close()
+    assert next_id == 12
+    assert sorted(tracks) == [7, 9]
+    assert tracks[7]['random_id'] == 321 and tracks[7]['class_id'] == 2 and tracks[7]['vx'] == 1.0
+    assert tracks[9]['random_id'] == 654 and tracks[9]['age'] == 0
+
+
+def test_stale_and_torn_snapshots_ignored(tmp_path):
+    """Instantané trop ancien ou écriture interrompue (seq impair) : rien n'est restauré"""
+    path = str(tmp_path / 'ultra.tracks')
+    snapshot = TrackSnapshot(path, max_age=10.0)
+    snapshot.save(_tracks(time.time()), 3)
+    assert snapshot.load() is not None
+
+    seq, stamp = HEADER.unpack_from(snapshot.mm, 0)[2:4]
+    HEADER.pack_into(snapshot.mm, 0, MAGIC, VERSION, seq, stamp - 60.0, 3, 2)
+    assert snapshot.load() is None
+
+    HEADER.pack_into(snapshot.mm, 0, MAGIC, VERSION, seq + 1, time.time(), 3, 2)
+    assert snapshot.load() is None
+    snapshot.close()
+
+
+def test_snapshot_file_private(tmp_path):
+    """Fichier 0600, sans la clé des IDs anonymes, lien symbolique refusé, un seul détenteur"""
+    path = str(tmp_path / 'ultra.tracks')
+    snapshot = TrackSnapshot(path)
+    snapshot.save(_tracks(time.time()), 3)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    with pytest.raises(BlockingIOError):
+        TrackSnapshot(path)
+    snapshot.close()
+
+    target = tmp_path / 'cible'
+    target.write_bytes(b'')
+    os.symlink(target, tmp_path / 'lien.tracks')
+    with pytest.raises(OSError):
+        TrackSnapshot(str(tmp_path / 'lien.tracks'))
+    assert target.read_bytes() == b''
+
+
+def test_snapshot_opt_in_per_instance(tmp_path, monkeypatch):
+    """Désactivé sans YOLO_TRACK_SNAPSHOT_DIR ; deux instances vivantes = deux fichiers"""
+    monkeypatch.delenv('YOLO_TRACK_SNAPSHOT_DIR', raising=False)
+    assert open_track_snapshot('UltraHybrid') is None
+
+    monkeypatch.setenv('YOLO_TRACK_SNAPSHOT_DIR', str(tmp_path))
+    first = open_track_snapshot('UltraHybrid', 'modele')
+    second = open_track_snapshot('UltraHybrid', 'modele')
+    assert first.path != second.path
+    first.close()
+    second.close()
+
+    # Rechargement : la première instance retrouve son fichier
+    again = open_track_snapshot('UltraHybrid', 'modele')
+    assert again.path == first.path
+    again.close()
+
+
+def test_restart_after_expiry_delay_keeps_ids(tmp_path):
+    """Instantané de plus de 2 s (délai d'expiration du tracker) : IDs conservés après une frame traitée"""
+    import jevois_stub
+    jevois_stub.install()
+    from PyPostYOLO_UltraHybrid import PyPostYOLO_UltraHybrid
+
+    path = str(tmp_path / 'ultra.tracks')
+    snapshot = TrackSnapshot(path)
+    then = time.time() - 5.0
+    snapshot.save(_tracks(then - 0.5), 12)
+    seq = HEADER.unpack_from(snapshot.mm, 0)[2]
+    HEADER.pack_into(snapshot.mm, 0, MAGIC, VERSION, seq, then, 12, 2)  # arrêt de 5 s
+    snapshot.close()
+
+    pp = PyPostYOLO_UltraHybrid(snapshot_path=path)
+    assert sorted(pp.tracks) == [7, 9]
+    assert time.time() - pp.tracks[7]['last_seen'] == pytest.approx(0.5, abs=0.5)
+    pp.tracking_mode = 'persistent'
+    pp._apply_tracking([])  # frame sans détection : expiration appliquée
+    assert sorted(pp.tracks) == [7, 9]
+    assert pp.tracks[7]['random_id'] == 321
+    pp.uninit()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Tests des compteurs de zones et de lignes sur des tracks scriptés
+"""
+
+import json
+
+import numpy as np
+
+from zone_analytics import ZoneAnalytics, zone_analytics_from_env
+
+# Ligne verticale x = 0.5 (A en haut, B en bas) : sens 'in' = arrivée du côté x < 0.5
+LINES = {'porte': [[0.5, 0.0], [0.5, 1.0]]}
+ZONES = {'quai': [[0.1, 0.5], [0.9, 0.5], [0.9, 1.0], [0.1, 1.0]]}
+
+# Frame par frame : {track: centre}
+SCRIPT = [
+    {1: (0.30, 0.7), 2: (0.80, 0.2), 3: (0.20, 0.2)},   # 1 apparaît dans le quai
+    {1: (0.45, 0.7), 2: (0.60, 0.2), 3: (0.20, 0.6)},   # 3 entre dans le quai
+    {1: (0.55, 0.7), 2: (0.40, 0.2), 3: (0.20, 0.4)},   # 1 franchit vers x > 0.5, 2 vers x < 0.5, 3 sort
+    {2: (0.30, 0.2)},                                   # 1 et 3 disparaissent
+    {2: (0.30, 0.2)},
+    {2: (0.30, 0.2)},                                   # 1 oublié (absent > max_missing) : sortie du quai
+    {},                                                 # 2 absent une frame...
+    {2: (0.70, 0.2)},                                   # ... et revenu de l'autre côté : franchissement
+]
+
+EXPECTED = [
+    [('enter', 'quai', 1, None)],
+    [('enter', 'quai', 3, None)],
+    [('line', 'porte', 1, 'out'), ('line', 'porte', 2, 'in'), ('exit', 'quai', 3, None)],
+    [],
+    [],
+    [('exit', 'quai', 1, None)],
+    [],
+    [('line', 'porte', 2, 'out')],
+]
+
+
+def _run(za):
+    events = []
+    for frame, tracks in enumerate(SCRIPT):
+        za.update(list(tracks), list(tracks.values()), timestamp=float(frame))
+        events.append([(kind, name, track, sens) for _, kind, name, track, sens in za.drain()])
+    return events
+
+
+def test_scripted_tracks():
+    """Entrées / sorties de zone (apparition, déplacement, oubli) et franchissements dans les deux sens"""
+    za = ZoneAnalytics(LINES, ZONES, max_missing=2)
+    assert _run(za) == EXPECTED
+    assert za.stats() == {
+        'lines': {'porte': {'in': 1, 'out': 2}},
+        'zones': {'quai': {'occupancy': 0, 'entries': 2, 'exits': 2}},
+        'tracks': 1,
+    }
+
+
+def test_occupancy_and_touching_line():
+    """Occupation par frame ; un déplacement qui s'arrête sur la ligne ne compte pas comme franchissement"""
+    za = ZoneAnalytics(LINES, ZONES)
+    za.update([4, 5, 6], [(0.2, 0.9), (0.8, 0.8), (0.5, 0.1)])
+    assert za.stats()['zones']['quai']['occupancy'] == 2
+    za.update([4, 5, 6], [(0.2, 0.3), (0.8, 0.8), (0.5, 0.3)])
+    za.update([4, 5, 6], [(0.5, 0.3), (0.8, 0.8), (0.6, 0.3)])
+    stats = za.stats()
+    assert stats['zones']['quai'] == {'occupancy': 1, 'entries': 2, 'exits': 1}
+    assert stats['lines']['porte'] == {'in': 0, 'out': 0}
+
+
+def test_from_env(tmp_path, monkeypatch):
+    monkeypatch.delenv('YOLO_ZONES', raising=False)
+    assert zone_analytics_from_env() is None
+    path = tmp_path / 'zones.json'
+    path.write_text(json.dumps({'lines': LINES, 'zones': ZONES}))
+    monkeypatch.setenv('YOLO_ZONES', str(path))
+    za = zone_analytics_from_env()
+    assert za.line_names == ['porte'] and za.zone_names == ['quai']
+    assert np.array_equal(za.lines[0], LINES['porte'])
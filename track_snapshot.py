@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+💾 TRACK SNAPSHOT
+Instantané binaire compact de l'état du tracker dans un fichier mappé en mémoire
+- Tracks (position lissée, vitesse, classe, âge, ID aléatoire), compteur d'IDs
+- Écrit périodiquement sur le chemin chaud (quelques µs, pas de sérialisation Python)
+- Relu au démarrage s'il est récent : pas de remise à zéro visible des IDs ; last_seen décalé de la durée
+  de l'arrêt (un track vu juste avant l'instantané n'est pas expiré par la première frame après reprise)
+- La clé des IDs anonymes n'est jamais écrite : les IDs affichés des tracks restaurés sont repris tels quels,
+  les nouveaux tracks dérivent les leurs d'une nouvelle clé
+- Fichier privé (0600, pas de lien symbolique suivi) et verrouillé : un fichier par instance et par modèle
+
+Activation : YOLO_TRACK_SNAPSHOT_DIR=/dossier (fichiers <post-processeur>-<modèle>-<n>.tracks)
+"""
+
+import fcntl
+import mmap
+import os
+import stat
+import struct
+import time
+
+import numpy as np
+
+MAGIC = b'YTRK'
+VERSION = 3
+
+# magic, version, seq, timestamp, next_track_id, n_tracks
+HEADER = struct.Struct('<4sIQdqI')
+HEADER_SIZE = 128  # aligné pour les vues NumPy qui suivent
+
+TRACK_DTYPE = np.dtype([
+    ('id', '<i8'),
+    ('random_id', '<i4'),
+    ('class_id', '<i4'),
+    ('age', '<i4'),
+    ('x', '<f4'),
+    ('y', '<f4'),
+    ('w', '<f4'),
+    ('h', '<f4'),
+    ('vx', '<f4'),
+    ('vy', '<f4'),
+    ('score', '<f4'),
+    ('last_seen', '<f8'),
+])
+
+
+class TrackSnapshot:
+    """
+    Fichier d'instantané à capacité fixe :
+    - seq impair pendant l'écriture, pair une fois complet (écriture interrompue = ignorée)
+    - pas de flush disque : le cache de pages survit au redémarrage du module/processus
+    """
+
+    def __init__(self, path, max_tracks=512, interval=1.0, max_age=10.0):
+        self.path = path
+        self.max_tracks = max_tracks
+        self.interval = interval
+        self.max_age = max_age
+        self.last_save = 0.0
+        self.seq = 0
+
+        size = HEADER_SIZE + max_tracks * TRACK_DTYPE.itemsize
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW | os.O_CLOEXEC, 0o600)
+        try:
+            st = os.fstat(fd)
+            if not stat.S_ISREG(st.st_mode) or st.st_uid != os.getuid():
+                raise OSError(f"{path} : fichier d'instantané refusé (pas un fichier ordinaire à nous)")
+            if st.st_mode & 0o077:
+                os.fchmod(fd, 0o600)
+            # Une instance par fichier (le verrou suit le descripteur, libéré à close() ou à la sortie)
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            if st.st_size != size:
+                os.ftruncate(fd, size)
+            self.mm = mmap.mmap(fd, size)
+        except BaseException:
+            os.close(fd)
+            raise
+        self.fd = fd
+
+        self.records = np.ndarray((max_tracks,), dtype=TRACK_DTYPE, buffer=self.mm, offset=HEADER_SIZE)
+
+        header = self._read_header()
+        if header is not None:
+            self.seq = header[2] + (header[2] & 1)
+
+    def _read_header(self):
+        header = HEADER.unpack_from(self.mm, 0)
+        if header[0] != MAGIC or header[1] != VERSION:
+            return None
+        return header
+
+    def save(self, tracks, next_track_id):
+        """Écrit l'état complet du tracker (tracks: dict id -> track dict)"""
+        n = min(len(tracks), self.max_tracks)
+        now = time.time()
+
+        # Marquer l'écriture en cours (seq impair)
+        self.seq += 1
+        HEADER.pack_into(self.mm, 0, MAGIC, VERSION, self.seq, now, 0, 0)
+
+        records = self.records
+        for i, (track_id, track) in enumerate(list(tracks.items())[:n]):
+            records[i] = (track_id, track.get('random_id', 0), track['class_id'], track.get('age', 0),
+                          track['x'], track['y'], track['w'], track['h'],
+                          track.get('vx', 0.0), track.get('vy', 0.0),
+                          track.get('score', 0.0), track.get('last_seen', now))
+
+        self.seq += 1
+        HEADER.pack_into(self.mm, 0, MAGIC, VERSION, self.seq, now, next_track_id, n)
+        self.last_save = now
+
+    def maybe_save(self, tracks, next_track_id):
+        """Écrit l'instantané si l'intervalle est écoulé"""
+        if time.time() - self.last_save >= self.interval:
+            self.save(tracks, next_track_id)
+
+    def load(self):
+        """
+        Retourne (tracks, next_track_id) si l'instantané est complet et récent,
+        sinon None ; last_seen avancé de la durée de l'arrêt (âge relatif à l'instantané conservé)
+        """
+        header = self._read_header()
+        if header is None:
+            return None
+
+        _, _, seq, stamp, next_id, n = header
+        downtime = max(0.0, time.time() - stamp)
+        if seq & 1 or n > self.max_tracks or downtime > self.max_age:
+            return None
+
+        tracks = {}
+        for rec in self.records[:n].copy():
+            tracks[int(rec['id'])] = {
+                'x': float(rec['x']),
+                'y': float(rec['y']),
+                'w': float(rec['w']),
+                'h': float(rec['h']),
+                'vx': float(rec['vx']),
+                'vy': float(rec['vy']),
+                'score': float(rec['score']),
+                'class_id': int(rec['class_id']),
+                'random_id': int(rec['random_id']),
+                'age': int(rec['age']),
+                'last_seen': float(rec['last_seen']) + downtime,
+                'tracking_mode': 'persistent',
+            }
+        return tracks, int(next_id)
+
+    def close(self):
+        del self.records
+        self.mm.close()
+        os.close(self.fd)
+
+
+def open_track_snapshot(name, scope='default', max_instances=8):
+    """
+    TrackSnapshot de YOLO_TRACK_SNAPSHOT_DIR pour le post-processeur name et le modèle scope, ou None :
+    premier fichier <name>-<scope>-<n>.tracks non verrouillé par une autre instance (même ordre à chaque
+    démarrage : une instance rechargée retrouve son fichier)
+    """
+    directory = os.environ.get('YOLO_TRACK_SNAPSHOT_DIR')
+    if not directory:
+        return None
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    for n in range(max_instances):
+        try:
+            return TrackSnapshot(os.path.join(directory, f'{name}-{scope}-{n}.tracks'))
+        except BlockingIOError:
+            continue  # fichier d'une autre instance vivante
+    return None
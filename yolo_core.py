@@ -0,0 +1,836 @@
+#!/usr/bin/env python3
+"""
+🧩 YOLO CORE
+Cœur de post-traitement commun aux PyPost* : un seul décodeur, une seule NMS, un seul chargement
+des classes. Les classes JeVois deviennent des adaptateurs qui gardent leurs contrats
+init / process / report et leurs formats de sortie.
+
+Étapes interchangeables de YoloCore :
+- décodeur : Yolov7Decoder (sorties brutes [1, 255, H, W]), PredecodedDecoder (lignes x, y, w, h, conf, classe)
+- suppression : NmsSuppressor (IoU, par classe ou toutes classes), CellSuppressor (linéaire, mode dégradé)
+  (ou None : sorties déjà filtrées)
+- tracker : RandomIdTracker, CenterTracker (ou None : l'adaptateur garde son tracking)
+  PersistentTracker : tracking persistant d'UltraHybrid sur des dicts, sans E/S (aussi utilisé par les shards
+  de multistream_tracker)
+- reporter : LogReporter, OverlayReporter (ou None)
+
+Détections = structure de tableaux (Detections) : boîtes x1, y1, x2, y2 en pixels du blob, scores,
+classes, tête d'origine ; chaque adaptateur les convertit dans son format une seule fois, après la NMS.
+Lot de frames (process_batch) : sorties empilées (B, 255, H, W) décodées en une passe par tête,
+DetectionBatch = détections triées par frame + offsets, NMS par frame en un seul appel.
+"""
+
+import math
+import os
+import random
+import time
+
+import numpy as np
+
+from instrumentation import NULL_METRICS
+
+YOLOV7_TINY_ANCHORS = "10,13, 16,30, 33,23;   30,61, 62,45, 59,119;   116,90, 156,198, 373,326"
+
+COCO_LABEL_PATHS = (
+    '/jevoispro/share/dnn/labels/coco-labels.txt',
+    '/usr/share/jevois-pro/dnn/labels/coco-labels.txt',
+    'dnn/labels/coco-labels.txt',
+)
+
+
+# Fichiers de classes lus une fois par processus : chemin -> (mtime_ns, noms)
+_LABELS = {}
+
+
+# ========== Utilitaires ==========
+
+def parse_anchors(text):
+    """'10,13, 16,30, ...; ...' -> [[(w, h), ...] par tête]"""
+    layers = []
+    for layer in text.replace(' ', '').split(';'):
+        if not layer:
+            continue
+        values = [float(v) for v in layer.split(',') if v]
+        layers.append([(values[i], values[i + 1]) for i in range(0, len(values), 2)])
+    return layers
+
+
+def load_classes(paths=COCO_LABEL_PATHS, num_classes=80, fallback=True):
+    """
+    Noms de classes du premier fichier lisible ; sinon class0..classN (ou None si fallback=False)
+    Cache partagé par toutes les instances (clé : chemin et date de modification) : un changement
+    de module ne relit pas le fichier, un fichier modifié est relu
+    """
+    for path in paths:
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            continue
+        cached = _LABELS.get(path)
+        if cached is None or cached[0] != mtime:
+            try:
+                with open(path, 'r') as f:
+                    cached = (mtime, tuple(f.read().rstrip('\n').split('\n')))
+            except OSError:
+                continue
+            _LABELS[path] = cached
+        return list(cached[1])
+    return [f"class{i}" for i in range(num_classes)] if fallback else None
+
+
+def class_name(classmap, class_id):
+    if classmap and 0 <= class_id < len(classmap):
+        return classmap[class_id]
+    return f"class{class_id}"
+
+
+def parse_class_selection(classes='', thresholds='', classmap=None, scale=1.0, unknown=None):
+    """
+    Allow-list et seuils par classe depuis du texte : classes 'person,car' ou '0,2',
+    thresholds 'person:0.5,car:0.3' (valeurs multipliées par scale, ex. 0.01 pour des pourcentages)
+    -> (indices ou None, {indice: seuil}) ; nom inconnu = ValueError, ou unknown(nom) et nom ignoré
+    (aucune classe reconnue dans l'allow-list = toutes les classes)
+    """
+    names = {name: i for i, name in enumerate(classmap or [])}
+
+    def index(token):
+        token = token.strip()
+        if token.lstrip('-').isdigit():
+            return int(token)
+        if token in names:
+            return names[token]
+        if unknown is None:
+            raise ValueError(f"Classe inconnue : {token!r}")
+        unknown(token)
+        return None
+
+    allowed = [i for i in (index(t) for t in classes.split(',') if t.strip()) if i is not None] or None
+    per_class = {}
+    for item in thresholds.split(','):
+        if item.strip():
+            name, _, value = item.rpartition(':')
+            i = index(name)
+            if i is not None:
+                per_class[i] = float(value) * scale
+    return allowed, per_class
+
+
+def class_selection_from_env(classmap=None):
+    """parse_class_selection de YOLO_CLASSES / YOLO_CLASS_THRESHOLDS (seuils en fraction)"""
+    return parse_class_selection(os.environ.get('YOLO_CLASSES', ''),
+                                 os.environ.get('YOLO_CLASS_THRESHOLDS', ''), classmap)
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-np.clip(x, -50.0, 50.0)))
+
+
+_cv2 = None
+
+
+def _opencv():
+    """cv2 importé au premier besoin (None si absent) : la NMS C++ d'OpenCV est la plus rapide"""
+    global _cv2
+    if _cv2 is None:
+        try:
+            import cv2
+            _cv2 = cv2
+        except ImportError:
+            _cv2 = False
+    return _cv2 or None
+
+
+def _logit(p):
+    """Seuil en probabilité -> seuil en logit (sigmoid monotone : on compare les sorties brutes)"""
+    p = min(max(p, 1e-7), 1.0 - 1e-7)
+    return math.log(p / (1.0 - p))
+
+
+class Detections:
+    """
+    Détections d'une frame en colonnes : boxes (N, 4) x1 y1 x2 y2, scores, class_ids, heads, ids
+    source_xywh : boîtes x, y, w, h d'origine (sorties déjà décodées), rendues telles quelles par xywh()
+    """
+
+    __slots__ = ('boxes', 'scores', 'class_ids', 'heads', 'ids', 'random_ids', 'source_xywh')
+
+    def __init__(self, boxes, scores, class_ids, heads, ids=None, random_ids=None, source_xywh=None):
+        self.boxes = boxes
+        self.scores = scores
+        self.class_ids = class_ids
+        self.heads = heads
+        self.ids = ids
+        self.random_ids = random_ids
+        self.source_xywh = source_xywh
+
+    def __len__(self):
+        return len(self.scores)
+
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.intp), np.zeros(0, np.intp))
+
+    @classmethod
+    def concat(cls, parts):
+        parts = [p for p in parts if len(p)]
+        if not parts:
+            return cls.empty()
+        if len(parts) == 1:
+            return parts[0]
+        ids = random_ids = source_xywh = None
+        if all(p.ids is not None for p in parts):
+            ids = np.concatenate([p.ids for p in parts])
+        if all(p.random_ids is not None for p in parts):
+            random_ids = np.concatenate([p.random_ids for p in parts])
+        if all(p.source_xywh is not None for p in parts):
+            source_xywh = np.concatenate([p.source_xywh for p in parts])
+        return cls(np.concatenate([p.boxes for p in parts]), np.concatenate([p.scores for p in parts]),
+                   np.concatenate([p.class_ids for p in parts]), np.concatenate([p.heads for p in parts]),
+                   ids, random_ids, source_xywh)
+
+    @classmethod
+    def from_xywh(cls, boxes, scores, class_ids, head=0):
+        """Boîtes x, y (coin), w, h -> Detections (boîtes d'origine conservées pour xywh())"""
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        xyxy = np.concatenate([boxes[:, :2], boxes[:, :2] + boxes[:, 2:]], axis=1)
+        return cls(xyxy, np.asarray(scores, dtype=np.float32), np.asarray(class_ids, dtype=np.intp),
+                   np.full(len(boxes), head, dtype=np.intp), source_xywh=boxes)
+
+    def take(self, idx):
+        return Detections(self.boxes[idx], self.scores[idx], self.class_ids[idx], self.heads[idx],
+                          None if self.ids is None else self.ids[idx],
+                          None if self.random_ids is None else self.random_ids[idx],
+                          None if self.source_xywh is None else self.source_xywh[idx])
+
+    def xywh(self):
+        """(N, 4) x, y (coin haut gauche), w, h ; sans aller-retour par x2 - x1 si les boîtes d'origine sont connues"""
+        if self.source_xywh is not None:
+            return self.source_xywh
+        return np.concatenate([self.boxes[:, :2], self.boxes[:, 2:] - self.boxes[:, :2]], axis=1)
+
+    def centers(self):
+        """(N, 4) cx, cy, w, h"""
+        wh = self.boxes[:, 2:] - self.boxes[:, :2]
+        return np.concatenate([self.boxes[:, :2] + wh / 2, wh], axis=1)
+
+
+class DetectionBatch:
+    """Détections de plusieurs frames, triées par frame : la frame i occupe [offsets[i], offsets[i + 1])"""
+
+    __slots__ = ('dets', 'frames', 'offsets')
+
+    def __init__(self, dets, frames, size):
+        self.dets = dets
+        self.frames = frames
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(frames, minlength=size))]).astype(np.intp)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def frame(self, i):
+        return self.dets.take(slice(self.offsets[i], self.offsets[i + 1]))
+
+    def take(self, idx):
+        """Sous-ensemble (indices dans l'ordre des frames)"""
+        return DetectionBatch(self.dets.take(idx), self.frames[idx], len(self))
+
+
+# ========== Décodeurs ==========
+
+class _ClassSelection:
+    """Allow-list et seuils par classe des décodeurs à colonnes x, y, w, h, objectness, classes..."""
+
+    def select(self, classes=None, thresholds=None):
+        """
+        classes : indices retenus ; seuls leurs canaux sont rassemblés, avant sigmoid et argmax
+        (classe retenue = meilleure des classes autorisées), None = toutes
+        thresholds : {classe: seuil}, vectorisé ; les autres classes gardent le seuil de l'appel
+        """
+        self.classes = None if classes is None else np.unique(np.asarray(classes, dtype=np.intp))
+        self.thresholds = dict(thresholds or {})
+        self._channels = None if self.classes is None else np.concatenate([np.arange(5), 5 + self.classes])
+        self._limits = {}  # (conf, nombre de classes) -> seuils par colonne de classe
+        return self
+
+    @property
+    def selection(self):
+        """Arguments de select() (pour un décodeur reconstruit)"""
+        return (None if self.classes is None else self.classes.tolist()), self.thresholds
+
+    def _class_limits(self, conf, num_classes):
+        """Seuils par colonne de classe (None = seuil unique conf) et seuil minimal"""
+        if not self.thresholds:
+            return None, conf
+        limits = self._limits.get((conf, num_classes))
+        if limits is None:
+            columns = self.classes if self.classes is not None else range(num_classes)
+            limits = np.array([self.thresholds.get(int(c), conf) for c in columns], dtype=np.float32)
+            self._limits[(conf, num_classes)] = limits
+        return limits, float(limits.min())
+
+
+class Yolov7Decoder(_ClassSelection):
+    """
+    Décodage YOLOv7 brut (logits) par tête, entièrement vectorisé :
+    - seuil d'objectness comparé en logit : pas de sigmoid sur la grille entière
+    - argmax des classes sur les logits, sigmoid sur la seule classe retenue
+    - centre = (sig(t) * scale_xy - 0.5 * (scale_xy - 1) + cellule) * blob / grille, taille = exp(t) * anchor
+    - sorties entières (8U, ...) avec quant : seuil comparé dans le domaine quantifié,
+      seules les cellules retenues sont déquantifiées
+    - select() : allow-list de classes (seuls leurs canaux sont lus) et seuils par classe
+    """
+
+    def __init__(self, anchors=YOLOV7_TINY_ANCHORS, scale_xy=2.0, size_clip=5.0, quant=None):
+        self.key = (anchors if isinstance(anchors, str) else repr(anchors), scale_xy)  # reconstruction si changé
+        if isinstance(anchors, str):
+            anchors = parse_anchors(anchors)
+        self.anchors = [np.asarray(layer, dtype=np.float32).reshape(-1, 2) for layer in anchors]
+        self.scale_xy = scale_xy
+        self.size_clip = size_clip  # exp(t) borné : pas de débordement sur des sorties aberrantes
+        self.quant = quant  # [(scale, zero point)] par tête, ou None
+        self.select()
+
+    @classmethod
+    def from_artifacts(cls, artifacts, size_clip=5.0):
+        """Décodeur à partir des artefacts précalculés d'un modèle (voir model_artifacts.py)"""
+        decoder = cls(artifacts.anchors, artifacts.meta['scale_xy'], size_clip, artifacts.quant)
+        decoder.key = (artifacts.meta['fields']['anchors'], artifacts.meta['scale_xy'])
+        return decoder
+
+    def decode_head(self, output, head, blob_w, blob_h, conf, metrics=NULL_METRICS, max_candidates=None):
+        """Une tête [1, A * (5 + C), H, W] -> Detections (au plus max_candidates, meilleurs scores)"""
+        if output.ndim != 4 or head >= len(self.anchors):
+            return Detections.empty()
+        return self._decode(output[:1], head, blob_w, blob_h, conf, metrics, max_candidates)[0]
+
+    def _decode(self, output, head, blob_w, blob_h, conf, metrics=NULL_METRICS, max_candidates=None):
+        """Tête [B, A * (5 + C), H, W] -> (Detections, frame de chaque détection)"""
+        anchors = self.anchors[head]
+        num_anchors = len(anchors)
+        batch, grid_h, grid_w = output.shape[0], output.shape[2], output.shape[3]
+        no_frames = np.zeros(0, dtype=np.intp)
+
+        t = metrics.start()
+        limits, min_conf = self._class_limits(conf, output.shape[1] // num_anchors - 5)
+        quant = self.quant[head] if self.quant is not None and output.dtype.kind in 'ui' else None
+        if quant is None:
+            pred = np.asarray(output, dtype=np.float32).reshape(batch, num_anchors, -1, grid_h, grid_w)
+            limit = _logit(min_conf)
+        else:
+            pred = output.reshape(batch, num_anchors, -1, grid_h, grid_w)
+            limit = _logit(min_conf) / quant[0] + quant[1]  # q > limit <=> (q - zero) * scale > logit(conf)
+        t = metrics.lap('dequant', t)
+
+        b, a, y, x = np.nonzero(pred[:, :, 4] > limit)
+        t = metrics.lap('threshold', t)
+        if metrics.enabled:
+            metrics.count('candidates', len(a), head=head)
+        if not len(a):
+            return Detections.empty(), no_frames
+
+        if self._channels is None:
+            cells = pred[b, a, :, y, x]  # [N, 5 + C]
+        else:
+            # [N, 5 + classes retenues] : un take à plat, moins coûteux qu'un indexage sur 5 axes
+            plane = grid_h * grid_w
+            base = (b * num_anchors + a) * (pred.shape[2] * plane) + y * grid_w + x
+            cells = pred.ravel().take(base[:, None] + self._channels * plane)
+        if quant is not None:
+            cells = (cells.astype(np.float32) - np.float32(quant[1])) * np.float32(quant[0])
+        best = cells[:, 5:].argmax(axis=1)
+        class_ids = best if self.classes is None else self.classes[best]
+        scores = _sigmoid(cells[:, 4]) * _sigmoid(cells[np.arange(len(cells)), 5 + best])
+        keep = np.flatnonzero(scores > (conf if limits is None else limits[best]))
+        if max_candidates is not None and len(keep) > max_candidates:
+            keep = keep[np.argsort(-scores[keep], kind='stable')[:max(0, max_candidates)]]
+        cells, scores, class_ids, b, a, y, x = (cells[keep], scores[keep], class_ids[keep],
+                                                b[keep], a[keep], y[keep], x[keep])
+
+        s = self.scale_xy
+        cx = (_sigmoid(cells[:, 0]) * s - 0.5 * (s - 1) + x) * (blob_w / grid_w)
+        cy = (_sigmoid(cells[:, 1]) * s - 0.5 * (s - 1) + y) * (blob_h / grid_h)
+        wh = np.exp(np.clip(cells[:, 2:4], -self.size_clip, self.size_clip)) * anchors[a]
+        boxes = np.stack([cx - wh[:, 0] / 2, cy - wh[:, 1] / 2, cx + wh[:, 0] / 2, cy + wh[:, 1] / 2], axis=1)
+        metrics.lap('decode', t)
+
+        return (Detections(boxes.astype(np.float32, copy=False), scores.astype(np.float32, copy=False),
+                           class_ids, np.full(len(scores), head, dtype=np.intp)), b)
+
+    def __call__(self, outs, blob_w, blob_h, conf, metrics=NULL_METRICS, heads=None):
+        heads = range(min(len(outs), len(self.anchors))) if heads is None else heads
+        return Detections.concat([self.decode_head(outs[h], h, blob_w, blob_h, conf, metrics) for h in heads])
+
+    def decode_batch(self, outs, blob_w, blob_h, conf, metrics=NULL_METRICS, heads=None):
+        """
+        Sorties empilées par tête [B, A * (5 + C), H, W] -> DetectionBatch
+        Un seuillage, un gather et un décodage par tête pour les B frames
+        """
+        heads = range(min(len(outs), len(self.anchors))) if heads is None else heads
+        size = outs[0].shape[0] if len(outs) else 0
+        parts = [self._decode(outs[h], h, blob_w, blob_h, conf, metrics) for h in heads
+                 if outs[h].ndim == 4 and h < len(self.anchors)]
+        if not parts:
+            return DetectionBatch(Detections.empty(), np.zeros(0, dtype=np.intp), size)
+        frames = np.concatenate([f for _, f in parts])
+        order = np.argsort(frames, kind='stable')
+        return DetectionBatch(Detections.concat([d for d, _ in parts]).take(order), frames[order], size)
+
+
+class DenseRowDecoder(_ClassSelection):
+    """
+    Sorties en lignes [1, N, 5 + C] ou [N, 5 + C] déjà en probabilités (YOLOv8 avec bibliothèque) :
+    cx, cy, w, h (pixels du blob), objectness, score de chaque classe
+    - lignes sous le seuil minimal d'objectness écartées avant l'argmax (score = objectness * classe)
+    - select() : allow-list (seules ces colonnes sont lues) et seuils par classe, comme Yolov7Decoder
+    """
+
+    def __init__(self):
+        self.select()
+
+    def __call__(self, outs, blob_w, blob_h, conf, metrics=NULL_METRICS, heads=None):
+        if not len(outs):
+            return Detections.empty()
+        output = outs[0]
+        if output.ndim == 3:
+            output = output[0]
+        if output.ndim != 2 or output.shape[1] < 6:
+            return Detections.empty()
+
+        t = metrics.start()
+        limits, min_conf = self._class_limits(conf, output.shape[1] - 5)
+        rows = output[output[:, 4] > min_conf]
+        if metrics.enabled:
+            metrics.count('candidates', len(rows), head=0)
+        t = metrics.lap('threshold', t)
+        if self._channels is not None:
+            rows = rows[:, self._channels]
+        rows = np.asarray(rows, dtype=np.float32)
+        best = rows[:, 5:].argmax(axis=1)
+        class_ids = best if self.classes is None else self.classes[best]
+        scores = rows[:, 4] * rows[np.arange(len(rows)), 5 + best]
+        keep = np.flatnonzero(scores > (conf if limits is None else limits[best]))
+        rows, scores, class_ids = rows[keep], scores[keep], class_ids[keep]
+
+        half = rows[:, 2:4] / 2
+        boxes = np.concatenate([rows[:, :2] - half, rows[:, :2] + half], axis=1)
+        metrics.lap('decode', t)
+        return Detections(boxes, scores, class_ids, np.zeros(len(scores), dtype=np.intp))
+
+
+class PredecodedDecoder:
+    """Sorties déjà décodées par la bibliothèque native : [1, N, >=6] ou [N, >=6] = x, y, w, h, conf, classe"""
+
+    def __init__(self):
+        self.select()
+
+    def select(self, classes=None, thresholds=None):
+        """Allow-list et seuils par classe, appliqués aux lignes décodées (voir Yolov7Decoder.select)"""
+        self.classes = None if classes is None else np.unique(np.asarray(classes, dtype=np.intp))
+        self.thresholds = dict(thresholds or {})
+        return self
+
+    def __call__(self, outs, blob_w, blob_h, conf, metrics=NULL_METRICS, heads=None):
+        t = metrics.start()
+        dets = self._filter(outs, conf)
+        metrics.lap('threshold', t)
+        return dets
+
+    def _filter(self, outs, conf):
+        if not len(outs):
+            return Detections.empty()
+        output = outs[0]
+        if output.ndim == 3:
+            output = output[0]
+        if output.ndim != 2 or output.shape[1] < 6:
+            return Detections.empty()
+        if self.classes is None and not self.thresholds:
+            rows = output[output[:, 4] > conf]
+            return Detections.from_xywh(rows[:, :4], rows[:, 4], rows[:, 5].astype(np.intp))
+
+        class_ids = output[:, 5].astype(np.intp)
+        limits = np.full(len(output), conf, dtype=np.float32)
+        for class_id, threshold in self.thresholds.items():
+            limits[class_ids == class_id] = threshold
+        mask = output[:, 4] > limits
+        if self.classes is not None:
+            mask &= np.isin(class_ids, self.classes)
+        rows = output[mask]
+        return Detections.from_xywh(rows[:, :4], rows[:, 4], class_ids[mask])
+
+
+# ========== Suppression ==========
+
+class NmsSuppressor:
+    """
+    NMS gloutonne : cv2.dnn.NMSBoxes si OpenCV est disponible, sinon une passe NumPy par boîte gardée
+    (suppression si IoU > iou dans les deux cas)
+    per_class : les boîtes de classes différentes ne se suppriment pas (décalage des coordonnées par classe)
+    """
+
+    def __init__(self, iou=0.45, per_class=False, use_opencv=True):
+        self.iou = iou
+        self.per_class = per_class
+        self.use_opencv = use_opencv
+
+    def indices(self, dets):
+        if not len(dets):
+            return np.zeros(0, dtype=np.intp)
+        boxes = dets.boxes.astype(np.float64)
+        if self.per_class:
+            boxes = boxes + (dets.class_ids * (boxes.max() + 1.0))[:, None]
+
+        cv2 = _opencv() if self.use_opencv else None
+        if cv2 is not None:
+            xywh = np.concatenate([boxes[:, :2], boxes[:, 2:] - boxes[:, :2]], axis=1)
+            keep = cv2.dnn.NMSBoxes(xywh, dets.scores.astype(np.float64), 0.0, self.iou)
+            return np.asarray(keep, dtype=np.intp).reshape(-1)
+
+        x1, y1, x2, y2 = boxes.T
+        areas = (x2 - x1) * (y2 - y1)
+        order = np.argsort(-dets.scores, kind='stable')
+
+        keep = []
+        while order.size:
+            i = order[0]
+            keep.append(i)
+            rest = order[1:]
+            w = np.maximum(0.0, np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]))
+            h = np.maximum(0.0, np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]))
+            inter = w * h
+            union = areas[i] + areas[rest] - inter
+            iou = np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+            order = rest[iou <= self.iou]
+        return np.asarray(keep, dtype=np.intp)
+
+    def __call__(self, dets):
+        return dets.take(self.indices(dets))
+
+
+class CellSuppressor:
+    """Suppression linéaire sans IoU : meilleure détection par classe et par cellule de cell pixels (centre)"""
+
+    def __init__(self, cell=32):
+        self.cell = cell
+
+    def indices(self, dets):
+        if not len(dets):
+            return np.zeros(0, dtype=np.intp)
+        centers = (dets.boxes[:, :2] + dets.boxes[:, 2:]) / (2 * self.cell)
+        cells = np.floor(centers).astype(np.int64) + (1 << 15)
+        keys = (dets.class_ids.astype(np.int64) << 40) | (cells[:, 0] << 20) | cells[:, 1]
+        order = np.argsort(-dets.scores, kind='stable')
+        _, first = np.unique(keys[order], return_index=True)
+        return np.sort(order[first])
+
+    def __call__(self, dets):
+        return dets.take(self.indices(dets))
+
+
+# ========== Trackers ==========
+
+class RandomIdTracker:
+    """ID aléatoire par détection et par frame (pas de mémoire)"""
+
+    def __init__(self, low=1, high=999):
+        self.low = low
+        self.high = high
+
+    def __call__(self, dets, blob_w, blob_h):
+        dets.random_ids = np.array([random.randint(self.low, self.high) for _ in range(len(dets))], dtype=np.intp)
+        dets.ids = dets.random_ids
+        return dets
+
+
+class CenterTracker:
+    """
+    Association au track de même classe le plus proche (distance des centres normalisés < max_dist),
+    tracks oubliés après max_age secondes ; random_ids = identifiants d'affichage (AnonymousIdService)
+    """
+
+    def __init__(self, random_ids, max_dist=0.05, max_age=2.0, clock=time.time):
+        self.random_ids = random_ids
+        self.max_dist = max_dist
+        self.max_age = max_age
+        self.clock = clock
+        self.tracks = {}
+        self.next_id = 1
+
+    def track_one(self, cx, cy, class_id):
+        """Centre normalisé [0, 1] -> ID de track"""
+        best_track = None
+        best_dist = self.max_dist
+        for track_id, track in self.tracks.items():
+            if track['class_id'] != class_id:
+                continue
+            dist = math.hypot(cx - track['cx'], cy - track['cy'])
+            if dist < best_dist:
+                best_dist = dist
+                best_track = track_id
+
+        now = self.clock()
+        if best_track:
+            track = self.tracks[best_track]
+            track['cx'], track['cy'], track['time'] = cx, cy, now
+            return best_track
+
+        track_id = self.next_id
+        self.next_id += 1
+        self.tracks[track_id] = {'cx': cx, 'cy': cy, 'class_id': class_id,
+                                 'random_id': self.random_ids.acquire(track_id), 'time': now}
+
+        # Nettoyage des vieux tracks à chaque création
+        self.tracks = {k: v for k, v in self.tracks.items() if now - v['time'] < self.max_age}
+        self.random_ids.retain(self.tracks)
+        return track_id
+
+    def __call__(self, dets, blob_w, blob_h):
+        # Centres des boîtes normalisées et bornées à l'image
+        boxes = np.clip(dets.boxes / np.array([blob_w, blob_h, blob_w, blob_h], dtype=np.float32), 0.0, 1.0)
+        cx = (boxes[:, 0] + boxes[:, 2]) / 2
+        cy = (boxes[:, 1] + boxes[:, 3]) / 2
+        ids = [self.track_one(float(x), float(y), int(c)) for x, y, c in zip(cx, cy, dets.class_ids)]
+        dets.ids = np.asarray(ids, dtype=np.intp)
+        dets.random_ids = np.asarray([self.tracks[i]['random_id'] for i in ids], dtype=np.intp)
+        return dets
+
+
+class PersistentTracker:
+    """
+    Tracking persistant sur des détections dict (centre x, y, w, h en pixels du blob, class_id) :
+    association au track de même classe le plus proche (dans 10 % de l'image), position et vitesse lissées,
+    tracks oubliés après max_age secondes ; random_ids = identifiants d'affichage (AnonymousIdService)
+    Aucune E/S (instantané, export, enregistrement) : c'est l'appelant qui les fait, s'il en a
+    """
+
+    def __init__(self, random_ids, max_age=2.0, clock=time.time, metrics=NULL_METRICS):
+        self.random_ids = random_ids
+        self.max_age = max_age
+        self.clock = clock
+        self.metrics = metrics
+        self.tracks = {}
+        self.next_track_id = 1
+
+    def __call__(self, detections):
+        """
+        Annote les détections (id, random_id, age, tracking_mode) et remplace tracks par un nouveau dict :
+        ni le dict de la frame précédente ni ses tracks ne sont modifiés (publiés tels quels, voir result_snapshot)
+        """
+        t = self.metrics.start()
+        now = self.clock()
+        tracks = {}
+
+        # Matcher avec tracks existants
+        unmatched_dets = list(detections)
+
+        for track_id, track in self.tracks.items():
+            best_match = None
+            best_dist = float('inf')
+
+            for det in unmatched_dets:
+                # Distance spatiale
+                dist = math.sqrt((det['x'] - track['x'])**2 + (det['y'] - track['y'])**2)
+
+                # Vérifier classe
+                if det['class_id'] == track['class_id'] and dist < best_dist:
+                    best_dist = dist
+                    best_match = det
+
+            # Si match trouvé (dans 10% de l'image)
+            if best_match and best_dist < 0.1 * max(best_match.get('img_w', 1000), best_match.get('img_h', 1000)):
+                best_match['id'] = track_id
+                best_match['random_id'] = track['random_id']
+                best_match['tracking_mode'] = 'persistent'
+                best_match['age'] = track.get('age', 0) + 1
+
+                # Mise à jour Kalman-like simple, sur une copie : le track de la frame publiée reste intact
+                track = dict(track)
+                alpha = 0.7  # Facteur de lissage
+                prev_x, prev_y = track['x'], track['y']
+                track['x'] = alpha * best_match['x'] + (1-alpha) * track['x']
+                track['y'] = alpha * best_match['y'] + (1-alpha) * track['y']
+                track['w'] = alpha * best_match['w'] + (1-alpha) * track['w']
+                track['h'] = alpha * best_match['h'] + (1-alpha) * track['h']
+                track['age'] = best_match['age']
+
+                # Vitesse lissée (pixels/s) pour la propagation entre deux décodages
+                dt = now - track.get('last_seen', now)
+                if dt > 0:
+                    beta = 0.5
+                    track['vx'] = beta * (track['x'] - prev_x) / dt + (1-beta) * track.get('vx', 0.0)
+                    track['vy'] = beta * (track['y'] - prev_y) / dt + (1-beta) * track.get('vy', 0.0)
+                track['last_seen'] = now
+
+                tracks[track_id] = track
+                unmatched_dets.remove(best_match)
+            elif now - track.get('last_seen', 0) < self.max_age:
+                tracks[track_id] = track  # non vu, pas encore oublié (> max_age secondes)
+
+        # Créer nouveaux tracks pour non-matchés
+        for det in unmatched_dets:
+            det['id'] = self.next_track_id
+            det['random_id'] = self.random_ids.acquire(self.next_track_id)
+            det['tracking_mode'] = 'persistent'
+            det['age'] = 0
+            track = det.copy()
+            track['last_seen'] = now
+            tracks[self.next_track_id] = track
+            self.next_track_id += 1
+        t = self.metrics.lap('association', t)
+
+        # IDs affichés des tracks oubliés libérés
+        self.tracks = tracks
+        self.random_ids.retain(tracks)
+        self.metrics.lap('expiry', t)
+
+        return detections
+
+# ========== Reporters ==========
+
+class LogReporter:
+    """Une ligne de log par détection, formatée par le thread du puits asynchrone (async_log)"""
+
+    def __init__(self, template, sink=None):
+        from async_log import INFO, get_log_sink
+        self.template = template
+        self.level = INFO
+        self.sink = sink if sink is not None else get_log_sink()
+
+    def __call__(self, rows, outimg=None, helper=None, overlay=True, idle=False, **kwargs):
+        self.sink.log_each(self.level, self.template, rows)
+
+
+class OverlayReporter:
+    """Boîtes + labels en cache dessinés en une passe (overlay_render) ; rows = (id, classe, score, x, y, w, h)"""
+
+    def __init__(self, backend, template="ID{id}:{name} {score:.1f}%", color=None, text_offset=(3, -12)):
+        from overlay_render import LabelCache, OverlayRenderer
+        self.backend = backend
+        self.labels = LabelCache(template)
+        self.renderer = OverlayRenderer()
+        self.color = color
+        self.text_offset = text_offset
+
+    def __call__(self, rows, outimg=None, helper=None, overlay=True, idle=False, classmap=None):
+        if not overlay or outimg is None:
+            return
+        dx, dy = self.text_offset
+        self.renderer.begin()
+        for track_id, class_id, score, x, y, w, h in rows:
+            label = self.labels.label(track_id, class_id, score, classmap)
+            self.renderer.add_box((track_id, label), x, y, w, h, label, x + dx, y + dy, self.color)
+        self.renderer.flush(self.backend, outimg)
+
+
+# ========== Assemblage ==========
+
+class YoloCore:
+    """
+    decode -> suppression -> tracking sur des Detections ; report délégué au reporter
+    Les adaptateurs appellent process() puis convertissent le résultat dans leur format
+    """
+
+    def __init__(self, decoder, suppressor, tracker=None, reporter=None, metrics=NULL_METRICS):
+        self.decoder = decoder
+        self.suppressor = suppressor
+        self.tracker = tracker
+        self.reporter = reporter
+        self.metrics = metrics
+        self.cache = None  # SceneCache (scene_cache.py) : détections réutilisées si la scène est inchangée
+
+    def prepare(self):
+        """Imports différés faits tout de suite (démarrage à chaud : pas de pic à la première frame)"""
+        if isinstance(self.suppressor, NmsSuppressor) and self.suppressor.use_opencv:
+            _opencv()
+
+    def decode(self, outs, blob_w, blob_h, conf, heads=None):
+        return self.decoder(outs, blob_w, blob_h, conf, self.metrics, heads)
+
+    def suppress(self, dets):
+        if self.suppressor is None:
+            return dets
+        t = self.metrics.start()
+        kept = self.suppressor(dets)
+        self.metrics.lap('nms', t)
+        if self.metrics.enabled:
+            for head in kept.heads:
+                self.metrics.count('survivors', head=int(head))
+        return kept
+
+    def track(self, dets, blob_w, blob_h):
+        if self.tracker is None:
+            return dets
+        t = self.metrics.start()
+        dets = self.tracker(dets, blob_w, blob_h)
+        self.metrics.lap('association', t)
+        return dets
+
+    def cached(self, outs, blob_w, blob_h, conf, heads=None, extra=None):
+        """
+        Détections de la frame de référence si la scène est inchangée (cache actif), sinon None
+        extra : autre paramètre du décodage de l'appelant (ex. budget de candidats), inclus dans la clé
+        """
+        if self.cache is None:
+            return None
+        key = (conf, blob_w, blob_h, None if heads is None else tuple(heads), self.decoder, self.suppressor,
+               getattr(self.suppressor, 'iou', None), extra)
+        dets = self.cache.get(outs, key)
+        if self.metrics.enabled:
+            self.metrics.count('scene_cache_hits' if dets is not None else 'scene_cache_misses')
+        return dets
+
+    def process(self, outs, blob_w, blob_h, conf, heads=None):
+        dets = self.cached(outs, blob_w, blob_h, conf, heads)
+        if dets is None:
+            dets = self.suppress(self.decode(outs, blob_w, blob_h, conf, heads))
+            if self.cache is not None:
+                self.cache.put(dets)
+        return self.track(dets, blob_w, blob_h)
+
+    def process_steps(self, outs, blob_w, blob_h, conf, heads=None):
+        """
+        process() en générateur : un yield après chaque tête décodée (point de préemption du pool de
+        décodage, voir decode_executor.py), Detections en valeur de retour
+        """
+        decoder = self.decoder
+        if not hasattr(decoder, 'decode_head') or self.cache is not None:
+            return self.process(outs, blob_w, blob_h, conf, heads)
+        heads = range(min(len(outs), len(decoder.anchors))) if heads is None else heads
+        parts = []
+        for h in heads:
+            parts.append(decoder.decode_head(outs[h], h, blob_w, blob_h, conf, self.metrics))
+            yield
+        return self.track(self.suppress(Detections.concat(parts)), blob_w, blob_h)
+
+    def process_batch(self, outs, blob_w, blob_h, conf, heads=None):
+        """
+        Sorties empilées [B, ...] par tête -> DetectionBatch
+        Décodage en une passe pour le lot ; NMS et tracking frame par frame (tranches contiguës), dans l'ordre
+        Une seule NMS sur tout le lot coûterait ~B fois plus : chaque boîte gardée est comparée aux B frames
+        """
+        batch = self.decoder.decode_batch(outs, blob_w, blob_h, conf, self.metrics, heads)
+        if self.suppressor is not None and len(batch.dets):
+            t = self.metrics.start()
+            keep = np.concatenate([self.suppressor.indices(batch.frame(i)) + batch.offsets[i]
+                                   for i in range(len(batch))])
+            batch = batch.take(keep)
+            self.metrics.lap('nms', t)
+            if self.metrics.enabled:
+                for head in batch.dets.heads:
+                    self.metrics.count('survivors', head=int(head))
+        if self.tracker is None:
+            return batch
+        frames = [self.track(batch.frame(i), blob_w, blob_h) for i in range(len(batch))]
+        return DetectionBatch(Detections.concat(frames), batch.frames, len(batch))
+
+    def report(self, rows, outimg=None, helper=None, overlay=True, idle=False, **kwargs):
+        if self.reporter is not None:
+            self.reporter(rows, outimg, helper, overlay, idle, **kwargs)
+
+
+def blob_size(preproc, default=(512, 288)):
+    """(largeur, hauteur) du blob ; preproc.blobsize(0) renvoie (hauteur, largeur)"""
+    try:
+        bsiz = preproc.blobsize(0)
+        return bsiz[1], bsiz[0]
+    except Exception:
+        return default
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+📍 ZONE ANALYTICS
+Comptage sur l'appareil à partir des tracks : occupation de zones et franchissements de lignes
+- Mise à jour incrémentale à chaque frame : centres des tracks (coordonnées normalisées [0, 1]) + IDs
+- Franchissement = le déplacement du track (position précédente -> courante) coupe une ligne :
+  tests d'orientation vectorisés [tracks x lignes] ; sens 'in' = arrivée du côté où (B - A) x (P - A) > 0
+- Zones : point dans polygone vectorisé (parité des croisements) [tracks x arêtes de toutes les zones] ; occupation,
+  entrées et sorties (track apparu dans la zone = entrée, track expiré dans la zone = sortie)
+- Sortie : compteurs et événements seulement, au lieu de toutes les boîtes de chaque frame
+
+Configuration : YOLO_ZONES=/chemin/zones.json, par exemple
+{"lines": {"porte": [[0.5, 0.0], [0.5, 1.0]]},
+ "zones": {"quai": [[0.1, 0.5], [0.9, 0.5], [0.9, 1.0], [0.1, 1.0]]}}
+"""
+
+import json
+import os
+from collections import deque
+
+import numpy as np
+
+
+def _cross(ax, ay, bx, by):
+    return ax * by - ay * bx
+
+
+class ZoneAnalytics:
+    """
+    za.update(track_ids, centers, timestamp)   # centers [N, 2] normalisés, une fois par frame
+    za.drain() -> événements depuis le dernier appel ; za.stats() -> compteurs
+    Tracks absents plus de max_missing frames oubliés (le franchissement pendant l'absence est compté au retour)
+    """
+
+    def __init__(self, lines=None, zones=None, max_missing=60, log_size=1024):
+        self.line_names = list(lines or {})
+        self.lines = np.asarray([lines[n] for n in self.line_names], dtype=np.float64).reshape(-1, 2, 2)
+        self.zone_names = list(zones or {})
+        self.zones = [np.asarray(zones[n], dtype=np.float64).reshape(-1, 2) for n in self.zone_names]
+        self.max_missing = max_missing
+
+        # Arêtes de toutes les zones à la suite (x1, y1, y2, pente dx / dy), début de chaque zone
+        edges = [np.column_stack([poly, np.roll(poly, -1, axis=0)]) for poly in self.zones]
+        edges = np.concatenate(edges) if edges else np.zeros((0, 4))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slope = np.where(edges[:, 3] != edges[:, 1], (edges[:, 2] - edges[:, 0]) / (edges[:, 3] - edges[:, 1]), 0.0)
+        self.edges = (edges[:, 0], edges[:, 1], edges[:, 3], slope)
+        self.zone_starts = np.cumsum([0] + [len(poly) for poly in self.zones[:-1]])
+
+        # État des tracks connus, triés par ID : position, zones occupées, dernière frame vue
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.xy = np.zeros((0, 2), dtype=np.float64)
+        self.inside = np.zeros((0, len(self.zones)), dtype=bool)
+        self.seen = np.zeros(0, dtype=np.int64)
+        self.frame = 0
+
+        self.crossings = np.zeros((len(self.line_names), 2), dtype=np.int64)  # [ligne, (in, out)]
+        self.occupancy = np.zeros(len(self.zones), dtype=np.int64)
+        self.entries = np.zeros(len(self.zones), dtype=np.int64)
+        self.exits = np.zeros(len(self.zones), dtype=np.int64)
+
+        self.events = deque(maxlen=log_size)
+        self.undrained = 0
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        with open(path, 'r') as f:
+            config = json.load(f)
+        return cls(config.get('lines'), config.get('zones'), **kwargs)
+
+    # ========== Géométrie ==========
+
+    def _crossed(self, p, q):
+        """Segments p -> q [M, 2] contre les lignes [L] -> (franchit [M, L], sens in [M, L])"""
+        a = self.lines[None, :, 0]  # [1, L, 2]
+        b = self.lines[None, :, 1]
+        p = p[:, None]
+        q = q[:, None]
+        dx, dy = (b - a)[..., 0], (b - a)[..., 1]
+        side_p = _cross(dx, dy, p[..., 0] - a[..., 0], p[..., 1] - a[..., 1])
+        side_q = _cross(dx, dy, q[..., 0] - a[..., 0], q[..., 1] - a[..., 1])
+        mx, my = (q - p)[..., 0], (q - p)[..., 1]
+        side_a = _cross(mx, my, a[..., 0] - p[..., 0], a[..., 1] - p[..., 1])
+        side_b = _cross(mx, my, b[..., 0] - p[..., 0], b[..., 1] - p[..., 1])
+        crossed = (side_p * side_q < 0) & (side_a * side_b < 0)
+        return crossed, side_q > 0
+
+    def _contains(self, xy):
+        """Points [N, 2] dans chaque zone -> [N, Z]"""
+        if not len(xy):
+            return np.zeros((0, len(self.zones)), dtype=bool)
+        x1, y1, y2, slope = self.edges
+        x, y = xy[:, 0:1], xy[:, 1:2]
+        spans = (y1 > y) != (y2 > y)  # [N, E] : l'arête traverse l'horizontale du point
+        hits = spans & (x < x1 + (y - y1) * slope)
+        return np.add.reduceat(hits, self.zone_starts, axis=1) % 2 == 1
+
+    # ========== Mise à jour ==========
+
+    def update(self, track_ids, centers, timestamp=0.0):
+        """Tracks de la frame -> nombre d'événements produits"""
+        self.frame += 1
+        ids = np.asarray(track_ids, dtype=np.int64).reshape(-1)
+        xy = np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+        ids, first = np.unique(ids, return_index=True)  # triés, un centre par track
+        xy = xy[first]
+        events = []
+
+        pos = np.searchsorted(self.ids, ids)
+        known = pos < len(self.ids)
+        known[known] = self.ids[pos[known]] == ids[known]
+        prev = pos[known]
+
+        # Franchissements de lignes par les tracks déjà connus
+        if len(self.lines) and len(prev):
+            crossed, forward = self._crossed(self.xy[prev], xy[known])
+            t, line = np.nonzero(crossed)
+            if len(t):
+                inward = forward[t, line]
+                np.add.at(self.crossings, (line, np.where(inward, 0, 1)), 1)
+                moved = ids[known]
+                for track, l, d in zip(moved[t].tolist(), line.tolist(), inward.tolist()):
+                    events.append((timestamp, 'line', self.line_names[l], track, 'in' if d else 'out'))
+
+        # Zones : transitions pour les tracks connus, entrée pour les nouveaux tracks déjà dans la zone
+        inside = self._contains(xy) if self.zones else np.zeros((len(ids), 0), dtype=bool)
+        was = np.zeros_like(inside)
+        was[known] = self.inside[prev]
+        entered = inside & ~was
+        left = was & ~inside
+        self.entries += entered.sum(axis=0)
+        self.exits += left.sum(axis=0)
+        for kind, mask in (('enter', entered), ('exit', left)):
+            for t, z in zip(*np.nonzero(mask)):
+                events.append((timestamp, kind, self.zone_names[z], int(ids[t]), None))
+
+        # Tracks absents cette frame : gardés max_missing frames, sortie de zone à l'oubli
+        absent = np.ones(len(self.ids), dtype=bool)
+        absent[prev] = False
+        expired = absent & (self.frame - self.seen > self.max_missing)
+        if expired.any():
+            gone = self.inside[expired]
+            self.exits += gone.sum(axis=0)
+            for t, z in zip(*np.nonzero(gone)):
+                events.append((timestamp, 'exit', self.zone_names[z], int(self.ids[expired][t]), None))
+        kept = absent & ~expired
+
+        if known.all() and not absent.any():
+            # Mêmes tracks que la frame précédente (cas courant) : mise à jour en place, ordre inchangé
+            self.xy[prev] = xy
+            self.inside[prev] = inside
+            self.seen[prev] = self.frame
+        else:
+            self._merge(ids, xy, inside, kept)
+
+        self.occupancy = inside.sum(axis=0)
+        self.events.extend(events)
+        self.undrained = min(self.undrained + len(events), self.events.maxlen)
+        return len(events)
+
+    def _merge(self, ids, xy, inside, kept):
+        """Tracks de la frame + tracks absents conservés, triés par ID"""
+        self.ids = np.concatenate([ids, self.ids[kept]])
+        self.xy = np.concatenate([xy, self.xy[kept]])
+        self.inside = np.concatenate([inside, self.inside[kept]])
+        self.seen = np.concatenate([np.full(len(ids), self.frame, dtype=np.int64), self.seen[kept]])
+        order = np.argsort(self.ids, kind='stable')
+        self.ids, self.xy, self.inside, self.seen = self.ids[order], self.xy[order], self.inside[order], self.seen[order]
+
+    # ========== Sortie ==========
+
+    def drain(self):
+        """Événements (timestamp, 'line' | 'enter' | 'exit', nom, track, sens) depuis le dernier appel"""
+        if not self.undrained:
+            return []
+        new = list(self.events)[-self.undrained:]
+        self.undrained = 0
+        return new
+
+    def stats(self):
+        return {
+            'lines': {name: {'in': int(c[0]), 'out': int(c[1])} for name, c in zip(self.line_names, self.crossings)},
+            'zones': {name: {'occupancy': int(self.occupancy[z]), 'entries': int(self.entries[z]),
+                             'exits': int(self.exits[z])} for z, name in enumerate(self.zone_names)},
+            'tracks': len(self.ids),
+        }
+
+
+def zone_analytics_from_env():
+    """ZoneAnalytics configuré par YOLO_ZONES (fichier JSON), ou None"""
+    path = os.environ.get('YOLO_ZONES')
+    if not path:
+        return None
+    try:
+        return ZoneAnalytics.from_file(path)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ YOLO_ZONES ignoré ({path}) : {e}")
+        return None